@@ -170,6 +170,7 @@ variables_in_special_object_table = {
     "interrupt_semaphore": SO_USER_INTERRUPT_SEMAPHORE,
     "timerSemaphore": SO_TIMER_SEMAPHORE,
     "low_space_semaphore": SO_LOW_SPACE_SEMAPHORE,
+    "external_objects_array": SO_EXTERNAL_OBJECTS_ARRAY,
     "jit_hook_selector": SO_JIT_HOOK,
     "jit_hook_receiver": SO_JIT_HOOK_RCVR
 }
@@ -192,6 +193,10 @@ TAGGED_MININT = -2 ** (LONG_BIT - 2)
 TAGGED_MAXINT32 = 2 ** (32 - 2) - 1
 TAGGED_MININT32 = -2 ** (32 - 2)
 
+# 64-bit Spur images use 3 tag bits (clamped to what fits a machine int)
+TAGGED_MAXINT61 = int(min(2 ** (64 - 4) - 1, sys.maxint))
+TAGGED_MININT61 = int(max(-2 ** (64 - 4), -sys.maxint - 1))
+
 TAGGED_MASK = int(2 ** (LONG_BIT - 1) - 1)
 
 MAXINT = sys.maxint
@@ -262,6 +267,8 @@ def decode_alternate_compiled_method_header(header):
 
 INTERRUPT_COUNTER_SIZE = 10000
 LITERAL_LIST_UNROLL_SIZE = 7 # up to which size the wrapping of literal arrays in methods is unrolled
+METHOD_CACHE_SIZE = 1024 # number of (class, selector) entries in the global lookup cache, must be a power of 2
+INLINE_CACHE_ENTRIES = 4 # receiver classes cached per send site before it is considered megamorphic
 CompileTime = time.time()
 
 SYSTEM_ATTRIBUTE_IMAGE_NAME_INDEX = 1
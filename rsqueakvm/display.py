@@ -50,6 +50,7 @@ DISABLED_EVENTS = unrolling_iterable([
 ])
 
 MINIMUM_DEPTH = 16
+IDLE_EVENT_SLICE_MS = 10
 BELOW_MINIMUM_DEPTH = 32
 
 PIXELVOIDPP = lltype.malloc(rffi.VOIDPP.TO, 1,
@@ -112,6 +113,11 @@ class NullDisplay(object):
     def is_headless(self):
         return True
 
+    def idle_slice_ms(self):
+        """Answer how long idling may wait at most before the image has to
+        look for events again, or -1 if it can wait as long as it likes."""
+        return -1
+
     def mouse_button(self):
         return self.button
 
@@ -196,6 +202,10 @@ class SDLDisplay(NullDisplay):
     def is_headless(self):
         return False
 
+    def idle_slice_ms(self):
+        # SDL has no fd to wait for events with
+        return IDLE_EVENT_SLICE_MS
+
     def close(self):
         RSDL.Quit()
 
@@ -11,9 +11,11 @@ from rsqueakvm.model.numeric import W_SmallInteger
 from rsqueakvm.model.pointers import W_PointersObject
 from rsqueakvm.model.variable import W_BytesObject
 from rsqueakvm.storage_contexts import ContextPartShadow, ActiveContext, InactiveContext, DirtyContext
+from rsqueakvm.util import signal_queue, timer
+from rsqueakvm.util.iopoll import IOPoller
 
-from rpython.rlib import jit, rstackovf, unroll, objectmodel, rsignal
-from rpython.rlib.rarithmetic import ovfcheck
+from rpython.rlib import jit, rstackovf, objectmodel, rsignal
+from rpython.rlib.rarithmetic import intmask, ovfcheck
 
 
 class ReturnFromTopLevel(Exception):
@@ -126,8 +128,6 @@ class ProcessSwitch(ContextSwitchException):
         ContextSwitchException.__init__(self, s_new_context)
         self.forced = forced
 
-UNROLLING_BYTECODE_RANGES = unroll.unrolling_iterable(interpreter_bytecodes.BYTECODE_RANGES)
-
 def get_printable_location(pc, self, method, w_class, blockmethod):
     bc = ord(method.bytes[pc])
     name = method.safe_identifier_string()
@@ -157,6 +157,8 @@ jit_driver_name = "rsqueakjit"
 class Interpreter(object):
     _immutable_fields_ = ["space",
                           "image",
+                          "io_poller",
+                          "interrupt_flag",
                           "startup_time",
                           "evented",
                           "interrupts",
@@ -199,6 +201,8 @@ class Interpreter(object):
             self.interrupt_counter_size = constants.INTERRUPT_COUNTER_SIZE
         self.last_check = self.time_now()
         self.trace = trace
+        self.io_poller = IOPoller()
+        self.interrupt_flag = timer.interrupt_pending_flag()
 
         # === Initialize mutable variables
         self.interrupt_check_counter = self.interrupt_counter_size
@@ -412,16 +416,10 @@ class Interpreter(object):
                 self.check_sigusr(context)
 
         bytecode = context.fetch_next_bytecode()
-        for entry in UNROLLING_BYTECODE_RANGES:
-            if len(entry) == 2:
-                bc, methname = entry
-                if bytecode == bc:
-                    return getattr(context, methname)(self, bytecode)
-            else:
-                start, stop, methname = entry
-                if start <= bytecode <= stop:
-                    return getattr(context, methname)(self, bytecode)
-        assert 0, "unreachable"
+        # The table is immutable and the bytecode is a constant in traces, so
+        # the JIT sees a direct call here.
+        implementation = interpreter_bytecodes.bytecode_holder.bytecode_table[bytecode]
+        return implementation(context, self, bytecode)
 
     # ============== Methods for handling user interrupts ==============
 
@@ -439,10 +437,18 @@ class Interpreter(object):
         if not self.interrupts:
             return
         self.interrupt_check_counter -= dec
-        if self.interrupt_check_counter <= 0:
+        # the timer thread raises the flag when the timer semaphore is due,
+        # so Delays do not have to wait for the counter to run out
+        if self.interrupt_check_counter <= 0 or self.interrupt_flag[0] != 0:
             self.interrupt_check_counter = self.interrupt_counter_size
             self.check_for_interrupts(s_frame)
 
+    def set_next_wakeup_tick(self, tick):
+        "Signal the timer semaphore at tick, UTC microseconds, or never if 0."
+        self.next_wakeup_tick = tick
+        if self.interrupts:
+            timer.set_deadline(tick)
+
     def check_sigusr(self, s_frame):
         poll = rsignal.pypysig_poll()
         if poll == rsignal.SIGUSR1:
@@ -455,6 +461,8 @@ class Interpreter(object):
             wrapper.SemaphoreWrapper(self.space, w_low_space_sema).signal(s_frame, forced=True)
 
     def check_for_interrupts(self, s_frame):
+        timer_due = self.interrupt_flag[0] != 0
+        self.interrupt_flag[0] = 0
         display = self.space.display()
         if display:
             display.render()
@@ -484,15 +492,71 @@ class Interpreter(object):
 
         # 5. the low space semaphore is signalled in ClassShadow#new
         # 6. signal the timer
-        if not self.next_wakeup_tick == 0 and now >= self.next_wakeup_tick:
+        if not self.next_wakeup_tick == 0 and (timer_due or now >= self.next_wakeup_tick):
             self.next_wakeup_tick = 0
             semaphore = self.space.w_timerSemaphore()
             if not semaphore.is_nil(self.space):
                 assert isinstance(semaphore, W_PointersObject)
                 wrapper.SemaphoreWrapper(self.space, semaphore).signal(s_frame, forced=False)
         # We have no finalization process, so far.
-        # We do not support external semaphores.
-        # In cog, the method to add such a semaphore is only called in GC.
+        # 7. signal the external semaphores of the fds that became ready and
+        # the ones that plugins or other threads queued a signal for
+        self.io_poller.poll()
+        self.signal_external_semaphores(
+            s_frame, self.io_poller.take_ready() + signal_queue.take_signals())
+
+    def signal_external_semaphores(self, s_frame, indices):
+        """Signal the semaphores at the 1-based indices into the external
+        objects array. When a signal makes a process of higher priority
+        runnable, the remaining ones are signalled on behalf of that process
+        and the switch to it is raised in the end."""
+        switch = None
+        for index in indices:
+            w_semaphore = self.external_semaphore(index)
+            if w_semaphore is None:
+                continue
+            try:
+                wrapper.SemaphoreWrapper(self.space, w_semaphore).signal(s_frame, forced=False)
+            except ProcessSwitch as e:
+                switch = e
+                s_frame = e.s_new_context
+        if switch is not None:
+            raise switch
+
+    def external_semaphore(self, index):
+        w_external_objects = self.space.w_external_objects_array()
+        if not isinstance(w_external_objects, W_PointersObject):
+            return None
+        if not 0 < index <= w_external_objects.size():
+            return None
+        w_semaphore = w_external_objects.at0(self.space, index - 1)
+        if not isinstance(w_semaphore, W_PointersObject):
+            return None
+        if not w_semaphore.getclass(self.space).is_same_object(self.space.w_Semaphore):
+            return None
+        return w_semaphore
+
+    def idle(self, time_mu_s):
+        """Wait for up to time_mu_s microseconds, or until the timer
+        semaphore is due, a watched fd becomes ready or a signal is queued,
+        whichever comes first. With a display the wait is cut into slices,
+        so that the image gets to look at its events."""
+        import time
+        wakeup_fd = signal_queue.wakeup_fd()
+        if signal_queue.has_pending_signals():
+            return
+        if self.next_wakeup_tick != 0:
+            time_mu_s = min(time_mu_s, intmask(self.next_wakeup_tick - self.time_now()))
+        if time_mu_s <= 0:
+            return
+        timeout_ms = (time_mu_s + 999) / 1000
+        slice_ms = self.space.display().idle_slice_ms()
+        if slice_ms >= 0:
+            timeout_ms = min(timeout_ms, slice_ms)
+        if wakeup_fd < 0 and not self.io_poller.has_watches():
+            time.sleep(timeout_ms / 1000.0)
+        else:
+            self.io_poller.poll(timeout_ms, wakeup_fd)
 
     def time_now(self):
         """
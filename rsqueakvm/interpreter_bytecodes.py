@@ -315,7 +315,11 @@ class __extend__(ContextPartShadow):
     def _sendSelector(self, w_selector, argcount, interp, receiver,
                       receiverclassshadow, w_arguments=None, s_fallback=None):
         assert argcount >= 0
-        w_method = receiverclassshadow.lookup(w_selector)
+        if w_arguments is None:
+            w_method = self._lookup_at_send_site(w_selector, receiverclassshadow)
+        else:
+            # perform primitives have no send site of their own
+            w_method = receiverclassshadow.lookup(w_selector)
         if w_method is None:
             if w_arguments:
                 self.push_all(w_arguments)
@@ -351,6 +355,21 @@ class __extend__(ContextPartShadow):
 
         return interp.stack_frame(s_frame, self, True)
 
+    def _lookup_at_send_site(self, w_selector, receiverclassshadow):
+        if jit.we_are_jitted():
+            # The lookup is elidable on the promoted class, no need to cache.
+            return receiverclassshadow.lookup(w_selector)
+        # The pc already points behind the send, so pc - 1 identifies the site.
+        cache = self.w_method().get_inline_cache(self.pc() - 1, w_selector)
+        if cache is None:
+            return receiverclassshadow.lookup(w_selector)
+        index = cache.probe(receiverclassshadow)
+        if index >= 0:
+            return cache.methods[index]
+        w_method = receiverclassshadow.lookup(w_selector)
+        cache.fill(receiverclassshadow, w_method)
+        return w_method
+
     def _invokeObjectAsMethod(self, w_selector, argcount, interp, w_receiver):
         args_w = self.pop_and_return_n(argcount)
         w_arguments = interp.space.wrap_list_unroll_safe(args_w)
@@ -762,13 +781,20 @@ def initialize_bytecode_table():
         else:
             positions = range(entry[0], entry[1]+1)
         for pos in positions:
-            result[pos] = getattr(ContextPartShadow, entry[-1])
+            result[pos] = getattr(ContextPartShadow, entry[-1]).im_func
     assert None not in result
     return result
 
-# this table is only used for creating named bytecodes in tests and printing
+# Maps every bytecode to its implementation. Interpreter.step dispatches
+# through this table, it is also used for printing bytecodes.
 BYTECODE_TABLE = initialize_bytecode_table()
 
+class BytecodeHolder(object):
+    _immutable_fields_ = ["bytecode_table[*]"]
+
+bytecode_holder = BytecodeHolder()
+bytecode_holder.bytecode_table = BYTECODE_TABLE
+
 def initialize_return_bytecodes():
     result = []
     for entry in BYTECODE_RANGES:
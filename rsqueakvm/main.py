@@ -99,6 +99,12 @@ def _usage(argv):
                                  Disables non-cooperative scheduling.
             -S|--no-storage    - Disable specialized storage strategies.
                                  Always use generic ListStrategy. Probably slower.
+            --background-snapshot
+                               - Write snapshots from a forked process, so
+                                 the VM only pauses while tracing the image.
+            --image-cache      - Keep the decoded objects of the image in
+                                 <image>.cache and load from there on the next
+                                 start, as long as the image is unchanged.
             --hacks            - Enable Spy hacks. Set display color depth to 8
 
           Logging:
@@ -164,7 +170,11 @@ prebuilt_space = make_initial_space()
 
 def safe_entry_point(argv):
     try:
-        return entry_point(argv)
+        try:
+            return entry_point(argv)
+        finally:
+            squeakimage.wait_for_snapshot_writer(prebuilt_space)
+            [p.shutdown(prebuilt_space) for p in PluginRegistry.enabled_plugins]
     except error.CleanExit as e:
         return 0
     except error.Exit as e:
@@ -200,6 +210,7 @@ class Config(object):
         self.trace_important = False
         self.extra_arguments_idx = len(argv)
         self.log_image_loading = False
+        self.image_cache = False
         self.shell = False
 
     def parse_args(self, argv, skip_bad=False):
@@ -269,6 +280,10 @@ class Config(object):
                 self.interrupts = False
             elif arg in ["-S", "--no-storage"]:
                 self.space.strategy_factory.no_specialized_storage.activate()
+            elif arg == "--background-snapshot":
+                self.space.background_snapshot.activate()
+            elif arg == "--image-cache":
+                self.image_cache = True
             # Logging
             elif arg in ["-t", "--trace"]:
                 self.trace = True
@@ -413,7 +428,7 @@ def entry_point(argv):
         return 1
 
     try:
-        stream = squeakimage.Stream(filename=cfg.path)
+        stream = squeakimage.Stream(filename=cfg.path, use_mmap=True)
     except OSError as e:
         print_error("%s -- %s (LoadError)" % (os.strerror(e.errno), cfg.path))
         return 1
@@ -423,7 +438,11 @@ def entry_point(argv):
         argv.append('-headless')
 
     # Load & prepare image and environment
-    image = squeakimage.ImageReader(space, stream, cfg.log_image_loading).create_image()
+    cache_path = None
+    if cfg.image_cache:
+        cache_path = cfg.path + ".cache"
+    image = squeakimage.ImageReader(space, stream, cfg.log_image_loading,
+                                    cache_path=cache_path).create_image()
     interp = interpreter.Interpreter(space, image,
                 trace=cfg.trace, trace_important=cfg.trace_important,
                 evented=not cfg.poll, interrupts=cfg.interrupts)
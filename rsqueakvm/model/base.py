@@ -98,6 +98,13 @@ class W_Object(object):
     def setword(self, n0, r_uint_value):
         raise NotImplementedError()
 
+    def replace_from_to(self, space, start, stop, w_source, source_start):
+        """Copy the variable-sized part of w_source, beginning at source_start,
+        to start..stop of the receiver without wrapping each element, as by
+        replaceFrom:to:with:startingAt:. Answer False if the layouts do not
+        allow that, the caller then copies element by element."""
+        return False
+
     def invariant(self):
         return True
 
@@ -38,6 +38,56 @@ class SpurCompiledMethodHeader(CompiledMethodHeader):
         return header_word & (1 << 16) != 0
 
 
+class InlineCache(object):
+    """The methods found at a single send site for the receiver classes seen
+    there. Each entry is only valid as long as the version of its class shadow
+    is unchanged. Once more than INLINE_CACHE_ENTRIES classes have been seen,
+    the site is megamorphic and only the global method cache is used."""
+    _attrs_ = ["w_selector", "classes", "versions", "methods",
+               "megamorphic", "hits", "misses"]
+
+    def __init__(self, w_selector):
+        self.w_selector = w_selector
+        self.classes = []
+        self.versions = []
+        self.methods = []
+        self.megamorphic = False
+        self.hits = 0
+        self.misses = 0
+
+    def probe(self, s_class):
+        for i in range(len(self.classes)):
+            if self.classes[i] is s_class and self.versions[i] is s_class.version:
+                self.hits += 1
+                return i
+        self.misses += 1
+        return -1
+
+    def fill(self, s_class, w_method):
+        if self.megamorphic:
+            return
+        for i in range(len(self.classes)):
+            if self.classes[i] is s_class:
+                self.versions[i] = s_class.version
+                self.methods[i] = w_method
+                return
+        if len(self.classes) >= constants.INLINE_CACHE_ENTRIES:
+            self.megamorphic = True
+            self.classes = []
+            self.versions = []
+            self.methods = []
+            return
+        self.classes.append(s_class)
+        self.versions.append(s_class.version)
+        self.methods.append(w_method)
+
+    def polymorphism(self):
+        """Number of receiver classes currently cached, -1 if megamorphic."""
+        if self.megamorphic:
+            return -1
+        return len(self.classes)
+
+
 class W_CompiledMethod(W_AbstractObjectWithIdentityHash):
     """My instances are methods suitable for interpretation by the virtual machine.  This is the only class in the system whose instances intermix both indexable pointer fields and indexable integer fields.
 
@@ -58,9 +108,12 @@ class W_CompiledMethod(W_AbstractObjectWithIdentityHash):
                 # Main method content
                 "bytes", "literals",
                 # Additional info about the method
-                "lookup_selector", "compiledin_class", "lookup_class" ]
+                "lookup_selector", "compiledin_class", "lookup_class",
+                # Send site caches, allocated lazily by the interpreter
+                "inline_caches" ]
     lookup_selector = "<unknown>"
     lookup_class = None
+    inline_caches = None
 
     def pointers_become_one_way(self, space, from_w, to_w):
         W_AbstractObjectWithIdentityHash.pointers_become_one_way(self, space, from_w, to_w)
@@ -105,7 +158,7 @@ class W_CompiledMethod(W_AbstractObjectWithIdentityHash):
         # Implicitly sets the header, including self.literalsize
         for i, w_object in enumerate(g_self.get_pointers()):
             self.literalatput0(space, i, w_object, initializing=True)
-        self.setbytes(g_self.get_bytes()[self.bytecodeoffset():])
+        self.setbytes(g_self.get_bytecodes(self.literalsize))
         self.post_init()
 
     def post_init(self):
@@ -140,10 +193,27 @@ class W_CompiledMethod(W_AbstractObjectWithIdentityHash):
 
     def setbytes(self, bytes):
         self.bytes = bytes
+        self.inline_caches = None
 
     def setchar(self, index0, character):
         assert index0 >= 0
         self.bytes[index0] = character
+        self.inline_caches = None
+
+    def get_inline_cache(self, pc, w_selector):
+        """Answer the cache for the send ending at bytecode index pc, or None
+        if the site cannot be cached for this selector (e.g. a perform)."""
+        caches = self.inline_caches
+        if caches is None:
+            caches = self.inline_caches = [None] * len(self.bytes)
+        if not 0 <= pc < len(caches):
+            return None
+        cache = caches[pc]
+        if cache is None:
+            cache = caches[pc] = InlineCache(w_selector)
+        elif cache.w_selector is not w_selector:
+            return None
+        return cache
 
     # === Getters ===
 
@@ -310,6 +380,7 @@ class W_CompiledMethod(W_AbstractObjectWithIdentityHash):
         self.literals, w_other.literals = w_other.literals, self.literals
         self._tempsize, w_other._tempsize = w_other._tempsize, self._tempsize
         self.bytes, w_other.bytes = w_other.bytes, self.bytes
+        self.inline_caches, w_other.inline_caches = w_other.inline_caches, self.inline_caches
         self.header, w_other.header = w_other.header, self.header
         self.literalsize, w_other.literalsize = w_other.literalsize, self.literalsize
         self.islarge, w_other.islarge = w_other.islarge, self.islarge
@@ -114,6 +114,37 @@ class W_AbstractFloat(W_AbstractObjectWithIdentityHash):
         return constants.WORDS_IN_FLOAT
 
 
+# 64-bit Spur images store floats with an 8-bit exponent (and zero) as
+# SmallFloat64 immediates. The exponent is rebased by
+# SMALLFLOAT64_EXPONENT_OFFSET and the bits are rotated left by one, so that
+# the sign ends up in the lowest bit.
+SMALLFLOAT64_EXPONENT_OFFSET = 896
+SMALLFLOAT64_TAG = 4
+
+def is_small_float64(value):
+    bits = r_ulonglong(float_pack(value, 8))
+    if (bits << 1) == 0: # +/- zero
+        return True
+    exponent = intmask((bits >> 52) & 0x7ff)
+    return (SMALLFLOAT64_EXPONENT_OFFSET < exponent <=
+            SMALLFLOAT64_EXPONENT_OFFSET + 255)
+
+def small_float64_oop(value):
+    assert is_small_float64(value)
+    bits = r_ulonglong(float_pack(value, 8))
+    rotated = (bits << 1) | (bits >> 63)
+    if rotated > 1:
+        rotated -= r_ulonglong(SMALLFLOAT64_EXPONENT_OFFSET) << 53
+    return (rotated << 3) | SMALLFLOAT64_TAG
+
+def small_float64_value(oop):
+    rotated = r_ulonglong(oop) >> 3
+    if rotated > 1:
+        rotated += r_ulonglong(SMALLFLOAT64_EXPONENT_OFFSET) << 53
+    bits = (rotated >> 1) | (rotated << 63)
+    return float_unpack(bits, 8)
+
+
 class W_Float(W_AbstractFloat):
     """Boxed float value."""
     _attrs_ = ['value']
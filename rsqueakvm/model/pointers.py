@@ -27,11 +27,14 @@ class W_PointersObject(W_AbstractObjectWithIdentityHash):
 
     def fillin(self, space, g_self):
         W_AbstractObjectWithIdentityHash.fillin(self, space, g_self)
-        # Recursive fillin required to enable specialized storage strategies.
-        for g_obj in g_self.pointers:
-            g_obj.fillin(space)
+        storage_type = g_self.storage_type
+        if storage_type is None:
+            # Recursive fillin required to enable specialized storage strategies.
+            for g_obj in g_self.pointers:
+                g_obj.fillin(space)
         pointers = g_self.get_pointers()
-        storage_type = space.strategy_factory.strategy_type_for(pointers, weak=False)  # do not fill in weak lists, yet
+        if storage_type is None:
+            storage_type = space.strategy_factory.strategy_type_for(pointers, weak=False)  # do not fill in weak lists, yet
         space.strategy_factory.set_initial_strategy(self, storage_type,
                                                     g_self.get_class(),
                                                     len(pointers), pointers)
@@ -169,6 +172,13 @@ class W_PointersObject(W_AbstractObjectWithIdentityHash):
         # To test, at0 = in varsize part
         self.store(space, index0 + self.instsize(), w_value)
 
+    def replace_from_to(self, space, start, stop, w_source, source_start):
+        if not isinstance(w_source, W_PointersObject):
+            return False
+        return self._get_strategy().copy_storage_from(
+            self, start + self.instsize(), w_source,
+            source_start + w_source.instsize(), stop - start + 1)
+
     def fetch(self, space, n0):
         return self._get_strategy().fetch(self, n0)
 
@@ -2,9 +2,22 @@ from rsqueakvm import constants, error
 from rsqueakvm.model.base import W_AbstractObjectWithClassReference
 from rsqueakvm.util.version import Version, elidable_for_version_iff
 
-from rpython.rlib import jit
+from rpython.rlib import jit, rgc
 from rpython.rlib.objectmodel import not_rpython
 from rpython.rlib.rarithmetic import intmask, r_uint, r_uint32, r_int64
+from rpython.rlib.rstring import StringBuilder
+from rpython.rtyper.lltypesystem import lltype, rffi
+
+
+def byte_buffer(chars):
+    """Answer the list of chars as byte storage. After translation this is a
+    flat char array, which I/O can address through raw_buffer()."""
+    return rgc.resizable_list_supporting_raw_ptr(chars)
+
+
+def pack_words(ruints):
+    "Answer the 32-bit words of the list of r_uints as a list of r_uint32."
+    return [r_uint32(word) for word in ruints]
 
 
 class W_BytesObject(W_AbstractObjectWithClassReference):
@@ -17,7 +30,7 @@ class W_BytesObject(W_AbstractObjectWithClassReference):
         W_AbstractObjectWithClassReference.__init__(self, space, w_class)
         assert isinstance(size, int)
         self.mutate()
-        self.bytes = ['\x00'] * size
+        self.bytes = byte_buffer(['\x00'] * size)
 
     def mutate(self):
         self.version = Version()
@@ -25,7 +38,7 @@ class W_BytesObject(W_AbstractObjectWithClassReference):
     def fillin(self, space, g_self):
         W_AbstractObjectWithClassReference.fillin(self, space, g_self)
         self.mutate()
-        self.bytes = g_self.get_bytes()
+        self.bytes = byte_buffer(g_self.get_bytes())
 
     def at0(self, space, index0):
         return space.wrap_smallint_unsafe(ord(self.getchar(index0)))
@@ -94,8 +107,33 @@ class W_BytesObject(W_AbstractObjectWithClassReference):
     @jit.dont_look_inside
     def setbytes(self, lst):
         assert len(lst) == self.size()
-        self.bytes = lst
+        self.bytes = byte_buffer(lst)
+        self.mutate()
+
+    @jit.dont_look_inside
+    def raw_buffer(self):
+        """Answer a non-moving char* to the bytes, so that I/O can read into
+        and write from this object without copying. It stays valid until the
+        bytes are replaced (setbytes, become). Callers writing through it
+        must call mutate() afterwards."""
+        return rgc.nonmoving_raw_ptr_for_resizable_list(self._bytes())
+
+    def writable_raw_buffer(self):
+        """Answer raw_buffer() for writing into the bytes, or a null pointer
+        if the receiver must not be changed."""
+        return self.raw_buffer()
+
+    def replace_from_to(self, space, start, stop, w_source, source_start):
+        if not isinstance(w_source, W_BytesObject):
+            return False
+        source_stop = source_start + stop - start + 1
+        self.bytes[start:stop + 1] = w_source.byte_slice(source_start, source_stop)
         self.mutate()
+        return True
+
+    def byte_slice(self, start, stop):
+        "Answer the bytes from start to stop as a list of chars."
+        return self._bytes()[start:stop]
 
     def is_positive(self, space):
         return self.getclass(space).is_same_object(space.w_LargePositiveInteger)
@@ -164,7 +202,7 @@ class W_BytesObject(W_AbstractObjectWithClassReference):
     def clone(self, space):
         size = self.size()
         w_result = W_BytesObject(space, self.getclass(space), size)
-        w_result.bytes = list(self._bytes())
+        w_result.bytes = byte_buffer(list(self._bytes()))
         return w_result
 
     def is_array_object(self):
@@ -179,18 +217,18 @@ class W_BytesObject(W_AbstractObjectWithClassReference):
 
 
 class W_WordsObject(W_AbstractObjectWithClassReference):
-    # TODO: this assumes only 32-bit words objects
+    # words are 32-bit, also on 64-bit hosts, and kept packed as r_uint32
     _attrs_ = ['words']
     repr_classname = "W_WordsObject"
     _immutable_fields_ = ['words?']
 
     def __init__(self, space, w_class, size):
         W_AbstractObjectWithClassReference.__init__(self, space, w_class)
-        self.words = [r_uint(0)] * size
+        self.words = [r_uint32(0)] * size
 
     def fillin(self, space, g_self):
         W_AbstractObjectWithClassReference.fillin(self, space, g_self)
-        self.words = g_self.get_ruints()
+        self.words = pack_words(g_self.get_ruints())
 
     def at0(self, space, index0):
         val = self.getword(index0)
@@ -202,10 +240,10 @@ class W_WordsObject(W_AbstractObjectWithClassReference):
 
     def getword(self, n):
         assert self.size() > n >= 0
-        return self._words()[n]
+        return r_uint(self._words()[n])
 
     def setword(self, n, word):
-        self.words[n] = r_uint(word)
+        self.words[n] = r_uint32(word)
 
     def getchar(self, n0):
         return chr(self.getword(n0))
@@ -249,11 +287,21 @@ class W_WordsObject(W_AbstractObjectWithClassReference):
     @jit.dont_look_inside
     def setwords(self, lst):
         assert len(lst) == self.size()
-        self.words = lst
+        self.words = pack_words(lst)
 
     def getwords(self):
+        "Answer the packed words, a list of r_uint32"
         return self.words
 
+    def replace_from_to(self, space, start, stop, w_source, source_start):
+        if not isinstance(w_source, W_WordsObject):
+            return False
+        words = self.words
+        offset = source_start - start
+        for i in range(start, stop + 1):
+            words[i] = r_uint32(w_source.getword(i + offset))
+        return True
+
     def size(self):
         return len(self._words())
 
@@ -262,14 +310,30 @@ class W_WordsObject(W_AbstractObjectWithClassReference):
 
     @jit.look_inside_iff(lambda self, space: jit.isconstant(self.size()))
     def unwrap_string(self, space):
-        # OH GOD! TODO: Make this sane!
-        res = []
-        for word in self._words():
-            res += [chr((word & r_uint(0x000000ff)) >>  0),
-                    chr((word & r_uint(0x0000ff00)) >>  8),
-                    chr((word & r_uint(0x00ff0000)) >> 16),
-                    chr((word & r_uint(0xff000000)) >> 24)]
-        return "".join(res)
+        return self.words_as_string(0, self.size())
+
+    @jit.look_inside_iff(lambda self, start, stop:
+                         jit.isconstant(start) and jit.isconstant(stop))
+    def words_as_string(self, start, stop):
+        "Answer the little-endian bytes of the words from start to stop."
+        words = self._words()
+        builder = StringBuilder((stop - start) * 4)
+        for i in range(start, stop):
+            word = intmask(words[i])
+            builder.append(chr(word & 0xff))
+            builder.append(chr((word >> 8) & 0xff))
+            builder.append(chr((word >> 16) & 0xff))
+            builder.append(chr((word >> 24) & 0xff))
+        return builder.build()
+
+    def raw_buffer(self):
+        """Answer a char* to the words for I/O without copying. The words
+        are a list of r_uint32, which has no raw storage, so this is a null
+        pointer unless a subclass keeps them in raw memory."""
+        return lltype.nullptr(rffi.CCHARP.TO)
+
+    def writable_raw_buffer(self):
+        return self.raw_buffer()
 
     def invariant(self):
         return (W_AbstractObjectWithClassReference.invariant(self) and
@@ -292,11 +356,12 @@ class W_WordsObject(W_AbstractObjectWithClassReference):
 
     def convert_to_bytes_layout(self, wordsize):
         words = self.words
-        new_words = [r_uint(0)] * len(words * wordsize)
-        for i, word in enumerate(words):
-            new_words[i * 4 + 0] = r_uint((word >> 0) & 0xff)
-            new_words[i * 4 + 1] = r_uint((word >> 8) & 0xff)
-            new_words[i * 4 + 2] = r_uint((word >> 16) & 0xff)
-            new_words[i * 4 + 3] = r_uint((word >> 24) & 0xff)
+        new_words = [r_uint32(0)] * (len(words) * wordsize)
+        for i in range(len(words)):
+            word = words[i]
+            new_words[i * 4 + 0] = word & 0xff
+            new_words[i * 4 + 1] = (word >> 8) & 0xff
+            new_words[i * 4 + 2] = (word >> 16) & 0xff
+            new_words[i * 4 + 3] = (word >> 24) & 0xff
         self.words = new_words
         return self
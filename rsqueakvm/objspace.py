@@ -1,4 +1,4 @@
-from rsqueakvm import constants, display, storage
+from rsqueakvm import constants, display, storage, storage_classes
 from rsqueakvm.constants import SYSTEM_ATTRIBUTE_IMAGE_NAME_INDEX, SYSTEM_ATTRIBUTE_IMAGE_ARGS_INDEX, IS_64BIT
 from rsqueakvm.error import WrappingError, UnwrappingError
 from rsqueakvm.model.character import W_Character
@@ -44,6 +44,7 @@ class ObjSpace(object):
         self.is_spur = QuasiConstant(False)
         self.uses_block_contexts = QuasiConstant(False)
         self.simulate_numeric_primitives = QuasiConstant(False)
+        self.background_snapshot = QuasiConstant(False)
 
         self.system_attributes = {}
         self._system_attribute_version = QuasiConstant(Version())
@@ -58,6 +59,10 @@ class ObjSpace(object):
 
         self.make_special_objects()
         self.strategy_factory = storage.StrategyFactory(self)
+        self.method_cache = storage_classes.MethodCache()
+        from rsqueakvm.wrapper import ReadyQueues
+        self.ready_queues = ReadyQueues()
+        self.snapshot_writer_pid = 0 # see squeakimage.wait_for_snapshot_writer
 
     def make_special_objects(self):
         # These are used in the interpreter bytecodes
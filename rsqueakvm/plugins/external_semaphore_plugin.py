@@ -0,0 +1,68 @@
+from rsqueakvm.error import PrimitiveFailedError
+from rsqueakvm.model.pointers import W_PointersObject
+from rsqueakvm.plugins.plugin import Plugin
+from rsqueakvm.util import signal_queue
+
+
+class ExternalSemaphorePlugin(Plugin):
+    pass
+
+plugin = ExternalSemaphorePlugin()
+
+# how many slots the external objects array grows by, like the image's
+# ExternalSemaphoreTable
+GROWTH = 20
+
+
+def external_objects(space):
+    w_objects = space.w_external_objects_array()
+    if not isinstance(w_objects, W_PointersObject):
+        raise PrimitiveFailedError
+    return w_objects
+
+
+@plugin.expose_primitive(unwrap_spec=[object, object])
+def primitiveRegisterExternalObject(interp, s_frame, w_rcvr, w_object):
+    """Put w_object into the external objects array and answer its 1-based
+    index. Objects that are already registered keep their index, otherwise
+    the first free slot is taken, growing the array if there is none."""
+    space = interp.space
+    w_objects = external_objects(space)
+    size = w_objects.size()
+    free = -1
+    for i in range(size):
+        w_each = w_objects.at0(space, i)
+        if w_each.is_same_object(w_object):
+            return space.wrap_int(i + 1)
+        if free < 0 and w_each.is_nil(space):
+            free = i
+    if free < 0:
+        if size + GROWTH > signal_queue.MAX_SEMAPHORE_INDEX:
+            raise PrimitiveFailedError
+        objects_w = [w_objects.at0(space, i) for i in range(size)]
+        w_objects = space.wrap_list(objects_w + [space.w_nil] * GROWTH)
+        space.set_w_external_objects_array(w_objects)
+        free = size
+    w_objects.atput0(space, free, w_object)
+    return space.wrap_int(free + 1)
+
+
+@plugin.expose_primitive(unwrap_spec=[object, object])
+def primitiveUnregisterExternalObject(interp, s_frame, w_rcvr, w_object):
+    "Answer whether w_object was registered and its slot is free now."
+    space = interp.space
+    w_objects = external_objects(space)
+    for i in range(w_objects.size()):
+        if w_objects.at0(space, i).is_same_object(w_object):
+            w_objects.atput0(space, i, space.w_nil)
+            return space.w_true
+    return space.w_false
+
+
+@plugin.expose_primitive(unwrap_spec=[object, int])
+def primitiveSignalSemaphoreWithIndex(interp, s_frame, w_rcvr, index):
+    """Queue a signal for the external semaphore at index, it is delivered
+    at the next interrupt check, just like the signals of plugins."""
+    if not signal_queue.signal_semaphore_with_index(index):
+        raise PrimitiveFailedError
+    return w_rcvr
@@ -3,19 +3,33 @@ import stat
 import sys
 
 from rsqueakvm.error import PrimitiveFailedError
+from rsqueakvm.model.base import W_AbstractObjectWithClassReference, W_AbstractObjectWithIdentityHash
 from rsqueakvm.model.display import W_DisplayBitmap
 from rsqueakvm.model.numeric import W_Float, W_LargeInteger
-from rsqueakvm.model.variable import W_BytesObject, W_WordsObject
+from rsqueakvm.model.pointers import W_PointersObject
+from rsqueakvm.model.variable import W_BytesObject, W_WordsObject, byte_buffer
 from rsqueakvm.plugins.plugin import Plugin
 from rsqueakvm.primitives import index1_0
+from rsqueakvm.storage_classes import BYTES, WORDS
 from rsqueakvm.util.system import IS_WINDOWS
 
-from rpython.rlib import rarithmetic
-from rpython.rlib.rarithmetic import r_uint
+from rpython.rlib import rarithmetic, rgc, rmmap, rposix
+from rpython.rlib.objectmodel import keepalive_until_here
+from rpython.rlib.rarithmetic import r_uint, r_uint32
+from rpython.rtyper.lltypesystem import lltype, rffi
+from rpython.translator.tool.cbuild import ExternalCompilationInfo
 
 
 class FilePlugin(Plugin):
-    pass
+
+    @staticmethod
+    def shutdown(space):
+        # like stdio, write out what is still buffered in unclosed files
+        for handle in open_handles:
+            try:
+                handle.flush()
+            except PrimitiveFailedError:
+                pass
 
 plugin = FilePlugin()
 os.stat_float_times(False)
@@ -49,6 +63,368 @@ else:
     ftruncate = os.ftruncate
     os.O_BINARY = 0
 
+DEFAULT_BUFFER_SIZE = 64 * 1024
+MAX_BUFFER_SIZE = 16 * 1024 * 1024
+
+# the buffered handles that have not been closed yet
+open_handles = []
+
+
+class W_FileHandle(W_AbstractObjectWithIdentityHash):
+    """A file descriptor with a buffer, so that a FileStream reading or
+    writing a few bytes at a time does not make a syscall for each of them.
+    The buffer either holds read-ahead data (buffer[read_start:read_end]
+    is the file content at position) or pending writes (buffer[:write_len]
+    ends at position), never both. With a buffer size of 0 every read and
+    write goes straight to the fd."""
+    _attrs_ = ["fd", "position", "buffer", "buffer_size",
+               "read_start", "read_end", "write_len"]
+    repr_classname = "W_FileHandle"
+
+    def __init__(self, fd, buffer_size, position=0):
+        self.fd = fd
+        # -1 while unknown (stdio), then asked from the kernel on demand
+        self.position = position
+        self.read_start = 0
+        self.read_end = 0
+        self.write_len = 0
+        self.allocate_buffer(buffer_size)
+
+    def getclass(self, space):
+        return space.w_SmallInteger
+
+    def guess_classname(self):
+        return "FileHandle"
+
+    def allocate_buffer(self, size):
+        self.buffer_size = size
+        self.buffer = byte_buffer(['\x00'] * size)
+
+    def buffer_ptr(self, offset):
+        return rffi.ptradd(rgc.nonmoving_raw_ptr_for_resizable_list(self.buffer), offset)
+
+    def is_closed(self):
+        return self.fd < 0
+
+    def set_buffer_size(self, size):
+        self.flush()
+        self.drop_read_ahead()
+        self.allocate_buffer(size)
+
+    def get_position(self):
+        if self.position < 0:
+            try:
+                self.position = os.lseek(self.fd, 0, os.SEEK_CUR)
+            except OSError:
+                raise PrimitiveFailedError
+        return self.position
+
+    def advance(self, count):
+        if self.position >= 0:
+            self.position += count
+
+    def read(self, dest, count):
+        "Read up to count bytes into the char* dest, answer how many."
+        self.flush()
+        got = min(self.read_end - self.read_start, count)
+        if got > 0:
+            rffi.c_memcpy(rffi.cast(rffi.VOIDP, dest),
+                          rffi.cast(rffi.VOIDP, self.buffer_ptr(self.read_start)),
+                          rffi.cast(rffi.SIZE_T, got))
+            keepalive_until_here(self.buffer)
+            self.read_start += got
+            self.advance(got)
+        remaining = count - got
+        if remaining == 0:
+            return got
+        if remaining >= self.buffer_size:
+            # too big for the buffer, read directly into the destination
+            len_read = read_into(self.fd, rffi.ptradd(dest, got), remaining)
+            self.advance(len_read)
+            return got + len_read
+        self.read_start = 0
+        self.read_end = read_into(self.fd, self.buffer_ptr(0), self.buffer_size)
+        keepalive_until_here(self.buffer)
+        return got + self.read(rffi.ptradd(dest, got), min(remaining, self.read_end))
+
+    def write(self, src, count):
+        "Write count bytes from the char* src, answer how many were written."
+        self.drop_read_ahead()
+        if self.write_len + count > self.buffer_size:
+            self.flush()
+        if count >= self.buffer_size:
+            written = write_from(self.fd, src, count)
+            self.advance(written)
+            return written
+        rffi.c_memcpy(rffi.cast(rffi.VOIDP, self.buffer_ptr(self.write_len)),
+                      rffi.cast(rffi.VOIDP, src),
+                      rffi.cast(rffi.SIZE_T, count))
+        keepalive_until_here(self.buffer)
+        self.write_len += count
+        self.advance(count)
+        return count
+
+    def flush(self):
+        done = 0
+        try:
+            while done < self.write_len:
+                written = write_from(self.fd, self.buffer_ptr(done), self.write_len - done)
+                if written == 0:
+                    raise PrimitiveFailedError
+                done += written
+        finally:
+            keepalive_until_here(self.buffer)
+            self.drop_written(done)
+
+    def drop_written(self, done):
+        "Keep the pending bytes a failed flush did not write."
+        remaining = self.write_len - done
+        for i in range(remaining):
+            self.buffer[i] = self.buffer[done + i]
+        self.write_len = remaining
+
+    def drop_read_ahead(self):
+        if self.read_start != self.read_end:
+            # the kernel is ahead of us by the unread part of the buffer
+            self.seek_fd(self.position)
+        self.read_start = 0
+        self.read_end = 0
+
+    def seek_fd(self, position):
+        try:
+            os.lseek(self.fd, position, os.SEEK_SET)
+        except OSError:
+            raise PrimitiveFailedError
+
+    def seek(self, position):
+        if self.read_end > 0 and self.position >= 0:
+            buffer_start = self.position - self.read_start
+            if buffer_start <= position <= buffer_start + self.read_end:
+                # still inside the read-ahead
+                self.read_start = position - buffer_start
+                self.position = position
+                return
+        self.flush()
+        self.read_start = 0
+        self.read_end = 0
+        self.seek_fd(position)
+        self.position = position
+
+    def size(self):
+        try:
+            file_info = os.fstat(self.fd)
+        except OSError:
+            raise PrimitiveFailedError
+        size = rarithmetic.intmask(file_info.st_size)
+        if self.write_len > 0:
+            # pending writes end at position and may grow the file
+            return max(size, self.position)
+        return size
+
+    def at_end(self):
+        if self.read_start < self.read_end:
+            return False
+        return self.get_position() >= self.size()
+
+    def truncate(self, position):
+        self.flush()
+        self.drop_read_ahead()
+        try:
+            ftruncate(self.fd, position)
+        except OSError:
+            raise PrimitiveFailedError
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            fd = self.fd
+            self.fd = -1
+            if self in open_handles:
+                open_handles.remove(self)
+            try:
+                os.close(fd)
+            except OSError:
+                raise PrimitiveFailedError
+
+
+c_memmove = rffi.llexternal("memmove",
+    [rffi.VOIDP, rffi.VOIDP, rffi.SIZE_T], lltype.Void,
+    compilation_info=ExternalCompilationInfo(includes=["string.h"]),
+    releasegil=False,
+)
+
+
+class W_MappedBytesObject(W_BytesObject):
+    """Bytes that are a memory-mapped region of a file, so that large files
+    can be used without reading them into the heap. The mapping is released
+    by primitiveFileUnmap or when the object is collected; afterwards the
+    object is empty."""
+    _attrs_ = ['mmap', 'writable']
+    _immutable_fields_ = ['mmap', 'writable']
+    repr_classname = 'W_MappedBytesObject'
+
+    def __init__(self, space, w_class, mmap, writable):
+        W_AbstractObjectWithClassReference.__init__(self, space, w_class)
+        self.mutate()
+        self.mmap = mmap
+        self.writable = writable
+
+    def check_writable(self):
+        if not self.writable:
+            raise PrimitiveFailedError
+
+    def unmap(self):
+        self.mmap.close()
+        self.mutate()
+
+    def size(self):
+        return self.mmap.size
+
+    def getchar(self, n0):
+        # the data is not a list that fails on a bad index, and unmapped
+        # it is NULL with a size of 0
+        if not 0 <= n0 < self.size():
+            raise IndexError
+        return self.mmap.data[n0]
+
+    def setchar(self, n0, character):
+        assert len(character) == 1
+        self.check_writable()
+        if not 0 <= n0 < self.size():
+            raise IndexError
+        self.mmap.data[n0] = character[0]
+        self.mutate()
+
+    def _bytes(self):
+        # the bytes as a list would be a copy of the whole mapping, so the
+        # primitives that want one (bytelist arguments, getrbigint) fail
+        # and the image falls back to code that uses at:
+        raise PrimitiveFailedError
+
+    def byte_slice(self, start, stop):
+        return list(self.mmap.getslice(start, stop - start))
+
+    def unwrap_string(self, space):
+        # one copy of the mapping, for the users that need a string
+        return self.mmap.getslice(0, self.size())
+
+    def invariant(self):
+        return W_AbstractObjectWithClassReference.invariant(self)
+
+    def clone(self, space):
+        w_result = W_BytesObject(space, self.getclass(space), 0)
+        w_result.bytes = byte_buffer(self.byte_slice(0, self.size()))
+        return w_result
+
+    def setbytes(self, lst):
+        assert len(lst) == self.size()
+        self.check_writable()
+        data = self.mmap.data
+        for i in range(len(lst)):
+            data[i] = lst[i]
+        self.mutate()
+
+    def raw_buffer(self):
+        return self.mmap.data
+
+    def writable_raw_buffer(self):
+        if not self.writable:
+            return lltype.nullptr(rffi.CCHARP.TO)
+        return self.mmap.data
+
+    def replace_from_to(self, space, start, stop, w_source, source_start):
+        if not isinstance(w_source, W_BytesObject):
+            return False
+        self.check_writable()
+        c_memmove(rffi.cast(rffi.VOIDP, rffi.ptradd(self.mmap.data, start)),
+                  rffi.cast(rffi.VOIDP, rffi.ptradd(w_source.raw_buffer(), source_start)),
+                  rffi.cast(rffi.SIZE_T, stop - start + 1))
+        keepalive_until_here(w_source)
+        self.mutate()
+        return True
+
+    def can_become(self, w_other):
+        return False
+
+
+class W_MappedWordsObject(W_WordsObject):
+    """32-bit words in host byte order that are a memory-mapped region of a
+    file, see W_MappedBytesObject."""
+    _attrs_ = ['mmap', 'writable']
+    _immutable_fields_ = ['mmap', 'writable']
+    repr_classname = 'W_MappedWordsObject'
+
+    def __init__(self, space, w_class, mmap, writable):
+        W_AbstractObjectWithClassReference.__init__(self, space, w_class)
+        self.mmap = mmap
+        self.writable = writable
+
+    def check_writable(self):
+        if not self.writable:
+            raise PrimitiveFailedError
+
+    def unmap(self):
+        self.mmap.close()
+
+    def size(self):
+        return self.mmap.size / 4
+
+    def getword(self, n):
+        if not 0 <= n < self.size():
+            raise IndexError
+        return r_uint(rffi.cast(rffi.UINTP, self.mmap.data)[n])
+
+    def setword(self, n, word):
+        self.check_writable()
+        if not 0 <= n < self.size():
+            raise IndexError
+        rffi.cast(rffi.UINTP, self.mmap.data)[n] = rffi.cast(rffi.UINT, word)
+
+    def _words(self):
+        # a copy, only for the rare users that need the words as a list
+        return [r_uint32(self.getword(i)) for i in range(self.size())]
+
+    def setwords(self, lst):
+        assert len(lst) == self.size()
+        for i in range(len(lst)):
+            self.setword(i, lst[i])
+
+    def getwords(self):
+        return self._words()
+
+    def words_as_string(self, start, stop):
+        return self.mmap.getslice(start * 4, (stop - start) * 4)
+
+    def raw_buffer(self):
+        return self.mmap.data
+
+    def writable_raw_buffer(self):
+        if not self.writable:
+            return lltype.nullptr(rffi.CCHARP.TO)
+        return self.mmap.data
+
+    def replace_from_to(self, space, start, stop, w_source, source_start):
+        if not isinstance(w_source, W_WordsObject):
+            return False
+        self.check_writable()
+        offset = source_start - start
+        for i in range(start, stop + 1):
+            self.setword(i, w_source.getword(i + offset))
+        return True
+
+    def can_become(self, w_other):
+        return False
+
+
+def file_handle(space, w_file):
+    if isinstance(w_file, W_FileHandle):
+        if w_file.is_closed():
+            raise PrimitiveFailedError
+        return w_file
+    # the stdio handles are plain fds, so use them unbuffered
+    return W_FileHandle(space.unwrap_int(w_file), 0, position=-1)
+
 #should we implement primitiveDirectoryEntry ?
 #should we implement primitiveHasFileAccess ?
 
@@ -134,64 +510,67 @@ def primitiveFileOpen(interp, s_frame, w_rcvr, file_path, w_writeable_flag):
         file_descriptor = os.open(file_path, mode, 0666)
     except OSError:
         raise PrimitiveFailedError()
-    return space.wrap_int(file_descriptor)
+    handle = W_FileHandle(file_descriptor, DEFAULT_BUFFER_SIZE)
+    open_handles.append(handle)
+    return handle
 
-@plugin.expose_primitive(unwrap_spec=[object, int])
-def primitiveFileClose(interp, s_frame, w_rcvr, fd):
-    try:
-        os.close(fd)
-    except OSError:
-        raise PrimitiveFailedError()
+@plugin.expose_primitive(unwrap_spec=[object, object])
+def primitiveFileClose(interp, s_frame, w_rcvr, w_file):
+    file_handle(interp.space, w_file).close()
     return w_rcvr
 
-@plugin.expose_primitive(unwrap_spec=[object, int])
-def primitiveFileAtEnd(interp, s_frame, w_rcvr, fd):
-    file_info = os.fstat(fd)
-    if os.lseek(fd, 0, os.SEEK_CUR) >= file_info.st_size:
-        return interp.space.w_true
-    else:
-        return interp.space.w_false
+@plugin.expose_primitive(unwrap_spec=[object, object])
+def primitiveFileAtEnd(interp, s_frame, w_rcvr, w_file):
+    return interp.space.wrap_bool(file_handle(interp.space, w_file).at_end())
 
-@plugin.expose_primitive(unwrap_spec=[object, int, object, index1_0, int])
-def primitiveFileRead(interp, s_frame, w_rcvr, fd, target, start, count):
+@plugin.expose_primitive(unwrap_spec=[object, object, object, index1_0, int])
+def primitiveFileRead(interp, s_frame, w_rcvr, w_file, target, start, count):
+    handle = file_handle(interp.space, w_file)
     if not isinstance(target, W_BytesObject):
         raise PrimitiveFailedError
-    try:
-        contents = os.read(fd, count)
-    except OSError:
+    if start < 0 or count < 0 or target.size() < start + count:
         raise PrimitiveFailedError
-    space = interp.space
-    len_read = len(contents)
-    if target.size() < start + len_read:
+    buf = target.writable_raw_buffer()
+    if not buf:
+        raise PrimitiveFailedError
+    # read straight into the bytes of the target
+    len_read = handle.read(rffi.ptradd(buf, start), count)
+    keepalive_until_here(target)
+    target.mutate()
+    return interp.space.wrap_int(len_read)
+
+def read_into(fd, buf, count):
+    "Read up to count bytes from fd to the char* buf, answer how many."
+    got = rffi.cast(lltype.Signed, rposix.c_read(fd, rffi.cast(rffi.VOIDP, buf),
+                                                rffi.cast(rffi.SIZE_T, count)))
+    if got < 0:
         raise PrimitiveFailedError
-    for i in range(len_read):
-        target.setchar(start + i, contents[i])
-    return space.wrap_int(len_read)
+    return got
 
-@plugin.expose_primitive(unwrap_spec=[object, int])
-def primitiveFileGetPosition(interp, s_frame, w_rcvr, fd):
-    try:
-        pos = r_uint(os.lseek(fd, 0, os.SEEK_CUR))
-    except OSError:
+def write_from(fd, buf, count):
+    "Write count bytes from the char* buf to fd, answer how many were written."
+    written = rffi.cast(lltype.Signed, rposix.c_write(fd, rffi.cast(rffi.VOIDP, buf),
+                                                     rffi.cast(rffi.SIZE_T, count)))
+    if written < 0:
         raise PrimitiveFailedError
-    else:
-        return interp.space.wrap_int(pos)
+    return written
 
-@plugin.expose_primitive(unwrap_spec=[object, int, int])
-def primitiveFileSetPosition(interp, s_frame, w_rcvr, fd, position):
-    try:
-        os.lseek(fd, position, os.SEEK_SET)
-    except OSError:
+@plugin.expose_primitive(unwrap_spec=[object, object])
+def primitiveFileGetPosition(interp, s_frame, w_rcvr, w_file):
+    position = file_handle(interp.space, w_file).get_position()
+    return interp.space.wrap_int(r_uint(position))
+
+@plugin.expose_primitive(unwrap_spec=[object, object, int])
+def primitiveFileSetPosition(interp, s_frame, w_rcvr, w_file, position):
+    if position < 0:
         raise PrimitiveFailedError
+    file_handle(interp.space, w_file).seek(position)
     return w_rcvr
 
-@plugin.expose_primitive(unwrap_spec=[object, int])
-def primitiveFileSize(interp, s_frame, w_rcvr, fd):
-    try:
-        file_info = os.fstat(fd)
-    except OSError:
-        raise PrimitiveFailedError
-    return interp.space.wrap_int(r_uint(file_info.st_size))
+@plugin.expose_primitive(unwrap_spec=[object, object])
+def primitiveFileSize(interp, s_frame, w_rcvr, w_file):
+    size = file_handle(interp.space, w_file).size()
+    return interp.space.wrap_int(r_uint(size))
 
 @plugin.expose_primitive(unwrap_spec=[object])
 def primitiveFileStdioHandles(interp, s_frame, w_rcvr):
@@ -200,8 +579,9 @@ def primitiveFileStdioHandles(interp, s_frame, w_rcvr):
     space = interp.space
     return space.wrap_list_unroll_safe([space.wrap_int(fd) for fd in std_fds])
 
-@plugin.expose_primitive(unwrap_spec=[object, int, object, index1_0, int])
-def primitiveFileWrite(interp, s_frame, w_rcvr, fd, content, start, count):
+@plugin.expose_primitive(unwrap_spec=[object, object, object, index1_0, int])
+def primitiveFileWrite(interp, s_frame, w_rcvr, w_file, content, start, count):
+    handle = file_handle(interp.space, w_file)
     size = content.size()
     if isinstance(content, W_WordsObject):
         element_size = 4
@@ -216,25 +596,78 @@ def primitiveFileWrite(interp, s_frame, w_rcvr, fd, content, start, count):
     else:
         raise PrimitiveFailedError
 
-    string_content = interp.space.unwrap_string(content)
     byte_start = start * element_size
     byte_end = min(start + count, size) * element_size
 
     space = interp.space
     if not (byte_start >= 0 and byte_end > byte_start):
         return space.wrap_int(0)
-    try:
-        written = os.write(fd, string_content[byte_start:byte_end])
-    except OSError:
-        raise PrimitiveFailedError
-    else:
+    if isinstance(content, W_BytesObject):
+        # write straight from the bytes of the content
+        written = handle.write(rffi.ptradd(content.raw_buffer(), byte_start),
+                               byte_end - byte_start)
+        keepalive_until_here(content)
+        return space.wrap_int(r_uint(written))
+    if isinstance(content, W_MappedWordsObject):
+        written = handle.write(rffi.ptradd(content.raw_buffer(), byte_start),
+                               byte_end - byte_start)
         return space.wrap_int(r_uint(written / element_size))
+    if isinstance(content, W_WordsObject):
+        # convert only the words that are written
+        string_content = content.words_as_string(start, min(start + count, size))
+        byte_end -= byte_start
+        byte_start = 0
+    else:
+        string_content = space.unwrap_string(content)
+    with rffi.scoped_nonmovingbuffer(string_content[byte_start:byte_end]) as buf:
+        written = handle.write(buf, byte_end - byte_start)
+    return space.wrap_int(r_uint(written / element_size))
+
+@plugin.expose_primitive(unwrap_spec=[object, object, int])
+def primitiveFileTruncate(interp, s_frame, w_rcvr, w_file, position):
+    if position < 0:
+        raise PrimitiveFailedError
+    file_handle(interp.space, w_file).truncate(position)
+    return w_rcvr
 
-@plugin.expose_primitive(unwrap_spec=[object, int, int])
-def primitiveFileTruncate(interp, s_frame, w_rcvr, fd, position):
+@plugin.expose_primitive(unwrap_spec=[object, object, int, int, object, object])
+def primitiveFileMap(interp, s_frame, w_rcvr, w_file, offset, size, w_writable, w_class):
+    # map size bytes (0 for all) from offset, which must be page aligned, as a
+    # new instance of the bytes or words class w_class
+    space = interp.space
+    handle = file_handle(space, w_file)
+    if offset < 0 or size < 0 or offset % rmmap.ALLOCATIONGRANULARITY != 0:
+        raise PrimitiveFailedError
+    if not isinstance(w_class, W_PointersObject):
+        raise PrimitiveFailedError
+    instance_kind = w_class.as_class_get_shadow(space).instance_kind
+    if instance_kind != BYTES and instance_kind != WORDS:
+        raise PrimitiveFailedError
+    writable = w_writable is space.w_true
+    if writable:
+        access = rmmap.ACCESS_WRITE
+    else:
+        access = rmmap.ACCESS_READ
+    # the mapping must see what was written through the handle
+    handle.flush()
     try:
-        ftruncate(fd, position)
-    except OSError:
+        mmap = rmmap.mmap(handle.fd, size, access=access, offset=offset)
+    except (rmmap.RMMapError, OSError):
+        raise PrimitiveFailedError
+    if instance_kind == BYTES:
+        return W_MappedBytesObject(space, w_class, mmap, writable)
+    if mmap.size % 4 != 0:
+        mmap.close()
+        raise PrimitiveFailedError
+    return W_MappedWordsObject(space, w_class, mmap, writable)
+
+@plugin.expose_primitive(unwrap_spec=[object, object])
+def primitiveFileUnmap(interp, s_frame, w_rcvr, w_mapped):
+    if isinstance(w_mapped, W_MappedBytesObject):
+        w_mapped.unmap()
+    elif isinstance(w_mapped, W_MappedWordsObject):
+        w_mapped.unmap()
+    else:
         raise PrimitiveFailedError
     return w_rcvr
 
@@ -251,6 +684,19 @@ def smalltalk_timestamp(space, sec_since_epoch):
     sec_since_1901 = r_uint(sec_since_epoch + secs_between_1901_and_1970)
     return space.wrap_int(sec_since_1901)
 
-@plugin.expose_primitive(unwrap_spec=[object, int])
-def primitiveFileFlush(interp, s_frame, w_rcvr, fd):
+@plugin.expose_primitive(unwrap_spec=[object, object])
+def primitiveFileFlush(interp, s_frame, w_rcvr, w_file):
+    file_handle(interp.space, w_file).flush()
+    return w_rcvr
+
+@plugin.expose_primitive(unwrap_spec=[object, object])
+def primitiveFileGetBufferSize(interp, s_frame, w_rcvr, w_file):
+    return interp.space.wrap_int(file_handle(interp.space, w_file).buffer_size)
+
+@plugin.expose_primitive(unwrap_spec=[object, object, int])
+def primitiveFileSetBufferSize(interp, s_frame, w_rcvr, w_file, size):
+    # only opened files can keep a buffer, not the stdio fds
+    if not isinstance(w_file, W_FileHandle) or not 0 <= size <= MAX_BUFFER_SIZE:
+        raise PrimitiveFailedError
+    file_handle(interp.space, w_file).set_buffer_size(size)
     return w_rcvr
@@ -3,7 +3,7 @@ from rsqueakvm.plugins.plugin import Plugin
 from rsqueakvm.primitives import wordlist, index1_0
 
 from rpython.rlib.longlong2float import uint2singlefloat, singlefloat2uint
-from rpython.rlib.rarithmetic import r_singlefloat, r_uint
+from rpython.rlib.rarithmetic import r_singlefloat, r_uint32
 from rpython.rtyper.lltypesystem import rffi
 
 
@@ -28,7 +28,7 @@ def primitiveAt(interp, s_frame, words, index0):
 def primitiveAtPut(interp, s_frame, words, index0, w_float):
     value = interp.space.unwrap_float(w_float)
     try:
-        words[index0] = r_uint(singlefloat2uint(r_singlefloat(value)))
+        words[index0] = r_uint32(singlefloat2uint(r_singlefloat(value)))
     except IndexError:
         raise PrimitiveFailedError
     return w_float
@@ -4,6 +4,10 @@ Base functions for ImmutabilityPlugin.
 .. data:: WRITE_OPERATIONS
 A list of all write operations to be stubbed out by `immutable_class(cls)`
 decorator.
+
+.. data:: BULK_WRITE_OPERATIONS
+A list of all bulk write operations to be stubbed out by
+`immutable_class(cls)` decorator.
 """
 
 from rsqueakvm.model.base import W_Object
@@ -19,6 +23,10 @@ WRITE_OPERATIONS = [
     'convert_to_bytes_layout', 'setbytes', 'mutate'
 ]
 
+# Bulk write operations answer whether they wrote. Immutable objects answer
+# False, so that callers fall back to the (stubbed out) element writes.
+BULK_WRITE_OPERATIONS = ['replace_from_to']
+
 
 def immutable_class(cls):
     """
@@ -38,6 +46,11 @@ def immutable_class(cls):
             def noop(self, *args):
                 pass
             setattr(cls, method_name, noop)
+    for method_name in BULK_WRITE_OPERATIONS:
+        if hasattr(cls, method_name):
+            def nowrite(self, *args):
+                return False
+            setattr(cls, method_name, nowrite)
     return cls
 
 
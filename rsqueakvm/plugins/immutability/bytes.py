@@ -1,9 +1,11 @@
 """Immutable W_BytesObject Implementation."""
 
 from rsqueakvm.model.base import W_AbstractObjectWithClassReference
-from rsqueakvm.model.variable import W_BytesObject
+from rsqueakvm.model.variable import W_BytesObject, byte_buffer
 from rsqueakvm.plugins.immutability import immutable_class
 
+from rpython.rtyper.lltypesystem import lltype, rffi
+
 
 @immutable_class
 class W_Immutable_BytesObject(W_BytesObject):
@@ -19,7 +21,7 @@ class W_Immutable_BytesObject(W_BytesObject):
         because there is no need to `self.mutate()` and set `self.bytes`.
         """
         W_AbstractObjectWithClassReference.__init__(self, space, w_cls)
-        self.immutable_bytes = bytes
+        self.immutable_bytes = byte_buffer(bytes)
 
     # No need to make this jit.elidable, jit can prove return val is constant.
     def _bytes(self):
@@ -38,6 +40,14 @@ class W_Immutable_BytesObject(W_BytesObject):
         """
         return None
 
+    def writable_raw_buffer(self):
+        """
+        `W_BytesObject.writable_raw_buffer(self)` override.
+
+        :returns: a null pointer, the bytes must not be written.
+        """
+        return lltype.nullptr(rffi.CCHARP.TO)
+
     """
     No need to override other methods that reference self.bytes, because they
     were stubbed out by @immutable_class.
@@ -52,6 +52,11 @@ class Plugin(object):
         "Called after image has been loaded and space has been set up."
         pass
 
+    @staticmethod
+    def shutdown(space):
+        "Called once when the VM exits."
+        pass
+
     def call(self, name, interp, s_frame, argcount, w_method):
         func = self._find_prim(name)
         if not func:
@@ -2,25 +2,83 @@ import errno
 
 from rsqueakvm import error
 from rsqueakvm.model.base import W_AbstractObjectWithIdentityHash
-from rsqueakvm.model.variable import W_BytesObject
+from rsqueakvm.model.variable import W_BytesObject, W_WordsObject
 from rsqueakvm.plugins.plugin import Plugin
-from rsqueakvm.util.cells import Cell
+from rsqueakvm.util import iopoll, resolver
 from rsqueakvm.util.system import IS_SHELL, IS_WINDOWS
 
 from rpython.rlib import rsocket, _rsocket_rffi, objectmodel
+from rpython.rlib.objectmodel import keepalive_until_here
+from rpython.rlib.rarithmetic import r_uint
+from rpython.rtyper.lltypesystem import lltype, rffi
+from rpython.rtyper.tool import rffi_platform as platform
+from rpython.translator.tool.cbuild import ExternalCompilationInfo
 
 
+# send_buffers and recv_buffers move data between a socket and a list of
+# char* buffers, they answer the number of bytes or -1 with errno saved
 if IS_WINDOWS:
-    def non_blocking_recv(self, count):
-        self.socket._setblocking(False)
+    # no writev/readv, send and receive the buffers one after the other
+    def transfer_buffers(sending, fd, bufs, sizes):
+        total = 0
+        for i in range(len(bufs)):
+            if sending:
+                res = _rsocket_rffi.send(fd, bufs[i], sizes[i], 0)
+            else:
+                res = _rsocket_rffi.socketrecv(
+                    fd, rffi.cast(rffi.VOIDP, bufs[i]), sizes[i], 0)
+            res = rffi.cast(lltype.Signed, res)
+            if res < 0:
+                return res if total == 0 else total
+            total += res
+            if res < sizes[i]:
+                break
+        return total
+
+    def send_buffers(fd, bufs, sizes):
+        return transfer_buffers(True, fd, bufs, sizes)
+
+    def recv_buffers(fd, bufs, sizes):
+        return transfer_buffers(False, fd, bufs, sizes)
+else:
+    eci = ExternalCompilationInfo(includes=["sys/uio.h", "limits.h"])
+
+    class CConfig:
+        _compilation_info_ = eci
+        iovec = platform.Struct("struct iovec", [("iov_base", rffi.VOIDP),
+                                                 ("iov_len", rffi.SIZE_T)])
+        IOV_MAX = platform.DefinedConstantInteger("IOV_MAX")
+    config = platform.configure(CConfig)
+    IOVEC_ARRAY = rffi.CArray(config["iovec"])
+    IOV_MAX = config["IOV_MAX"] or 16  # 16 is the POSIX minimum
+
+    c_writev = rffi.llexternal("writev",
+        [rffi.INT, lltype.Ptr(IOVEC_ARRAY), rffi.INT], rffi.SSIZE_T,
+        compilation_info=eci,
+        save_err=rffi.RFFI_SAVE_ERRNO,
+    )
+    c_readv = rffi.llexternal("readv",
+        [rffi.INT, lltype.Ptr(IOVEC_ARRAY), rffi.INT], rffi.SSIZE_T,
+        compilation_info=eci,
+        save_err=rffi.RFFI_SAVE_ERRNO,
+    )
+
+    def transfer_buffers(c_transfer, fd, bufs, sizes):
+        count = min(len(bufs), IOV_MAX)
+        iov = lltype.malloc(IOVEC_ARRAY, count, flavor="raw")
         try:
-            return self.socket.recv(count)
+            for i in range(count):
+                iov[i].c_iov_base = rffi.cast(rffi.VOIDP, bufs[i])
+                iov[i].c_iov_len = rffi.cast(rffi.SIZE_T, sizes[i])
+            return rffi.cast(lltype.Signed, c_transfer(fd, iov, count))
         finally:
-            self.socket._setblocking(True)
-else:
-    # on unix, we just use the flag, avoiding the extra fcntl calls
-    def non_blocking_recv(self, count):
-        return self.socket.recv(count, _rsocket_rffi.MSG_DONTWAIT)
+            lltype.free(iov, flavor="raw")
+
+    def send_buffers(fd, bufs, sizes):
+        return transfer_buffers(c_writev, fd, bufs, sizes)
+
+    def recv_buffers(fd, bufs, sizes):
+        return transfer_buffers(c_readv, fd, bufs, sizes)
 
 
 ResolverUninitialized = 0
@@ -28,13 +86,36 @@ ResolverReady = 1
 ResolverBusy = 2
 ResolverError = 3
 
+# the address families, socket types, protocols and flags of the
+# getaddrinfo primitives, see SocketAddressInformation
+SqAddressFamilies = [rsocket.AF_UNSPEC,
+                     rsocket.AF_UNIX if rsocket.HAS_AF_UNIX else -1,
+                     rsocket.AF_INET, rsocket.AF_INET6]
+SqSocketTypes = [0, rsocket.SOCK_STREAM, rsocket.SOCK_DGRAM]
+SqProtocols = [0, rsocket.IPPROTO_TCP, rsocket.IPPROTO_UDP]
+SqNumericFlag = 1
+SqPassiveFlag = 2
+
+
+def to_native(codes, code):
+    if not 0 <= code < len(codes):
+        raise error.PrimitiveFailedError
+    return codes[code]
+
+
+def from_native(codes, value):
+    for code in range(len(codes)):
+        if codes[code] == value:
+            return code
+    return 0
+
 
 class SocketPlugin(Plugin):
-    _attrs_ = ["fds", "sockets", "last_lookup"]
+    _attrs_ = ["fds", "sockets", "resolver"]
 
     def __init__(self):
         Plugin.__init__(self)
-        self.last_lookup = Cell(None)
+        self.resolver = resolver.Resolver()
 
     @staticmethod
     def startup(space, argv):
@@ -61,11 +142,11 @@ class SocketPlugin(Plugin):
             return func
         return decorator
 
-    def set_last_lookup(self, v):
-        self.last_lookup.set(v)
-
-    def get_last_lookup(self):
-        return self.last_lookup.get()
+    def lookup_result(self, interp):
+        "Answer the answer of the last name or address lookup, if any."
+        if not self.resolver.poll(interp):
+            return None
+        return self.resolver.name_result()
 
     def is_socket(self, space, w_int):
         return isinstance(w_int, W_SocketHandle)
@@ -92,21 +173,102 @@ Connected = 2
 OtherEndClosed = 3
 ThisEndClosed = 4
 
+TCPSocketType = 0
+UDPSocketType = 1
+
+# options the image may set or get by name, see Socket>>setOption:value:
+SOCKET_OPTIONS = {}
+for _name, _level in [("SO_REUSEADDR", rsocket.SOL_SOCKET),
+                      ("SO_REUSEPORT", rsocket.SOL_SOCKET),
+                      ("SO_KEEPALIVE", rsocket.SOL_SOCKET),
+                      ("SO_BROADCAST", rsocket.SOL_SOCKET),
+                      ("SO_OOBINLINE", rsocket.SOL_SOCKET),
+                      ("SO_RCVBUF", rsocket.SOL_SOCKET),
+                      ("SO_SNDBUF", rsocket.SOL_SOCKET),
+                      ("SO_RCVLOWAT", rsocket.SOL_SOCKET),
+                      ("SO_SNDLOWAT", rsocket.SOL_SOCKET),
+                      ("TCP_NODELAY", rsocket.IPPROTO_TCP),
+                      ("IP_TTL", rsocket.IPPROTO_IP),
+                      ("IP_MULTICAST_TTL", rsocket.IPPROTO_IP),
+                      ("IP_MULTICAST_LOOP", rsocket.IPPROTO_IP)]:
+    if rsocket.constants.get(_name, None) is not None:
+        SOCKET_OPTIONS[_name] = (_level, rsocket.constants[_name])
+
+
+def inet_address(family, host, port):
+    "Answer the address of host (a name or numeric string, empty for any)."
+    try:
+        if family == rsocket.AF_INET6:
+            return rsocket.INET6Address(host or "::", port)
+        return rsocket.INETAddress(host, port)
+    except rsocket.SocketError:
+        raise error.PrimitiveFailedError
+
+
+sockaddr_to_bytes = resolver.address_to_bytes
+
+
+def sockaddr_from_bytes(w_bytes):
+    if not isinstance(w_bytes, W_BytesObject):
+        raise error.PrimitiveFailedError
+    address = resolver.address_from_bytes(w_bytes.unwrap_string(None))
+    if address is None:
+        raise error.PrimitiveFailedError
+    return address
+
+
+def sockaddr_port(data):
+    # sin_port and sin6_port are both stored in network order at offset 2
+    return (ord(data[2]) << 8) | ord(data[3])
+
+
+def store_string(w_target, data):
+    if not isinstance(w_target, W_BytesObject) or w_target.size() != len(data):
+        raise error.PrimitiveFailedError
+    for idx, char in enumerate(data):
+        w_target.setchar(idx, char)
+
+
+def host_of(address):
+    "Answer the numeric host of address, as the name lookup answers it."
+    try:
+        host, _ = rsocket.getnameinfo(
+            address, rsocket.NI_NUMERICHOST | rsocket.NI_NUMERICSERV)
+    except rsocket.SocketError:
+        raise error.PrimitiveFailedError
+    return host
+
 
 class W_SocketHandle(W_AbstractObjectWithIdentityHash):
-    _attrs_ = ["socket", "state", "family", "socketType"]
+    _attrs_ = ["io_poller", "socket", "state", "family", "socketType",
+               "connSema", "readSema", "writeSema",
+               "listening", "accept_in_place"]
     repr_classname = "W_SocketHandle"
 
-    def __init__(self, family, socketType):
+    def __init__(self, io_poller, family, socketType, connSema=0, readSema=0,
+                 writeSema=0, fd=_rsocket_rffi.INVALID_SOCKET):
+        # closing the socket drops its watches, see close()
+        self.io_poller = io_poller
         self.socket = None
         self.state = Unconnected
         self.family = family
         self.socketType = socketType
-        self.make_socket()
-
-    def make_socket(self):
+        # indices of the external semaphores to signal when the socket
+        # becomes ready, see iopoll.IOPoller
+        self.connSema = connSema
+        self.readSema = readSema
+        self.writeSema = writeSema
+        self.listening = False
+        self.accept_in_place = False
+        self.make_socket(fd)
+
+    def make_socket(self, fd=_rsocket_rffi.INVALID_SOCKET):
+        if self.socketType == UDPSocketType:
+            sock_type = rsocket.SOCK_DGRAM
+        else:
+            sock_type = rsocket.SOCK_STREAM
         try:
-            self.socket = rsocket.RSocket(family=self.family, proto=self.socketType)
+            self.socket = rsocket.RSocket(family=self.family, type=sock_type, fd=fd)
         except rsocket.CSocketError:
             raise error.PrimitiveFailedError
         self.socket.setblocking(False)
@@ -117,6 +279,9 @@ class W_SocketHandle(W_AbstractObjectWithIdentityHash):
     def isipv6(self):
         return self.family == rsocket.AF_INET6
 
+    def isudp(self):
+        return self.socketType == UDPSocketType
+
     def getclass(self, space):
         return space.w_SmallInteger
 
@@ -133,15 +298,106 @@ class W_SocketHandle(W_AbstractObjectWithIdentityHash):
                 self.make_socket()
             except rsocket.GAIError:
                 raise error.PrimitiveFailedError
+        self.connect_to(inet)
+
+    def connect_to(self, address):
         self.socket.setblocking(True)
         try:
-            self.socket.connect(inet)
+            self.socket.connect(address)
         except rsocket.SocketError:
             raise error.PrimitiveFailedError
         finally:
             self.socket.setblocking(False)
         self.state = Connected
 
+    def bind(self, address):
+        try:
+            self.socket.bind(address)
+        except rsocket.SocketError:
+            raise error.PrimitiveFailedError
+
+    def listen(self, backlog):
+        """Start listening on the bound socket. A datagram socket is ready
+        as soon as it is bound. Without a backlog the first connection
+        replaces the listening socket, like the old single connection
+        Socket>>listenOn: expects."""
+        if self.isudp():
+            self.state = Connected
+            return
+        self.accept_in_place = backlog <= 0
+        try:
+            self.socket.listen(backlog)
+        except rsocket.SocketError:
+            raise error.PrimitiveFailedError
+        self.listening = True
+        self.state = WaitingForConnection
+
+    def listen_on(self, host, port, backlog):
+        address = inet_address(self.family, host, port)
+        if not self.isudp():
+            self.set_option(rsocket.SOL_SOCKET, rsocket.SO_REUSEADDR, 1)
+        self.bind(address)
+        self.listen(backlog)
+
+    def connection_state(self, interp):
+        """Answer the state the image should see. A listening socket with a
+        pending connection reports Connected, until then its connection
+        semaphore is signalled once one arrives."""
+        if not self.listening:
+            return self.state
+        if not iopoll.is_ready(self.fileno(), iopoll.READ):
+            interp.io_poller.watch(self.fileno(), iopoll.READ, self.connSema)
+            return WaitingForConnection
+        if self.accept_in_place:
+            fd = self.accept_fd()
+            interp.io_poller.unwatch(self.fileno())
+            self.socket.close()
+            self.listening = False
+            self.make_socket(fd)
+            self.state = Connected
+        return Connected
+
+    def accept_fd(self):
+        try:
+            fd, _ = self.socket.accept()
+        except rsocket.SocketError:
+            raise error.PrimitiveFailedError
+        return fd
+
+    def accept(self, connSema, readSema, writeSema):
+        "Answer a new handle for a pending connection, never blocks."
+        if not self.listening or self.accept_in_place:
+            raise error.PrimitiveFailedError
+        w_socket = W_SocketHandle(self.io_poller, self.family, self.socketType,
+                                  connSema, readSema, writeSema,
+                                  fd=self.accept_fd())
+        w_socket.state = Connected
+        return w_socket
+
+    def set_option(self, level, option, value):
+        try:
+            self.socket.setsockopt_int(level, option, value)
+        except rsocket.SocketError:
+            raise error.PrimitiveFailedError
+
+    def get_option(self, level, option):
+        try:
+            return self.socket.getsockopt_int(level, option)
+        except rsocket.SocketError:
+            raise error.PrimitiveFailedError
+
+    def local_address(self):
+        try:
+            return self.socket.getsockname()
+        except rsocket.SocketError:
+            raise error.PrimitiveFailedError
+
+    def remote_address(self):
+        try:
+            return self.socket.getpeername()
+        except rsocket.SocketError:
+            raise error.PrimitiveFailedError
+
     def can_read(self):
         if self.state == Connected:
             try:
@@ -150,31 +406,75 @@ class W_SocketHandle(W_AbstractObjectWithIdentityHash):
                 if e.errno == errno.EAGAIN or e.errno == errno.EWOULDBLOCK:
                     return False
                 raise
-            if len(r) == 0:
+            if len(r) == 0 and not self.isudp():
                 self.state = OtherEndClosed
                 return False
             else:
                 return True
         return False
 
-    def recv(self, count):
-        try:
-            data = non_blocking_recv(self, count)
-        except rsocket.CSocketError:
+    def recv_into(self, buffers):
+        """Receive into the IOBuffers, answer the number of bytes, 0 if
+        there is no data yet."""
+        got = recv_buffers(self.fileno(), buffers.bufs, buffers.sizes)
+        if got < 0:
+            e = rsocket.last_error()
+            if e.errno == errno.EAGAIN or e.errno == errno.EWOULDBLOCK:
+                return 0
             raise error.PrimitiveFailedError
-        if len(data) == 0:
+        if got == 0 and buffers.total() > 0 and not self.isudp():
             self.state = OtherEndClosed
-        return data
+        return got
 
-    def send(self, data):
-        return self.socket.send(data)
+    def recvfrom(self, count):
+        """Answer the next datagram (empty if there is none) and the
+        address it was sent from (None if there is none)."""
+        try:
+            return self.socket.recvfrom(count)
+        except rsocket.CSocketError, e:
+            if e.errno == errno.EAGAIN or e.errno == errno.EWOULDBLOCK:
+                return "", None
+            raise error.PrimitiveFailedError
+
+    def send_from(self, buffers):
+        "Send from the IOBuffers, answer the number of bytes sent."
+        sent = send_buffers(self.fileno(), buffers.bufs, buffers.sizes)
+        if sent < 0:
+            e = rsocket.last_error()
+            if e.errno == errno.EAGAIN or e.errno == errno.EWOULDBLOCK:
+                return 0
+            raise error.PrimitiveFailedError
+        return sent
+
+    def sendto(self, data, address):
+        try:
+            return self.socket.sendto(data, len(data), 0, address)
+        except rsocket.CSocketError, e:
+            if e.errno == errno.EAGAIN or e.errno == errno.EWOULDBLOCK:
+                return 0
+            raise error.PrimitiveFailedError
+
+    def fileno(self):
+        return self.socket.fd
+
+    def watch_readable(self, interp):
+        "Signal the read semaphore once data arrives or the peer closes."
+        interp.io_poller.watch(self.fileno(), iopoll.READ, self.readSema)
+
+    def watch_writable(self, interp):
+        "Signal the write semaphore once data can be sent again."
+        interp.io_poller.watch(self.fileno(), iopoll.WRITE, self.writeSema)
 
     def close(self):
+        # the fd number is free for reuse once closed, so it must not stay
+        # watched
+        self.io_poller.unwatch(self.fileno())
         if (self.state == Connected or
             self.state == OtherEndClosed or
                 self.state == WaitingForConnection):
             self.socket.close()
             self.state = Unconnected
+            self.listening = False
 
     def destroy(self):
         if self.state != InvalidSocket:
@@ -184,6 +484,98 @@ class W_SocketHandle(W_AbstractObjectWithIdentityHash):
         self.close()
 
 
+class IOBuffers(object):
+    """The char* storage of ranges of bytes and words objects, so that
+    sends and receives go straight from and into the objects. Plain words
+    objects keep their words in a list, which has no raw storage, so they
+    go through a raw scratch copy instead. finish() must be called once
+    the transfer is done."""
+    _attrs_ = ["writable", "objects", "indices", "bufs", "sizes", "scratch"]
+
+    def __init__(self, writable):
+        self.writable = writable
+        self.objects = []
+        self.indices = []
+        self.bufs = []
+        self.sizes = []
+        self.scratch = []
+
+    def add(self, w_buffer, index, count):
+        "Add count elements of w_buffer from the 0-based index on."
+        if index < 0 or count < 0 or index + count > w_buffer.size():
+            raise error.PrimitiveFailedError
+        if isinstance(w_buffer, W_BytesObject):
+            element_size = 1
+            if self.writable:
+                buf = w_buffer.writable_raw_buffer()
+            else:
+                buf = w_buffer.raw_buffer()
+            if not buf:
+                raise error.PrimitiveFailedError
+        elif isinstance(w_buffer, W_WordsObject):
+            element_size = 4
+            if self.writable:
+                buf = w_buffer.writable_raw_buffer()
+            else:
+                buf = w_buffer.raw_buffer()
+        else:
+            raise error.PrimitiveFailedError
+        scratch = not buf
+        if not scratch:
+            buf = rffi.ptradd(buf, index * element_size)
+        elif self.writable:
+            buf = lltype.malloc(rffi.CCHARP.TO, count * element_size, flavor="raw")
+        else:
+            assert isinstance(w_buffer, W_WordsObject)
+            buf = rffi.str2charp(w_buffer.words_as_string(index, index + count))
+        self.objects.append(w_buffer)
+        self.indices.append(index)
+        self.bufs.append(buf)
+        self.sizes.append(count * element_size)
+        self.scratch.append(scratch)
+        return element_size
+
+    def total(self):
+        total = 0
+        for size in self.sizes:
+            total += size
+        return total
+
+    def finish(self, nbytes):
+        """Store the nbytes received into the scratch copies back into
+        their words, free the copies and note the changed bytes objects."""
+        for i in range(len(self.objects)):
+            w_buffer = self.objects[i]
+            if self.scratch[i]:
+                if self.writable and nbytes > 0:
+                    assert isinstance(w_buffer, W_WordsObject)
+                    store_words(w_buffer, self.indices[i], self.bufs[i],
+                                min(nbytes, self.sizes[i]))
+                lltype.free(self.bufs[i], flavor="raw")
+            elif self.writable and nbytes > 0 and isinstance(w_buffer, W_BytesObject):
+                w_buffer.mutate()
+            nbytes -= self.sizes[i]
+        keepalive_until_here(self.objects)
+
+
+def store_words(w_words, index, buf, nbytes):
+    """Store nbytes little-endian bytes from the char* buf into the words
+    from index on, a trailing partial word keeps its other bytes."""
+    full = nbytes / 4
+    for i in range(full):
+        j = i * 4
+        w_words.setword(index + i, r_uint(ord(buf[j])) |
+                        (r_uint(ord(buf[j + 1])) << 8) |
+                        (r_uint(ord(buf[j + 2])) << 16) |
+                        (r_uint(ord(buf[j + 3])) << 24))
+    if nbytes > full * 4:
+        word = w_words.getword(index + full)
+        for j in range(full * 4, nbytes):
+            shift = (j % 4) * 8
+            word = (word & ~(r_uint(0xff) << shift)) | (r_uint(ord(buf[j])) << shift)
+        w_words.setword(index + full, word)
+
+
 def ensure_socket(w_socket):
     if not isinstance(w_socket, W_SocketHandle):
         raise error.PrimitiveFailedError
@@ -191,373 +583,186 @@ def ensure_socket(w_socket):
         return w_socket
 
 
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveResolverGetNameInfoHostResult(interp, s_frame, argcount):  # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveResolverGetNameInfoHostResult"
-        raise error.PrimitiveFailedError
-
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveResolverGetNameInfoServiceSize(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveResolverGetNameInfoServiceSize"
-        raise error.PrimitiveFailedError
-
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveResolverGetNameInfoServiceResult(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveResolverGetNameInfoServiceResult"
-        raise error.PrimitiveFailedError
-
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveResolverStartAddressLookup(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveResolverStartAddressLookup"
-        raise error.PrimitiveFailedError
-
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveResolverGetAddressInfo(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveResolverGetAddressInfo"
-        raise error.PrimitiveFailedError
-
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveResolverError(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveResolverError"
-        raise error.PrimitiveFailedError
-
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveResolverGetAddressInfoSize(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveResolverGetAddressInfoSize"
-        raise error.PrimitiveFailedError
-
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveResolverHostNameSize(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveResolverHostNameSize"
-        raise error.PrimitiveFailedError
-
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveResolverAbortLookup(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveResolverAbortLookup"
-        raise error.PrimitiveFailedError
-
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveResolverGetAddressInfoType(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveResolverGetAddressInfoType"
-        raise error.PrimitiveFailedError
-
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveResolverAddressLookupResult(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveResolverAddressLookupResult"
-        raise error.PrimitiveFailedError
-
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveResolverGetAddressInfoFamily(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveResolverGetAddressInfoFamily"
-        raise error.PrimitiveFailedError
-
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveResolverGetAddressInfoNext(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveResolverGetAddressInfoNext"
-        raise error.PrimitiveFailedError
-
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveResolverGetNameInfo(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveResolverGetNameInfo"
-        raise error.PrimitiveFailedError
-
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveResolverGetNameInfoHostSize(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveResolverGetNameInfoHostSize"
-        raise error.PrimitiveFailedError
-
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveResolverHostNameResult(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveResolverHostNameResult"
-        raise error.PrimitiveFailedError
-
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveResolverGetAddressInfoResult(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveResolverGetAddressInfoResult"
-        raise error.PrimitiveFailedError
-
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveResolverLocalAddress(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveResolverLocalAddress"
-        raise error.PrimitiveFailedError
-
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveResolverGetAddressInfoProtocol(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveResolverGetAddressInfoProtocol"
-        raise error.PrimitiveFailedError
-
 @plugin.expose_primitive(unwrap_spec=[object])
 def primitiveHasSocketAccess(interp, s_frame, w_rcvr):
     # if security plugin forbids it, this should return false
     return interp.space.w_true
 
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveSocketAddressSetPort(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveSocketAddressSetPort"
-        raise error.PrimitiveFailedError
-
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveSocketAddressGetPort(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveSocketAddressGetPort"
-        raise error.PrimitiveFailedError
-
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveSocketReceiveUDPDataBufCount(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveSocketReceiveUDPDataBufCount"
-        raise error.PrimitiveFailedError
-
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveSocketSetOptions(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveSocketSetOptions"
-        raise error.PrimitiveFailedError
-
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveSocketRemoteAddressSize(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveSocketRemoteAddressSize"
+@plugin.expose_primitive(unwrap_spec=[object, object])
+def primitiveSocketCloseConnection(interp, s_frame, w_rcvr, w_handle):
+    w_socket = ensure_socket(w_handle)
+    try:
+        w_socket.close()
+    except rsocket.SocketError:
         raise error.PrimitiveFailedError
+    return interp.space.w_nil
 
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveSocketConnectTo(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveSocketConnectTo"
-        raise error.PrimitiveFailedError
+@plugin.expose_primitive(unwrap_spec=[object, int, int, int, int, int, int, int])
+def primitiveSocketCreate3Semaphores(interp, s_frame, w_rcvr, netType, socketType, rcvBufSize, sendBufSize, sema, readSema, writeSema):
+    if netType == 0: # undefined
+        netType = rsocket.AF_INET
+    return W_SocketHandle(interp.io_poller, netType, socketType, sema, readSema, writeSema)
 
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveSocketLocalAddressSize(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
+@plugin.expose_primitive(unwrap_spec=[object, object])
+def primitiveSocketConnectionStatus(interp, s_frame, w_rcvr, w_socket):
+    if not isinstance(w_socket, W_SocketHandle):
+        return interp.space.wrap_int(InvalidSocket)
     else:
-        print "Missing Socket primitive primitiveSocketLocalAddressSize"
-        raise error.PrimitiveFailedError
+        return interp.space.wrap_int(w_socket.connection_state(interp))
 
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveSocketRemoteAddress(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveSocketRemoteAddress"
+@plugin.expose_primitive(unwrap_spec=[object, object, object, int])
+def primitiveSocketConnectToPort(interp, s_frame, w_rcvr, w_handle, w_hostaddr, port):
+    w_socket = ensure_socket(w_handle)
+    if not isinstance(w_hostaddr, W_BytesObject):
         raise error.PrimitiveFailedError
+    w_socket.connect(w_hostaddr, port)
+    return interp.space.w_nil
 
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveSocketLocalPort(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveSocketLocalPort"
-        raise error.PrimitiveFailedError
+@plugin.expose_primitive(unwrap_spec=[object, object])
+def primitiveSocketSendDone(interp, s_frame, w_rcvr, w_handle):
+    w_socket = ensure_socket(w_handle)
+    if w_socket.state != Connected or iopoll.is_ready(w_socket.fileno(), iopoll.WRITE):
+        return interp.space.w_true
+    w_socket.watch_writable(interp)
+    return interp.space.w_false
 
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveSocketError(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveSocketError"
-        raise error.PrimitiveFailedError
+@plugin.expose_primitive(unwrap_spec=[object, object, object, int, int])
+def primitiveSocketSendDataBufCount(interp, s_frame, w_rcvr, w_handle, w_data, start, count):
+    w_socket = ensure_socket(w_handle)
+    buffers = IOBuffers(False)
+    element_size = buffers.add(w_data, start - 1, count)
+    try:
+        sent = w_socket.send_from(buffers)
+    finally:
+        buffers.finish(0)
+    if sent < buffers.total():
+        w_socket.watch_writable(interp)
+    return interp.space.wrap_int(sent / element_size)
 
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveSocketBindTo(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveSocketBindTo"
-        raise error.PrimitiveFailedError
+@plugin.expose_primitive(unwrap_spec=[object, object])
+def primitiveSocketReceiveDataAvailable(interp, s_frame, w_rcvr, w_handle):
+    w_socket = ensure_socket(w_handle)
+    if w_socket.can_read():
+        return interp.space.w_true
+    if w_socket.state == Connected:
+        w_socket.watch_readable(interp)
+    return interp.space.w_false
 
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveSocketAbortConnection(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveSocketAbortConnection"
-        raise error.PrimitiveFailedError
+@plugin.expose_primitive(unwrap_spec=[object, object, object, int, int])
+def primitiveSocketReceiveDataBufCount(interp, s_frame, w_rcvr, w_handle, w_target, start, count):
+    w_socket = ensure_socket(w_handle)
+    buffers = IOBuffers(True)
+    element_size = buffers.add(w_target, start - 1, count)
+    got = 0
+    try:
+        got = w_socket.recv_into(buffers)
+    finally:
+        buffers.finish(got)
+    if got == 0 and w_socket.state == Connected:
+        w_socket.watch_readable(interp)
+    return interp.space.wrap_int(got / element_size)
+
+@plugin.expose_primitive(unwrap_spec=[object, object, list])
+def primitiveSocketSendDataBuffers(interp, s_frame, w_rcvr, w_handle, buffers_w):
+    """Send the whole contents of each bytes or words object in the array
+    with a single call, answer the number of bytes sent."""
+    w_socket = ensure_socket(w_handle)
+    buffers = IOBuffers(False)
+    try:
+        for w_buffer in buffers_w:
+            buffers.add(w_buffer, 0, w_buffer.size())
+        sent = w_socket.send_from(buffers)
+    finally:
+        buffers.finish(0)
+    if sent < buffers.total():
+        w_socket.watch_writable(interp)
+    return interp.space.wrap_int(sent)
+
+@plugin.expose_primitive(unwrap_spec=[object, object, list])
+def primitiveSocketReceiveDataBuffers(interp, s_frame, w_rcvr, w_handle, buffers_w):
+    """Receive into the bytes or words objects in the array one after the
+    other with a single call, answer the number of bytes received."""
+    w_socket = ensure_socket(w_handle)
+    buffers = IOBuffers(True)
+    got = 0
+    try:
+        for w_buffer in buffers_w:
+            buffers.add(w_buffer, 0, w_buffer.size())
+        got = w_socket.recv_into(buffers)
+    finally:
+        buffers.finish(got)
+    if got == 0 and w_socket.state == Connected:
+        w_socket.watch_readable(interp)
+    return interp.space.wrap_int(got)
+
+@plugin.expose_primitive(unwrap_spec=[object, object, int, int, int, int, int])
+def primitiveSocketAccept3Semaphores(interp, s_frame, w_rcvr, w_handle, rcvBufSize, sendBufSize, sema, readSema, writeSema):
+    w_socket = ensure_socket(w_handle)
+    return w_socket.accept(sema, readSema, writeSema)
 
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveSocketListenWithBacklog(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveSocketListenWithBacklog"
-        raise error.PrimitiveFailedError
+@plugin.expose_primitive(unwrap_spec=[object, object, int, int, int])
+def primitiveSocketAccept(interp, s_frame, w_rcvr, w_handle, rcvBufSize, sendBufSize, sema):
+    w_socket = ensure_socket(w_handle)
+    return w_socket.accept(sema, 0, 0)
 
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveSocketGetOptions(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveSocketGetOptions"
-        raise error.PrimitiveFailedError
+@plugin.expose_primitive(unwrap_spec=[object, object, int])
+def primitiveSocketListenOnPort(interp, s_frame, w_rcvr, w_handle, port):
+    w_socket = ensure_socket(w_handle)
+    w_socket.listen_on("", port, 0)
+    return interp.space.w_nil
 
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveSocketSendUDPDataBufCount(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveSocketSendUDPDataBufCount"
-        raise error.PrimitiveFailedError
+@plugin.expose_primitive(unwrap_spec=[object, object, int, int])
+def primitiveSocketListenOnPortBacklog(interp, s_frame, w_rcvr, w_handle, port, backlog):
+    w_socket = ensure_socket(w_handle)
+    w_socket.listen_on("", port, backlog)
+    return interp.space.w_nil
 
 @plugin.expose_primitive(unwrap_spec=None)
-def primitiveSocketLocalAddressResult(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
+def primitiveSocketListenWithOrWithoutBacklog(interp, s_frame, argcount):
+    if argcount == 2:
+        backlog = 0
+    elif argcount == 3:
+        backlog = interp.space.unwrap_int(s_frame.peek(0))
     else:
-        print "Missing Socket primitive primitiveSocketLocalAddressResult"
         raise error.PrimitiveFailedError
+    port = interp.space.unwrap_int(s_frame.peek(argcount - 2))
+    w_socket = ensure_socket(s_frame.peek(argcount - 1))
+    w_socket.listen_on("", port, backlog)
+    s_frame.pop_n(argcount + 1)
+    return interp.space.w_nil
 
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveSocketLocalAddress(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveSocketLocalAddress"
-        raise error.PrimitiveFailedError
+@plugin.expose_primitive(unwrap_spec=[object, object, int, int, str])
+def primitiveSocketListenOnPortBacklogInterface(interp, s_frame, w_rcvr, w_handle, port, backlog, host):
+    w_socket = ensure_socket(w_handle)
+    w_socket.listen_on(host, port, backlog)
+    return interp.space.w_nil
 
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveSocketListenWithOrWithoutBacklog(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveSocketListenWithOrWithoutBacklog"
-        raise error.PrimitiveFailedError
+@plugin.expose_primitive(unwrap_spec=[object, object, int])
+def primitiveSocketListenWithBacklog(interp, s_frame, w_rcvr, w_handle, backlog):
+    w_socket = ensure_socket(w_handle)
+    w_socket.listen(backlog)
+    return interp.space.w_nil
 
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveSocketAccept3Semaphores(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveSocketAccept3Semaphores"
-        raise error.PrimitiveFailedError
+@plugin.expose_primitive(unwrap_spec=[object, object, str, int])
+def primitiveSocketBindToPort(interp, s_frame, w_rcvr, w_handle, host, port):
+    w_socket = ensure_socket(w_handle)
+    w_socket.bind(inet_address(w_socket.family, host, port))
+    return interp.space.w_nil
 
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveSocketRemoteAddressResult(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveSocketRemoteAddressResult"
-        raise error.PrimitiveFailedError
+@plugin.expose_primitive(unwrap_spec=[object, object, object])
+def primitiveSocketBindTo(interp, s_frame, w_rcvr, w_handle, w_sockaddr):
+    w_socket = ensure_socket(w_handle)
+    w_socket.bind(sockaddr_from_bytes(w_sockaddr))
+    return interp.space.w_nil
 
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveSocketListenOnPortBacklogInterface(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
-    else:
-        print "Missing Socket primitive primitiveSocketListenOnPortBacklogInterface"
-        raise error.PrimitiveFailedError
+@plugin.expose_primitive(unwrap_spec=[object, object, object])
+def primitiveSocketConnectTo(interp, s_frame, w_rcvr, w_handle, w_sockaddr):
+    w_socket = ensure_socket(w_handle)
+    w_socket.connect_to(sockaddr_from_bytes(w_sockaddr))
+    return interp.space.w_nil
 
 @plugin.expose_primitive(unwrap_spec=[object, object])
-def primitiveSocketCloseConnection(interp, s_frame, w_rcvr, w_handle):
+def primitiveSocketAbortConnection(interp, s_frame, w_rcvr, w_handle):
     w_socket = ensure_socket(w_handle)
     try:
         w_socket.close()
@@ -565,42 +770,107 @@ def primitiveSocketCloseConnection(interp, s_frame, w_rcvr, w_handle):
         raise error.PrimitiveFailedError
     return interp.space.w_nil
 
-@plugin.expose_primitive(unwrap_spec=None)
-def primitiveSocketRemotePort(interp, s_frame, argcount): # pragma: no cover
-    if not objectmodel.we_are_translated():
-        import pdb; pdb.set_trace()
-        raise error.PrimitiveFailedError
+@plugin.expose_primitive(unwrap_spec=[object, object])
+def primitiveSocketError(interp, s_frame, w_rcvr, w_handle):
+    w_socket = ensure_socket(w_handle)
+    return interp.space.wrap_int(
+        w_socket.get_option(rsocket.SOL_SOCKET, rsocket.SO_ERROR))
+
+@plugin.expose_primitive(unwrap_spec=[object, object, str, str])
+def primitiveSocketSetOptions(interp, s_frame, w_rcvr, w_handle, name, value):
+    w_socket = ensure_socket(w_handle)
+    option = SOCKET_OPTIONS.get(name, None)
+    if option is None:
+        raise error.PrimitiveFailedError
+    level, optname = option
+    if value == "true":
+        intvalue = 1
+    elif value == "false":
+        intvalue = 0
     else:
-        print "Missing Socket primitive primitiveSocketRemotePort"
+        try:
+            intvalue = int(value)
+        except ValueError:
+            raise error.PrimitiveFailedError
+    w_socket.set_option(level, optname, intvalue)
+    return interp.space.wrap_list([
+        interp.space.wrap_int(0),
+        interp.space.wrap_int(w_socket.get_option(level, optname))])
+
+@plugin.expose_primitive(unwrap_spec=[object, object, str])
+def primitiveSocketGetOptions(interp, s_frame, w_rcvr, w_handle, name):
+    w_socket = ensure_socket(w_handle)
+    option = SOCKET_OPTIONS.get(name, None)
+    if option is None:
         raise error.PrimitiveFailedError
+    level, optname = option
+    return interp.space.wrap_list([
+        interp.space.wrap_int(0),
+        interp.space.wrap_int(w_socket.get_option(level, optname))])
 
-@plugin.expose_primitive(unwrap_spec=[object, int, int, int, int, int, int, int])
-def primitiveSocketCreate3Semaphores(interp, s_frame, w_rcvr, netType, socketType, rcvBufSize, sendBufSize, sema, readSema, writeSema):
-    if netType == 0: # undefined
-        netType = rsocket.AF_INET
-    return W_SocketHandle(netType, socketType)
+@plugin.expose_primitive(unwrap_spec=[object, object])
+def primitiveSocketLocalPort(interp, s_frame, w_rcvr, w_handle):
+    w_socket = ensure_socket(w_handle)
+    return interp.space.wrap_int(
+        sockaddr_port(sockaddr_to_bytes(w_socket.local_address())))
 
 @plugin.expose_primitive(unwrap_spec=[object, object])
-def primitiveSocketConnectionStatus(interp, s_frame, w_rcvr, w_socket):
-    if not isinstance(w_socket, W_SocketHandle):
-        return interp.space.wrap_int(InvalidSocket)
-    else:
-        return interp.space.wrap_int(w_socket.state)
+def primitiveSocketLocalAddress(interp, s_frame, w_rcvr, w_handle):
+    w_socket = ensure_socket(w_handle)
+    return interp.space.wrap_string(host_of(w_socket.local_address()))
 
-@plugin.expose_primitive(unwrap_spec=[object, object, object, int])
-def primitiveSocketConnectToPort(interp, s_frame, w_rcvr, w_handle, w_hostaddr, port):
+@plugin.expose_primitive(unwrap_spec=[object, object])
+def primitiveSocketRemotePort(interp, s_frame, w_rcvr, w_handle):
     w_socket = ensure_socket(w_handle)
-    if not isinstance(w_hostaddr, W_BytesObject):
-        raise error.PrimitiveFailedError
-    w_socket.connect(w_hostaddr, port)
-    return interp.space.w_nil
+    if w_socket.state != Connected:
+        return interp.space.wrap_int(0)
+    return interp.space.wrap_int(
+        sockaddr_port(sockaddr_to_bytes(w_socket.remote_address())))
 
 @plugin.expose_primitive(unwrap_spec=[object, object])
-def primitiveSocketSendDone(interp, s_frame, w_rcvr, fd):
-    return interp.space.w_true
+def primitiveSocketRemoteAddress(interp, s_frame, w_rcvr, w_handle):
+    w_socket = ensure_socket(w_handle)
+    return interp.space.wrap_string(host_of(w_socket.remote_address()))
+
+@plugin.expose_primitive(unwrap_spec=[object, object])
+def primitiveSocketLocalAddressSize(interp, s_frame, w_rcvr, w_handle):
+    w_socket = ensure_socket(w_handle)
+    return interp.space.wrap_int(w_socket.local_address().addrlen)
+
+@plugin.expose_primitive(unwrap_spec=[object, object, object])
+def primitiveSocketLocalAddressResult(interp, s_frame, w_rcvr, w_handle, w_target):
+    w_socket = ensure_socket(w_handle)
+    store_string(w_target, sockaddr_to_bytes(w_socket.local_address()))
+    return w_target
+
+@plugin.expose_primitive(unwrap_spec=[object, object])
+def primitiveSocketRemoteAddressSize(interp, s_frame, w_rcvr, w_handle):
+    w_socket = ensure_socket(w_handle)
+    return interp.space.wrap_int(w_socket.remote_address().addrlen)
+
+@plugin.expose_primitive(unwrap_spec=[object, object, object])
+def primitiveSocketRemoteAddressResult(interp, s_frame, w_rcvr, w_handle, w_target):
+    w_socket = ensure_socket(w_handle)
+    store_string(w_target, sockaddr_to_bytes(w_socket.remote_address()))
+    return w_target
+
+@plugin.expose_primitive(unwrap_spec=[object])
+def primitiveSocketAddressGetPort(interp, s_frame, w_rcvr):
+    return interp.space.wrap_int(
+        sockaddr_port(sockaddr_to_bytes(sockaddr_from_bytes(w_rcvr))))
+
+@plugin.expose_primitive(unwrap_spec=[object, int])
+def primitiveSocketAddressSetPort(interp, s_frame, w_rcvr, port):
+    sockaddr_from_bytes(w_rcvr)  # validate
+    if not 0 <= port <= 0xffff:
+        raise error.PrimitiveFailedError
+    assert isinstance(w_rcvr, W_BytesObject)
+    w_rcvr.setchar(2, chr(port >> 8))
+    w_rcvr.setchar(3, chr(port & 0xff))
+    return w_rcvr
 
-@plugin.expose_primitive(unwrap_spec=[object, object, str, int, int])
-def primitiveSocketSendDataBufCount(interp, s_frame, w_rcvr, w_handle, data, start, count):
+@plugin.expose_primitive(unwrap_spec=[object, object, str, int, str, int, int])
+def primitiveSocketSendUDPDataBufCount(interp, s_frame, w_rcvr, w_handle, host, port, data, start, count):
     w_socket = ensure_socket(w_handle)
     s = start - 1
     if s < 0:
@@ -609,63 +879,205 @@ def primitiveSocketSendDataBufCount(interp, s_frame, w_rcvr, w_handle, data, sta
     if e > len(data):
         raise error.PrimitiveFailedError
     assert e >= 0
-    res = w_socket.send(data[s:e])
+    res = w_socket.sendto(data[s:e], inet_address(w_socket.family, host, port))
+    if res < count:
+        w_socket.watch_writable(interp)
     return interp.space.wrap_int(res)
 
-@plugin.expose_primitive(unwrap_spec=[object, object])
-def primitiveSocketReceiveDataAvailable(interp, s_frame, w_rcvr, w_handle):
-    w_socket = ensure_socket(w_handle)
-    if w_socket.can_read():
-        return interp.space.w_true
-    else:
-        return interp.space.w_false
-
 @plugin.expose_primitive(unwrap_spec=[object, object, object, int, int])
-def primitiveSocketReceiveDataBufCount(interp, s_frame, w_rcvr, w_handle, w_target, start, count):
+def primitiveSocketReceiveUDPDataBufCount(interp, s_frame, w_rcvr, w_handle, w_target, start, count):
     w_socket = ensure_socket(w_handle)
-    if start + count - 1 > w_target.size():
-        raise error.PrimitiveFailedError
     if not isinstance(w_target, W_BytesObject):
         raise error.PrimitiveFailedError
-    try:
-        data = w_socket.recv(count)
-    except rsocket.SocketError:
-        return interp.space.wrap_int(0)
+    if start < 1 or count < 0 or start + count - 1 > w_target.size():
+        raise error.PrimitiveFailedError
+    data, address = w_socket.recvfrom(count)
     for idx, char in enumerate(data):
         w_target.setchar(idx + start - 1, char)
-    return interp.space.wrap_int(len(data))
+    if address is None:
+        w_host = interp.space.wrap_string("")
+        port = 0
+    else:
+        w_host = interp.space.wrap_string(host_of(address))
+        port = sockaddr_port(sockaddr_to_bytes(address))
+    return interp.space.wrap_list([interp.space.wrap_int(len(data)), w_host,
+                                   interp.space.wrap_int(port),
+                                   interp.space.w_false])
 
 @plugin.expose_primitive(unwrap_spec=[object, object])
 def primitiveSocketDestroy(interp, s_frame, w_rcvr, w_handle):
     w_socket = ensure_socket(w_handle)
+    interp.io_poller.unwatch(w_socket.fileno())
     try:
         w_socket.destroy()
     except rsocket.SocketError:
         raise error.PrimitiveFailedError
     return interp.space.wrap_int(w_socket.state)
 
-@plugin.expose_primitive(unwrap_spec=[object, object])
-def primitiveInitializeNetwork(interp, s_frame, w_rcvr, w_semaphore):
+@plugin.expose_primitive(unwrap_spec=[object, int])
+def primitiveInitializeNetwork(interp, s_frame, w_rcvr, resolverSemaIndex):
+    plugin.resolver.semaphore_index = resolverSemaIndex
     return w_rcvr
 
 @plugin.expose_primitive(unwrap_spec=[object])
 def primitiveResolverStatus(interp, s_frame, w_rcvr):
+    if not plugin.resolver.poll(interp):
+        return interp.space.wrap_int(ResolverBusy)
+    result = plugin.resolver.result
+    if result is not None and result.error != 0:
+        return interp.space.wrap_int(ResolverError)
     return interp.space.wrap_int(ResolverReady)
 
+@plugin.expose_primitive(unwrap_spec=[object])
+def primitiveResolverError(interp, s_frame, w_rcvr):
+    result = plugin.resolver.result
+    if plugin.resolver.is_busy() or result is None:
+        return interp.space.wrap_int(0)
+    return interp.space.wrap_int(result.error)
+
+@plugin.expose_primitive(unwrap_spec=[object])
+def primitiveResolverAbortLookup(interp, s_frame, w_rcvr):
+    plugin.resolver.abort(interp)
+    return interp.space.w_nil
+
 @plugin.expose_primitive(unwrap_spec=[object, str])
 def primitiveResolverStartNameLookup(interp, s_frame, w_rcvr, hostname):
-    try:
-        host = rsocket.INETAddress(hostname, 80).get_host()
-        plugin.set_last_lookup(host)
-    except rsocket.GAIError, e:
-        print "SocketError: %s" % e.get_msg()
-        plugin.set_last_lookup(None)
+    plugin.resolver.start(interp, resolver.name_request(hostname))
     return interp.space.w_nil
 
 @plugin.expose_primitive(unwrap_spec=[object])
 def primitiveResolverNameLookupResult(interp, s_frame, w_rcvr):
-    inet = plugin.get_last_lookup()
-    if inet is None:
+    host = plugin.lookup_result(interp)
+    if host is None:
         return interp.space.w_nil
     else:
-        return interp.space.wrap_string(inet)
+        return interp.space.wrap_string(host)
+
+@plugin.expose_primitive(unwrap_spec=[object, str])
+def primitiveResolverStartAddressLookup(interp, s_frame, w_rcvr, host):
+    plugin.resolver.start(interp, resolver.address_request(host))
+    return interp.space.w_nil
+
+@plugin.expose_primitive(unwrap_spec=[object])
+def primitiveResolverAddressLookupResult(interp, s_frame, w_rcvr):
+    name = plugin.lookup_result(interp)
+    if name is None:
+        return interp.space.w_nil
+    else:
+        return interp.space.wrap_string(name)
+
+@plugin.expose_primitive(unwrap_spec=[object])
+def primitiveResolverLocalAddress(interp, s_frame, w_rcvr):
+    try:
+        host = rsocket.INETAddress(rsocket.gethostname(), 0).get_host()
+    except rsocket.SocketError:
+        host = "127.0.0.1"
+    return interp.space.wrap_string(host)
+
+@plugin.expose_primitive(unwrap_spec=[object])
+def primitiveResolverHostNameSize(interp, s_frame, w_rcvr):
+    return interp.space.wrap_int(len(rsocket.gethostname()))
+
+@plugin.expose_primitive(unwrap_spec=[object, object])
+def primitiveResolverHostNameResult(interp, s_frame, w_rcvr, w_target):
+    store_string(w_target, rsocket.gethostname())
+    return w_target
+
+@plugin.expose_primitive(unwrap_spec=[object, str, str, int, int, int, int])
+def primitiveResolverGetAddressInfo(interp, s_frame, w_rcvr, host, service, flags, family, socktype, protocol):
+    """Start looking up the address infos. A numeric host does not need the
+    DNS, so it is answered at once, and fails the primitive if it is not
+    valid. Otherwise the resolver is busy until the answer has arrived."""
+    native_flags = 0
+    if flags & SqNumericFlag:
+        native_flags |= rsocket.AI_NUMERICHOST
+    if flags & SqPassiveFlag:
+        native_flags |= rsocket.AI_PASSIVE
+    request = resolver.addrinfo_request(host, service, native_flags,
+                                        to_native(SqAddressFamilies, family),
+                                        to_native(SqSocketTypes, socktype),
+                                        to_native(SqProtocols, protocol))
+    numeric = flags & SqNumericFlag != 0
+    plugin.resolver.start(interp, request, inline=numeric)
+    if numeric and plugin.resolver.result.error != 0:
+        raise error.PrimitiveFailedError
+    return interp.space.w_nil
+
+@plugin.expose_primitive(unwrap_spec=[object])
+def primitiveResolverGetAddressInfoSize(interp, s_frame, w_rcvr):
+    info = plugin.resolver.current_addrinfo(interp)
+    if info is None:
+        return interp.space.wrap_int(-1)
+    return interp.space.wrap_int(len(info.sockaddr))
+
+@plugin.expose_primitive(unwrap_spec=[object, object])
+def primitiveResolverGetAddressInfoResult(interp, s_frame, w_rcvr, w_target):
+    info = plugin.resolver.current_addrinfo(interp)
+    if info is None:
+        raise error.PrimitiveFailedError
+    store_string(w_target, info.sockaddr)
+    return w_target
+
+@plugin.expose_primitive(unwrap_spec=[object])
+def primitiveResolverGetAddressInfoFamily(interp, s_frame, w_rcvr):
+    info = plugin.resolver.current_addrinfo(interp)
+    if info is None:
+        raise error.PrimitiveFailedError
+    return interp.space.wrap_int(from_native(SqAddressFamilies, info.family))
+
+@plugin.expose_primitive(unwrap_spec=[object])
+def primitiveResolverGetAddressInfoType(interp, s_frame, w_rcvr):
+    info = plugin.resolver.current_addrinfo(interp)
+    if info is None:
+        raise error.PrimitiveFailedError
+    return interp.space.wrap_int(from_native(SqSocketTypes, info.socktype))
+
+@plugin.expose_primitive(unwrap_spec=[object])
+def primitiveResolverGetAddressInfoProtocol(interp, s_frame, w_rcvr):
+    info = plugin.resolver.current_addrinfo(interp)
+    if info is None:
+        raise error.PrimitiveFailedError
+    return interp.space.wrap_int(from_native(SqProtocols, info.protocol))
+
+@plugin.expose_primitive(unwrap_spec=[object])
+def primitiveResolverGetAddressInfoNext(interp, s_frame, w_rcvr):
+    return interp.space.wrap_bool(plugin.resolver.next_addrinfo(interp))
+
+@plugin.expose_primitive(unwrap_spec=[object, object, int])
+def primitiveResolverGetNameInfo(interp, s_frame, w_rcvr, w_sockaddr, flags):
+    """Start looking up the host and service name of a socket address, see
+    primitiveResolverGetAddressInfo."""
+    native_flags = 0
+    if flags & SqNumericFlag:
+        native_flags = rsocket.NI_NUMERICHOST | rsocket.NI_NUMERICSERV
+    sockaddr_from_bytes(w_sockaddr)  # fail right away for a bad address
+    request = resolver.nameinfo_request(w_sockaddr.unwrap_string(None), native_flags)
+    numeric = flags & SqNumericFlag != 0
+    plugin.resolver.start(interp, request, inline=numeric)
+    if numeric and plugin.resolver.result.error != 0:
+        raise error.PrimitiveFailedError
+    return interp.space.w_nil
+
+def nameinfo_string(interp, index):
+    string = plugin.resolver.nameinfo_string(interp, index)
+    if string is None:
+        raise error.PrimitiveFailedError
+    return string
+
+@plugin.expose_primitive(unwrap_spec=[object])
+def primitiveResolverGetNameInfoHostSize(interp, s_frame, w_rcvr):
+    return interp.space.wrap_int(len(nameinfo_string(interp, 0)))
+
+@plugin.expose_primitive(unwrap_spec=[object, object])
+def primitiveResolverGetNameInfoHostResult(interp, s_frame, w_rcvr, w_target):
+    store_string(w_target, nameinfo_string(interp, 0))
+    return w_target
+
+@plugin.expose_primitive(unwrap_spec=[object])
+def primitiveResolverGetNameInfoServiceSize(interp, s_frame, w_rcvr):
+    return interp.space.wrap_int(len(nameinfo_string(interp, 1)))
+
+@plugin.expose_primitive(unwrap_spec=[object, object])
+def primitiveResolverGetNameInfoServiceResult(interp, s_frame, w_rcvr, w_target):
+    store_string(w_target, nameinfo_string(interp, 1))
+    return w_target
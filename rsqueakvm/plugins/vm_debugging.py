@@ -1,4 +1,5 @@
 from rsqueakvm import error
+from rsqueakvm.model.compiled_methods import W_CompiledMethod
 from rsqueakvm.model.variable import W_BytesObject
 from rsqueakvm.plugins.plugin import Plugin
 
@@ -72,3 +73,27 @@ def stopUIProcess(interp, s_frame, w_rcvr):
         return interp.space.w_true
     else:
         return interp.space.w_false
+
+
+@plugin.expose_primitive(unwrap_spec=[object, object])
+def inlineCacheStatistics(interp, s_frame, w_rcvr, w_method):
+    # Answers an Array with one entry per send site of w_method that has been
+    # executed by the interpreter: {pc. selector. classes. hits. misses}, where
+    # pc is the 1-based index of the last byte of the send and classes is the
+    # number of receiver classes cached (-1 for megamorphic sites).
+    if not isinstance(w_method, W_CompiledMethod):
+        raise error.PrimitiveFailedError
+    space = interp.space
+    sites_w = []
+    caches = w_method.inline_caches
+    if caches is not None:
+        for pc, cache in enumerate(caches):
+            if cache is None:
+                continue
+            sites_w.append(space.wrap_list([
+                space.wrap_int(w_method.bytecodeoffset() + pc + 1),
+                cache.w_selector,
+                space.wrap_int(cache.polymorphism()),
+                space.wrap_int(cache.hits),
+                space.wrap_int(cache.misses)]))
+    return space.wrap_list(sites_w)
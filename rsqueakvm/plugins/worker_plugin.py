@@ -0,0 +1,406 @@
+import errno
+import os
+
+from rsqueakvm.error import PrimitiveFailedError
+from rsqueakvm.model.character import W_Character
+from rsqueakvm.model.numeric import W_AbstractFloat, W_LargeInteger, W_SmallInteger
+from rsqueakvm.model.pointers import W_PointersObject
+from rsqueakvm.model.variable import W_BytesObject
+from rsqueakvm.plugins import file_plugin
+from rsqueakvm.plugins.plugin import Plugin
+from rsqueakvm.util import iopoll, timer
+from rsqueakvm.util.system import IS_POSIX
+
+from rpython.rlib import rbigint, rposix
+from rpython.rlib.longlong2float import float2longlong, longlong2float
+from rpython.rlib.rstring import StringBuilder, ParseStringError
+
+
+# how deeply Arrays may nest in a message, this also stops cycles
+MAX_DEPTH = 64
+# the longest length prefix of a frame
+MAX_LENGTH_DIGITS = 20
+READ_SIZE = 65536
+WRITE_SIZE = 65536
+
+
+class Channel(iopoll.Flusher):
+    """The two pipes between a worker and its parent. Messages are framed as
+    "<length>:<payload>". The write end does not block: what the pipe does
+    not take is kept in outbox and written out by the io poller. Received
+    bytes are kept in inbox until a whole frame has arrived."""
+    _attrs_ = ["pid", "rfd", "wfd", "outbox", "outbox_pos", "inbox",
+               "inbox_size", "frame_length"]
+
+    def __init__(self, pid, rfd, wfd):
+        self.pid = pid
+        self.rfd = rfd
+        self.wfd = wfd
+        self.outbox = []
+        self.outbox_pos = 0
+        self.inbox = []
+        self.inbox_size = 0
+        self.frame_length = -1
+
+    def is_open(self):
+        return self.rfd >= 0
+
+    def send(self, payload):
+        """Queue a message and write out what the pipe takes now. Answer
+        whether all of it was written."""
+        self.outbox.append("%d:%s" % (len(payload), payload))
+        return self.flush()
+
+    def flush(self):
+        while len(self.outbox) > 0:
+            data = self.outbox[0]
+            start = self.outbox_pos
+            assert start >= 0
+            try:
+                written = os.write(self.wfd, data[start:start + WRITE_SIZE])
+            except OSError as e:
+                if e.errno == errno.EAGAIN or e.errno == errno.EWOULDBLOCK:
+                    return False
+                self.outbox = []
+                self.outbox_pos = 0
+                raise
+            self.outbox_pos += written
+            if self.outbox_pos >= len(data):
+                self.outbox.pop(0)
+                self.outbox_pos = 0
+        return True
+
+    def flush_blocking(self):
+        "Write out everything that is queued, waiting for the pipe if need be."
+        if len(self.outbox) > 0:
+            rposix.set_status_flags(self.wfd, rposix.get_status_flags(self.wfd) &
+                                    ~os.O_NONBLOCK)
+            self.flush()
+
+    def receive(self):
+        "Answer the next whole message, or None if it has not arrived yet."
+        payload = self.next_frame()
+        while payload is None and iopoll.is_ready(self.rfd, iopoll.READ):
+            chunk = os.read(self.rfd, READ_SIZE)
+            if not chunk:
+                break  # the other end is gone, only buffered frames remain
+            self.inbox.append(chunk)
+            self.inbox_size += len(chunk)
+            payload = self.next_frame()
+        return payload
+
+    def next_frame(self):
+        """Answer the frame that is complete in inbox, or None. Only the
+        bytes of the current frame are read, so the chunks are joined once
+        per frame."""
+        if self.frame_length < 0:
+            if self.inbox_size == 0:
+                return None
+            data = "".join(self.inbox)
+            colon = data.find(":")
+            if colon < 0:
+                if len(data) > MAX_LENGTH_DIGITS:
+                    raise PrimitiveFailedError
+                self.inbox = [data]
+                return None
+            try:
+                length = int(data[:colon])
+            except ValueError:
+                raise PrimitiveFailedError
+            if length < 0:
+                raise PrimitiveFailedError
+            self.frame_length = length
+            self.set_inbox(data, colon + 1)
+        if self.inbox_size < self.frame_length:
+            return None
+        data = "".join(self.inbox)
+        end = self.frame_length
+        assert end >= 0
+        self.frame_length = -1
+        self.set_inbox(data, end)
+        return data[:end]
+
+    def set_inbox(self, data, start):
+        assert start >= 0
+        rest = data[start:]
+        self.inbox = [rest] if rest else []
+        self.inbox_size = len(rest)
+
+    def close(self):
+        if self.is_open():
+            os.close(self.rfd)
+            os.close(self.wfd)
+            self.rfd = self.wfd = -1
+            self.outbox = []
+
+
+class WorkerPlugin(Plugin):
+    """Forks the VM into workers that start out with the image the parent
+    has loaded, shared copy-on-write, so one image load serves many cores.
+    Parent and workers only exchange messages of plain data."""
+    _attrs_ = ["workers", "parent"]
+
+    def __init__(self):
+        Plugin.__init__(self)
+        self.workers = {}
+        self.parent = None
+
+    def is_enabled(self):
+        return IS_POSIX and Plugin.is_enabled(self)
+
+    def channel(self, index):
+        "Answer the channel to worker index, or to the parent for 0."
+        if index == 0:
+            channel = self.parent
+        else:
+            channel = self.workers.get(index, None)
+        if channel is None or not channel.is_open():
+            raise PrimitiveFailedError
+        return channel
+
+    def next_index(self):
+        index = 1
+        while index in self.workers:
+            index += 1
+        return index
+
+plugin = WorkerPlugin()
+
+
+def encode(space, w_object, builder, depth=0):
+    """Append w_object to builder. nil, booleans, integers, Floats,
+    Characters, Strings, Symbols, ByteArrays and Arrays of these can be
+    sent, anything else fails the primitive."""
+    if depth > MAX_DEPTH:
+        raise PrimitiveFailedError
+    if w_object.is_nil(space):
+        builder.append("n")
+    elif w_object is space.w_true:
+        builder.append("t")
+    elif w_object is space.w_false:
+        builder.append("f")
+    elif isinstance(w_object, W_SmallInteger):
+        builder.append("i%d;" % space.unwrap_int(w_object))
+    elif isinstance(w_object, W_LargeInteger):
+        builder.append("l%s;" % space.unwrap_rbigint(w_object).str())
+    elif isinstance(w_object, W_AbstractFloat):
+        builder.append("d%d;" % float2longlong(space.unwrap_float(w_object)))
+    elif isinstance(w_object, W_Character):
+        builder.append("c%d;" % w_object.value)
+    elif isinstance(w_object, W_BytesObject):
+        w_class = w_object.getclass(space)
+        if w_class.is_same_object(space.w_String):
+            builder.append("s")
+        elif w_class.is_same_object(space.w_ByteSymbol):
+            builder.append("y")
+        elif w_class.is_same_object(space.w_ByteArray):
+            builder.append("b")
+        else:
+            raise PrimitiveFailedError
+        data = space.unwrap_string(w_object)
+        builder.append("%d:" % len(data))
+        builder.append(data)
+    elif (isinstance(w_object, W_PointersObject) and
+            w_object.getclass(space).is_same_object(space.w_Array)):
+        size = w_object.size()
+        builder.append("a%d:" % size)
+        for i in range(size):
+            encode(space, w_object.at0(space, i), builder, depth + 1)
+    else:
+        raise PrimitiveFailedError
+
+
+class Decoder(object):
+    _attrs_ = ["data", "pos"]
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def next_char(self):
+        if self.pos >= len(self.data):
+            raise PrimitiveFailedError
+        c = self.data[self.pos]
+        self.pos += 1
+        return c
+
+    def read_until(self, terminator):
+        end = self.data.find(terminator, self.pos)
+        if end < 0:
+            raise PrimitiveFailedError
+        start = self.pos
+        assert start >= 0
+        self.pos = end + 1
+        return self.data[start:end]
+
+    def read_int(self, terminator):
+        try:
+            return int(self.read_until(terminator))
+        except ValueError:
+            raise PrimitiveFailedError
+
+    def read_bigint(self, terminator):
+        try:
+            return rbigint.rbigint.fromstr(self.read_until(terminator))
+        except ParseStringError:
+            raise PrimitiveFailedError
+
+    def read_bytes(self):
+        length = self.read_int(":")
+        start = self.pos
+        end = start + length
+        if length < 0 or end > len(self.data):
+            raise PrimitiveFailedError
+        assert start >= 0 and end >= 0
+        self.pos = end
+        return self.data[start:end]
+
+    def decode(self, space, depth=0):
+        if depth > MAX_DEPTH:
+            raise PrimitiveFailedError
+        tag = self.next_char()
+        if tag == "n":
+            return space.w_nil
+        elif tag == "t":
+            return space.w_true
+        elif tag == "f":
+            return space.w_false
+        elif tag == "i":
+            return space.wrap_int(self.read_int(";"))
+        elif tag == "l":
+            return space.wrap_rbigint(self.read_bigint(";"))
+        elif tag == "d":
+            try:
+                bits = self.read_bigint(";").tolonglong()
+            except OverflowError:
+                raise PrimitiveFailedError
+            return space.wrap_float(longlong2float(bits))
+        elif tag == "c":
+            return W_Character(self.read_int(";"))
+        elif tag == "s":
+            return space.wrap_string(self.read_bytes())
+        elif tag == "y":
+            return space.wrap_symbol(self.read_bytes())
+        elif tag == "b":
+            w_bytes = space.wrap_string(self.read_bytes())
+            w_bytes.change_class(space, space.w_ByteArray)
+            return w_bytes
+        elif tag == "a":
+            size = self.read_int(":")
+            if size < 0:
+                raise PrimitiveFailedError
+            return space.wrap_list([self.decode(space, depth + 1) for _ in range(size)])
+        raise PrimitiveFailedError
+
+
+def encode_object(space, w_object):
+    builder = StringBuilder()
+    encode(space, w_object, builder)
+    return builder.build()
+
+
+def decode_object(space, data):
+    decoder = Decoder(data)
+    w_object = decoder.decode(space)
+    if decoder.pos != len(data):
+        raise PrimitiveFailedError
+    return w_object
+
+
+@plugin.expose_primitive(unwrap_spec=[object])
+def primitiveForkWorker(interp, s_frame, w_rcvr):
+    """Fork a worker. The parent is answered the worker's index for the
+    other primitives, the worker continues right here and is answered 0."""
+    # write out buffered file data now, or the worker would write it again
+    for handle in file_plugin.open_handles:
+        handle.flush()
+    to_worker_r, to_worker_w = os.pipe()
+    to_parent_r, to_parent_w = os.pipe()
+    for fd in [to_worker_w, to_parent_w]:
+        rposix.set_status_flags(fd, rposix.get_status_flags(fd) | os.O_NONBLOCK)
+    pid = os.fork()
+    if pid == 0:
+        os.close(to_worker_w)
+        os.close(to_parent_r)
+        for channel in plugin.workers.values():
+            interp.io_poller.unwatch(channel.rfd)
+            interp.io_poller.unwatch(channel.wfd)
+            channel.close()
+        plugin.workers.clear()
+        plugin.parent = Channel(os.getppid(), to_worker_r, to_parent_w)
+        # a background snapshot writer is a child of the parent only
+        interp.space.snapshot_writer_pid = 0
+        # the timer thread of the parent does not survive the fork, the
+        # timer's fork handler has reset it, so this starts a new one
+        if interp.next_wakeup_tick != 0:
+            timer.set_deadline(interp.next_wakeup_tick)
+        return interp.space.wrap_int(0)
+    os.close(to_worker_r)
+    os.close(to_parent_w)
+    index = plugin.next_index()
+    plugin.workers[index] = Channel(pid, to_parent_r, to_worker_w)
+    return interp.space.wrap_int(index)
+
+
+@plugin.expose_primitive(unwrap_spec=[object, int, object])
+def primitiveWorkerSend(interp, s_frame, w_rcvr, index, w_message):
+    "Send w_message to worker index, or to the parent for 0."
+    channel = plugin.channel(index)
+    payload = encode_object(interp.space, w_message)
+    try:
+        if not channel.send(payload):
+            interp.io_poller.flush_when_writable(channel.wfd, channel)
+    except OSError:
+        raise PrimitiveFailedError
+    return w_rcvr
+
+
+@plugin.expose_primitive(unwrap_spec=[object, int, int])
+def primitiveWorkerReceive(interp, s_frame, w_rcvr, index, semaphore_index):
+    """Answer the next message from worker index, or from the parent for 0.
+    If there is none yet, answer nil and signal the external semaphore at
+    semaphore_index once data arrives."""
+    channel = plugin.channel(index)
+    try:
+        payload = channel.receive()
+    except OSError:
+        raise PrimitiveFailedError
+    if payload is None:
+        interp.io_poller.watch(channel.rfd, iopoll.READ, semaphore_index)
+        return interp.space.w_nil
+    return decode_object(interp.space, payload)
+
+
+@plugin.expose_primitive(unwrap_spec=[object, int])
+def primitiveWorkerWait(interp, s_frame, w_rcvr, index):
+    """Close the channel to worker index, wait for it to exit and answer its
+    exit status."""
+    channel = plugin.channel(index)
+    if index == 0:
+        raise PrimitiveFailedError
+    interp.io_poller.unwatch(channel.rfd)
+    interp.io_poller.unwatch(channel.wfd)
+    channel.close()
+    del plugin.workers[index]
+    try:
+        _, status = os.waitpid(channel.pid, 0)
+    except OSError:
+        raise PrimitiveFailedError
+    if os.WIFEXITED(status):
+        return interp.space.wrap_int(os.WEXITSTATUS(status))
+    return interp.space.wrap_int(-1)
+
+
+@plugin.expose_primitive(unwrap_spec=[object, int])
+def primitiveWorkerExit(interp, s_frame, w_rcvr, code):
+    """End this worker with the exit status code. Buffered file data and
+    queued messages are written out, nothing else is shut down."""
+    if plugin.parent is None:
+        raise PrimitiveFailedError
+    file_plugin.FilePlugin.shutdown(interp.space)
+    try:
+        plugin.parent.flush_blocking()
+    except OSError:
+        pass  # the parent is gone
+    plugin.parent.close()
+    os._exit(code)
@@ -334,7 +334,7 @@ def func(interp, s_frame, w_delay, w_semaphore, ev_timestamp):
         interp.space.set_w_timerSemaphore(interp.space.w_nil)
     else:
         interp.space.set_w_timerSemaphore(w_semaphore)
-    interp.next_wakeup_tick = event_time_to_microseconds(interp, ev_timestamp)
+    interp.set_next_wakeup_tick(event_time_to_microseconds(interp, ev_timestamp))
     return w_delay
 
 
@@ -361,5 +361,5 @@ def func(interp, s_frame, w_delay, w_semaphore, timestamp):
         interp.space.set_w_timerSemaphore(interp.space.w_nil)
     else:
         interp.space.set_w_timerSemaphore(w_semaphore)
-    interp.next_wakeup_tick = timestamp
+    interp.set_next_wakeup_tick(timestamp)
     return w_delay
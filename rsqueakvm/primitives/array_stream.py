@@ -4,6 +4,8 @@ from rsqueakvm.model.variable import W_BytesObject, W_WordsObject
 from rsqueakvm.primitives import expose_primitive, assert_valid_index, index1_0
 from rsqueakvm.primitives.constants import *
 
+from rpython.rlib.rarithmetic import int_between
+
 # ___________________________________________________________________________
 # Array and Stream Primitives
 
@@ -44,18 +46,25 @@ def func(interp, s_frame, w_obj, n0, w_val):
     w_obj.setchar(n0, val)
     return w_val
 
+def assert_valid_short_index(n0, w_receiver):
+    if isinstance(w_receiver, W_BytesObject):
+        short_size = w_receiver.size() / 2
+    elif isinstance(w_receiver, W_WordsObject):
+        short_size = w_receiver.size() * 2
+    else:
+        raise PrimitiveFailedError
+    if not int_between(0, n0, short_size):
+        raise PrimitiveFailedError
+    return n0
+
 @expose_primitive(SHORT_AT, unwrap_spec=[object, index1_0])
 def func(interp, s_frame, w_receiver, n0):
-    if not (isinstance(w_receiver, W_BytesObject) or
-            isinstance(w_receiver, W_WordsObject)):
-        raise PrimitiveFailedError
+    n0 = assert_valid_short_index(n0, w_receiver)
     return w_receiver.short_at0(interp.space, n0)
 
 @expose_primitive(SHORT_AT_PUT, unwrap_spec=[object, index1_0, object])
 def func(interp, s_frame, w_receiver, n0, w_value):
-    if not (isinstance(w_receiver, W_BytesObject) or
-            isinstance(w_receiver, W_WordsObject)):
-        raise PrimitiveFailedError
+    n0 = assert_valid_short_index(n0, w_receiver)
     w_receiver.short_atput0(interp.space, n0, w_value)
     return w_value
 
@@ -103,7 +103,8 @@ def func(interp, s_frame, argcount):
     from rsqueakvm.squeakimage import SpurImageWriter
     from rsqueakvm.constants import SYSTEM_ATTRIBUTE_IMAGE_NAME_INDEX
     filename = interp.space.get_system_attribute(SYSTEM_ATTRIBUTE_IMAGE_NAME_INDEX)
-    SpurImageWriter(interp, filename).trace_image(s_frame)
+    SpurImageWriter(interp, filename,
+                    is_64bit=interp.image.version.is_64bit).trace_image(s_frame)
     s_frame.pop()
     s_frame.push(interp.space.w_false)  # the non-resuming image gets false
 
@@ -200,6 +201,14 @@ def func(interp, s_frame, w_rcvr, start, stop, w_replacement, repStart):
     if (w_rcvr.varsize() <= stop or w_replacement.varsize() <= repStart + (stop - start)):
         raise PrimitiveFailedError()
     repOff = repStart - start
+    if stop >= start and not (w_rcvr is w_replacement and
+                              repStart < start <= repStart + stop - start):
+        # the loop above copies forward, within one object overlapping ranges
+        # with the source before the destination repeat the first elements.
+        # Leave that to the element by element copy.
+        if w_rcvr.replace_from_to(interp.space, start, stop,
+                                  w_replacement, repStart):
+            return w_rcvr
     _replace_from_to(interp.space, start, stop, repOff, w_rcvr, w_replacement)
     return w_rcvr
 
@@ -6,7 +6,8 @@ from rsqueakvm.model.display import W_DisplayBitmap
 from rsqueakvm.model.variable import W_BytesObject, W_WordsObject
 from rsqueakvm.primitives import expose_primitive, uint, index1_0
 from rsqueakvm.primitives.constants import *
-from rsqueakvm.primitives.storage import get_instances_array
+from rsqueakvm.primitives.storage import (get_instances_array,
+                                          get_instances_index)
 
 from rpython.rlib import jit
 from rpython.rlib.rarithmetic import r_uint
@@ -131,23 +132,17 @@ def func(interp, s_frame, w_class):
     except IndexError:
         raise PrimitiveFailedError()
 
-def next_object(space, list_of_objects, w_obj):
-    retval = None
-    try:
-        idx = list_of_objects.index(w_obj)
-    except ValueError:
-        idx = -1
-    try:
-        retval = list_of_objects[idx + 1]
-    except IndexError:
-        return space.wrap_int(0)
-    return retval
+def next_object(space, index, w_obj):
+    i = index.position_after(w_obj)
+    if i < len(index.objects_w):
+        return index.objects_w[i]
+    return space.wrap_int(0)
 
 @expose_primitive(NEXT_OBJECT, unwrap_spec=[object])
 def func(interp, s_frame, w_obj):
     # This primitive is used to iterate through all objects:
     # it returns the "next" instance after w_obj.
-    return next_object(interp.space, get_instances_array(interp, s_frame), w_obj)
+    return next_object(interp.space, get_instances_index(interp, s_frame), w_obj)
 
 @expose_primitive(ALL_INSTANCES, unwrap_spec=[object])
 def func(interp, s_frame, w_class):
@@ -6,7 +6,7 @@ from rsqueakvm.model.block_closure import W_BlockClosure
 from rsqueakvm.model.compiled_methods import (W_CompiledMethod,
                                               W_PreSpurCompiledMethod,
                                               W_SpurCompiledMethod)
-from rsqueakvm.model.numeric import W_SmallInteger
+from rsqueakvm.model.numeric import W_Float, W_SmallInteger, is_small_float64
 from rsqueakvm.model.pointers import W_PointersObject
 from rsqueakvm.primitives import (expose_primitive, expose_also_as,
                                   assert_pointers, index1_0, assert_valid_inst_index)
@@ -148,9 +148,7 @@ def get_instances_array_gc(interp, w_class=None):
             if w_obj is not None and w_obj.has_class():
                 w_cls = w_obj.getclass(space)
                 if w_cls is not None:
-                    # XXX: should not return SmallFloat64 on Spur64...
-                    if ((not w_cls.is_same_object(space.w_SmallInteger)) and
-                        (not (space.is_spur.is_set() and w_cls.is_same_object(space.w_Character))) and
+                    if ((not is_immediate(interp, w_obj, w_cls)) and
                         (w_class is None or w_cls.is_same_object(w_class))):
                         result_w.append(w_obj)
             pending.extend(rgc.get_rpy_referents(gcref))
@@ -159,23 +157,30 @@ def get_instances_array_gc(interp, w_class=None):
     rgc.assert_no_more_gcflags()
     return result_w
 
+def _is_same(w_a, w_b):
+    return w_a is w_b
+
+def identity_dict():
+    # W_Object keys by identity, the numeric models define value equality
+    return objectmodel.r_dict(_is_same, objectmodel.compute_identity_hash)
+
 @jit.dont_look_inside
 def get_instances_array_trace(interp, w_class, some_instance=False):
     space = interp.space
     result_w = []
-    seen_w = {}
+    seen_w = identity_dict()
     roots = [space.w_special_objects]
     pending = roots[:]
     while pending:
         w_obj = pending.pop()
-        if w_obj and not seen_w.get(w_obj, False):
+        if not w_obj or isinstance(w_obj, W_SmallInteger):
+            continue
+        if not seen_w.get(w_obj, False):
             seen_w[w_obj] = True
             if w_obj.has_class():
                 w_cls = w_obj.getclass(space)
                 if w_cls is not None:
-                    # XXX: should not return SmallFloat64 on Spur64...
-                    if ((not w_cls.is_same_object(space.w_SmallInteger)) and
-                        (not (space.is_spur.is_set() and w_cls.is_same_object(space.w_Character))) and
+                    if ((not is_immediate(interp, w_obj, w_cls)) and
                         (w_class is None or w_cls.is_same_object(w_class))):
                         if some_instance:
                             return [w_obj]
@@ -184,6 +189,21 @@ def get_instances_array_trace(interp, w_class, some_instance=False):
             pending.extend(_trace_pointers(interp.space, w_obj))
     return result_w
 
+def is_immediate(interp, w_obj, w_cls):
+    """Answer whether the image stores w_obj in the pointer itself. Such
+    objects are no instances for allInstances and friends."""
+    space = interp.space
+    if w_cls.is_same_object(space.w_SmallInteger):
+        return True
+    if space.is_spur.is_set():
+        if w_cls.is_same_object(space.w_Character):
+            return True
+        # SmallFloat64 values, we use W_Float for those and boxed floats alike
+        if (isinstance(w_obj, W_Float) and interp.image.version.is_64bit and
+                is_small_float64(w_obj.value)):
+            return True
+    return False
+
 def _trace_pointers(space, w_obj):
     p_w = [w_obj.getclass(space)]
     if isinstance(w_obj, W_CompiledMethod):
@@ -194,8 +214,25 @@ def _trace_pointers(space, w_obj):
         p_w.extend(w_obj.fetch_all(space))
     return p_w
 
-def get_instances_array(interp, s_frame, w_class=None, store=True,
-                        some_instance=False):
+class InstancesIndex(object):
+    """The result of one heap walk, cached in the frame that iterates over
+    it. Positions are looked up by identity, so that nextInstance and
+    nextObject take constant time instead of searching the list."""
+    _attrs_ = ['objects_w', 'positions']
+
+    def __init__(self, objects_w):
+        self.objects_w = objects_w
+        self.positions = None
+
+    def position_after(self, w_obj):
+        "Answer the index following w_obj, or 0 if w_obj is not listed."
+        if self.positions is None:
+            self.positions = identity_dict()
+            for i in range(len(self.objects_w)):
+                self.positions[self.objects_w[i]] = i
+        return self.positions.get(w_obj, -1) + 1
+
+def walk_instances(interp, s_frame, w_class=None, some_instance=False):
     # early return for classes that never had instances. This is true for a
     # bunch of special classes.
     if w_class:
@@ -204,9 +241,6 @@ def get_instances_array(interp, s_frame, w_class=None, store=True,
         if interp.space.is_spur.is_set():
             if interp.space.w_Character.is_same_object(w_class):
                 return []
-            if interp.image.version.is_64bit:
-                if interp.space.w_Float.is_same_object(w_class):
-                    return []
         if interp.image.version.is_modern:
             if interp.space.w_BlockContext.is_same_object(w_class):
                 return []
@@ -215,20 +249,32 @@ def get_instances_array(interp, s_frame, w_class=None, store=True,
     active_process = wrapper.ProcessWrapper(interp.space, w_active_process)
     active_process.store_suspended_context(s_frame.w_self())
     try:
-        match_w = s_frame.instances_array(w_class)
-        if match_w is None:
-            if some_instance and interp.space.is_spur.is_set():
-                # on Spur, someInstance really means just one, it's not used to
-                # start iterating over all instances
-                return get_instances_array_trace(interp, w_class,
-                                                 some_instance=True)
-            match_w = get_instances_array_trace(interp, w_class)
-            if store:
-                s_frame.store_instances_array(w_class, match_w)
-        return match_w
+        return get_instances_array_trace(interp, w_class,
+                                         some_instance=some_instance)
     finally:
         active_process.store_suspended_context(interp.space.w_nil)
 
+def get_instances_array(interp, s_frame, w_class=None, store=True,
+                        some_instance=False):
+    index = s_frame.instances_array(w_class)
+    if index is not None:
+        return index.objects_w
+    if some_instance and interp.space.is_spur.is_set():
+        # on Spur, someInstance really means just one, it's not used to
+        # start iterating over all instances
+        return walk_instances(interp, s_frame, w_class, some_instance=True)
+    match_w = walk_instances(interp, s_frame, w_class)
+    if store:
+        s_frame.store_instances_array(w_class, InstancesIndex(match_w))
+    return match_w
+
+def get_instances_index(interp, s_frame, w_class=None):
+    index = s_frame.instances_array(w_class)
+    if index is None:
+        index = InstancesIndex(walk_instances(interp, s_frame, w_class))
+        s_frame.store_instances_array(w_class, index)
+    return index
+
 
 @expose_primitive(SOME_INSTANCE, unwrap_spec=[object])
 def func(interp, s_frame, w_class):
@@ -244,22 +290,17 @@ def func(interp, s_frame, w_class):
     except IndexError:
         raise PrimitiveFailedError()
 
-def next_instance(space, list_of_objects, w_obj):
-    retval = None
-    try:
-        idx = list_of_objects.index(w_obj)
-    except ValueError:
-        idx = -1
-    try:
-        retval = list_of_objects[idx + 1]
-    except IndexError:
-        raise PrimitiveFailedError()
-    # just in case, that one of the objects in the list changes its class
-    if retval.getclass(space).is_same_object(w_obj.getclass(space)):
-        return retval
-    else:
-        list_of_objects.pop(idx + 1)
-        return next_instance(space, list_of_objects, w_obj)
+def next_instance(space, index, w_obj):
+    w_class = w_obj.getclass(space)
+    objects_w = index.objects_w
+    i = index.position_after(w_obj)
+    while i < len(objects_w):
+        w_next = objects_w[i]
+        # just in case, that one of the objects in the list changes its class
+        if w_next.getclass(space).is_same_object(w_class):
+            return w_next
+        i += 1
+    raise PrimitiveFailedError()
 
 @expose_primitive(NEXT_INSTANCE, unwrap_spec=[object])
 def func(interp, s_frame, w_obj):
@@ -267,7 +308,7 @@ def func(interp, s_frame, w_obj):
     # it returns the "next" instance after w_obj.
     return next_instance(
         interp.space,
-        get_instances_array(interp, s_frame,
+        get_instances_index(interp, s_frame,
                             w_class=w_obj.getclass(interp.space)),
         w_obj
     )
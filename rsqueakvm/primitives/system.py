@@ -3,6 +3,7 @@ from rpython.rlib import jit, objectmodel
 from rsqueakvm import constants
 from rsqueakvm.error import PrimitiveFailedError
 from rsqueakvm.model.numeric import W_SmallInteger
+from rsqueakvm.model.pointers import W_PointersObject
 from rsqueakvm.primitives import expose_primitive
 from rsqueakvm.primitives.constants import *
 
@@ -13,12 +14,10 @@ from rsqueakvm.primitives.constants import *
 @expose_primitive(IDLE_FOR_MICROSECONDS,
                   unwrap_spec=[object, int], no_result=True, clean_stack=False)
 def func(interp, s_frame, w_rcvr, time_mu_s):
-    import time
     s_frame.pop()
-    time_s = time_mu_s / 1000000.0
     interp.interrupt_check_counter = 0
     interp.quick_check_for_interrupt(s_frame, dec=0)
-    time.sleep(time_s)
+    interp.idle(time_mu_s)
     interp.interrupt_check_counter = 0
     interp.quick_check_for_interrupt(s_frame, dec=0)
 
@@ -113,7 +112,9 @@ def func(interp, s_frame, argcount):
             64  current number of machine code methods (read-only; Cog VMs only)
             65  true if the VM supports multiple bytecode sets;  (read-only; Cog VMs only; nil in older Cog VMs)
             66  the byte size of a stack page in the stack zone  (read-only; Cog VMs only)
-            67 - 69 reserved for more Cog-related info
+            67  number of global method cache hits since startup (read-only; RSqueak only)
+            68  number of global method cache misses since startup (read-only; RSqueak only)
+            69  reserved for more Cog-related info
             70  the value of VM_PROXY_MAJOR (the interpreterProxy major version number)
             71  the value of VM_PROXY_MINOR (the interpreterProxy minor version number)
 
@@ -140,6 +141,9 @@ def func(interp, s_frame, argcount):
 
     vm_w_params[39] = interp.space.wrap_int(constants.BYTES_PER_MACHINE_INT)
     vm_w_params[40] = interp.space.wrap_int(interp.image.version.magic)
+    w_external_objects = interp.space.w_external_objects_array()
+    if isinstance(w_external_objects, W_PointersObject):
+        vm_w_params[48] = interp.space.wrap_int(w_external_objects.size())
     vm_w_params[55] = interp.space.wrap_int(interp.process_switch_count)
     vm_w_params[57] = interp.space.wrap_int(interp.forced_interrupt_checks_count)
     vm_w_params[59] = interp.space.wrap_int(interp.stack_overflow_count)
@@ -149,6 +153,9 @@ def func(interp, s_frame, argcount):
         numberOfBridges = jit_hooks.stats_get_counter_value(None, jit.Counters.TOTAL_COMPILED_BRIDGES)
         vm_w_params[63] = interp.space.wrap_int(numberOfLoops + numberOfBridges)
 
+    vm_w_params[66] = interp.space.wrap_int(interp.space.method_cache.hits)
+    vm_w_params[67] = interp.space.wrap_int(interp.space.method_cache.misses)
+
     vm_w_params[69] = interp.space.wrap_int(constants.INTERP_PROXY_MAJOR)
     vm_w_params[70] = interp.space.wrap_int(constants.INTERP_PROXY_MINOR)
 
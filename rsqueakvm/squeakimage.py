@@ -1,4 +1,5 @@
 import os
+import stat
 import time
 
 from rsqueakvm import constants, error, wrapper
@@ -6,16 +7,21 @@ from rsqueakvm.model.character import W_Character
 from rsqueakvm.model.compiled_methods import W_CompiledMethod, W_PreSpurCompiledMethod, W_SpurCompiledMethod
 from rsqueakvm.model.display import W_DisplayBitmap
 from rsqueakvm.model.numeric import W_Float, W_SmallInteger, W_LargeIntegerWord, W_LargeIntegerBig, W_LargeInteger
+from rsqueakvm.model.numeric import is_small_float64, small_float64_oop, small_float64_value
 from rsqueakvm.model.pointers import W_PointersObject
 from rsqueakvm.model.block_closure import W_BlockClosure
 from rsqueakvm.model.variable import W_BytesObject, W_WordsObject
+from rsqueakvm.storage import AllNilStrategy, ListStrategy
+from rsqueakvm.storage_classes import ClassShadowError
 from rsqueakvm.util import stream, system
 from rsqueakvm.util.bitmanipulation import splitter
 from rsqueakvm.util.progress import Progress
 
-from rpython.rlib import objectmodel
+from rpython.rlib import objectmodel, rposix, streamio
 from rpython.rlib.rarithmetic import r_ulonglong, r_longlong, r_int, intmask, r_uint, r_uint32, r_int64
 from rpython.rlib import jit, rbigint, unroll, rgc
+from rpython.rlib.rstring import StringBuilder
+from rpython.rtyper.lltypesystem import lltype, rffi
 
 if r_longlong is not r_int:
     r_uint64 = r_ulonglong
@@ -76,9 +82,13 @@ image_versions = {
     0x69190000:         ImageVersion(6505,  False, False, True,  True ),
     0x00001979:         ImageVersion(6521,  True,  False, True,  True , is_spur=True),
     0x79190000:         ImageVersion(6521,  False, False, True,  True , is_spur=True),
+    # 64-bit Spur images start with a 32-bit version, too
+    0x000109B5:         ImageVersion(68021, True,  True,  True,  True , is_spur=True),
+    -0x4af6ff00:        ImageVersion(68021, False, True,  True,  True , is_spur=True), # 0xB5090100
     # CUSTOM VERSION MAGIC: These are for a Spur-format image that we have
     # written from an old image with block-contexts
-    0x34120000:         ImageVersion(6521,  False,  False, False,  True , is_spur=True)
+    0x34120000:         ImageVersion(6521,  False,  False, False,  True , is_spur=True),
+    0x35120000:         ImageVersion(68021, False,  True,  False,  True , is_spur=True)
 }
 
 image_versions_64bit = {
@@ -89,38 +99,116 @@ image_versions_64bit = {
     (-0x5df6ff00, 0x00000000): ImageVersion(68002, False, True,  True,  False), # 0xA209010000000000
     (0x00000000,  0x000109A3): ImageVersion(68003, True,  True,  True,  True ),
     (-0x5cf6ff00, 0x00000000): ImageVersion(68003, False, True,  True,  True ), # 0xA309010000000000
-    # TODO: add 64bit Spur once supported
+    # 64-bit Spur (68021) has a 32-bit version, see image_versions
 }
 
+# ____________________________________________________________
+#
+# Image cache format, see ImageCacheWriter and CachedReader. The cache is a
+# sequence of little-endian 32-bit words.
+
+CACHE_MAGIC = 0x43515352 # "RSQC"
+CACHE_VERSION = 2
+CACHE_HEADER_WORDS = 11
+
+# How an object is instantiated, decided when the cache is written
+CACHE_KIND_POINTERS = 0
+CACHE_KIND_WEAK_POINTERS = 1
+CACHE_KIND_CHARACTER = 2
+CACHE_KIND_BLOCK_CLOSURE = 3
+CACHE_KIND_FLOAT = 4
+CACHE_KIND_SMALLINT = 5
+CACHE_KIND_LARGE_WORD = 6
+CACHE_KIND_LARGE_BIG = 7
+CACHE_KIND_WORDS = 8
+CACHE_KIND_BYTES = 9
+CACHE_KIND_PRESPUR_METHOD = 10
+CACHE_KIND_SPUR_METHOD = 11
+
+# The storage strategy a pointers object got when the image was filled in.
+# Objects whose strategy unboxes their contents are recorded as NONE, their
+# contents have to be filled in and looked at again on load.
+CACHE_STORAGE_NONE = 0
+CACHE_STORAGE_ALL_NIL = 1
+CACHE_STORAGE_LIST = 2
+# Set for the classes of objects, they get their shadows right on load
+CACHE_STORAGE_CLASS = 0x100
+
 # ____________________________________________________________
 #
 # Parser classes for Squeak image format.
 
 class ImageReader(object):
-    _immutable_fields_ = ["space", "stream", "version", "readerStrategy", "logging_enabled"]
+    _immutable_fields_ = ["space", "stream", "version", "readerStrategy", "logging_enabled", "cache_path"]
 
-    def __init__(self, space, stream, logging_enabled=False):
+    def __init__(self, space, stream, logging_enabled=False, cache_path=None):
         self.space = space
         self.stream = stream
         self.version = None
         self.readerStrategy = None
         self.logging_enabled = logging_enabled
+        # if given, objects are loaded from (or saved to) this cache file
+        self.cache_path = cache_path
+        self.image_length = 0
+        self.image_identity = [0, 0, 0]
+        self.magic1 = 0
+        self.magic2 = 0
 
     def create_image(self):
         self.read_all()
         return SqueakImage(self)
 
     def read_all(self):
+        if self.cache_path is not None:
+            self.image_length = self.stream.length()
+            self.image_identity = self.stream.identity()
+            if self.read_cache():
+                return
         self.read_header()
         self.readerStrategy.read_and_initialize()
 
+    def read_cache(self):
+        """Load the objects from the cache file, if it exists, was written
+        for this image and is intact. Answer whether that worked. If not,
+        nothing has been changed and the image can be loaded instead."""
+        try:
+            cache_stream = Stream(filename=self.cache_path, use_mmap=True)
+        except OSError:
+            return False
+        cache_stream.big_endian = False
+        version = read_cache_header(cache_stream, self.image_length, self.image_identity)
+        if version is None:
+            cache_stream.close()
+            return False
+        strategy = CachedReader(self, version, cache_stream, self.space)
+        strategy.start_load()
+        try:
+            strategy.read_body()
+        except error.CorruptImageError as e:
+            strategy.log("image cache ignored, %s" % e.msg)
+            cache_stream.close()
+            return False
+        self.stream.close()
+        self.stream = None
+        self.version = version
+        if version.is_spur:
+            self.space.is_spur.activate()
+        if not version.has_closures:
+            self.space.uses_block_contexts.activate()
+        self.readerStrategy = strategy
+        self.lastWindowSize = strategy.lastWindowSize
+        strategy.initialize_objects()
+        return True
+
     def try_read_version(self):
         magic1 = self.stream.next()
+        self.magic1 = magic1
         version = image_versions.get(magic1, None)
         if version:
             return version
         # Check 64 bit version
         magic2 = self.stream.next()
+        self.magic2 = magic2
         version = image_versions_64bit.get((magic1, magic2), None)
         if not version:
             self.stream.reset()
@@ -189,11 +277,18 @@ class BaseReaderStrategy(object):
         self.intcache = {} # Cached instances of SmallInteger
         self.lastWindowSize = 0
         self._progress = Progress(stages=5, silent=space.silent.is_set())  # Track 5 stages in read_and_initialize
+        self._load_start = 0.0
+        self._phase_start = 0.0
 
     def log(self, msg):
         if self.imageReader.logging_enabled:
             print msg
 
+    def log_phase(self, name):
+        now = time.time()
+        self.log("%s: %d ms" % (name, int((now - self._phase_start) * 1000)))
+        self._phase_start = now
+
     def continue_read_header(self):
         # 1 word headersize
         self.headersize = self.stream.next()
@@ -213,27 +308,89 @@ class BaseReaderStrategy(object):
         self.stream.skipbytes(self.headersize - self.stream.pos)
 
     def read_and_initialize(self):
+        self.start_load()
         self.read_body()
+        self.initialize_objects()
+
+    def start_load(self):
+        self._load_start = self._phase_start = time.time()
+
+    def initialize_objects(self):
+        self.log_phase("read body")
         # All chunks are read, now convert them to real objects.
         self.init_g_objects()
         self.assign_prebuilt_constants()
-        for chunk in self.chunklist:
-            if self.ispointers(chunk.g_object):
-                chunk.data = None
-            if chunk.g_object.filled_in:
-                chunk.data = None
-        self.chunks = {}
-        self.intcache = {}
-        rgc.collect()
-        self.init_w_objects()
-        self.fillin_w_objects()
-        rgc.collect()
+        cache_writer = None
+        if self.imageReader.cache_path is not None:
+            cache_writer = self.start_cache(self.imageReader.cache_path)
+        try:
+            for chunk in self.chunklist:
+                if self.ispointers(chunk.g_object):
+                    chunk.release_data()
+                if chunk.g_object.filled_in:
+                    chunk.release_data()
+            self.chunks = {}
+            self.intcache = {}
+            rgc.collect()
+            self.log_phase("decode headers and pointers")
+            self.init_w_objects()
+            self.log_phase("instantiate objects")
+            self.fillin_w_objects()
+            self.release_stream()
+            rgc.collect()
+            self.log_phase("fill in objects")
+            if cache_writer is not None:
+                self.finish_cache(cache_writer)
+                cache_writer = None
+        finally:
+            if cache_writer is not None:
+                cache_writer.abort()
         self.fillin_weak_w_objects()
+        self.log_phase("fill in weak objects")
         self.fillin_finalize()
+        self.log_phase("finalize")
+        self.log("image loaded in %d ms" % int((time.time() - self._load_start) * 1000))
 
     def read_body(self):
         raise NotImplementedError("subclass must override this")
 
+    def start_cache(self, path):
+        """Write the decoded objects to the cache, answer the writer to
+        finish it with once they are filled in, or None."""
+        if self.version.is_64bit:
+            self.log("image cache not written, 64-bit images are not supported")
+            return None
+        writer = ImageCacheWriter(self, path)
+        try:
+            written = writer.write()
+        except OSError:
+            self.log("image cache not written, cannot write %s" % path)
+            return None
+        if not written:
+            self.log("image cache not written, the image has unsupported objects")
+            return None
+        return writer
+
+    def finish_cache(self, writer):
+        try:
+            writer.finish()
+        except OSError:
+            self.log("image cache not written, cannot write %s" % writer.path)
+            return
+        self.log("wrote image cache %s" % writer.path)
+
+    def release_stream_after_read(self):
+        # An in-memory stream holds a copy of the whole file, so drop it as
+        # soon as the body is read. A mapped stream costs no heap and is only
+        # unmapped once fillin_w_objects is done.
+        if not self.stream.is_mapped():
+            self.release_stream()
+
+    def release_stream(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
     def init_compactclassesarray(self):
         raise NotImplementedError("subclass must override this")
 
@@ -306,7 +463,7 @@ class BaseReaderStrategy(object):
     def init_w_objects(self):
         self._progress.next_stage(len(self.chunklist))
         for g in self.special_g_objects:
-            self.init_w_object(g.chunk)
+            g.init_w_object(self.space) # may be an immediate, without chunk
             self._progress.update()
         for chunk in self.chunklist:
             self.init_w_object(chunk)
@@ -337,10 +494,27 @@ class BaseReaderStrategy(object):
         for chunk in self.chunklist:
             chunk.g_object.fillin_finalize(self.space)
 
+    def untag_int(self, word):
+        return word >> 1
+
+    def unused_bytes_of(self, chunk):
+        # the low bits of the format of byte objects and compiled methods
+        return chunk.format & 3
+
+    def get_ruints_of(self, chunk):
+        return [r_uint(r_uint32(chunk.data_at(i))) for i in range(chunk.len_data())]
+
     def len_bytes_of(self, chunk):
+        if chunk.data is None and chunk.stream is not None:
+            return chunk.len_data() * chunk.stream.word_size
         return len(chunk.data) * 4
 
-    def get_bytes_of(self, chunk):
+    def get_bytes_of(self, chunk, length=-1):
+        if length < 0:
+            length = self.len_bytes_of(chunk)
+        if chunk.data is None and chunk.stream is not None:
+            # the bytes of a lazily read chunk are in file order already
+            return list(chunk.stream.bytes_at(chunk.offset, length))
         bytes = []
         if self.version.is_big_endian:
             for each in chunk.data:
@@ -354,6 +528,8 @@ class BaseReaderStrategy(object):
                 bytes.append(chr((each >> 8) & 0xff))
                 bytes.append(chr((each >> 16) & 0xff))
                 bytes.append(chr((each >> 24) & 0xff))
+        if length < len(bytes):
+            return bytes[:length]
         return bytes
 
     def isfloat(self, g_object):
@@ -411,8 +587,7 @@ class NonSpurReader(BaseReaderStrategy):
             self._progress.update(self.stream.count)
             self.chunklist.append(chunk)
             self.chunks[pos + self.oldbaseaddress] = chunk
-        self.stream.close()
-        self.stream = None
+        self.release_stream_after_read()
         rgc.collect()
         return self.chunklist # return for testing
 
@@ -577,6 +752,9 @@ class SpurReader(BaseReaderStrategy):
         space.is_spur.activate()
 
     def continue_read_header(self):
+        if self.version.is_64bit:
+            self.continue_read_header_64bit()
+            return
         BaseReaderStrategy.continue_read_header(self)
         self.hdrNumStackPages = self.stream.next_short()
         self.hdrCogCodeSize = self.stream.next_short()
@@ -586,6 +764,30 @@ class SpurReader(BaseReaderStrategy):
         self.firstSegSize = self.stream.next()
         self.freeOldSpaceInImage = self.stream.next()
 
+    def continue_read_header_64bit(self):
+        # the version has already been read, the header size and the VM
+        # settings are 32-bit, everything else is 64-bit
+        self.headersize = self.stream.next_word32()
+        self.endofmemory = self.stream.next()
+        self.oldbaseaddress = self.stream.next()
+        self.specialobjectspointer = self.stream.next()
+        lasthash = self.stream.next()
+        self.lastWindowSize = self.stream.next()
+        headerflags = self.stream.next()
+        extravmmemory = self.stream.next_word32()
+        self.hdrNumStackPages, self.hdrCogCodeSize = self.split_word32(self.stream.next_word32())
+        self.hdrEdenBytes = self.stream.next_word32()
+        self.hdrMaxExtSemTabSize, _ = self.split_word32(self.stream.next_word32())
+        self.firstSegSize = self.stream.next()
+        self.freeOldSpaceInImage = self.stream.next()
+
+    def split_word32(self, word):
+        """Answer the two 16-bit fields of word in file order"""
+        if self.version.is_big_endian:
+            return (word >> 16) & 0xffff, word & 0xffff
+        else:
+            return word & 0xffff, (word >> 16) & 0xffff
+
     _SLOTS_MASK = 0xFFL << 56
     SLOTS_MASK = intmask(_SLOTS_MASK) if system.IS_64BIT else r_ulonglong(_SLOTS_MASK)
 
@@ -621,8 +823,9 @@ class SpurReader(BaseReaderStrategy):
             segmentEnd = segmentEnd + nextSegmentSize
             # address swizzle is in bytes, but bridgeSpan is in image words
             currentAddressSwizzle += (bridgeSpan * (8 if self.version.is_64bit else 4))
-        self.stream.close()
-        self.stream = None
+        self.log("read %d objects (%d bytes)" % (len(self.chunklist), self.stream.count))
+        # The chunk bodies are decoded lazily from the stream, so it is kept
+        # until fillin_w_objects is done, see read_and_initialize.
         return self.chunklist # return for testing
 
     def read_object(self):
@@ -642,20 +845,24 @@ class SpurReader(BaseReaderStrategy):
         size = r_uint(r_uint32(size_l)) # reading 64 bit images not supported in 32 bit build
         assert 0 <= format <= 31
         chunk = ImageChunk(size, format, classid, hash)
-        # the minimum object length is 16 bytes, i.e. 8 header + 8 payload
-        # (to accommodate a forwarding ptr)
-        chunk.data = [self.stream.next() for _ in range(self.words_for(size))]
-        if len(chunk.data) != size:
-            # remove trailing alignment slots
-            assert size < len(chunk.data) and len(chunk.data) - size < 4
-            chunk.data = chunk.data[:size]
-        if format < 10 and classid != self.FREE_OBJECT_CLASS_INDEX_PUN:
-            for slot in chunk.data:
+        # The body is not copied, the chunk decodes it lazily from the stream.
+        # The minimum object length is 16 bytes, i.e. 8 header + 8 payload
+        # (to accommodate a forwarding ptr), so skip the trailing alignment slots
+        nwords = intmask(size)
+        chunk.read_lazily(self.stream, self.stream.pos, nwords)
+        self.stream.skipbytes(self.words_for(nwords) * self.stream.word_size)
+        if (not objectmodel.we_are_translated() and format < 10 and
+                classid != self.FREE_OBJECT_CLASS_INDEX_PUN):
+            for i in range(nwords):
+                slot = chunk.data_at(i)
                 assert slot % 16 != 0 or slot >= self.oldbaseaddress
         assert format != 0 or classid == 0 or size == 0, "empty objects must not have slots"
         return chunk, pos
 
     def words_for(self, size):
+        if self.version.is_64bit:
+            # see Spur64BitMemoryManager>>smallObjectBytesForSlots:
+            return max(size, 1)
         # see Spur32BitMemoryManager>>smallObjectBytesForSlots:
         if size <= 1:
             return 2
@@ -667,8 +874,8 @@ class SpurReader(BaseReaderStrategy):
         minor_class_index = self.minor_class_index_of(chunk.classid)
         HIDDEN_ROOTS_CHUNK = 4 # after nil, true, false, freeList
         hiddenRoots = self.chunklist[HIDDEN_ROOTS_CHUNK]
-        classTablePage = self.chunks[hiddenRoots.data[major_class_index]]
-        return self.chunks[classTablePage.data[minor_class_index]].g_object
+        classTablePage = self.chunks[hiddenRoots.data_at(major_class_index)]
+        return self.chunks[classTablePage.data_at(minor_class_index)].g_object
 
     def major_class_index_of(self, classid):
         return classid >> 10
@@ -677,11 +884,13 @@ class SpurReader(BaseReaderStrategy):
         return classid & ((1 << 10) - 1)
 
     def decode_pointers(self, g_object, space, end=-1):
+        if self.version.is_64bit:
+            return self.decode_pointers_64bit(g_object, space, end)
         if end == -1:
-            end = len(g_object.chunk.data)
+            end = g_object.chunk.len_data()
         pointers = []
         for i in range(end):
-            pointer = g_object.chunk.data[i]
+            pointer = g_object.chunk.data_at(i)
             if (pointer & 3) == 0:
                 # pointer = ...00
                 try:
@@ -706,6 +915,58 @@ class SpurReader(BaseReaderStrategy):
                 pointers.append(character)
         return pointers
 
+    def decode_pointers_64bit(self, g_object, space, end=-1):
+        # 64-bit Spur has three tag bits: ...000 is an object pointer, ...001
+        # a SmallInteger, ...010 a Character and ...100 a SmallFloat64
+        if end == -1:
+            end = g_object.chunk.len_data()
+        pointers = []
+        for i in range(end):
+            pointer = g_object.chunk.data_at(i)
+            tag = pointer & 7
+            if tag == 0:
+                pointers.append(self.chunks[pointer].g_object)
+                continue
+            immediate = GenericObject()
+            if tag == 1:
+                immediate.initialize_int(pointer >> 3, self, space)
+            elif tag == 2:
+                immediate.initialize_char(intmask(r_uint(pointer) >> 3), self, space)
+            elif tag == 4:
+                immediate.initialize_float(small_float64_value(r_uint(pointer)), self, space)
+            else:
+                raise error.CorruptImageError("Invalid tag %d in pointer %d" % (tag, pointer))
+            pointers.append(immediate)
+        return pointers
+
+    def untag_int(self, word):
+        if self.version.is_64bit:
+            return word >> 3
+        return word >> 1
+
+    def unused_bytes_of(self, chunk):
+        if self.version.is_64bit:
+            return chunk.format & 7
+        return chunk.format & 3
+
+    def get_ruints_of(self, chunk):
+        if not self.version.is_64bit:
+            return BaseReaderStrategy.get_ruints_of(self, chunk)
+        # Split the 64-bit slots into 32-bit words, low half first. The low
+        # bits of the format tell how much of the last slot is unused.
+        words = []
+        for i in range(chunk.len_data()):
+            slot = r_uint(chunk.data_at(i))
+            words.append(slot & r_uint(0xffffffff))
+            words.append(slot >> 32)
+        if 10 <= chunk.format <= 11:
+            unused = chunk.format & 1 # 32-bit words
+        elif 12 <= chunk.format <= 15:
+            unused = (chunk.format & 3) / 2 # 16-bit halfwords
+        else:
+            unused = 0
+        return words[:len(words) - unused]
+
     def instantiate(self, g_object):
         """ 0      no fields
             1      fixed fields only (all containing pointers)
@@ -780,6 +1041,436 @@ class SpurReader(BaseReaderStrategy):
 
     def literal_count_of_method_header(self, untagged_header):
         return untagged_header & 0x7fff # AlternateHeaderNumLiteralsMask
+
+def read_cache_header(stream, image_length, image_identity):
+    """Answer the image version stored in the cache header, or None if the
+    stream is no cache for an image of this length and identity, see
+    Stream.identity."""
+    if stream.length() < CACHE_HEADER_WORDS * 4:
+        return None
+    if stream.next() != CACHE_MAGIC or stream.next() != CACHE_VERSION:
+        return None
+    if stream.next() != intmask(rffi.cast(rffi.INT, image_length)):
+        return None
+    for word in image_identity:
+        if stream.next() != word:
+            return None
+    magic1 = stream.next()
+    magic2 = stream.next()
+    version = image_versions.get(magic1, None)
+    if version is None:
+        version = image_versions_64bit.get((magic1, magic2), None)
+    return version
+
+class CachedReader(BaseReaderStrategy):
+    """Reader strategy for a cache written by ImageCacheWriter. The cache
+    holds the decoded object graph of an image: how each object is
+    instantiated, its class and pointers as indices into the chunk list,
+    the body of non-pointer objects and the storage each object got. So
+    neither object headers, nor class tables, nor addresses have to be
+    decoded again, most pointers objects get their storage strategy without
+    a look at their contents and classes get their shadows right away. The
+    classid of a cached chunk holds its CACHE_KIND.
+
+    read_body checks every count and index of the cache before any object
+    is created and raises CorruptImageError if one is out of range."""
+
+    def __init__(self, imageReader, version, stream, space):
+        BaseReaderStrategy.__init__(self, imageReader, version, stream, space)
+        # the rest of the header, see read_cache_header
+        self.specialobjectspointer = stream.next()
+        self.lastWindowSize = stream.next()
+        self.object_count = stream.next()
+        # parallel to chunklist
+        self.class_indices = []
+        self.pointer_offsets = []
+        self.pointer_counts = []
+        self.storage_tags = []
+
+    def start_cache(self, path):
+        return None
+
+    def words_left(self):
+        return (self.stream.length() - self.stream.pos) / 4
+
+    def read_body(self):
+        stream = self.stream
+        count = self.object_count
+        if not 0 <= self.specialobjectspointer < count:
+            raise error.CorruptImageError("special objects index out of range")
+        self._progress.next_stage(stream.length())
+        for i in range(count):
+            self.chunklist.append(self.read_cached_object(count))
+            self._progress.update(stream.pos)
+        if self.words_left() < count:
+            raise error.CorruptImageError("storage table is truncated")
+        for i in range(count):
+            tag = stream.next()
+            storage = tag & ~CACHE_STORAGE_CLASS
+            if not CACHE_STORAGE_NONE <= storage <= CACHE_STORAGE_LIST:
+                raise error.CorruptImageError("unknown storage %d" % storage)
+            if (tag & CACHE_STORAGE_CLASS and
+                    self.chunklist[i].classid != CACHE_KIND_POINTERS):
+                raise error.CorruptImageError("class without pointers")
+            self.storage_tags.append(tag)
+        special_chunk = self.chunklist[self.specialobjectspointer]
+        if not 0 <= special_chunk.classid <= CACHE_KIND_BLOCK_CLOSURE:
+            raise error.CorruptImageError("special objects array without pointers")
+        self.chunks[self.specialobjectspointer] = special_chunk
+        self.log("read %d cached objects" % len(self.chunklist))
+        return self.chunklist # return for testing
+
+    def read_cached_object(self, count):
+        stream = self.stream
+        if self.words_left() < 6:
+            raise error.CorruptImageError("object header is truncated")
+        kind = stream.next()
+        format = stream.next()
+        hash = stream.next()
+        class_index = stream.next()
+        pointer_count = stream.next()
+        body_size = stream.next()
+        if not 0 <= kind <= CACHE_KIND_SPUR_METHOD:
+            raise error.CorruptImageError("unknown object kind %d" % kind)
+        if not 0 <= class_index < count:
+            raise error.CorruptImageError("class index out of range")
+        if kind <= CACHE_KIND_BLOCK_CLOSURE:
+            sizes_ok = pointer_count >= 0 and body_size == 0
+        elif kind == CACHE_KIND_PRESPUR_METHOD or kind == CACHE_KIND_SPUR_METHOD:
+            sizes_ok = pointer_count >= 1 and body_size * 4 >= (format & 3)
+        elif kind == CACHE_KIND_BYTES:
+            sizes_ok = pointer_count == -1 and body_size * 4 >= (format & 3)
+        elif kind == CACHE_KIND_FLOAT:
+            sizes_ok = pointer_count == -1 and body_size == 2
+        else:
+            sizes_ok = pointer_count == -1 and body_size >= 0
+        if not sizes_ok:
+            raise error.CorruptImageError("bad sizes of a %d object" % kind)
+        left = self.words_left()
+        if pointer_count > left or body_size > left - max(pointer_count, 0):
+            raise error.CorruptImageError("object body is truncated")
+        self.class_indices.append(class_index)
+        self.pointer_offsets.append(stream.pos)
+        self.pointer_counts.append(pointer_count)
+        for j in range(pointer_count):
+            word = stream.next()
+            tag = word & 3
+            if (tag == 0 and not 0 <= (word >> 2) < count) or (tag == 2 and word < 0):
+                raise error.CorruptImageError("pointer out of range")
+        chunk = ImageChunk(r_uint(body_size), format, kind, hash)
+        chunk.read_lazily(stream, stream.pos, body_size)
+        if body_size > 0:
+            stream.skipbytes(body_size * 4)
+        return chunk
+
+    def init_g_objects(self):
+        self._progress.next_stage(len(self.chunklist))
+        for i in range(len(self.chunklist)):
+            chunk = self.chunklist[i]
+            g_class = self.chunklist[self.class_indices[i]].g_object
+            pointers = None
+            if self.pointer_counts[i] >= 0:
+                offset = self.pointer_offsets[i]
+                pointers = [self.decode_cached_pointer(self.stream.word_at(offset + j * 4))
+                            for j in range(self.pointer_counts[i])]
+            g_object = chunk.g_object
+            g_object.initialize_cached(chunk, self, g_class, pointers)
+            g_object.storage_type = self.storage_type_of(self.storage_tags[i])
+            self._progress.update()
+        self.class_indices = []
+        self.pointer_offsets = []
+        self.pointer_counts = []
+        self.special_g_objects = self.chunklist[self.specialobjectspointer].g_object.pointers
+
+    def decode_cached_pointer(self, word):
+        if (word & 3) == 0:
+            return self.chunklist[word >> 2].g_object
+        g_object = GenericObject()
+        if (word & 1) == 1:
+            g_object.initialize_int(word >> 1, self, self.space)
+        else:
+            g_object.initialize_char(word >> 2, self, self.space)
+        return g_object
+
+    def storage_type_of(self, tag):
+        storage = tag & ~CACHE_STORAGE_CLASS
+        if storage == CACHE_STORAGE_LIST:
+            return ListStrategy
+        elif storage == CACHE_STORAGE_ALL_NIL:
+            if self.space.strategy_factory.no_specialized_storage.is_set():
+                return ListStrategy
+            return AllNilStrategy
+        return None
+
+    def fillin_w_objects(self):
+        # Objects with a known storage do not fill in their contents first,
+        # but storing a SmallInteger takes its value. So everything without
+        # pointers is filled in before.
+        self._progress.next_stage(len(self.chunklist))
+        for chunk in self.chunklist:
+            if not self.ispointers(chunk.g_object):
+                self.fillin_w_object(chunk)
+                self._progress.update()
+        for chunk in self.chunklist:
+            if self.ispointers(chunk.g_object):
+                self.fillin_w_object(chunk)
+                self._progress.update()
+
+    def fillin_finalize(self):
+        BaseReaderStrategy.fillin_finalize(self)
+        # the shadows are otherwise created when each class is first used
+        for i in range(len(self.chunklist)):
+            if self.storage_tags[i] & CACHE_STORAGE_CLASS:
+                w_class = self.chunklist[i].g_object.w_object
+                if isinstance(w_class, W_PointersObject):
+                    try:
+                        w_class.as_class_get_shadow(self.space)
+                    except ClassShadowError:
+                        pass # raised again when the class is used
+        self.storage_tags = []
+
+    def instantiate(self, g_object):
+        kind = self.kind_of(g_object)
+        if kind == CACHE_KIND_CHARACTER:
+            return objectmodel.instantiate(W_Character)
+        elif kind == CACHE_KIND_BLOCK_CLOSURE:
+            return objectmodel.instantiate(W_BlockClosure)
+        elif kind == CACHE_KIND_POINTERS or kind == CACHE_KIND_WEAK_POINTERS:
+            return objectmodel.instantiate(W_PointersObject)
+        elif kind == CACHE_KIND_FLOAT:
+            return objectmodel.instantiate(W_Float)
+        elif kind == CACHE_KIND_SMALLINT:
+            return objectmodel.instantiate(W_SmallInteger)
+        elif kind == CACHE_KIND_LARGE_WORD:
+            return objectmodel.instantiate(W_LargeIntegerWord)
+        elif kind == CACHE_KIND_LARGE_BIG:
+            return objectmodel.instantiate(W_LargeIntegerBig)
+        elif kind == CACHE_KIND_WORDS:
+            return objectmodel.instantiate(W_WordsObject)
+        elif kind == CACHE_KIND_BYTES:
+            return objectmodel.instantiate(W_BytesObject)
+        elif kind == CACHE_KIND_PRESPUR_METHOD:
+            return objectmodel.instantiate(W_PreSpurCompiledMethod)
+        elif kind == CACHE_KIND_SPUR_METHOD:
+            return objectmodel.instantiate(W_SpurCompiledMethod)
+        else:
+            raise error.CorruptImageError("Unknown cached object kind %d" % kind)
+
+    def kind_of(self, g_object):
+        if g_object.chunk is None:
+            return -1 # SmallInteger or Character
+        return g_object.chunk.classid
+
+    def ispointers(self, g_object):
+        return 0 <= self.kind_of(g_object) <= CACHE_KIND_BLOCK_CLOSURE
+
+    def isweak(self, g_object):
+        return self.kind_of(g_object) == CACHE_KIND_WEAK_POINTERS
+
+    def iswords(self, g_object):
+        kind = self.kind_of(g_object)
+        return kind == CACHE_KIND_WORDS or kind == CACHE_KIND_FLOAT
+
+    def isbytes(self, g_object):
+        return self.kind_of(g_object) == CACHE_KIND_BYTES
+
+    def iscompiledmethod(self, g_object):
+        kind = self.kind_of(g_object)
+        return kind == CACHE_KIND_PRESPUR_METHOD or kind == CACHE_KIND_SPUR_METHOD
+
+
+class UncacheableObject(Exception):
+    pass
+
+class ImageCacheWriter(object):
+    """Writes the object graph decoded by a reader strategy to a cache file
+    for CachedReader, in two steps. write has to happen after
+    init_g_objects and before any object body is released, finish once the
+    objects are filled in and their storage is known. Until then the cache
+    is a temporary file, which abort removes."""
+
+    # flush the output when this many bytes are buffered
+    BUFFER_SIZE = 64 * 1024
+
+    def __init__(self, reader, path):
+        self.reader = reader
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.file = None
+        self.indices = {} # GenericObject -> index in the chunk list
+        self.kinds = [] # parallel to the chunk list
+        self.is_class = []
+
+    def write(self):
+        """Answer False and leave no file if an object cannot be cached"""
+        reader = self.reader
+        chunklist = reader.chunklist
+        for i in range(len(chunklist)):
+            self.indices[chunklist[i].g_object] = i
+        self.is_class = [False] * len(chunklist)
+        self.file = streamio.open_file_as_stream(self.tmp_path, mode="wb")
+        ok = False
+        try:
+            imageReader = reader.imageReader
+            builder = StringBuilder()
+            header = [CACHE_MAGIC, CACHE_VERSION,
+                      intmask(rffi.cast(rffi.INT, imageReader.image_length))]
+            header.extend(imageReader.image_identity)
+            header.extend([imageReader.magic1, imageReader.magic2,
+                           self.indices[reader.chunks[reader.specialobjectspointer].g_object],
+                           reader.lastWindowSize, len(chunklist)])
+            assert len(header) == CACHE_HEADER_WORDS
+            for word in header:
+                append_word(builder, word)
+            for chunk in chunklist:
+                self.write_object(builder, chunk.g_object)
+                if builder.getlength() >= self.BUFFER_SIZE:
+                    self.file.write(builder.build())
+                    builder = StringBuilder()
+            self.file.write(builder.build())
+            ok = True
+        except UncacheableObject:
+            pass
+        finally:
+            if not ok:
+                self.abort()
+        return ok
+
+    def finish(self):
+        """Append the storage of each filled in object and put the cache in
+        place"""
+        chunklist = self.reader.chunklist
+        ok = False
+        try:
+            builder = StringBuilder()
+            for i in range(len(chunklist)):
+                append_word(builder, self.storage_of(i, chunklist[i].g_object.w_object))
+            self.file.write(builder.build())
+            self.file.close()
+            self.file = None
+            os.rename(self.tmp_path, self.path)
+            ok = True
+        finally:
+            if not ok:
+                self.abort()
+
+    def abort(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        try:
+            os.unlink(self.tmp_path)
+        except OSError:
+            pass
+
+    def storage_of(self, index, w_object):
+        kind = self.kinds[index]
+        if kind != CACHE_KIND_POINTERS and kind != CACHE_KIND_WEAK_POINTERS:
+            return CACHE_STORAGE_NONE
+        if not isinstance(w_object, W_PointersObject):
+            return CACHE_STORAGE_NONE
+        strategy = w_object._get_strategy()
+        tag = CACHE_STORAGE_NONE
+        if isinstance(strategy, AllNilStrategy):
+            tag = CACHE_STORAGE_ALL_NIL
+        elif isinstance(strategy, ListStrategy) and not strategy.is_shadow():
+            tag = CACHE_STORAGE_LIST
+        if kind == CACHE_KIND_POINTERS and self.is_class[index]:
+            tag |= CACHE_STORAGE_CLASS
+        return tag
+
+    def write_object(self, builder, g_object):
+        index_of_class = self.indices.get(g_object.g_class, -1)
+        if index_of_class == -1:
+            raise UncacheableObject
+        self.is_class[index_of_class] = True
+        kind = self.kind_of(g_object)
+        self.kinds.append(kind)
+        pointers = None
+        words = []
+        bytes = []
+        if kind <= CACHE_KIND_BLOCK_CLOSURE:
+            pointers = g_object.pointers
+        elif kind == CACHE_KIND_WORDS or kind == CACHE_KIND_FLOAT:
+            words = g_object.get_ruints()
+        else:
+            if kind == CACHE_KIND_PRESPUR_METHOD or kind == CACHE_KIND_SPUR_METHOD:
+                pointers = g_object.pointers
+            # all of the body, odd bytes are trimmed by the format on load
+            bytes = self.reader.get_bytes_of(g_object.chunk)
+        body_size = len(words) + (len(bytes) + 3) / 4
+        append_word(builder, kind)
+        append_word(builder, g_object.format)
+        append_word(builder, g_object.hash)
+        append_word(builder, index_of_class)
+        append_word(builder, -1 if pointers is None else len(pointers))
+        append_word(builder, body_size)
+        if pointers is not None:
+            for g_pointer in pointers:
+                append_word(builder, self.encode_pointer(g_pointer))
+        for word in words:
+            append_word(builder, intmask(word))
+        for c in bytes:
+            builder.append(c)
+        for i in range(body_size * 4 - len(words) * 4 - len(bytes)):
+            builder.append('\x00')
+
+    def encode_pointer(self, g_object):
+        """Encode like Spur: object index << 2, SmallInteger << 1 | 1 and
+        Character << 2 | 2."""
+        if g_object.chunk is not None:
+            index = self.indices.get(g_object, -1)
+            if not 0 <= index < (1 << 29):
+                raise UncacheableObject
+            return index << 2
+        w_object = g_object.w_object
+        if isinstance(w_object, W_SmallInteger):
+            value = w_object.value
+            if not -(1 << 30) <= value < (1 << 30):
+                raise UncacheableObject
+            return (value << 1) | 1
+        elif isinstance(w_object, W_Character):
+            value = w_object.value
+            if not 0 <= value < (1 << 29):
+                raise UncacheableObject
+            return (value << 2) | 2
+        raise UncacheableObject
+
+    def kind_of(self, g_object):
+        w_object = self.reader.instantiate(g_object)
+        if isinstance(w_object, W_Character):
+            return CACHE_KIND_CHARACTER
+        elif isinstance(w_object, W_BlockClosure):
+            return CACHE_KIND_BLOCK_CLOSURE
+        elif isinstance(w_object, W_PointersObject):
+            if self.reader.isweak(g_object):
+                return CACHE_KIND_WEAK_POINTERS
+            return CACHE_KIND_POINTERS
+        elif isinstance(w_object, W_Float):
+            return CACHE_KIND_FLOAT
+        elif isinstance(w_object, W_SmallInteger):
+            return CACHE_KIND_SMALLINT
+        elif isinstance(w_object, W_LargeIntegerWord):
+            return CACHE_KIND_LARGE_WORD
+        elif isinstance(w_object, W_LargeIntegerBig):
+            return CACHE_KIND_LARGE_BIG
+        elif isinstance(w_object, W_WordsObject):
+            return CACHE_KIND_WORDS
+        elif isinstance(w_object, W_BytesObject):
+            return CACHE_KIND_BYTES
+        elif isinstance(w_object, W_SpurCompiledMethod):
+            return CACHE_KIND_SPUR_METHOD
+        else:
+            assert isinstance(w_object, W_PreSpurCompiledMethod)
+            return CACHE_KIND_PRESPUR_METHOD
+
+def append_word(builder, word):
+    # little-endian 32-bit
+    builder.append(chr(word & 0xff))
+    builder.append(chr((word >> 8) & 0xff))
+    builder.append(chr((word >> 16) & 0xff))
+    builder.append(chr((word >> 24) & 0xff))
+
 # ____________________________________________________________
 
 class SqueakImage(object):
@@ -840,6 +1531,8 @@ class GenericObject(object):
         self.pointers = None
         self.g_class = None
         self.chunk = None
+        # the storage strategy, if known before the contents are filled in
+        self.storage_type = None
 
     def isinitialized(self):
         return self.reader is not None
@@ -859,6 +1552,11 @@ class GenericObject(object):
         self.w_object = W_Character(untagged_value)
         self.filled_in = True
 
+    def initialize_float(self, value, reader, space):
+        self.reader = reader
+        self.w_object = W_Float(value)
+        self.filled_in = True
+
     def initialize(self, chunk, reader, space):
         self.reader = reader
         self.chunk = chunk # for bytes, words and compiledmethod
@@ -866,6 +1564,14 @@ class GenericObject(object):
         self.init_g_class()
         self.w_object = None
 
+    def initialize_cached(self, chunk, reader, g_class, pointers):
+        # pointers and class are already decoded, see CachedReader
+        self.reader = reader
+        self.chunk = chunk
+        self.pointers = pointers
+        self.g_class = g_class
+        self.w_object = None
+
     @property
     def size(self):
         if self.chunk is None: return 0
@@ -895,7 +1601,7 @@ class GenericObject(object):
             ptrs = self.reader.decode_pointers(self, space)
             assert None not in ptrs
         elif self.reader.iscompiledmethod(self):
-            header = self.chunk.data[0] >> 1 # untag tagged int
+            header = self.reader.untag_int(self.chunk.data_at(0))
             literalsize = self.reader.literal_count_of_method_header(header)
             ptrs = self.reader.decode_pointers(self, space, literalsize + 1)  # adjust +1 for the header
             assert None not in ptrs
@@ -913,26 +1619,29 @@ class GenericObject(object):
 
     def len_bytes(self):
         sz = self.reader.len_bytes_of(self.chunk)
-        return sz - (self.format & 3)
+        return sz - self.reader.unused_bytes_of(self.chunk)
 
     def get_bytes(self):
-        bytes = self.reader.get_bytes_of(self.chunk)
-        stop = len(bytes) - (self.format & 3)
+        stop = self.len_bytes() # omit odd bytes
         assert stop >= 0
-        return bytes[:stop] # omit odd bytes
+        return self.reader.get_bytes_of(self.chunk, stop)
 
     def get_ruints(self, required_len=-1):
-        from rpython.rlib.rarithmetic import r_uint32, r_uint
-        words = [r_uint(r_uint32(x)) for x in self.chunk.data]
+        words = self.reader.get_ruints_of(self.chunk)
         if required_len != -1 and len(words) != required_len:
             raise error.CorruptImageError("Expected %d words, got %d" % (required_len, len(words)))
         return words
 
+    def get_bytecodes(self, literalsize):
+        # the method header and the literals take one image word each
+        word_size = 8 if self.reader.version.is_64bit else 4
+        return self.get_bytes()[(literalsize + 1) * word_size:]
+
     def fillin(self, space):
         if not self.filled_in:
             self.filled_in = True
             self.w_object.fillin(space, self)
-            self.chunk.data = None
+            self.chunk.release_data()
 
     def fillin_weak(self, space):
         if not self.filled_in_weak and self.isweak():
@@ -960,7 +1669,7 @@ class GenericObject(object):
     @objectmodel.not_rpython
     def as_string(self):
         return "".join([chr(c) for bytes in
-            [splitter[8,8,8,8](w) for w in self.chunk.data]
+            [splitter[8,8,8,8](w) for w in self.chunk.get_data()]
             for c in bytes if c != 0])
 
     @objectmodel.not_rpython
@@ -970,7 +1679,8 @@ class GenericObject(object):
 
 class ImageChunk(object):
     """ A chunk knows the information from the header, but the body of the
-    object is not decoded yet."""
+    object is not decoded yet. The body is either given as a list of words,
+    or it is decoded lazily from the image stream when it is accessed."""
     def __init__(self, size, format, classid, hash, data=None):
         self.size = size
         self.format = format
@@ -978,8 +1688,39 @@ class ImageChunk(object):
         self.hash = hash
         # list of integers forming the body of the object
         self.data = data
+        # alternatively, the stream and byte offset of the body
+        self.stream = None
+        self.offset = 0
+        self.nwords = 0
         self.g_object = GenericObject()
 
+    def read_lazily(self, stream, offset, nwords):
+        self.data = None
+        self.stream = stream
+        self.offset = offset
+        self.nwords = nwords
+
+    def len_data(self):
+        if self.data is not None:
+            return len(self.data)
+        return self.nwords
+
+    def data_at(self, index):
+        if self.data is not None:
+            return self.data[index]
+        assert 0 <= index < self.nwords
+        return self.stream.word_at(self.offset + index * self.stream.word_size)
+
+    def get_data(self):
+        if self.data is not None:
+            return self.data
+        return [self.data_at(i) for i in range(self.nwords)]
+
+    def release_data(self):
+        self.data = None
+        self.stream = None
+        self.nwords = 0
+
     def __repr__(self):
         return "ImageChunk(size=%(size)d, format=%(format)d, " \
                 "classid=%(classid)d, hash=%(hash)d, data=%(data)r)" \
@@ -991,7 +1732,7 @@ class ImageChunk(object):
                 self.format == other.format and
                 self.classid == other.classid and
                 self.hash == other.hash and
-                self.data == other.data)
+                self.get_data() == other.get_data())
 
     def __ne__(self, other):
         "(for testing)"
@@ -1006,21 +1747,171 @@ class ImageChunk(object):
         # pre-Spur
         return 0 < self.classid < 32
 
+class SnapshotStream(object):
+    """ The part of the file interface SpurImageWriter uses. The writer
+    seeks back and forth while it writes headers and bodies. """
+    def seek(self, pos, whence):
+        raise NotImplementedError
+
+    def tell(self):
+        raise NotImplementedError
+
+    def write(self, data):
+        raise NotImplementedError
+
+class SnapshotFile(SnapshotStream):
+    """ Writes a snapshot straight to the image file. """
+    def __init__(self, filename):
+        self.stream = streamio.open_file_as_stream(filename, mode="wb")
+
+    def seek(self, pos, whence):
+        self.stream.seek(pos, whence)
+
+    def tell(self):
+        return self.stream.tell()
+
+    def write(self, data):
+        self.stream.write(data)
+
+    def close(self):
+        self.stream.close()
+
+class SnapshotBuffer(SnapshotStream):
+    """ Staging area for a snapshot written in the background. The image is
+    assembled in memory in blocks and written to disk as a whole by
+    write_file. """
+    BLOCK_SIZE = 1 << 20
+
+    def __init__(self):
+        self.blocks = []
+        self.pos = 0
+        self.size = 0
+
+    def seek(self, pos, whence):
+        assert whence == 0
+        assert pos >= 0
+        self.pos = pos
+
+    def tell(self):
+        return self.pos
+
+    def write(self, data):
+        pos = self.pos
+        start = 0
+        while start < len(data):
+            block = self.block_at(pos / self.BLOCK_SIZE)
+            offset = pos % self.BLOCK_SIZE
+            n = min(len(data) - start, self.BLOCK_SIZE - offset)
+            for i in range(n):
+                block[offset + i] = data[start + i]
+            start += n
+            pos += n
+        self.pos = pos
+        self.size = max(self.size, pos)
+
+    def block_at(self, index):
+        while len(self.blocks) <= index:
+            self.blocks.append(
+                rgc.resizable_list_supporting_raw_ptr(['\0'] * self.BLOCK_SIZE))
+        return self.blocks[index]
+
+    def write_file(self, filename):
+        # write to a temporary file next to the real one first, so an
+        # interrupted write never leaves a truncated image behind
+        filename = resolve_symlinks(filename)
+        try:
+            mode = os.stat(filename).st_mode & 07777
+        except OSError:
+            mode = 0644
+        tmp_filename = filename + ".tmp"
+        fd = os.open(tmp_filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+        try:
+            try:
+                os.fchmod(fd, mode)
+                for i in range(len(self.blocks)):
+                    n = min(self.BLOCK_SIZE, self.size - i * self.BLOCK_SIZE)
+                    self.write_block(fd, self.blocks[i], n)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            os.rename(tmp_filename, filename)
+        except OSError:
+            try:
+                os.unlink(tmp_filename)
+            except OSError:
+                pass
+            raise
+
+    def write_block(self, fd, block, n):
+        buf = rgc.nonmoving_raw_ptr_for_resizable_list(block)
+        written = 0
+        while written < n:
+            count = rffi.cast(lltype.Signed, rposix.c_write(
+                fd, rffi.cast(rffi.VOIDP, rffi.ptradd(buf, written)),
+                rffi.cast(rffi.SIZE_T, n - written)))
+            if count < 0:
+                raise OSError(rposix.get_saved_errno(), "write failed")
+            written += count
+        objectmodel.keepalive_until_here(block)
+
+def resolve_symlinks(filename):
+    """ Answer the file a chain of symlinks points to, so renaming over it
+    replaces the target and keeps the links. """
+    for _ in range(40):
+        try:
+            if not stat.S_ISLNK(os.lstat(filename).st_mode):
+                return filename
+            target = os.readlink(filename)
+        except OSError:
+            return filename
+        slash = filename.rfind("/")
+        if target.startswith("/") or slash < 0:
+            filename = target
+        else:
+            filename = filename[:slash + 1] + target
+    return filename
+
+def wait_for_snapshot_writer(space):
+    """ Wait until an image written in the background is on disk. Answer
+    False and report it on stderr if the writer failed. """
+    pid = space.snapshot_writer_pid
+    if pid == 0:
+        return True
+    space.snapshot_writer_pid = 0
+    try:
+        _, status = os.waitpid(pid, 0)
+    except OSError as e:
+        os.write(2, "snapshot: cannot wait for the background writer (errno %d)\n" % e.errno)
+        return False
+    if os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0:
+        return True
+    os.write(2, "snapshot: writing in the background failed\n")
+    return False
+
 class SpurImageWriter(object):
-    _immutable_fields_ = ["space", "image", "trace_queue", "oop_map"]
-    # XXX: Writes forcibly little-endian 32-bit Spur-format images
-    image_header_size = 64
-    word_size = 4
+    _immutable_fields_ = ["space", "image", "trace_queue", "oop_map",
+                          "word_size", "header_words", "image_header_size"]
+    # XXX: Writes forcibly little-endian Spur-format images
 
-    def __init__(self, interp, filename):
-        from rpython.rlib import streamio, objectmodel
+    def __init__(self, interp, filename, is_64bit=False):
         self.space = interp.space
         self.image = interp.image
-        self.f = streamio.open_file_as_stream(filename, mode="wb")
+        self.filename = filename
+        if is_64bit:
+            assert system.IS_64BIT, "cannot write 64-bit images in a 32-bit build"
+            self.word_size = 8
+            self.image_header_size = 128
+        else:
+            self.word_size = 4
+            self.image_header_size = 64
+        # number of words in an object header
+        self.header_words = 8 / self.word_size
+        self.f = None
         self.next_chunk = self.image_header_size
         self.oop_map = {}
         self.trace_queue = []
         self.hidden_roots = None
+        self.pause_ms = 0
 
     @objectmodel.specialize.argtype(1)
     def len_and_header(self, obj):
@@ -1028,12 +1919,20 @@ class SpurImageWriter(object):
         n = self.fixed_and_indexable_size_for(obj)
         if isinstance(obj, W_BytesObject) or isinstance(obj, W_LargeInteger) or isinstance(obj, W_CompiledMethod):
             size = int(math.ceil(n / float(self.word_size)))
+        elif self.is_32bit_words(obj):
+            size = int(math.ceil(n * 4 / float(self.word_size)))
         else:
             size = n
         if size < 255:
-            return n, size + 2, 2
+            return n, size + self.header_words, self.header_words
         else:
-            return n, size + 2, 4
+            return n, size + self.header_words, 2 * self.header_words
+
+    @objectmodel.specialize.argtype(1)
+    def is_32bit_words(self, obj):
+        return (isinstance(obj, W_WordsObject) or
+                isinstance(obj, W_DisplayBitmap) or
+                isinstance(obj, W_Float))
 
     def frame_size_for(self, obj):
         w_method = None
@@ -1053,18 +1952,22 @@ class SpurImageWriter(object):
              obj.getclass(self.space).is_same_object(self.space.w_BlockContext))):
             return obj.instsize() + self.frame_size_for(obj)
         elif isinstance(obj, W_SpurCompiledMethod):
-            return obj.varsize()
+            return self.compiled_method_size_for(obj)
         elif isinstance(obj, W_PreSpurCompiledMethod):
             if obj.primitive() != 0:
-                return obj.varsize() + 3  # account for three extra bytes with
-                                          # primitive idx
+                return self.compiled_method_size_for(obj) + 3  # account for three extra bytes with
+                                                              # primitive idx
             else:
-                return obj.varsize()
+                return self.compiled_method_size_for(obj)
         else:
             return obj.instsize() + obj.varsize()
 
+    def compiled_method_size_for(self, obj):
+        # the header and each literal take one word
+        return (obj.literalsize + 1) * self.word_size + len(obj.getbytes())
+
     def padding_for(self, length):
-        if length - 2 == 0:
+        if length - self.header_words == 0:
             return 8
         elif (length % 2 != 0 and self.word_size == 4):
             return 4
@@ -1072,6 +1975,40 @@ class SpurImageWriter(object):
             return 0
 
     def trace_image(self, s_frame):
+        """ Trace the image and write it to disk. With background_snapshot,
+        the image is traced into a staging buffer and the file is written by
+        a forked process, so the VM is only paused for the tracing. """
+        start = time.time()
+        wait_for_snapshot_writer(self.space)
+        if system.IS_POSIX and self.space.background_snapshot.is_set():
+            buf = SnapshotBuffer()
+            self.f = buf
+            self.trace_objects(s_frame)
+            pid = os.fork()
+            if pid == 0:
+                exitcode = 0
+                try:
+                    buf.write_file(self.filename)
+                except OSError:
+                    exitcode = 1
+                os._exit(exitcode)
+            self.space.snapshot_writer_pid = pid
+            mode = "writing in the background"
+        else:
+            f = SnapshotFile(self.filename)
+            self.f = f
+            try:
+                self.trace_objects(s_frame)
+            finally:
+                f.close()
+            mode = "written"
+        self.pause_ms = int((time.time() - start) * 1000)
+        self.f = None
+        if not self.space.silent.is_set():
+            os.write(2, "snapshot: VM paused for %d ms, %s %s\n" % (
+                self.pause_ms, mode, self.filename))
+
+    def trace_objects(self, s_frame):
         w_active_process = wrapper.scheduler(self.space).active_process()
         active_process = wrapper.ProcessWrapper(self.space, w_active_process)
         active_process.store_suspended_context(s_frame.w_self())
@@ -1095,14 +2032,8 @@ class SpurImageWriter(object):
                 w_obj = w_special_objects.fetch(self.space, i)
                 if isinstance(w_obj, W_SmallInteger):
                     # This cannot be...
-                    val = self.space.unwrap_int(w_obj)
-                    if val >= 0:
-                        w_cls = self.space.w_LargePositiveInteger
-                    else:
-                        w_cls = self.space.w_LargeNegativeInteger
                     w_special_objects.store(
-                        self.space, i,
-                        W_LargeIntegerWord(self.space, w_cls, r_uint(val), 4))
+                        self.space, i, self.large_integer_for(w_obj.value))
             self.reserve(w_special_objects)
             self.trace_until_finish()
             # tracing through the image will have populated the hidden roots and
@@ -1114,7 +2045,6 @@ class SpurImageWriter(object):
             self.write_last_bridge()
             self.write_file_header(w_special_objects)
         finally:
-            self.f.close()
             active_process.store_suspended_context(self.space.w_nil)
 
     @jit.dont_look_inside
@@ -1127,13 +2057,16 @@ class SpurImageWriter(object):
 
     def write_file_header(self, w_special_objects):
         sp_obj_oop = self.oop_map[w_special_objects][0]
-        image_header_size = 64 if self.word_size == 4 else 128
+        image_header_size = self.image_header_size
         displaysize = self.image.lastWindowSize
         hdrflags = (0 +  # 0/1 fullscreen or not
                     0b10 +  # 0/2 imageFloatsLittleEndian or not
                     0x10 +  # preemption does not yield
                     0)  # old finalization
         self.f.seek(0, 0)
+        if self.word_size == 8:
+            self.write_file_header_64bit(sp_obj_oop, displaysize, hdrflags)
+            return
         version = 6521
         if self.space.uses_block_contexts.is_set():
             version = 0x1234  # our custom version magic
@@ -1154,15 +2087,42 @@ class SpurImageWriter(object):
         self.write_word(0)  # padding
         self.write_word(0)  # padding
 
+    def write_file_header_64bit(self, sp_obj_oop, displaysize, hdrflags):
+        # the version, header size and VM settings are 32-bit words
+        version = 68021
+        if self.space.uses_block_contexts.is_set():
+            version = 0x1235  # our custom version magic
+        image_header_size = self.image_header_size
+        self.write_word32(version)
+        self.write_word32(image_header_size)  # hdr size
+        self.write_word(self.next_chunk - image_header_size)  # memory size
+        self.write_word(image_header_size)  # start of memory
+        self.write_word(sp_obj_oop)
+        self.write_word(0xffee)  # last hash
+        self.write_word(displaysize)
+        self.write_word(hdrflags)
+        self.write_word32(0)  # extra VM memory
+        self.write_word32(0)  # (num stack pages << 16) | cog code size
+        self.write_word32(0)  # eden bytes
+        self.write_word32(0)  # max ext semaphore size << 16
+        self.write_word(self.next_chunk - image_header_size)  # first segment size
+        self.write_word(0)  # free old space in image
+        self.write_word(0)  # padding
+        self.write_word(0)  # padding
+        self.f.write("\0" * (image_header_size - self.f.tell()))
+
     def write_last_bridge(self):
         self.f.seek(self.next_chunk, 0)
         self.next_chunk = self.next_chunk + 16
-        # put the magic FINAL BRIDGE header
-        # FIXME: 64bit??
-        self.write_word((1 << 30) + (10 << 24) + 3)
-        self.write_word(0)
-        self.write_word(0)
-        self.write_word(0)
+        # put the magic FINAL BRIDGE header, two 64-bit words
+        if self.word_size == 8:
+            self.write_word((1 << 30) + (10 << 24) + 3)
+            self.write_word(0)
+        else:
+            self.write_word((1 << 30) + (10 << 24) + 3)
+            self.write_word(0)
+            self.write_word(0)
+            self.write_word(0)
 
     def insert_class_into_classtable(self, obj):
         classhash = obj.gethash()
@@ -1188,7 +2148,7 @@ class SpurImageWriter(object):
         oop, length, hdrsize, sz, padding = self.oop_map[obj]
         self.write_header(hdrsize, sz, obj, oop)
 
-        assert self.f.tell() == (oop + (2 * self.word_size))
+        assert self.f.tell() == (oop + (self.header_words * self.word_size))
 
         if isinstance(obj, W_BytesObject) or isinstance(obj, W_LargeInteger):
             self.write_bytes_object(obj)
@@ -1204,34 +2164,55 @@ class SpurImageWriter(object):
         assert self.f.tell() == oop + length * self.word_size + padding
 
     @objectmodel.specialize.argtype(1)
+    def large_integer_for(self, value):
+        """ Answer a LargeInteger for a SmallInteger value that has no
+        tagged representation in the image. Large integers store their
+        magnitude, the subtraction gets it right for MININT as well. """
+        if value >= 0:
+            return W_LargeIntegerWord(self.space, self.space.w_LargePositiveInteger,
+                                      r_uint(value), constants.BYTES_PER_MACHINE_INT)
+        else:
+            return W_LargeIntegerWord(self.space, self.space.w_LargeNegativeInteger,
+                                      r_uint(0) - r_uint(value),
+                                      constants.BYTES_PER_MACHINE_INT)
+
     def reserve(self, obj):
+        if self.word_size == 8:
+            if isinstance(obj, W_SmallInteger):
+                if constants.TAGGED_MININT61 <= obj.value <= constants.TAGGED_MAXINT61:
+                    return ((obj.value << 3) + 1, 0, 0, 0, 0)
+                return self.reserve(self.large_integer_for(obj.value))
+            elif isinstance(obj, W_Character):
+                return ((obj.value << 3) + 0b10, 0, 0, 0, 0)
+            elif isinstance(obj, W_Float) and is_small_float64(obj.value):
+                return (intmask(small_float64_oop(obj.value)), 0, 0, 0, 0)
         if isinstance(obj, W_SmallInteger):
             newoop = 0
             if obj.value >= 0:
                 if obj.value <= constants.TAGGED_MAXINT32:
                     newoop = (obj.value << 1) + 1
                 else:
-                    return self.reserve(W_LargeIntegerWord(
-                        self.space, self.space.w_LargePositiveInteger,
-                        r_uint(obj.value), constants.BYTES_PER_MACHINE_INT))
+                    return self.reserve(self.large_integer_for(obj.value))
             else:
                 if obj.value >= constants.TAGGED_MININT32:
                     newoop = intmask((((r_int64(1) << 31) + obj.value) << 1) + 1)
                 else:
-                    return self.reserve(W_LargeIntegerWord(
-                        self.space, self.space.w_LargeNegativeInteger,
-                        r_uint(obj.value), constants.BYTES_PER_MACHINE_INT))
+                    return self.reserve(self.large_integer_for(obj.value))
             return (newoop, 0, 0, 0, 0)
         elif isinstance(obj, W_Character):
             assert obj.value < constants.TAGGED_MAXINT32
             return ((obj.value << 2) + 0b10, 0, 0, 0, 0)
+        elif obj.getclass(self.space) is self.space.w_SmallInteger:
+            # file and socket handles only pose as SmallIntegers, they are
+            # stale after a restart anyway
+            return self.reserve(self.space.w_nil)
         else:
             oop = self.oop_map.get(obj, (0, 0, 0, 0, 0))
             if oop[0] > 0:
                 return oop
             else:
                 sz, length, hdrsize = self.len_and_header(obj)
-                oop = self.next_chunk + (hdrsize - 2) * self.word_size
+                oop = self.next_chunk + (hdrsize - self.header_words) * self.word_size
                 padding = self.padding_for(length)
                 self.next_chunk = oop + length * self.word_size + padding
                 retval = (oop, length, hdrsize, sz, padding)
@@ -1257,7 +2238,7 @@ class SpurImageWriter(object):
     def write_compiled_method(self, obj):
         cmbytes = obj.getbytes()
         if self.space.is_spur.is_set():
-            self.write_word((obj.getheader() << 1) + 1) # header is saved as tagged int
+            self.write_word(self.tagged_int(obj.getheader())) # header is saved as tagged int
         else:
             newheader = (obj.literalsize # 15 bits
                          | (0 << 15)  # is optimized, 1 bit
@@ -1267,7 +2248,7 @@ class SpurImageWriter(object):
                          | (obj.argsize << 24)  # 4 bits
                          | (0 << 28)  # access mod, 2 bits
                          | (0 << 30))  # instruction set bit, 1 bit
-            self.write_word((newheader << 1) + 1)  # header is saved as tagged int
+            self.write_word(self.tagged_int(newheader))  # header is saved as tagged int
         for i in range(obj.getliteralsize() / constants.BYTES_PER_WORD):
             self.write_word(self.reserve(obj.getliteral(i))[0])
         paddingbytes = 0
@@ -1311,8 +2292,18 @@ class SpurImageWriter(object):
             for i in range(self.frame_size_for(obj) - obj.varsize()):
                 self.write_word(self.reserve(self.space.w_nil)[0])
 
+    def tagged_int(self, value):
+        if self.word_size == 8:
+            return (value << 3) + 1
+        return (value << 1) + 1
+
     def write_word(self, word):
-        # FIXME: 64bit??
+        if self.word_size == 8:
+            self.f.write(self.ruint64_tobytes(r_uint64(word)))
+        else:
+            self.write_word32(word)
+
+    def write_word32(self, word):
         self.f.write("".join(
             [chr(word & r_uint(0x000000ff)),
              chr((word & r_uint(0x0000ff00)) >> 8),
@@ -1320,7 +2311,7 @@ class SpurImageWriter(object):
              chr((word & r_uint(0xff000000)) >> 24)]))
 
     def write_header(self, hdrsize, sz, obj, oop):
-        self.f.seek(oop - ((hdrsize - 2) * self.word_size), 0)
+        self.f.seek(oop - ((hdrsize - self.header_words) * self.word_size), 0)
         self.f.write(self.headers_for_hash_numfields(
             obj.getclass(self.space),
             obj.gethash(),
@@ -1337,7 +2328,7 @@ class SpurImageWriter(object):
 
     def headers_for_hash_numfields(self, Class, Hash, size):
         import math
-        from rsqueakvm.storage_classes import BYTES, COMPILED_METHOD, LARGE_INTEGER
+        from rsqueakvm.storage_classes import BYTES, COMPILED_METHOD, LARGE_INTEGER, WORDS, FLOAT
         classshadow = Class.as_class_get_shadow(self.space)
         length = r_uint64(size)
         wordlen = size
@@ -1351,9 +2342,15 @@ class SpurImageWriter(object):
         if (classshadow.instance_kind == BYTES or
             classshadow.instance_kind == COMPILED_METHOD or
             classshadow.instance_kind == LARGE_INTEGER):
-            wordlen = int(math.ceil(size / 4.0))
+            wordlen = int(math.ceil(size / float(self.word_size)))
+            length = r_uint64(wordlen)
+            fmt = fmt | ((wordlen * self.word_size) - size)
+        elif self.word_size == 8 and (classshadow.instance_kind == WORDS or
+                                      classshadow.instance_kind == FLOAT):
+            # two 32-bit words per slot, the format tells if the last is unused
+            wordlen = (size + 1) / 2
             length = r_uint64(wordlen)
-            fmt = fmt | ((wordlen * 4) - size)
+            fmt = fmt | (size & 1)
         header = r_uint64(0)
         length_header = r_uint64(0)
         if wordlen >= 255:
@@ -79,6 +79,10 @@ class AbstractStrategy(object):
         raise NotImplementedError("This strategy doesn't handle become.")
     def getclass(self):
         return self.w_class
+    def copy_storage_from(self, w_self, start, w_other, other_start, count):
+        """Copy count slots of w_other to w_self in bulk. Answer False if the
+        storage of w_other cannot be taken over as it is."""
+        return False
     def instantiate(self, w_self, w_class):
         if self._is_singleton:
             new_strategy = self.strategy_factory().strategy_singleton_instance(self.instantiate_type, w_class)
@@ -105,6 +109,14 @@ class SimpleStorageStrategy(AbstractStrategy):
     def default_value(self):
         return self.space.w_nil
 
+class CopyStorageMixin(object):
+    def _copy_storage(self, w_self, start, other, w_other, other_start, count):
+        # copies forward, overlapping ranges must have start < other_start
+        storage = self.get_storage(w_self)
+        other_storage = other.get_storage(w_other)
+        for i in range(count):
+            storage[start + i] = other_storage[other_start + i]
+
 class OptimizedConvertFromAllNilMixin(object):
     @jit.unroll_safe
     def _better_convert_storage_from(self, w_self, previous_strategy):
@@ -149,6 +161,20 @@ class ListStrategy(SimpleStorageStrategy):
                 storage[index0] = W_MutableSmallInteger(w_value.value)
         else:
             storage[index0] = w_value
+
+    def copy_storage_from(self, w_self, start, w_other, other_start, count):
+        # shadows react to their stores, they must see every element
+        if self.is_shadow():
+            return False
+        other = w_other._get_strategy()
+        if not isinstance(other, ListStrategy):
+            return False
+        storage = self.get_storage(w_self)
+        other_storage = other.get_storage(w_other)
+        for i in range(count):
+            # SmallIntegers are boxed mutably, they must not be shared
+            storage[start + i] = self._unwrap(other._wrap(other_storage[other_start + i]))
+        return True
 ListStrategy._convert_storage_from = ListStrategy._better_convert_storage_from
 ListStrategy.instantiate_type = ListStrategy
 
@@ -255,11 +281,18 @@ class SmallIntegerOrNilStrategy(SimpleStorageStrategy):
     repr_classname = "SmallIntegerOrNilStrategy"
     import_from_mixin(rstrat.TaggingStrategy)
     import_from_mixin(OptimizedConvertFromAllNilMixin)
+    import_from_mixin(CopyStorageMixin)
     contained_type = W_SmallInteger
     def wrap(self, val): return self.space.wrap_smallint_unsafe(val)
     def unwrap(self, w_val): return self.space.unwrap_int(w_val)
     def wrapped_tagged_value(self): return self.space.w_nil
     def unwrapped_tagged_value(self): return constants.MAXINT
+    def copy_storage_from(self, w_self, start, w_other, other_start, count):
+        other = w_other._get_strategy()
+        if not isinstance(other, SmallIntegerOrNilStrategy):
+            return False
+        self._copy_storage(w_self, start, other, w_other, other_start, count)
+        return True
 SmallIntegerOrNilStrategy._convert_storage_from = SmallIntegerOrNilStrategy._better_convert_storage_from
 SmallIntegerOrNilStrategy.instantiate_type = SmallIntegerOrNilStrategy
 
@@ -268,6 +301,7 @@ class CharacterOrNilStrategy(SimpleStorageStrategy):
     repr_classname = "CharacterOrNilStrategy"
     import_from_mixin(rstrat.TaggingStrategy)
     import_from_mixin(OptimizedConvertFromAllNilMixin)
+    import_from_mixin(CopyStorageMixin)
     contained_type = W_Character
     def wrap(self, val): return W_Character(val)
     def unwrap(self, w_val):
@@ -276,6 +310,12 @@ class CharacterOrNilStrategy(SimpleStorageStrategy):
         return w_val.value
     def wrapped_tagged_value(self): return self.space.w_nil
     def unwrapped_tagged_value(self): return constants.MAXINT
+    def copy_storage_from(self, w_self, start, w_other, other_start, count):
+        other = w_other._get_strategy()
+        if not isinstance(other, CharacterOrNilStrategy):
+            return False
+        self._copy_storage(w_self, start, other, w_other, other_start, count)
+        return True
 CharacterOrNilStrategy._convert_storage_from = CharacterOrNilStrategy._better_convert_storage_from
 CharacterOrNilStrategy.instantiate_type = CharacterOrNilStrategy
 
@@ -284,12 +324,19 @@ class FloatOrNilStrategy(SimpleStorageStrategy):
     repr_classname = "FloatOrNilStrategy"
     import_from_mixin(rstrat.TaggingStrategy)
     import_from_mixin(OptimizedConvertFromAllNilMixin)
+    import_from_mixin(CopyStorageMixin)
     contained_type = W_Float
     tag_float = sys.float_info.max
     def wrap(self, val): return self.space.wrap_float(val)
     def unwrap(self, w_val): return self.space.unwrap_float(w_val)
     def wrapped_tagged_value(self): return self.space.w_nil
     def unwrapped_tagged_value(self): return self.tag_float
+    def copy_storage_from(self, w_self, start, w_other, other_start, count):
+        other = w_other._get_strategy()
+        if not isinstance(other, FloatOrNilStrategy):
+            return False
+        self._copy_storage(w_self, start, other, w_other, other_start, count)
+        return True
 FloatOrNilStrategy._convert_storage_from = FloatOrNilStrategy._better_convert_storage_from
 FloatOrNilStrategy.instantiate_type = FloatOrNilStrategy
 
@@ -301,6 +348,9 @@ class AllNilStrategy(SimpleStorageStrategy):
     repr_classname = "AllNilStrategy"
     import_from_mixin(rstrat.SingleValueStrategy)
     def value(self): return self.space.w_nil
+    def copy_storage_from(self, w_self, start, w_other, other_start, count):
+        # nil over nil
+        return isinstance(w_other._get_strategy(), AllNilStrategy)
 AllNilStrategy.instantiate_type = AllNilStrategy
 
 class StrategyFactory(rstrat.StrategyFactory):
@@ -495,3 +545,37 @@ class ObserveeShadow(AbstractGenericShadow):
             raise RuntimeError('Meant to be observed by only one observer, so far')
         self.observer = observer
 ObserveeShadow.instantiate_type = ObserveeShadow
+
+
+class ProcessListsShadow(AbstractGenericShadow):
+    """
+    Shadow of the array of process lists of the ProcessorScheduler. Storing
+    another list into it invalidates the ready-queue bitmap of the space.
+    """
+    repr_classname = "ProcessListsShadow"
+
+    def store(self, w_self, n0, w_value):
+        AbstractGenericShadow.store(self, w_self, n0, w_value)
+        self.space.ready_queues.invalidate(w_self)
+ProcessListsShadow.instantiate_type = ProcessListsShadow
+
+
+class ProcessListShadow(AbstractGenericShadow):
+    """
+    Shadow of one LinkedList of the ProcessorScheduler. Every store of its
+    first link, by the VM or by image code, updates the ready-queue bit of
+    its priority.
+    """
+    _attrs_ = ['index0']
+    repr_classname = "ProcessListShadow"
+
+    def __init__(self, space, w_self, size, w_class):
+        AbstractGenericShadow.__init__(self, space, w_self, size, w_class)
+        self.index0 = -1
+
+    def store(self, w_self, n0, w_value):
+        AbstractGenericShadow.store(self, w_self, n0, w_value)
+        if n0 == 0:
+            self.space.ready_queues.note_first_link(
+                self.space, self.index0, w_self, w_value)
+ProcessListShadow.instantiate_type = ProcessListShadow
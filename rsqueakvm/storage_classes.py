@@ -296,6 +296,18 @@ class ClassShadow(AbstractCachingShadow):
 
     @elidable_for_version(1)
     def lookup(self, w_selector):
+        # The elidable wrapper makes this free in traces where the class is a
+        # constant. Everywhere else (interpreter, bridges, residual calls) we
+        # go through the global cache, which is invalidated by our version.
+        method_cache = self.space.method_cache
+        index = method_cache.probe(self, w_selector)
+        if index >= 0:
+            return method_cache.methods[index]
+        w_method = self.lookup_uncached(w_selector)
+        method_cache.fill(self, w_selector, w_method)
+        return w_method
+
+    def lookup_uncached(self, w_selector):
         look_in_shadow = self
         while look_in_shadow is not None:
             w_method = look_in_shadow.s_methoddict().find_selector(w_selector)
@@ -305,6 +317,8 @@ class ClassShadow(AbstractCachingShadow):
         return None
 
     def changed(self):
+        # A fresh version also invalidates all entries of this class and its
+        # subclasses in the global method cache.
         self.superclass_changed(Version())
 
     # this is done, because the class-hierarchy contains cycles
@@ -339,11 +353,55 @@ class ClassShadow(AbstractCachingShadow):
         assert not isinstance(w_selector, str)
         self.initialize_methoddict()
         self.s_methoddict().methoddict[w_selector] = w_method
+        self.changed()
         if isinstance(w_method, W_CompiledMethod):
             w_method.compiledin_class = self.w_self()
 ClassShadow.instantiate_type = ClassShadow
 
 
+class MethodCache(object):
+    """A global, direct-mapped (class, selector) -> method cache.
+
+    Entries are tagged with the version of the class shadow they were filled
+    for. Any change to a class or its superclasses (including a resync of its
+    method dictionary) installs a new version, so stale entries simply never
+    match again and there is no need to flush explicitly.
+    """
+    _attrs_ = ["mask", "classes", "selectors", "versions", "methods",
+               "hits", "misses"]
+
+    def __init__(self, size=constants.METHOD_CACHE_SIZE):
+        assert size > 0 and size & (size - 1) == 0, "size must be a power of 2"
+        self.mask = size - 1
+        self.classes = [None] * size
+        self.selectors = [None] * size
+        self.versions = [None] * size
+        self.methods = [None] * size
+        self.hits = 0
+        self.misses = 0
+
+    def _index(self, s_class, w_selector):
+        return ((objectmodel.compute_identity_hash(s_class) ^
+                 objectmodel.compute_identity_hash(w_selector)) & self.mask)
+
+    def probe(self, s_class, w_selector):
+        index = self._index(s_class, w_selector)
+        if (self.selectors[index] is w_selector and
+                self.classes[index] is s_class and
+                self.versions[index] is s_class.version):
+            self.hits += 1
+            return index
+        self.misses += 1
+        return -1
+
+    def fill(self, s_class, w_selector, w_method):
+        index = self._index(s_class, w_selector)
+        self.classes[index] = s_class
+        self.selectors[index] = w_selector
+        self.versions[index] = s_class.version
+        self.methods[index] = w_method
+
+
 class MethodDictionaryShadow(AbstractGenericShadow):
     _immutable_fields_ = ['s_class']
     _attrs_ = ['methoddict', 's_class']
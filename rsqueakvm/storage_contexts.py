@@ -572,11 +572,11 @@ class ContextPartShadow(AbstractStrategy):
     # ______________________________________________________________________
     # Primitive support
 
-    def store_instances_array(self, w_class, match_w):
-        # used for primitives 77 & 78
+    def store_instances_array(self, w_class, index):
+        # used for primitives 77 & 78, index is a storage.InstancesIndex
         if self.get_extra_data().instances_w is None:
             self.get_extra_data().instances_w = {}
-        self.get_extra_data().instances_w[w_class] = match_w
+        self.get_extra_data().instances_w[w_class] = index
 
     def instances_array(self, w_class):
         if self.get_extra_data().instances_w is None:
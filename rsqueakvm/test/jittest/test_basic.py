@@ -18,6 +18,9 @@ class TestBasic(BaseJITTest):
         setfield_gc(ConstPtr(ptr71), i70, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 32>),
         i73 = int_le(i70, 0),
         guard_false(i73, descr=<Guard0x9c13130>),
+        i1073 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1074 = int_is_true(i1073),
+        guard_false(i1074, descr=<Guard0x9c13130>),
         jump(p0, p3, i60, p12, p14, p16, p18, p20, p22, p24, p26, p28, p30, p32, p34, p36, p38, i61, descr=TargetToken(53667152))
         """)
 
@@ -38,6 +41,9 @@ class TestBasic(BaseJITTest):
         setfield_gc(ConstPtr(ptr71), i70, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 32>),
         i73 = int_le(i70, 0),
         guard_false(i73, descr=<Guard0x9c13130>),
+        i1073 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1074 = int_is_true(i1073),
+        guard_false(i1074, descr=<Guard0x9c13130>),
         jump(p0, p3, p4, i5, i6, p7, i8, i9, p11, p12, p13, i85, p22, p24, p26, p28, p30, p32, p34, p36, p38, p40, p42, p44, p46, p61, i86, descr=TargetToken(149146648))]
         """)
 
@@ -62,6 +68,9 @@ class TestBasic(BaseJITTest):
         setfield_gc(ConstPtr(ptr71), i70, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 32>),
         i73 = int_le(i70, 0),
         guard_false(i73, descr=<Guard0x9c13130>),
+        i1073 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1074 = int_is_true(i1073),
+        guard_false(i1074, descr=<Guard0x9c13130>),
         jump(p0, p3, p4, i5, i6, p7, i8, i9, p11, p12, p13, i72, p22, p24, p26, p28, p30, p32, p34, p36, p38, p40, p42, p44, p46, i73, descr=TargetToken(158683952))
         """)
 
@@ -90,6 +99,9 @@ class TestBasic(BaseJITTest):
         setfield_gc(ConstPtr(ptr71), i70, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 32>),
         i74 = int_le(i70, 0),
         guard_false(i74, descr=<Guard0x9c13130>),
+        i1074 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1075 = int_is_true(i1074),
+        guard_false(i1075, descr=<Guard0x9c13130>),
         jump(p0, p3, i73, p8, p10, p12, p14, p20, p22, p24, p26, p28, p30, p32, p34, p36, p38, p40, p42, p44, p46, i74, descr=TargetToken(48821968))
         """)
 
@@ -118,6 +130,9 @@ class TestBasic(BaseJITTest):
             setfield_gc(ConstPtr(ptr177), i604, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 24>),
             i605 = int_le(i604, 0),
             guard_false(i605, descr=<Guard0x37cb6d0>),
+            i1605 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+            i1606 = int_is_true(i1605),
+            guard_false(i1606, descr=<Guard0x37cb6d0>),
             i606 = int_le(i603, i187),
             guard_true(i606, descr=<Guard0x37cb3d0>),
             guard_not_invalidated(descr=<Guard0x37cb290>),
@@ -326,7 +341,10 @@ class TestBasic(BaseJITTest):
             i771 = int_sub(i604, 11)
             setfield_gc(ConstPtr(ptr177), i771, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 24>)
             i772 = int_le(i771, 0)
-            guard_false(i772, descr=<Guard0x2f34890>)
+            guard_false(i772, descr=<Guard0x2f34890>),
+            i1772 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+            i1773 = int_is_true(i1772),
+            guard_false(i1773, descr=<Guard0x2f34890>)
             p773 = new_with_vtable(23083336)
             setfield_gc(p773, i769, descr=<FieldS rsqueakvm.model.numeric.W_SmallInteger.inst_value 8>)
             setarrayitem_gc(p147, 34, p773, descr=<ArrayP 4>)
@@ -366,6 +384,9 @@ class TestBasic(BaseJITTest):
         setfield_gc(ConstPtr(ptr71), i70, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 32>),
         i73 = int_le(i70, 0),
         guard_false(i73, descr=<Guard0x9c13130>),
+        i1073 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1074 = int_is_true(i1073),
+        guard_false(i1074, descr=<Guard0x9c13130>),
         jump(p0, p3, p4, i5, i6, p7, i8, i9, p11, p12, p13, p16, i69, p24, p26, p28, p30, p32, p34, p36, p38, p40, p42, p44, p46, i70, descr=TargetToken(152642232))
         """)
 
@@ -387,6 +408,9 @@ class TestBasic(BaseJITTest):
         setfield_gc(ConstPtr(ptr71), i70, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 32>),
         i73 = int_le(i70, 0),
         guard_false(i73, descr=<Guard0x9c13130>),
+        i1073 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1074 = int_is_true(i1073),
+        guard_false(i1074, descr=<Guard0x9c13130>),
         i144 = arraylen_gc(p62, descr=<ArrayP 4>),
         jump(p0, p3, p4, i5, i6, p7, i8, i9, p11, p12, p13, p16, i141, p24, p26, p28, p30, p32, p34, p36, p38, p40, p42, p44, p46, p62, p84, i142, p114, descr=TargetToken(154312720))]
         """)
@@ -408,7 +432,10 @@ class TestBasic(BaseJITTest):
             i74 = int_sub(i64, 1)
             setfield_gc(ConstPtr(ptr75), i74, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 24>)
             i77 = int_le(i74, 0)
-            guard_false(i77, descr=<Guard0x21a5408>)
+            guard_false(i77, descr=<Guard0x21a5408>),
+            i1077 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+            i1078 = int_is_true(i1077),
+            guard_false(i1078, descr=<Guard0x21a5408>)
             jump(p0, p3, p4, i5, p6, p8, p9, p10, p13, p15, i72, p23, p25, p27, p29, p31, p33, p35, p37, p39, p41, p43, i57, i74, descr=TargetToken(37966400))
             """)
         else:
@@ -440,7 +467,10 @@ class TestBasic(BaseJITTest):
             i143 = int_sub(i100, 1)
             setfield_gc(ConstPtr(ptr144), i143, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 32>)
             i146 = int_le(i143, 0)
-            guard_false(i146, descr=<Guard0x343f690>)
+            guard_false(i146, descr=<Guard0x343f690>),
+            i1146 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+            i1147 = int_is_true(i1146),
+            guard_false(i1147, descr=<Guard0x343f690>)
             jump(p0, p1, i2, p3, p4, p7, p8, p10, p13, p15, i141, p23, p25, p27, p29, p31, p33, p35, p37, p39, p41, p43, i55, f57, i143, descr=TargetToken(55003392))
             """)
 
@@ -478,7 +508,10 @@ class TestBasic(BaseJITTest):
             i135 = int_sub(i95, 1)
             setfield_gc(ConstPtr(ptr136), i135, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 32>)
             i138 = int_le(i135, 0)
-            guard_false(i138, descr=<Guard0x346e72c>)
+            guard_false(i138, descr=<Guard0x346e72c>),
+            i1138 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+            i1139 = int_is_true(i1138),
+            guard_false(i1139, descr=<Guard0x346e72c>)
             jump(p0, p1, i2, p3, p4, p7, p8, p10, p13, p15, i133, p23, p25, p27, p29, p31, p33, p35, p37, p39, p41, p43, p55, i135, descr=TargetToken(55196036))
             """)
         else:
@@ -496,7 +529,10 @@ class TestBasic(BaseJITTest):
             i83 = int_sub(i67, 1)
             setfield_gc(ConstPtr(ptr84), i83, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 24>)
             i86 = int_le(i83, 0)
-            guard_false(i86, descr=<Guard0x7f81bd321e30>)
+            guard_false(i86, descr=<Guard0x7f81bd321e30>),
+            i1086 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+            i1087 = int_is_true(i1086),
+            guard_false(i1087, descr=<Guard0x7f81bd321e30>)
             jump(p0, p1, i2, p4, p5, p6, p8, p11, p13, i81, p21, p23, p25, p27, p29, p31, p33, p35, p37, p39, p41, i56, i52, i83, descr=TargetToken(29952464))
             """)
 
@@ -529,7 +565,10 @@ class TestBasic(BaseJITTest):
             i122 = int_sub(i91, 1)
             setfield_gc(ConstPtr(ptr123), i122, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 32>)
             i125 = int_le(i122, 0)
-            guard_false(i125, descr=<Guard0x353f690>)
+            guard_false(i125, descr=<Guard0x353f690>),
+            i1125 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+            i1126 = int_is_true(i1125),
+            guard_false(i1126, descr=<Guard0x353f690>)
             jump(p0, p1, i2, p3, p4, p7, p8, p10, p13, p15, i120, p23, p25, p27, p29, p31, p33, p35, p37, p39, p41, p43, i55, f57, i68, i122, descr=TargetToken(56051968))
             """)
         else:
@@ -547,7 +586,10 @@ class TestBasic(BaseJITTest):
             i83 = int_sub(i67, 1)
             setfield_gc(ConstPtr(ptr84), i83, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 24>)
             i86 = int_le(i83, 0)
-            guard_false(i86, descr=<Guard0x7fccf8891e30>)
+            guard_false(i86, descr=<Guard0x7fccf8891e30>),
+            i1086 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+            i1087 = int_is_true(i1086),
+            guard_false(i1087, descr=<Guard0x7fccf8891e30>)
             jump(p0, p1, i2, p4, p5, p6, p8, p11, p13, i81, p21, p23, p25, p27, p29, p31, p33, p35, p37, p39, p41, i56, i52, i83, descr=TargetToken(35670240))
             """)
 
@@ -570,6 +612,9 @@ class TestBasic(BaseJITTest):
         setfield_gc(ConstPtr(ptr71), i70, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 32>),
         i73 = int_le(i70, 0),
         guard_false(i73, descr=<Guard0x9c13130>),
+        i1073 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1074 = int_is_true(i1073),
+        guard_false(i1074, descr=<Guard0x9c13130>),
         jump(p0, p3, p4, i5, i6, p7, i8, i9, p11, p12, p13, p16, p18, i102, p26, p28, p30, p32, p34, p36, p38, p40, p42, p44, p46, p65, i83, i103, p79, descr=TargetToken(181116944))
         """)
 
@@ -592,6 +637,9 @@ class TestBasic(BaseJITTest):
             setfield_gc(ConstPtr(ptr71), i70, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 32>),
             i78 = int_le(i70, 0),
             guard_false(i78, descr=<Guard0x9c13130>),
+            i1078 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+            i1079 = int_is_true(i1078),
+            guard_false(i1079, descr=<Guard0x9c13130>),
             jump(p0, p3, p4, i5, i6, p7, i8, i9, p11, p12, p13, p16, p18, i75, p26, p28, p30, p32, p34, p36, p38, p40, p42, p44, p46, i58, i76, descr=TargetToken(169079000))
             """)
         else:
@@ -604,7 +652,10 @@ class TestBasic(BaseJITTest):
             i74 = int_sub(i64, 1)
             setfield_gc(ConstPtr(ptr75), i74, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 24>)
             i77 = int_le(i74, 0)
-            guard_false(i77, descr=<Guard0x1f11408>)
+            guard_false(i77, descr=<Guard0x1f11408>),
+            i1077 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+            i1078 = int_is_true(i1077),
+            guard_false(i1078, descr=<Guard0x1f11408>)
             jump(p0, p3, p4, i5, p6, p8, p9, p10, p13, p15, i72, p23, p25, p27, p29, p31, p33, p35, p37, p39, p41, p43, i57, i74, descr=TargetToken(35156544))
             """)
 
@@ -627,6 +678,9 @@ class TestBasic(BaseJITTest):
             setfield_gc(ConstPtr(ptr71), i70, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 32>),
             i78 = int_le(i70, 0),
             guard_false(i78, descr=<Guard0x9c13130>),
+            i1078 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+            i1079 = int_is_true(i1078),
+            guard_false(i1079, descr=<Guard0x9c13130>),
             jump(p0, p3, p4, i5, i6, p7, i8, i9, p11, p12, p13, p16, p18, i75, p26, p28, p30, p32, p34, p36, p38, p40, p42, p44, p46, i58, i76, descr=TargetToken(169079000))
             """)
         else:
@@ -639,7 +693,10 @@ class TestBasic(BaseJITTest):
             i74 = int_sub(i64, 1)
             setfield_gc(ConstPtr(ptr75), i74, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 24>)
             i77 = int_le(i74, 0)
-            guard_false(i77, descr=<Guard0x2bf7408>)
+            guard_false(i77, descr=<Guard0x2bf7408>),
+            i1077 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+            i1078 = int_is_true(i1077),
+            guard_false(i1078, descr=<Guard0x2bf7408>)
             jump(p0, p3, p4, i5, p6, p8, p9, p10, p13, p15, i72, p23, p25, p27, p29, p31, p33, p35, p37, p39, p41, p43, i57, i74, descr=TargetToken(48681536))
             """)
 
@@ -672,7 +729,10 @@ class TestBasic(BaseJITTest):
         i112 = int_sub(i89, 1)
         setfield_gc(ConstPtr(ptr113), i112, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 32>)
         i115 = int_le(i112, 0)
-        guard_false(i115, descr=<Guard0xab94690>)
+        guard_false(i115, descr=<Guard0xab94690>),
+        i1115 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1116 = int_is_true(i1115),
+        guard_false(i1116, descr=<Guard0xab94690>)
         jump(p0, p1, i2, p3, p4, p7, p8, p10, p13, i110, p23, p25, p27, p29, p31, p33, p35, p37, p39, p41, p43, i73, p72, i112, descr=TargetToken(180086732))
         """)
 
@@ -697,6 +757,9 @@ class TestBasic(BaseJITTest):
         setfield_gc(ConstPtr(ptr71), i70, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 32>),
         i73 = int_le(i70, 0),
         guard_false(i73, descr=<Guard0x9c13130>),
+        i1073 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1074 = int_is_true(i1073),
+        guard_false(i1074, descr=<Guard0x9c13130>),
         i137 = arraylen_gc(p71, descr=<ArrayP 4>)
         i138 = arraylen_gc(p81, descr=<ArrayP 4>)
         i139 = arraylen_gc(p98, descr=<ArrayS 4>)
@@ -728,7 +791,10 @@ class TestBasic(BaseJITTest):
             i93 = int_sub(i74, 1)
             setfield_gc(ConstPtr(ptr94), i93, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 24>)
             i96 = int_le(i93, 0)
-            guard_false(i96, descr=<Guard0x2d4d8e8>)
+            guard_false(i96, descr=<Guard0x2d4d8e8>),
+            i1096 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+            i1097 = int_is_true(i1096),
+            guard_false(i1097, descr=<Guard0x2d4d8e8>)
             jump(p0, p1, i2, p3, p4, p7, p8, p10, p13, p15, i91, p23, p25, p27, p29, p31, p33, p35, p37, p39, p41, p43, p55, i93, descr=TargetToken(47620368))
             """)
         else:
@@ -752,7 +818,10 @@ class TestBasic(BaseJITTest):
             i101 = int_sub(i78, 1)
             setfield_gc(ConstPtr(ptr102), i101, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 32>)
             i104 = int_le(i101, 0)
-            guard_false(i104, descr=<Guard0x351e65c>)
+            guard_false(i104, descr=<Guard0x351e65c>),
+            i1104 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+            i1105 = int_is_true(i1104),
+            guard_false(i1105, descr=<Guard0x351e65c>)
             jump(p0, p1, i2, p3, p4, p7, p8, p10, p13, p15, i99, p23, p25, p27, p29, p31, p33, p35, p37, p39, p41, p43, p55, i101, descr=TargetToken(55924992))
             """)
 
@@ -773,6 +842,9 @@ class TestBasic(BaseJITTest):
         i82 = int_sub(i71, 1)
         setfield_gc(ConstPtr(ptr83), i82, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 24>)
         i85 = int_le(i82, 0)
-        guard_false(i85, descr=<Guard0x39d7540>)
+        guard_false(i85, descr=<Guard0x39d7540>),
+        i1085 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1086 = int_is_true(i1085),
+        guard_false(i1086, descr=<Guard0x39d7540>)
         jump(p0, p1, i2, p3, p4, p7, p8, p10, p13, p15, i80, p23, p25, p27, p29, p31, p33, p35, p37, p39, p41, p43, f63, i82, descr=TargetToken(60603936))
         """)
@@ -0,0 +1,28 @@
+import re
+import subprocess
+
+from .base import BaseJITTest
+
+
+class TestInterpreterThroughput(BaseJITTest):
+    """Not a trace test: runs the tiny benchmarks with the JIT switched off
+    and without timer interrupts, to track the plain interpreter loop."""
+
+    def run_interpreter_only(self, spy, tmpdir, code):
+        proc = spy.popen(
+            "--silent", "-i", "-j", "off", "-r", code, self.test_image,
+            cwd=str(tmpdir),
+            stdout=subprocess.PIPE,
+            env={"SDL_VIDEODRIVER": "dummy"}
+        )
+        out, _ = proc.communicate()
+        return out
+
+    def test_bytecodes_per_second(self, spy, tmpdir):
+        out = self.run_interpreter_only(spy, tmpdir, "1 tinyBenchmarks")
+        match = re.search(r"([0-9,]+) bytecodes/sec; ([0-9,]+) sends/sec", out)
+        assert match, out
+        bytecodes = int(match.group(1).replace(",", ""))
+        sends = int(match.group(2).replace(",", ""))
+        assert bytecodes > 0 and sends > 0
+        print "interpreter only: %d bytecodes/sec, %d sends/sec" % (bytecodes, sends)
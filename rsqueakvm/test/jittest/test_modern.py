@@ -33,7 +33,10 @@ i := 1.' classified: 'none' withStamp: nil notifying: nil logSource: false.
         i100 = int_sub(i83, 1)
         setfield_gc(ConstPtr(ptr101), i100, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 24>)
         i103 = int_le(i100, 0)
-        guard_false(i103, descr=<Guard0xb06c498>)
+        guard_false(i103, descr=<Guard0xb06c498>),
+        i1103 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1104 = int_is_true(i1103),
+        guard_false(i1104, descr=<Guard0xb06c498>)
         jump(p0, p1, i2, p3, p4, p7, p8, p10, p13, i98, p21, p23, p25, p27, p29, p31, p33, p35, p37, p39, p41, p43, i100, descr=TargetToken(183580560))
         """)
 
@@ -88,6 +91,9 @@ i := n' classified: 'none' withStamp: nil notifying: nil logSource: false.
         setfield_gc(ConstPtr(ptr71), i70, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 32>),
         i73 = int_le(i70, 0),
         guard_false(i73, descr=<Guard0x9c13130>),
+        i1073 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1074 = int_is_true(i1073),
+        guard_false(i1074, descr=<Guard0x9c13130>),
         i72 = arraylen_gc(p65, descr=<ArrayP 4>)
         jump(p0, p1, i2, p3, p6, p7, i8, i9, p10, p11, i13, p14, p17, i71, p25, p27, p29, p31, p33, p35, p37, p39, p41, p43, p45, p47, p65, descr=TargetToken(231309508))
         """)
@@ -107,6 +113,9 @@ i := n' classified: 'none' withStamp: nil notifying: nil logSource: false.
         setfield_gc(ConstPtr(ptr71), i70, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 32>),
         i74 = int_le(i73, 0),
         guard_false(i74, descr=<Guard0x9c13130>),
+        i1074 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1075 = int_is_true(i1074),
+        guard_false(i1075, descr=<Guard0x9c13130>),
         i72 = arraylen_gc(p65, descr=<ArrayP 4>)
         jump(p0, p1, i2, p3, p6, p7, i8, i9, p10, p11, i13, p14, p17, i71, p25, p27, p29, p31, p33, p35, p37, p39, p41, p43, p45, p47, p65, descr=TargetToken(231309508))
         """)
@@ -164,7 +173,10 @@ i := n' classified: 'none' withStamp: nil notifying: nil logSource: false.
         i171 = int_sub(i166, 1)
         setfield_gc(ConstPtr(ptr163), i171, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 20>)
         i172 = int_le(i171, 0)
-        guard_false(i172, descr=<Guard0xe445c9c>)
+        guard_false(i172, descr=<Guard0xe445c9c>),
+        i1172 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1173 = int_is_true(i1172),
+        guard_false(i1173, descr=<Guard0xe445c9c>)
         i174 = arraylen_gc(p61, descr=<ArrayP 4>)
         i175 = arraylen_gc(p68, descr=<ArrayP 4>)
         i176 = arraylen_gc(p94, descr=<ArrayP 4>)
@@ -214,7 +226,10 @@ i := n' classified: 'none' withStamp: nil notifying: nil logSource: false.
         i236 = int_sub(i231, 3)
         setfield_gc(ConstPtr(ptr228), i236, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 20>)
         i237 = int_le(i236, 0)
-        guard_false(i237, descr=<Guard0xdba7380>)
+        guard_false(i237, descr=<Guard0xdba7380>),
+        i1237 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1238 = int_is_true(i1237),
+        guard_false(i1238, descr=<Guard0xdba7380>)
         i240 = arraylen_gc(p86, descr=<ArrayP 4>)
         i241 = arraylen_gc(p89, descr=<ArrayP 4>)
         i242 = arraylen_gc(p97, descr=<ArrayP 4>)
@@ -244,6 +259,9 @@ i := n' classified: 'none' withStamp: nil notifying: nil logSource: false.
         setfield_gc(ConstPtr(ptr71), i70, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 32>),
         i73 = int_le(i70, 0),
         guard_false(i73, descr=<Guard0x9c13130>),
+        i1073 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1074 = int_is_true(i1073),
+        guard_false(i1074, descr=<Guard0x9c13130>),
         jump(p0, p3, p4, i5, i6, p7, i8, i9, p11, p12, p13, i93, p22, p24, p26, p28, p30, p32, p34, p36, p38, p40, p42, p44, p46, i94, p68, descr=TargetToken(312516328))
         """)
         # self.assert_matches(traces[0].bridges[0], """
@@ -285,6 +303,9 @@ i := n' classified: 'none' withStamp: nil notifying: nil logSource: false.
         setfield_gc(ConstPtr(ptr71), i70, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 32>),
         i73 = int_le(i70, 0),
         guard_false(i73, descr=<Guard0x9c13130>),
+        i1073 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1074 = int_is_true(i1073),
+        guard_false(i1074, descr=<Guard0x9c13130>),
         jump(p0, p3, p4, i5, i6, p7, i8, i9, p11, p12, p13, i93, p22, p24, p26, p28, p30, p32, p34, p36, p38, p40, p42, p44, p46, i94, p68, descr=TargetToken(312516328))
         """)
 
@@ -344,7 +365,10 @@ i := n' classified: 'none' withStamp: nil notifying: nil logSource: false.
         i109 = int_sub(i94, 1)
         setfield_gc(ConstPtr(ptr110), i109, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 24>)
         i112 = int_le(i109, 0)
-        guard_false(i112, descr=<Guard0x5608cf1a95a8>)
+        guard_false(i112, descr=<Guard0x5608cf1a95a8>),
+        i1112 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1113 = int_is_true(i1112),
+        guard_false(i1113, descr=<Guard0x5608cf1a95a8>)
         i114 = arraylen_gc(p58, descr=<ArrayS 8>)
         i115 = arraylen_gc(p77, descr=<ArrayP 8>)
         jump(p0, p1, i2, p4, p6, p7, p9, p12, i100, i102, p18, i106, p26, p28, p30, p32, p34, p36, p38, p40, p42, p44, i55, p58, i64, i60, p77, p75, p83, p79, i88, i109, descr=TargetToken(94595864608128))
@@ -597,7 +621,10 @@ i := n' classified: 'none' withStamp: nil notifying: nil logSource: false.
             i171 = int_sub(i119, 1)
             setfield_gc(ConstPtr(ptr172), i171, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 24>)
             i174 = int_le(i171, 0)
-            guard_false(i174, descr=<Guard0xa8d2088>)
+            guard_false(i174, descr=<Guard0xa8d2088>),
+            i1174 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+            i1175 = int_is_true(i1174),
+            guard_false(i1175, descr=<Guard0xa8d2088>)
             i175 = arraylen_gc(p55, descr=<ArrayP 8>)
             jump(p0, p1, i2, p3, p4, p7, p8, p10, i129, i169, p23, p25, p27, p29, p31, p33, p35, p37, p39, p41, p43, p55, p57, i171, descr=TargetToken(175413136))
             """)
@@ -643,7 +670,10 @@ i := n' classified: 'none' withStamp: nil notifying: nil logSource: false.
             i191 = int_sub(i129, 1)
             setfield_gc(ConstPtr(ptr192), i191, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 32>)
             i194 = int_le(i191, 0)
-            guard_false(i194, descr=<Guard0x94416c4>)
+            guard_false(i194, descr=<Guard0x94416c4>),
+            i1194 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+            i1195 = int_is_true(i1194),
+            guard_false(i1195, descr=<Guard0x94416c4>)
             i195 = arraylen_gc(p55, descr=<ArrayP 4>)
             jump(p0, p1, i2, p3, p4, p7, p8, p10, i125, i189, p23, p25, p27, p29, p31, p33, p35, p37, p39, p41, p43, p55, p57, i191, descr=TargetToken(155445900))
             """)
@@ -687,7 +717,10 @@ i := n' classified: 'none' withStamp: nil notifying: nil logSource: false.
             i161 = int_sub(i124, 1)
             setfield_gc(ConstPtr(ptr162), i161, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 24>)
             i164 = int_le(i161, 0)
-            guard_false(i164, descr=<Guard0xa8ca1c0>)
+            guard_false(i164, descr=<Guard0xa8ca1c0>),
+            i1164 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+            i1165 = int_is_true(i1164),
+            guard_false(i1165, descr=<Guard0xa8ca1c0>)
             i165 = arraylen_gc(p55, descr=<ArrayP 8>)
             i166 = arraylen_gc(p76, descr=<ArrayP 8>)
             jump(p0, p1, i2, p3, p4, p7, p8, p10, i155, i159, p23, p25, p27, p29, p31, p33, p35, p37, p39, p41, p43, p55, p57, p59, p76, p78, i161, descr=TargetToken(176747472))
@@ -708,7 +741,10 @@ i := n' classified: 'none' withStamp: nil notifying: nil logSource: false.
             i122 = int_sub(i105, 1)
             setfield_gc(ConstPtr(ptr123), i122, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 32>)
             i125 = int_le(i122, 0)
-            guard_false(i125, descr=<Guard0x955a454>)
+            guard_false(i125, descr=<Guard0x955a454>),
+            i1125 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+            i1126 = int_is_true(i1125),
+            guard_false(i1126, descr=<Guard0x955a454>)
             i127 = arraylen_gc(p55, descr=<ArrayP 4>)
             i128 = arraylen_gc(p76, descr=<ArrayP 4>)
             jump(p0, p1, i2, p3, p4, p7, p8, p10, i120, p23, p25, p27, p29, p31, p33, p35, p37, p39, p41, p43, p55, p57, p59, p76, p78, i122, descr=TargetToken(156580140))
@@ -790,7 +826,10 @@ i := n' classified: 'none' withStamp: nil notifying: nil logSource: false.
         i205 = int_sub(i203, 1)
         setfield_gc(ConstPtr(ptr206), i205, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 24>)
         i208 = int_le(i205, 0)
-        guard_false(i208, descr=<Guard0x55adaa6b2ff8>)
+        guard_false(i208, descr=<Guard0x55adaa6b2ff8>),
+        i1208 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1209 = int_is_true(i1208),
+        guard_false(i1209, descr=<Guard0x55adaa6b2ff8>)
         jump(p0, p1, i2, p4, p6, p7, p9, p12, i201, p20, p22, p24, p26, p28, p30, p32, p34, p36, p38, p40, p42, p197, p72, descr=TargetToken(94204432495648))
         """)
 
@@ -902,7 +941,10 @@ i := n' classified: 'none' withStamp: nil notifying: nil logSource: false.
         i284 = int_sub(i282, 1)
         setfield_gc(ConstPtr(ptr285), i284, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 24>)
         i287 = int_le(i284, 0)
-        guard_false(i287, descr=<Guard0x5599fb87c770>)
+        guard_false(i287, descr=<Guard0x5599fb87c770>),
+        i1287 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1288 = int_is_true(i1287),
+        guard_false(i1288, descr=<Guard0x5599fb87c770>)
         i288 = arraylen_gc(p77, descr=<ArrayP 8>)
         jump(p0, p1, i2, p4, p6, p7, p9, p12, i190, i192, p18, p258, p26, p28, p30, p32, p34, p36, p38, p40, p42, p44, p277, i55, p77, p75, p267, descr=TargetToken(94119868618880))
         """)
@@ -934,7 +976,10 @@ i := n' classified: 'none' withStamp: nil notifying: nil logSource: false.
         i85 = int_sub(i72, 1)
         setfield_gc(ConstPtr(ptr86), i85, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 24>)
         i88 = int_le(i85, 0)
-        guard_false(i88, descr=<Guard0x9facd88>)
+        guard_false(i88, descr=<Guard0x9facd88>),
+        i1088 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1089 = int_is_true(i1088),
+        guard_false(i1089, descr=<Guard0x9facd88>)
         jump(p0, p1, i2, p4, p5, p6, p8, p11, p13, i83, p21, p23, p25, p27, p29, p31, p33, p35, p37, p39, p41, i85, descr=TargetToken(166460720))
         """)
 
@@ -973,7 +1018,10 @@ i := n' classified: 'none' withStamp: nil notifying: nil logSource: false.
         i88 = int_sub(i75, 1)
         setfield_gc(ConstPtr(ptr89), i88, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 24>)
         i91 = int_le(i88, 0)
-        guard_false(i91, descr=<Guard0xafaf060>)
+        guard_false(i91, descr=<Guard0xafaf060>),
+        i1091 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1092 = int_is_true(i1091),
+        guard_false(i1092, descr=<Guard0xafaf060>)
         jump(p0, p1, i2, p4, p5, p6, p8, p11, p13, i86, p21, p23, p25, p27, p29, p31, p33, p35, p37, p39, p41, i88, descr=TargetToken(184206704))
         """)
 
@@ -1003,7 +1051,10 @@ i := n' classified: 'none' withStamp: nil notifying: nil logSource: false.
         i82 = int_sub(i69, 1)
         setfield_gc(ConstPtr(ptr83), i82, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 24>)
         i85 = int_le(i82, 0)
-        guard_false(i85, descr=<Guard0xb6057b0>)
+        guard_false(i85, descr=<Guard0xb6057b0>),
+        i1085 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1086 = int_is_true(i1085),
+        guard_false(i1086, descr=<Guard0xb6057b0>)
         jump(p0, p1, i2, p4, p5, p6, p8, p11, p13, i80, p21, p23, p25, p27, p29, p31, p33, p35, p37, p39, p41, i82, descr=TargetToken(189806080))
         """)
 
@@ -1031,7 +1082,10 @@ i := n' classified: 'none' withStamp: nil notifying: nil logSource: false.
         i80 = int_sub(i68, 1)
         setfield_gc(ConstPtr(ptr81), i80, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 24>)
         i83 = int_le(i80, 0)
-        guard_false(i83, descr=<Guard0x55d2d85d9678>)
+        guard_false(i83, descr=<Guard0x55d2d85d9678>),
+        i1083 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1084 = int_is_true(i1083),
+        guard_false(i1084, descr=<Guard0x55d2d85d9678>)
         jump(p0, p1, i2, p4, p6, p7, p9, p12, i78, p20, p22, p24, p26, p28, p30, p32, p34, p36, p38, p40, p42, p47, i80, descr=TargetToken(94364117135856))
         """)
 
@@ -1076,7 +1130,10 @@ i := n' classified: 'none' withStamp: nil notifying: nil logSource: false.
         i143 = int_sub(i114, 1)
         setfield_gc(ConstPtr(ptr144), i143, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 24>)
         i146 = int_le(i143, 0)
-        guard_false(i146, descr=<Guard0x55a7d3b0ef28>)
+        guard_false(i146, descr=<Guard0x55a7d3b0ef28>),
+        i1146 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1147 = int_is_true(i1146),
+        guard_false(i1147, descr=<Guard0x55a7d3b0ef28>)
         i148 = arraylen_gc(p70, descr=<ArrayP 8>)
         jump(p0, p1, i2, p4, p6, p7, p9, p12, p14, p16, p18, i141, p26, p28, p30, p32, p34, p36, p38, p40, p42, p47, p70, p72, i74, p79, i81, p84, i94, p93, i143, descr=TargetToken(94179317062640))
         """)
@@ -1110,7 +1167,10 @@ i := n' classified: 'none' withStamp: nil notifying: nil logSource: false.
         i122 = int_sub(i102, 1)
         setfield_gc(ConstPtr(ptr123), i122, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 24>)
         i125 = int_le(i122, 0)
-        guard_false(i125, descr=<Guard0x4f87198>)
+        guard_false(i125, descr=<Guard0x4f87198>),
+        i1125 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1126 = int_is_true(i1125),
+        guard_false(i1126, descr=<Guard0x4f87198>)
         i127 = arraylen_gc(p54, descr=<ArrayS 8>)
         jump(p0, p1, i2, p4, p5, p6, p8, p11, i108, i110, p17, p25, p27, p29, p31, p33, p35, p37, p39, p41, p43, i49, p54, i60, i56, i122, descr=TargetToken(111727328))
         """)
@@ -1165,7 +1225,10 @@ i := n' classified: 'none' withStamp: nil notifying: nil logSource: false.
         i256 = int_sub(i193, 1)
         setfield_gc(ConstPtr(ptr257), i256, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 24>)
         i259 = int_le(i256, 0)
-        guard_false(i259, descr=<Guard0x5557b0fb1cf8>)
+        guard_false(i259, descr=<Guard0x5557b0fb1cf8>),
+        i1259 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1260 = int_is_true(i1259),
+        guard_false(i1260, descr=<Guard0x5557b0fb1cf8>)
         p260 = force_token()
         p261 = new_with_vtable(descr=<SizeDescr 104>)
         p262 = new_with_vtable(descr=<SizeDescr 24>)
@@ -1246,6 +1309,9 @@ i := n' classified: 'none' withStamp: nil notifying: nil logSource: false.
         i332 = int_sub(i330, 1)
         setfield_gc(ConstPtr(ptr333), i332, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 24>)
         i335 = int_le(i332, 0)
-        guard_false(i335, descr=<Guard0x5557b0fb07d8>)
+        guard_false(i335, descr=<Guard0x5557b0fb07d8>),
+        i1335 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1336 = int_is_true(i1335),
+        guard_false(i1336, descr=<Guard0x5557b0fb07d8>)
         jump(p0, p1, i2, p4, p6, p7, p9, i328, p18, p20, p22, p24, p26, p28, p30, p32, p34, p36, p38, p40, p42, p324, i332, descr=TargetToken(93835149719440))
         """)
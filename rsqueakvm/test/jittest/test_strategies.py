@@ -80,6 +80,9 @@ class TestBasic(BaseJITTest):
              setfield_gc(ConstPtr(ptr82), i226, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 24>),
              i227 = int_le(i226, 0),
              guard_false(i227, descr=<Guard0x2ea3b90>),
+             i1227 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+             i1228 = int_is_true(i1227),
+             guard_false(i1228, descr=<Guard0x2ea3b90>),
              p228 = new_with_vtable(23083336),
              setfield_gc(p228, i219, descr=<FieldS rsqueakvm.model.numeric.W_SmallInteger.inst_value 8>),
              setarrayitem_gc(p208, 2, p228, descr=<ArrayP 4>),
@@ -120,7 +123,10 @@ class TestBasic(BaseJITTest):
         i143 = int_sub(i118, 1)
         setfield_gc(ConstPtr(ptr144), i143, descr=<FieldS rsqueakvm.interpreter.Interpreter.inst_interrupt_check_counter 24>)
         i146 = int_le(i143, 0)
-        guard_false(i146, descr=<Guard0x55eaf8028910>)
+        guard_false(i146, descr=<Guard0x55eaf8028910>),
+        i1146 = getarrayitem_raw(29360128, 0, descr=<ArrayS 8>),
+        i1147 = int_is_true(i1146),
+        guard_false(i1147, descr=<Guard0x55eaf8028910>)
         i148 = arraylen_gc(p78, descr=<ArrayP 8>)
         jump(p0, p1, i2, p4, p6, p7, p9, p12, p14, p16, i141, p20, p26, p28, p30, p32, p34, p36, p38, p40, p42, p44, p46, p48, i62, p78, p80, i82, p87, i89, p92, i102, p101, i111, i143, descr=TargetToken(94467662841280))
         """)
@@ -99,76 +99,67 @@ def test_fileplugin_dirdelete(monkeypatch):
     finally:
         monkeypatch.undo()
 
-def test_fileplugin_filewrite_bytes(monkeypatch):
-    def write(fd, data):
-        assert len(data) == 4
-        assert data == 'abcd'
-        return 4
-    monkeypatch.setattr(os, "write", write)
-
-    content = W_BytesObject(space, space.w_String, 4)
-    content.bytes = ["a", "b", "c", "d"]
+def test_fileplugin_filewrite_bytes():
+    content = W_BytesObject(space, space.w_String, 6)
+    content.setbytes(list("abcdef"))
+    r, w = os.pipe()
     try:
-        stack = [space.w(1), space.w(1), content, space.w(1), space.w(4)]
+        stack = [space.w(1), space.w(w), content, space.w(2), space.w(4)]
         w_c = external_call(space,
             'FilePlugin',
             'primitiveFileWrite',
             stack)
+        assert w_c.value == 4
+        assert os.read(r, 10) == 'bcde'
     finally:
-        monkeypatch.undo()
-
-def test_fileplugin_filewrite_words(monkeypatch):
-    def write(fd, data):
-        assert len(data) == 4
-        assert data == 'dcba'
-        return 4
-    monkeypatch.setattr(os, "write", write)
+        os.close(r)
+        os.close(w)
 
+def test_fileplugin_filewrite_words():
     content = W_WordsObject(space, space.w_String, 1)
     content.words = [rffi.r_uint(1633837924)]
+    r, w = os.pipe()
     try:
-        stack = [space.w(1), space.w(1), content, space.w(1), space.w(1)]
+        stack = [space.w(1), space.w(w), content, space.w(1), space.w(1)]
         w_c = external_call(space,
             'FilePlugin',
             'primitiveFileWrite',
             stack)
+        assert w_c.value == 1
+        assert os.read(r, 10) == 'dcba'
     finally:
-        monkeypatch.undo()
-
-def test_fileplugin_filewrite_float(monkeypatch):
-    def write(fd, data):
-        assert len(data) == 8
-        assert data == 'hgfedcba'
-        return 4
-    monkeypatch.setattr(os, "write", write)
+        os.close(r)
+        os.close(w)
 
+def test_fileplugin_filewrite_float():
     content = space.wrap_float(1.2926117907728089e+161)
-
+    r, w = os.pipe()
     try:
-        stack = [space.w(1), space.w(1), content, space.w(1), space.w(1)]
+        stack = [space.w(1), space.w(w), content, space.w(1), space.w(1)]
         w_c = external_call(space,
             'FilePlugin',
             'primitiveFileWrite',
             stack)
+        assert w_c.value == 1
+        assert os.read(r, 10) == 'hgfedcba'
     finally:
-        monkeypatch.undo()
-
-def test_fileplugin_filewrite_largeposint(monkeypatch):
-    def write(fd, data):
-        assert len(data) == 4
-        assert data == 'dcba'
-        return 4
-    monkeypatch.setattr(os, "write", write)
+        os.close(r)
+        os.close(w)
 
+def test_fileplugin_filewrite_largeposint():
     content = W_LargeIntegerWord(space, space.w_LargePositiveInteger, r_uint(1633837924), 4)
+    r, w = os.pipe()
     try:
-        stack = [space.w(1), space.w(1), content, space.w(1), space.w(4)]
+        stack = [space.w(1), space.w(w), content, space.w(1), space.w(4)]
         w_c = external_call(space,
             'FilePlugin',
             'primitiveFileWrite',
             stack)
+        assert w_c.value == 4
+        assert os.read(r, 10) == 'dcba'
     finally:
-        monkeypatch.undo()
+        os.close(r)
+        os.close(w)
 
 def test_fileplugin_filewrite_pointers(monkeypatch):
     with py.test.raises(PrimitiveFailedError):
@@ -177,23 +168,21 @@ def test_fileplugin_filewrite_pointers(monkeypatch):
             'primitiveFileWrite',
             [1, 1, None, 1, 1])
 
-def test_fileplugin_filewrite_bitmap(monkeypatch):
-    def write(fd, data):
-        assert len(data) == 4
-        assert data == 'dcba'
-        return 4
-    monkeypatch.setattr(os, "write", write)
-
+def test_fileplugin_filewrite_bitmap():
     content = W_DisplayBitmap(space, 1, 32)
     content._squeak_pixel_buffer[0] = rffi.r_uint(1633837924)
+    r, w = os.pipe()
     try:
-        stack = [space.w(1), space.w(1), content, space.w(1), space.w(1)]
+        stack = [space.w(1), space.w(w), content, space.w(1), space.w(1)]
         w_c = external_call(space,
             'FilePlugin',
             'primitiveFileWrite',
             stack)
+        assert w_c.value == 1
+        assert os.read(r, 10) == 'dcba'
     finally:
-        monkeypatch.undo()
+        os.close(r)
+        os.close(w)
 
 def test_fileplugin_dirdelete_raises(monkeypatch):
     def rmdir(dir_path):
@@ -270,6 +259,7 @@ def test_fileplugin_dir_lookup(monkeypatch):
         monkeypatch.undo()
 
 def test_fileplugin_file_open(monkeypatch):
+    from rsqueakvm.plugins import file_plugin
     required_mode = -1
     osopen = os.open
     def open(path, mode, perm):
@@ -287,22 +277,22 @@ def test_fileplugin_file_open(monkeypatch):
         assert external_call(space,
             'FilePlugin',
             'primitiveFileOpen',
-            [None, "new_file", True]).value == 32
+            [None, "new_file", True]).fd == 32
         required_mode = os.O_RDWR
         assert external_call(space,
             'FilePlugin',
             'primitiveFileOpen',
-            [None, __file__, True]).value == 32
+            [None, __file__, True]).fd == 32
         required_mode = os.O_RDONLY
         assert external_call(space,
             'FilePlugin',
             'primitiveFileOpen',
-            [None, __file__, False]).value == 32
+            [None, __file__, False]).fd == 32
         required_mode = os.O_RDONLY
         assert external_call(space,
             'FilePlugin',
             'primitiveFileOpen',
-            [None, __file__, False]).value == 32
+            [None, __file__, False]).fd == 32
         assert external_call(space,
             'FilePlugin',
             'primitiveFileOpen',
@@ -314,6 +304,7 @@ def test_fileplugin_file_open(monkeypatch):
                 [None, os.path.dirname(__file__), True])
     finally:
         monkeypatch.undo()
+        del file_plugin.open_handles[:]
 
 def test_fileplugin_file_close(monkeypatch):
     def doclose(fd): return
@@ -348,53 +339,58 @@ def test_fileplugin_file_atend(monkeypatch):
     finally:
         os.close(fd)
 
-def test_fileplugin_file_read(monkeypatch):
+def test_fileplugin_file_read():
     with py.test.raises(PrimitiveFailedError):
         external_call(space, 'FilePlugin', 'primitiveFileRead', [None, 32, None, 1, 12])
 
-    def raiseread(fd, count):
-        raise OSError
-    monkeypatch.setattr(os, "read", raiseread)
-    try:
-        with py.test.raises(PrimitiveFailedError):
-            external_call(space,
-                'FilePlugin',
-                'primitiveFileRead',
-                [None, 32, "hello", 1, 5])
-    finally:
-        monkeypatch.undo()
+    r, w = os.pipe()
+    os.close(w)
+    os.close(r)
+    with py.test.raises(PrimitiveFailedError):
+        external_call(space,
+            'FilePlugin',
+            'primitiveFileRead',
+            [None, r, "hello", 1, 5])
 
-    def read(fd, count):
-        assert count == len("hello")
-        return "hello"
-    monkeypatch.setattr(os, "read", read)
+    r, w = os.pipe()
     try:
         with py.test.raises(PrimitiveFailedError):
             external_call(space,
                 'FilePlugin',
                 'primitiveFileRead',
-                [None, 32, "123", 1, 5])
+                [None, r, "123", 1, 5])
         with py.test.raises(PrimitiveFailedError):
             external_call(space,
                 'FilePlugin',
                 'primitiveFileRead',
-                [None, 32, "12345", 2, 5])
+                [None, r, "12345", 2, 5])
 
+        os.write(w, "hello")
         w_out = space.w("123456")
         assert external_call(space,
             'FilePlugin',
             'primitiveFileRead',
-            [None, 32, w_out, 1, 5]).value == 5
+            [None, r, w_out, 1, 5]).value == 5
         assert w_out.unwrap_string(space) == "hello6"
 
+        os.write(w, "hello")
         w_out = space.w("123456")
         assert external_call(space,
             'FilePlugin',
             'primitiveFileRead',
-            [None, 32, w_out, 2, 5]).value == 5
+            [None, r, w_out, 2, 5]).value == 5
         assert w_out.unwrap_string(space) == "1hello"
+
+        os.write(w, "hi")
+        w_out = space.w("123456")
+        assert external_call(space,
+            'FilePlugin',
+            'primitiveFileRead',
+            [None, r, w_out, 2, 5]).value == 2
+        assert w_out.unwrap_string(space) == "1hi456"
     finally:
-        monkeypatch.undo()
+        os.close(r)
+        os.close(w)
 
 def test_fileplugin_file_get_position(monkeypatch):
     fd = os.open(__file__, os.O_RDONLY)
@@ -468,6 +464,152 @@ def test_fileplugin_file_truncate(monkeypatch):
     finally:
         monkeypatch.undo()
 
+def test_fileplugin_buffered_file(tmpdir):
+    from rsqueakvm.plugins import file_plugin
+    path = str(tmpdir.join("buffered.txt"))
+    w_file = external_call(space, 'FilePlugin', 'primitiveFileOpen', [None, path, True])
+    assert w_file in file_plugin.open_handles
+    assert external_call(space, 'FilePlugin', 'primitiveFileGetBufferSize',
+                         [None, w_file]).value == file_plugin.DEFAULT_BUFFER_SIZE
+    external_call(space, 'FilePlugin', 'primitiveFileSetBufferSize', [None, w_file, 16])
+    for char in "hello world":
+        assert external_call(space, 'FilePlugin', 'primitiveFileWrite',
+                             [None, w_file, space.wrap_string(char), 1, 1]).value == 1
+    # the writes are coalesced until the buffer is flushed
+    assert os.path.getsize(path) == 0
+    assert external_call(space, 'FilePlugin', 'primitiveFileSize', [None, w_file]).value == 11
+    assert external_call(space, 'FilePlugin', 'primitiveFileAtEnd', [None, w_file]) is space.w_true
+    external_call(space, 'FilePlugin', 'primitiveFileFlush', [None, w_file])
+    assert open(path).read() == "hello world"
+
+    external_call(space, 'FilePlugin', 'primitiveFileSetPosition', [None, w_file, 6])
+    w_out = space.w("12345")
+    assert external_call(space, 'FilePlugin', 'primitiveFileRead',
+                         [None, w_file, w_out, 1, 2]).value == 2
+    assert w_out.unwrap_string(space) == "wo345"
+    # the rest was read ahead
+    assert external_call(space, 'FilePlugin', 'primitiveFileGetPosition', [None, w_file]).value == 8
+    assert os.lseek(w_file.fd, 0, os.SEEK_CUR) == 11
+    assert external_call(space, 'FilePlugin', 'primitiveFileAtEnd', [None, w_file]) is space.w_false
+    external_call(space, 'FilePlugin', 'primitiveFileSetPosition', [None, w_file, 0])
+    assert external_call(space, 'FilePlugin', 'primitiveFileRead',
+                         [None, w_file, w_out, 1, 5]).value == 5
+    assert w_out.unwrap_string(space) == "hello"
+
+    # writing drops the read-ahead and continues at the logical position
+    external_call(space, 'FilePlugin', 'primitiveFileWrite', [None, w_file, space.wrap_string("!"), 1, 1])
+    external_call(space, 'FilePlugin', 'primitiveFileSetBufferSize', [None, w_file, 0])
+    assert open(path).read() == "hello!world"
+    external_call(space, 'FilePlugin', 'primitiveFileWrite', [None, w_file, space.wrap_string("W"), 1, 1])
+    assert open(path).read() == "hello!World"
+    with py.test.raises(PrimitiveFailedError):
+        external_call(space, 'FilePlugin', 'primitiveFileSetBufferSize', [None, w_file, -1])
+    with py.test.raises(PrimitiveFailedError):
+        external_call(space, 'FilePlugin', 'primitiveFileSetBufferSize', [None, 1, 16])
+
+    external_call(space, 'FilePlugin', 'primitiveFileSetBufferSize', [None, w_file, 4])
+    external_call(space, 'FilePlugin', 'primitiveFileWrite', [None, w_file, "abc", 1, 3])
+    external_call(space, 'FilePlugin', 'primitiveFileClose', [None, w_file])
+    assert open(path).read() == "hello!Wabcd"
+    assert w_file not in file_plugin.open_handles
+    with py.test.raises(PrimitiveFailedError):
+        external_call(space, 'FilePlugin', 'primitiveFileSize', [None, w_file])
+
+def test_fileplugin_failed_flush_keeps_unwritten_bytes(tmpdir, monkeypatch):
+    from rsqueakvm.plugins import file_plugin
+    path = str(tmpdir.join("flush.txt"))
+    w_file = external_call(space, 'FilePlugin', 'primitiveFileOpen', [None, path, True])
+    external_call(space, 'FilePlugin', 'primitiveFileSetBufferSize', [None, w_file, 16])
+    external_call(space, 'FilePlugin', 'primitiveFileWrite', [None, w_file, space.wrap_string("hello world"), 1, 11])
+    write_from = file_plugin.write_from
+    def write_some(fd, buf, count):
+        if count < 11:
+            raise PrimitiveFailedError
+        return write_from(fd, buf, 6)
+    monkeypatch.setattr(file_plugin, "write_from", write_some)
+    with py.test.raises(PrimitiveFailedError):
+        external_call(space, 'FilePlugin', 'primitiveFileFlush', [None, w_file])
+    assert open(path).read() == "hello "
+    assert w_file.write_len == 5
+    monkeypatch.undo()
+    external_call(space, 'FilePlugin', 'primitiveFileWrite', [None, w_file, space.wrap_string("!"), 1, 1])
+    external_call(space, 'FilePlugin', 'primitiveFileClose', [None, w_file])
+    assert open(path).read() == "hello world!"
+
+def test_fileplugin_mapped_file(tmpdir):
+    from rsqueakvm.plugins import file_plugin
+    path = str(tmpdir.join("mapped.bin"))
+    with open(path, "wb") as f:
+        f.write("abcdefgh")
+    w_file = external_call(space, 'FilePlugin', 'primitiveFileOpen', [None, path, True])
+    try:
+        w_bytes = external_call(space, 'FilePlugin', 'primitiveFileMap',
+                                [None, w_file, 0, 0, False, space.w_ByteArray])
+        assert isinstance(w_bytes, file_plugin.W_MappedBytesObject)
+        assert w_bytes.getclass(space) is space.w_ByteArray
+        assert w_bytes.size() == 8
+        assert w_bytes.at0(space, 1).value == ord("b")
+        assert w_bytes.unwrap_string(space) == "abcdefgh"
+        with py.test.raises(PrimitiveFailedError):
+            w_bytes.atput0(space, 0, space.w(65))
+        with py.test.raises(IndexError):
+            w_bytes.getchar(8)
+        with py.test.raises(IndexError):
+            w_bytes.getchar(-1)
+        # no copy of the whole mapping as a list, the image falls back
+        external_call(space, 'MiscPrimitivePlugin', 'primitiveStringHash',
+                      [None, space.w("abcdefgh"), 0])
+        with py.test.raises(PrimitiveFailedError):
+            external_call(space, 'MiscPrimitivePlugin', 'primitiveStringHash',
+                          [None, w_bytes, 0])
+        assert w_bytes.clone(space).unwrap_string(space) == "abcdefgh"
+
+        # bulk copies and writes use the mapped memory directly
+        w_copy = space.w("123456")
+        assert w_copy.replace_from_to(space, 1, 3, w_bytes, 5)
+        assert w_copy.unwrap_string(space) == "1fgh56"
+        r, w = os.pipe()
+        try:
+            assert external_call(space, 'FilePlugin', 'primitiveFileWrite',
+                                 [None, w, w_bytes, 3, 4]).value == 4
+            assert os.read(r, 10) == "cdef"
+        finally:
+            os.close(r)
+            os.close(w)
+
+        w_words = external_call(space, 'FilePlugin', 'primitiveFileMap',
+                                [None, w_file, 0, 8, True, space.w_Bitmap])
+        assert isinstance(w_words, file_plugin.W_MappedWordsObject)
+        assert w_words.size() == 2
+        assert w_words.words_as_string(1, 2) == "efgh"
+        w_words.setword(0, r_uint(0x44434241))
+        with py.test.raises(IndexError):
+            w_words.setword(2, r_uint(0))
+        assert w_bytes.unwrap_string(space) == "ABCDefgh"
+        w_bytes_rw = external_call(space, 'FilePlugin', 'primitiveFileMap',
+                                   [None, w_file, 0, 0, True, space.w_ByteArray])
+        assert w_bytes_rw.replace_from_to(space, 4, 5, space.w("xyz"), 1)
+        assert w_words.getword(1) == 0x68677a79
+
+        for w_mapped in [w_bytes, w_words, w_bytes_rw]:
+            external_call(space, 'FilePlugin', 'primitiveFileUnmap', [None, w_mapped])
+            assert w_mapped.size() == 0
+        with py.test.raises(IndexError):
+            w_bytes.getchar(0)
+        with open(path, "rb") as f:
+            assert f.read() == "ABCDyzgh"
+
+        with py.test.raises(PrimitiveFailedError):
+            external_call(space, 'FilePlugin', 'primitiveFileMap',
+                          [None, w_file, 1, 0, False, space.w_ByteArray])
+        with py.test.raises(PrimitiveFailedError):
+            external_call(space, 'FilePlugin', 'primitiveFileMap',
+                          [None, w_file, 0, 0, False, space.w_Array])
+        with py.test.raises(PrimitiveFailedError):
+            external_call(space, 'FilePlugin', 'primitiveFileUnmap', [None, w_copy])
+    finally:
+        external_call(space, 'FilePlugin', 'primitiveFileClose', [None, w_file])
+
 def test_locale_plugin_primLang_fails(monkeypatch):
     from rpython.rlib import rlocale
     def setlocale(*args):
@@ -634,3 +776,155 @@ def test_float_array_at(monkeypatch):
         assert [space.unwrap_float(w) for w in st_res] == [1.5, 12.5, 12.5]
     finally:
         monkeypatch.undo()
+
+def test_external_semaphores_register_signal_unregister():
+    import threading
+    from rsqueakvm.util import signal_queue
+    from rsqueakvm.wrapper import SemaphoreWrapper
+    w_sema = W_PointersObject(space, space.w_Semaphore, 3)
+    SemaphoreWrapper(space, w_sema).store_excess_signals(0)
+    space.set_w_external_objects_array(space.wrap_list([space.w_nil]))
+    try:
+        register = lambda w_object: external_call(
+            space, 'ExternalSemaphorePlugin', 'primitiveRegisterExternalObject',
+            [space.w_nil, w_object])
+        assert register(w_sema).value == 1
+        assert register(w_sema).value == 1
+        w_other = W_PointersObject(space, space.w_Semaphore, 3)
+        assert register(w_other).value == 2
+        assert space.w_external_objects_array().size() == 21
+
+        external_call(space, 'ExternalSemaphorePlugin',
+                      'primitiveSignalSemaphoreWithIndex', [space.w_nil, 1])
+        # other threads may queue signals as well
+        thread = threading.Thread(target=signal_queue.signal_semaphore_with_index, args=(1, ))
+        thread.start()
+        thread.join()
+        assert signal_queue.has_pending_signals()
+        interp = InterpreterForTest(space)
+        s_frame = new_frame("<not called>")[0].as_context_get_shadow(space)
+        interp.signal_external_semaphores(s_frame, signal_queue.take_signals())
+        assert SemaphoreWrapper(space, w_sema).excess_signals() == 2
+        assert not signal_queue.has_pending_signals()
+        assert signal_queue.take_signals() == []
+        with py.test.raises(PrimitiveFailedError):
+            external_call(space, 'ExternalSemaphorePlugin',
+                          'primitiveSignalSemaphoreWithIndex',
+                          [space.w_nil, signal_queue.MAX_SEMAPHORE_INDEX + 1])
+
+        assert external_call(space, 'ExternalSemaphorePlugin',
+                             'primitiveUnregisterExternalObject',
+                             [space.w_nil, w_sema]) is space.w_true
+        assert external_call(space, 'ExternalSemaphorePlugin',
+                             'primitiveUnregisterExternalObject',
+                             [space.w_nil, w_sema]) is space.w_false
+        assert register(w_sema).value == 1
+    finally:
+        space.set_w_external_objects_array(space.w_nil)
+
+def test_worker_fork_send_receive_wait(tmpdir):
+    import time
+    from rsqueakvm.plugins.worker_plugin import encode_object, decode_object
+    from rsqueakvm.util import iopoll, timer
+    call = lambda name, *args: external_call(space, 'WorkerPlugin', name,
+                                             [space.w_nil] + list(args))
+    def receive(index):
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            w_message = call('primitiveWorkerReceive', index, 0)
+            if not w_message.is_nil(space):
+                return w_message
+            time.sleep(0.01)
+        raise AssertionError("no message from %d" % index)
+
+    w_bytes = space.wrap_string("\x00\xff")
+    w_bytes.change_class(space, space.w_ByteArray)
+    w_message = space.wrap_list([
+        space.w_nil, space.w_true, space.w_false, space.wrap_int(-42),
+        space.wrap_int(rbigint.fromlong(2 ** 100)), space.wrap_float(1.5),
+        space.wrap_char("a"), space.wrap_string("a:b;c"),
+        space.wrap_symbol("foo:"), w_bytes, space.wrap_list([])])
+    data = encode_object(space, w_message)
+    assert encode_object(space, decode_object(space, data)) == data
+    with py.test.raises(PrimitiveFailedError):
+        encode_object(space, W_PointersObject(space, space.w_Semaphore, 3))
+    with py.test.raises(PrimitiveFailedError):
+        decode_object(space, data[:-1])
+
+    # compile the poll and timer externals before the fork, not in both
+    # processes. The timer thread is running when the parent forks.
+    iopoll.is_ready(0, iopoll.READ)
+    timer.set_deadline(0)
+    path = str(tmpdir.join("buffered.txt"))
+    w_file = external_call(space, 'FilePlugin', 'primitiveFileOpen', [None, path, True])
+    external_call(space, 'FilePlugin', 'primitiveFileSetBufferSize', [None, w_file, 16])
+    external_call(space, 'FilePlugin', 'primitiveFileWrite',
+                  [None, w_file, space.wrap_string("hello"), 1, 5])
+    space.snapshot_writer_pid = os.getpid()
+    try:
+        index = call('primitiveForkWorker').value
+        if index == 0:
+            try:
+                w_request = receive(0)
+                # buffered, primitiveWorkerExit writes it out
+                external_call(space, 'FilePlugin', 'primitiveFileWrite',
+                              [None, w_file, space.wrap_string(" world"), 1, 6])
+                # the worker gets a timer thread of its own
+                flag = timer.interrupt_pending_flag()
+                timer.set_deadline(InterpreterForTest(space).time_now() + 20 * 1000)
+                time.sleep(0.2)
+                timer_fired = flag[0] == 1
+                timer.set_deadline(0)
+                call('primitiveWorkerSend', 0, space.wrap_list([
+                    w_request, space.wrap_int(os.getpid()), space.wrap_bool(timer_fired),
+                    space.wrap_int(space.snapshot_writer_pid)]))
+                call('primitiveWorkerExit', 7)
+            finally:
+                os._exit(1)
+    finally:
+        space.snapshot_writer_pid = 0
+    # buffered data was written out before the fork
+    assert open(path).read() == "hello"
+    call('primitiveWorkerSend', index, w_message)
+    w_answer = receive(index)
+    assert encode_object(space, w_answer.at0(space, 0)) == data
+    assert w_answer.at0(space, 1).value != os.getpid()
+    assert w_answer.at0(space, 2) is space.w_true
+    assert w_answer.at0(space, 3).value == 0
+    assert call('primitiveWorkerWait', index).value == 7
+    assert open(path).read() == "hello world"
+    external_call(space, 'FilePlugin', 'primitiveFileClose', [None, w_file])
+    with py.test.raises(PrimitiveFailedError):
+        call('primitiveWorkerSend', index, space.w_nil)
+    with py.test.raises(PrimitiveFailedError):
+        call('primitiveWorkerReceive', 0, 0)
+
+def test_worker_channel_send_does_not_block():
+    from rpython.rlib import rposix
+    from rsqueakvm.plugins.worker_plugin import Channel
+    from rsqueakvm.util import iopoll
+    rfd, wfd = os.pipe()
+    rposix.set_status_flags(wfd, rposix.get_status_flags(wfd) | os.O_NONBLOCK)
+    channel = Channel(0, rfd, wfd)
+    try:
+        # far more than a pipe holds, nobody reads yet
+        assert channel.send("x" * (1024 * 1024)) is False
+        assert channel.send("second") is False
+        poller = iopoll.IOPoller()
+        poller.flush_when_writable(wfd, channel)
+        assert poller.has_watches()
+        received = []
+        for _ in range(1000):
+            poller.poll(10)
+            payload = channel.receive()
+            while payload is not None:
+                received.append(payload)
+                payload = channel.receive()
+            if len(received) == 2:
+                break
+        assert received == ["x" * (1024 * 1024), "second"]
+        assert not poller.has_watches()
+        assert channel.send("") is True
+        assert channel.receive() == ""
+    finally:
+        channel.close()
@@ -44,6 +44,8 @@ def test_W_Immutable_BytesObject():
     w_ibytes.mutate()
     assert w_ibytes._version() is None
     py.test.raises(IndexError, lambda: w_ibytes.getchar(20))
+    assert not w_ibytes.writable_raw_buffer()
+    assert w_ibytes.raw_buffer()[3] == '\x00'
 
 
 def test_W_Immutable_PointersObjects():
@@ -471,6 +471,53 @@ def test_sendLiteralSelectorBytecode():
     w_object = w_class.as_class_get_shadow(space).new()
     sendBytecodesTest(w_class, w_object, sendLiteralSelectorBytecode(0))
 
+def test_bytecode_table_matches_ranges():
+    from rsqueakvm.interpreter_bytecodes import BYTECODE_RANGES, BYTECODE_TABLE
+    assert len(BYTECODE_TABLE) == 256
+    for entry in BYTECODE_RANGES:
+        if len(entry) == 2:
+            positions = [entry[0]]
+        else:
+            positions = range(entry[0], entry[1] + 1)
+        implementation = getattr(storage_contexts.ContextPartShadow, entry[-1]).im_func
+        for pos in positions:
+            assert BYTECODE_TABLE[pos] is implementation
+
+def test_send_site_inline_cache():
+    w_class = bootstrap_class(0)
+    s_class = w_class.as_class_get_shadow(space)
+    w_method = W_PreSpurCompiledMethod(space, 2)
+    w_method.bytes = pushConstantOneBytecode + returnTopFromMethodBytecode
+    literals = fakeliterals(space, "foo")
+    s_class.installmethod(literals[0], w_method)
+    for i in range(2):
+        w_frame, s_frame = new_frame(sendLiteralSelectorBytecode(0))
+        s_frame.w_method().setliterals(literals)
+        s_frame.push(s_class.new())
+        w_active_context = step_in_interp(s_frame)
+        assert w_active_context.as_context_get_shadow(space).w_method() is w_method
+        cache = s_frame.w_method().inline_caches[0]
+        assert cache.w_selector is literals[0]
+        assert cache.classes == [s_class]
+        assert cache.methods == [w_method]
+        assert cache.polymorphism() == 1
+
+def test_inline_cache_goes_megamorphic():
+    w_selector = fakesymbol("foo")
+    cache = W_PreSpurCompiledMethod(space, 1).get_inline_cache(0, w_selector)
+    shadows = [bootstrap_class(0).as_class_get_shadow(space)
+               for i in range(constants.INLINE_CACHE_ENTRIES + 1)]
+    for s_class in shadows[:-1]:
+        assert cache.probe(s_class) == -1
+        cache.fill(s_class, None)
+    assert cache.polymorphism() == constants.INLINE_CACHE_ENTRIES
+    assert cache.probe(shadows[0]) == 0
+    shadows[0].changed()
+    assert cache.probe(shadows[0]) == -1
+    cache.fill(shadows[-1], None)
+    assert cache.polymorphism() == -1
+    assert cache.probe(shadows[1]) == -1
+
 def test_fibWithArgument():
     bytecode=''.join(map(chr, [16, 119, 178, 154, 118, 164, 11, 112, 16, 118, 177, 224, 112, 16, 119, 177, 224, 176, 124]))
     shadow = bootstrap_class(0).as_class_get_shadow(space)
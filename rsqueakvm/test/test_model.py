@@ -10,7 +10,7 @@ from rsqueakvm.model.pointers import W_PointersObject
 from rsqueakvm.model.numeric import W_Float, W_SmallInteger, W_LargeIntegerWord, W_LargeIntegerBig
 from rsqueakvm.model.variable import W_BytesObject, W_WordsObject
 
-from rpython.rlib.rarithmetic import intmask, r_uint
+from rpython.rlib.rarithmetic import intmask, r_uint, r_uint32
 from rpython.rlib.rbigint import rbigint
 
 from .util import create_space, copy_to_module, cleanup_module
@@ -72,6 +72,19 @@ def test_bytes_object():
     assert w_bytes.getchar(0) == "\x00"
     py.test.raises(IndexError, lambda: w_bytes.getchar(20))
 
+def test_bytes_object_raw_buffer():
+    w_class = bootstrap_class(0, format=storage_classes.BYTES)
+    w_bytes = w_class.as_class_get_shadow(space).new(4)
+    w_bytes.setbytes(list("abcd"))
+    buf = w_bytes.raw_buffer()
+    assert buf[2] == "c"
+    buf[1] = "X"
+    w_bytes.mutate()
+    assert w_bytes.getchar(1) == "X"
+    assert w_bytes.unwrap_string(space) == "aXcd"
+    w_bytes.setchar(3, "Y")
+    assert buf[3] == "Y"
+
 def test_word_object():
     w_class = bootstrap_class(0, format=storage_classes.WORDS)
     w_words = w_class.as_class_get_shadow(space).new(20)
@@ -84,6 +97,17 @@ def test_word_object():
     assert w_words.getword(0) == 0
     py.test.raises(AssertionError, lambda: w_words.getword(20))
 
+def test_word_object_is_packed():
+    w_class = bootstrap_class(0, format=storage_classes.WORDS)
+    w_words = w_class.as_class_get_shadow(space).new(3)
+    w_words.setword(0, r_uint(0x64636261))
+    w_words.setword(2, r_uint(0xffffffff))
+    assert all(isinstance(word, r_uint32) for word in w_words.getwords())
+    assert w_words.getword(2) == r_uint(0xffffffff)
+    assert w_words.words_as_string(0, 1) == "abcd"
+    assert w_words.words_as_string(1, 3) == "\x00" * 4 + "\xff" * 4
+    assert w_words.unwrap_string(space) == "abcd" + "\x00" * 4 + "\xff" * 4
+
 def test_method_lookup():
     class mockmethod(object):
         def __init__(self, val):
@@ -14,8 +14,9 @@ from rsqueakvm.model.pointers import W_PointersObject
 from rsqueakvm.model.variable import W_BytesObject, W_WordsObject
 from rsqueakvm.error import PrimitiveFailedError
 from rsqueakvm import primitives
-from rsqueakvm.primitives import prim_table
+from rsqueakvm.primitives import prim_table, storage
 from rsqueakvm.primitives.constants import *
+from rsqueakvm.util import timer
 
 from rpython.rlib.rarithmetic import intmask, r_uint, r_int64
 from rpython.rlib.rfloat import isinf, isnan
@@ -337,6 +338,16 @@ def test_short_at_put():
     prim(SHORT_AT_PUT, [test_str, 1, (ord("o") | (ord("b") << 8))])
     assert test_str.unwrap_string(space) == "obobar"
 
+def test_short_at_out_of_bounds():
+    prim(SHORT_AT, ["foobar", 3])
+    prim_fails(SHORT_AT, ["foobar", 4])
+    prim_fails(SHORT_AT, ["foobar", 0])
+    prim_fails(SHORT_AT_PUT, ["fooba", 3, 1])
+    w_words = W_WordsObject(space, space.w_Bitmap, 1)
+    prim(SHORT_AT_PUT, [w_words, 2, 1])
+    prim_fails(SHORT_AT_PUT, [w_words, 3, 1])
+    prim_fails(SHORT_AT, [w_words, 3])
+
 def test_invalid_object_at():
     prim_fails(OBJECT_AT, ["q", constants.CHARACTER_VALUE_INDEX+2])
 
@@ -546,6 +557,7 @@ def test_signal_at_milliseconds():
     sema = space.w_Semaphore.as_class_get_shadow(space).new()
     prim(SIGNAL_AT_MILLISECONDS, [space.w_nil, sema, future])
     assert space.w_timerSemaphore() is sema
+    timer.set_deadline(0)
 
 
 def test_primitive_utc_microseconds_clock():
@@ -560,6 +572,33 @@ def test_signal_at_utc_microseconds():
     sema = space.w_Semaphore.as_class_get_shadow(space).new()
     prim(SIGNAL_AT_UTC_MICROSECONDS, [space.w_nil, sema, future])
     assert space.w_timerSemaphore() is sema
+    timer.set_deadline(0)
+
+def test_timer_raises_interrupt_flag(monkeypatch):
+    from rsqueakvm.display import NullDisplay
+    monkeypatch.setattr(space, "display", lambda: NullDisplay())
+    interp, w_frame, _ = mock(space, [])
+    s_frame = w_frame.as_context_get_shadow(space)
+    sema = W_PointersObject(space, None, 3)
+    wrapper.SemaphoreWrapper(space, sema).store_excess_signals(0)
+    space.set_w_timerSemaphore(sema)
+    interp.interrupt_check_counter = interp.interrupt_counter_size = 1000000
+    interp.set_next_wakeup_tick(interp.time_now() + r_int64(20 * 1000))
+    assert interp.interrupt_flag[0] == 0
+    time.sleep(0.1)
+    assert interp.interrupt_flag[0] == 1
+    # the next quick check signals the semaphore, the counter is not used up
+    interp.quick_check_for_interrupt(s_frame)
+    assert interp.interrupt_flag[0] == 0
+    assert interp.next_wakeup_tick == 0
+    assert wrapper.SemaphoreWrapper(space, sema).excess_signals() == 1
+    # a deadline that is moved away lowers the flag
+    interp.set_next_wakeup_tick(interp.time_now())
+    time.sleep(0.05)
+    interp.set_next_wakeup_tick(interp.time_now() + r_int64(60 * 1000 * 1000))
+    assert interp.interrupt_flag[0] == 0
+    interp.set_next_wakeup_tick(0)
+    space.set_w_timerSemaphore(space.w_nil)
 
 def test_seconds_clock():
     now = int(time.time())
@@ -703,6 +742,49 @@ def test_primitive_closure_copyClosure():
     assert w_block.at0(space, 1) == wrap(2)
     assert w_block.numArgs() is 2
 
+def test_primitive_replace_from_to_bytes():
+    w_r = prim(REPLACE_FROM_TO, ["aaaaa", 2, 4, "bcdef", 2])
+    assert w_r.unwrap_string(space) == "acdea"
+    w_r = prim(REPLACE_FROM_TO, ["aaaaa", 3, 2, "bcdef", 1])
+    assert w_r.unwrap_string(space) == "aaaaa"
+    prim_fails(REPLACE_FROM_TO, ["aaaaa", 2, 6, "ccccc", 1])
+    prim_fails(REPLACE_FROM_TO, ["aaaaa", 1, 4, "ccccc", 3])
+
+def test_primitive_replace_from_to_words():
+    w_class = space.w_Bitmap
+    w_rcvr = w_class.as_class_get_shadow(space).new(3)
+    w_repl = w_class.as_class_get_shadow(space).new(3)
+    for i in range(3):
+        w_repl.setword(i, r_uint(0xffffff00 + i))
+    w_r = prim(REPLACE_FROM_TO, [w_rcvr, 2, 3, w_repl, 1])
+    assert [w_r.getword(i) for i in range(3)] == [0, 0xffffff00, 0xffffff01]
+
+def test_primitive_replace_from_to_pointers():
+    for values in [[1, 2, 3, 4], [1.5, 2.5, 3.5, 4.5], ["a", 2, 3.5, space.w_nil]]:
+        for w_rcvr in [space.wrap_list([space.w_nil] * 4),
+                       space.wrap_list([wrap(v) for v in reversed(values)])]:
+            w_repl = space.wrap_list([wrap(v) for v in values])
+            w_last = w_rcvr.at0(space, 3)
+            w_r = prim(REPLACE_FROM_TO, [w_rcvr, 1, 3, w_repl, 2])
+            assert ([w_r.at0(space, i) for i in range(3)] ==
+                    [w_repl.at0(space, i) for i in range(1, 4)])
+            assert w_r.at0(space, 3) is w_last or w_r.at0(space, 3) == w_last
+    w_rcvr = space.wrap_list([wrap(1), wrap(2)])
+    w_repl = space.wrap_list([wrap(1.5), wrap(2.5)])
+    w_r = prim(REPLACE_FROM_TO, [w_rcvr, 1, 2, w_repl, 1])
+    assert [space.unwrap_float(w_r.at0(space, i)) for i in range(2)] == [1.5, 2.5]
+
+def test_primitive_replace_from_to_overlapping():
+    for w_obj in [wrap("abcdef"), space.wrap_list(map(wrap, [1, 2, 3, 4, 5, 6]))]:
+        values = [w_obj.at0(space, i) for i in range(6)]
+        # source after the destination, like a memmove
+        prim(REPLACE_FROM_TO, [w_obj, 1, 4, w_obj, 3])
+        assert [w_obj.at0(space, i) for i in range(6)] == values[2:] + values[4:]
+        # source before the destination, copied forward element by element
+        values = [w_obj.at0(space, i) for i in range(6)]
+        prim(REPLACE_FROM_TO, [w_obj, 3, 6, w_obj, 1])
+        assert [w_obj.at0(space, i) for i in range(6)] == values[:2] * 3
+
 # def test_primitive_string_copy():
 #     w_r = prim(STRING_REPLACE, ["aaaaa", 1, 5, "ababab", 1])
 #     assert w_r.unwrap_string(None) == "ababa"
@@ -817,6 +899,33 @@ def test_primitive_next_instance_wo_some_instance_in_same_frame():
     assert w_2.getclass(space) is space.w_Array
     assert w_1 is not w_2
 
+def test_primitive_next_instance_walks_each_instance_once():
+    w_frame, s_context = new_frame("<never called, but needed for method generation>")
+    interp = InterpreterForTest(space)
+
+    s_context.push(space.w_Array)
+    prim_table[SOME_INSTANCE](interp, s_context, 0)
+    seen = []
+    while True:
+        w_obj = s_context.pop()
+        assert w_obj.getclass(space) is space.w_Array
+        assert w_obj not in seen
+        seen.append(w_obj)
+        s_context.push(w_obj)
+        try:
+            prim_table[NEXT_INSTANCE](interp, s_context, 0)
+        except PrimitiveFailedError:
+            break
+    assert seen == storage.get_instances_array(interp, s_context, space.w_Array)
+
+def test_next_instance_skips_objects_that_changed_class():
+    w_a, w_changed, w_b = map(space.wrap_list, [[2], [3], [4]])
+    index = storage.InstancesIndex([w_a, w_changed, w_b])
+    w_changed.change_class(space, space.w_Semaphore)
+    assert storage.next_instance(space, index, w_a) is w_b
+    with py.test.raises(PrimitiveFailedError):
+        storage.next_instance(space, index, w_b)
+
 def test_primitive_value_no_context_switch(monkeypatch):
     class Context_switched(Exception):
         pass
@@ -1002,6 +1111,51 @@ def test_idle_for_microseconds():
     prim(IDLE_FOR_MICROSECONDS, [None, 1 * 1000 * 1000])
     assert time.time() - t0 >= 1
 
+def test_idle_ends_early(monkeypatch):
+    import threading
+    from rsqueakvm.display import NullDisplay
+    from rsqueakvm.util import signal_queue
+    monkeypatch.setattr(space, "display", lambda: NullDisplay())
+    interp = InterpreterForTest(space)
+    # compile the externals before anything is timed, and start empty
+    signal_queue.wakeup_fd()
+    signal_queue.signal_semaphore_with_index(1)
+    assert signal_queue.has_pending_signals()
+    assert signal_queue.take_signals() == [1]
+    # record the timeout and the answer of every poll instead of timing it
+    polls = []
+    polling = threading.Event()
+    poll = interp.io_poller.poll
+    def recording_poll(timeout_ms=0, wakeup_fd=-1):
+        assert wakeup_fd == signal_queue.wakeup_fd()
+        polling.set()
+        polls.append((timeout_ms, poll(timeout_ms, wakeup_fd)))
+        return polls[-1][1]
+    monkeypatch.setattr(interp.io_poller, "poll", recording_poll)
+    # the wakeup tick of the timer semaphore caps the wait
+    interp.next_wakeup_tick = interp.time_now() + 200 * 1000
+    interp.idle(60 * 1000 * 1000)
+    interp.next_wakeup_tick = 0
+    assert len(polls) == 1
+    assert polls[0][0] <= 200 and polls[0][1] is False
+    # a signal queued by another thread during the poll makes the wakeup fd
+    # readable and ends it
+    del polls[:]
+    thread = threading.Thread(target=lambda: (polling.wait(),
+                              signal_queue.signal_semaphore_with_index(1)))
+    polling.clear()
+    thread.start()
+    interp.idle(60 * 1000 * 1000)
+    thread.join()
+    assert polls == [(60 * 1000, True)]
+    assert signal_queue.take_signals() == [1]
+    # a signal that is already pending does not poll at all
+    del polls[:]
+    signal_queue.signal_semaphore_with_index(1)
+    interp.idle(60 * 1000 * 1000)
+    assert polls == []
+    assert signal_queue.take_signals() == [1]
+
 def test_fullscreen(monkeypatch):
     is_fs = {'value': None}
     class FakeDisplay(): pass
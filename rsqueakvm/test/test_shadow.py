@@ -268,6 +268,28 @@ def test_cached_methoddict():
     assert s_class.lookup(key) is baz
     assert version is not s_class.version
 
+def test_bulk_replace_in_methoddict_updates_lookup():
+    from rsqueakvm.primitives.constants import REPLACE_FROM_TO
+    from rsqueakvm.test.test_primitives import _prim
+    foo = W_PreSpurCompiledMethod(space, 0)
+    bar = W_PreSpurCompiledMethod(space, 0)
+    w_class = build_smalltalk_class("Demo", 0x90, w_superclass=space.w_nil,
+                                    methods={'foo': foo})
+    s_class = w_class.as_class_get_shadow(space)
+    w_methoddict = s_class.w_methoddict()
+    size = w_methoddict.varsize()
+    key = [w_key for w_key in s_class.s_methoddict().methoddict][0]
+    assert s_class.lookup(key) is foo
+    # replaceFrom:to:with:startingAt: on the values array
+    w_array = w_methoddict.fetch(space, constants.METHODDICT_VALUES_INDEX)
+    _prim(space, REPLACE_FROM_TO, [w_array, 1, size, space.wrap_list([bar] * size), 1])
+    assert s_class.lookup(key) is bar
+    # and on the selectors of the method dictionary itself
+    w_other = space.wrap_string('other')
+    _prim(space, REPLACE_FROM_TO, [w_methoddict, 1, size, space.wrap_list([w_other] * size), 1])
+    assert s_class.lookup(key) is None
+    assert s_class.lookup(w_other) is bar
+
 def test_updating_class_changes_subclasses():
     w_parent = build_smalltalk_class("Demo", 0x90,
             methods={'bar': W_PreSpurCompiledMethod(space, 0)})
@@ -289,6 +311,35 @@ def test_updating_class_changes_subclasses():
     assert s_class.version is not version
     assert s_class.version is w_parent.as_class_get_shadow(space).version
 
+def test_method_cache_hit_and_invalidation():
+    foo = W_PreSpurCompiledMethod(space, 0)
+    w_parent = build_smalltalk_class("Demo", 0x90, methods={'foo': foo})
+    w_class = build_smalltalk_class("Demo", 0x90, w_superclass=w_parent)
+    s_class = w_class.as_class_get_shadow(space)
+    key = [w_key for w_key in w_parent.as_class_get_shadow(space).s_methoddict().methoddict][0]
+    method_cache = space.method_cache
+
+    assert s_class.lookup(key) is foo
+    hits = method_cache.hits
+    assert s_class.lookup(key) is foo
+    assert method_cache.hits == hits + 1
+
+    # installing a method in the superclass invalidates the cached entry
+    bar = W_PreSpurCompiledMethod(space, 0)
+    w_parent.as_class_get_shadow(space).installmethod(key, bar)
+    misses = method_cache.misses
+    assert s_class.lookup(key) is bar
+    assert method_cache.misses == misses + 1
+
+def test_method_cache_caches_missing_selectors():
+    w_class = build_smalltalk_class("Demo", 0x90, w_superclass=space.w_nil)
+    s_class = w_class.as_class_get_shadow(space)
+    key = space.wrap_string('notThere')
+    assert s_class.lookup(key) is None
+    hits = space.method_cache.hits
+    assert s_class.lookup(key) is None
+    assert space.method_cache.hits == hits + 1
+
 def test_returned_contexts_pc():
     w_context = methodcontext()
     s_context = w_context.as_context_get_shadow(space)
@@ -1,19 +1,36 @@
 import py
+import sys
 import time
 
 from rsqueakvm import constants
 from rsqueakvm.model.compiled_methods import W_PreSpurCompiledMethod
+from rsqueakvm.model.pointers import W_PointersObject
 from rsqueakvm.model.variable import W_BytesObject
 from rsqueakvm.primitives import prim_table
 from rsqueakvm.primitives.constants import EXTERNAL_CALL
 from rsqueakvm.error import PrimitiveFailedError
 from rsqueakvm.plugins import socket_plugin as socket
+from rsqueakvm.util import resolver
 
 from .util import create_space, copy_to_module, cleanup_module
 from .test_primitives import mock
 
 
 def setup_module():
+    # Reading the address length rsocket gets back from accept, getsockname
+    # etc. recurses in ll2ctypes until hasattr swallows the RuntimeError.
+    # Under the recursion limit of the interpreter module that overflows the
+    # C stack instead.
+    recursionlimit = sys.getrecursionlimit()
+    sys.setrecursionlimit(1000)
+    # The resolver forks a helper for lookups. Untranslated, the first call
+    # of an external function compiles it through a helper process, which
+    # the forked child would share with us, so compile the lookups up front.
+    resolver.lookup(resolver.name_request("localhost"))
+    resolver.lookup(resolver.address_request("127.0.0.1"))
+    for info in resolver.lookup(resolver.addrinfo_request(
+            "localhost", "80", 0, socket.rsocket.AF_INET, 0, 0)).infos:
+        resolver.lookup(resolver.nameinfo_request(info.sockaddr, 0))
     space = create_space(bootstrap = True)
     space.set_system_attribute(constants.SYSTEM_ATTRIBUTE_IMAGE_NAME_INDEX, "IMAGENAME")
     wrap = space.w
@@ -22,12 +39,14 @@ def setup_module():
     copy_to_module(locals(), __name__)
 
 def teardown_module():
+    sys.setrecursionlimit(recursionlimit)
     cleanup_module(__name__)
 
 IMAGENAME = "anImage.image"
 
-def _prim(space, name, module, stack, context = None):
-    interp, w_frame, argument_count = mock(space, stack, context)
+def _prim(space, name, module, stack, context = None, interp = None):
+    mock_interp, w_frame, argument_count = mock(space, stack, context)
+    interp = interp or mock_interp
     orig_stack = list(w_frame.as_context_get_shadow(space).stack())
     prim_meth = W_PreSpurCompiledMethod(space, 0, header=17045052)
     prim_meth._primitive = EXTERNAL_CALL
@@ -38,10 +57,10 @@ def _prim(space, name, module, stack, context = None):
         prim_table[EXTERNAL_CALL](interp, w_frame.as_context_get_shadow(space), argument_count-1, prim_meth)
     return w_frame, orig_stack, call
 
-def prim(name, module=None, stack = None, context = None):
+def prim(name, module=None, stack = None, context = None, interp = None):
     if module is None: module = "SocketPlugin"
     if stack is None: stack = [space.w_nil]
-    w_frame, orig_stack, call = _prim(space, name, module, stack, context)
+    w_frame, orig_stack, call = _prim(space, name, module, stack, context, interp)
     call()
     res = w_frame.as_context_get_shadow(space).pop()
     s_frame = w_frame.as_context_get_shadow(space)
@@ -63,12 +82,114 @@ def test_resolver_start_lookup():
     assert prim("primitiveResolverStartNameLookup", "SocketPlugin",
                 [space.w_nil, space.wrap_string("google.com")]) == space.w_nil
 
+def lookup(hostname):
+    prim("primitiveResolverStartNameLookup", "SocketPlugin",
+         [space.w_nil, space.wrap_string(hostname)])
+    while prim("primitiveResolverStatus", "SocketPlugin").value == socket.ResolverBusy:
+        time.sleep(0.01)
+    return prim("primitiveResolverNameLookupResult", "SocketPlugin")
+
 def test_resolver_lookup_result():
-    assert prim("primitiveResolverStartNameLookup", "SocketPlugin",
-                [space.w_nil, space.wrap_string("google.com")]) == space.w_nil
-    w_res = prim("primitiveResolverNameLookupResult", "SocketPlugin")
+    w_res = lookup("google.com")
     assert isinstance(w_res, W_BytesObject)
 
+def test_resolver_lookup_is_asynchronous_and_cached():
+    from .util import InterpreterForTest
+    interp = InterpreterForTest(space)
+    socket.plugin.resolver.cache.clear()
+    prim("primitiveInitializeNetwork", "SocketPlugin", [space.w_nil, 7], interp=interp)
+    prim("primitiveResolverStartNameLookup", "SocketPlugin",
+         [space.w_nil, space.wrap_string("localhost")], interp=interp)
+    assert socket.plugin.resolver.is_busy()
+    assert (prim("primitiveResolverStatus", "SocketPlugin", interp=interp).value ==
+            socket.ResolverBusy)
+    assert interp.io_poller.poll(5000)
+    assert interp.io_poller.take_ready() == [7]
+    assert (prim("primitiveResolverStatus", "SocketPlugin", interp=interp).value ==
+            socket.ResolverReady)
+    assert prim("primitiveResolverNameLookupResult", "SocketPlugin",
+                interp=interp).unwrap_string(None) == "127.0.0.1"
+    # answered from the cache until the entry expires
+    prim("primitiveResolverStartNameLookup", "SocketPlugin",
+         [space.w_nil, space.wrap_string("localhost")], interp=interp)
+    assert not socket.plugin.resolver.is_busy()
+    assert not interp.io_poller.has_watches()
+    assert prim("primitiveResolverNameLookupResult", "SocketPlugin",
+                interp=interp).unwrap_string(None) == "127.0.0.1"
+    for result in socket.plugin.resolver.cache.values():
+        result.expires = 0.0
+    prim("primitiveResolverStartNameLookup", "SocketPlugin",
+         [space.w_nil, space.wrap_string("localhost")], interp=interp)
+    assert socket.plugin.resolver.is_busy()
+    prim("primitiveResolverAbortLookup", "SocketPlugin", interp=interp)
+    assert not socket.plugin.resolver.is_busy()
+    assert not interp.io_poller.has_watches()
+    assert prim("primitiveResolverNameLookupResult", "SocketPlugin",
+                interp=interp) is space.w_nil
+    # the helper stays around, the aborted answer is skipped
+    helper_pid = socket.plugin.resolver.helper_pid
+    assert helper_pid != 0
+    prim("primitiveResolverStartAddressLookup", "SocketPlugin",
+         [space.w_nil, space.wrap_string("127.0.0.1")], interp=interp)
+    while prim("primitiveResolverStatus", "SocketPlugin",
+               interp=interp).value == socket.ResolverBusy:
+        interp.io_poller.poll(5000)
+    assert prim("primitiveResolverAddressLookupResult", "SocketPlugin",
+                interp=interp) is not space.w_nil
+    assert socket.plugin.resolver.helper_pid == helper_pid
+    prim("primitiveInitializeNetwork", "SocketPlugin", [space.w_nil, 0], interp=interp)
+
+def test_resolver_address_info_is_asynchronous():
+    from .util import InterpreterForTest
+    interp = InterpreterForTest(space)
+    socket.plugin.resolver.cache.clear()
+    prim("primitiveInitializeNetwork", "SocketPlugin", [space.w_nil, 7], interp=interp)
+    prim("primitiveResolverGetAddressInfo", "SocketPlugin",
+         [space.w_nil, space.wrap_string("localhost"), space.wrap_string("80"),
+          0, 2, 1, 0], interp=interp)
+    assert (prim("primitiveResolverStatus", "SocketPlugin", interp=interp).value ==
+            socket.ResolverBusy)
+    assert interp.io_poller.poll(5000)
+    assert interp.io_poller.take_ready() == [7]
+    assert (prim("primitiveResolverStatus", "SocketPlugin", interp=interp).value ==
+            socket.ResolverReady)
+    size = prim("primitiveResolverGetAddressInfoSize", "SocketPlugin", interp=interp).value
+    w_addr = W_BytesObject(space, space.w_ByteArray, size)
+    prim("primitiveResolverGetAddressInfoResult", "SocketPlugin",
+         [space.w_nil, w_addr], interp=interp)
+    assert prim("primitiveSocketAddressGetPort", "SocketPlugin", [w_addr]).value == 80
+    # images that ask right away wait for the answer
+    prim("primitiveResolverGetNameInfo", "SocketPlugin",
+         [space.w_nil, w_addr, 0], interp=interp)
+    assert socket.plugin.resolver.is_busy()
+    assert prim("primitiveResolverGetNameInfoHostSize", "SocketPlugin",
+                interp=interp).value > 0
+    assert not socket.plugin.resolver.is_busy()
+    prim("primitiveInitializeNetwork", "SocketPlugin", [space.w_nil, 0], interp=interp)
+
+def test_resolver_address_info():
+    prim("primitiveResolverGetAddressInfo", "SocketPlugin",
+         [space.w_nil, space.wrap_string("127.0.0.1"), space.wrap_string("80"),
+          socket.SqNumericFlag, 2, 1, 0])
+    size = prim("primitiveResolverGetAddressInfoSize", "SocketPlugin").value
+    w_addr = W_BytesObject(space, space.w_ByteArray, size)
+    prim("primitiveResolverGetAddressInfoResult", "SocketPlugin", [space.w_nil, w_addr])
+    assert prim("primitiveResolverGetAddressInfoFamily", "SocketPlugin").value == 2
+    assert prim("primitiveResolverGetAddressInfoType", "SocketPlugin").value == 1
+    assert prim("primitiveResolverGetAddressInfoNext", "SocketPlugin") is space.w_false
+    assert prim("primitiveResolverGetAddressInfoSize", "SocketPlugin").value == -1
+    assert prim("primitiveSocketAddressGetPort", "SocketPlugin", [w_addr]).value == 80
+    prim("primitiveResolverGetNameInfo", "SocketPlugin",
+         [space.w_nil, w_addr, socket.SqNumericFlag])
+    size = prim("primitiveResolverGetNameInfoHostSize", "SocketPlugin").value
+    w_host = space.wrap_string(" " * size)
+    prim("primitiveResolverGetNameInfoHostResult", "SocketPlugin", [space.w_nil, w_host])
+    assert w_host.unwrap_string(None) == "127.0.0.1"
+    size = prim("primitiveResolverGetNameInfoServiceSize", "SocketPlugin").value
+    w_service = space.wrap_string(" " * size)
+    prim("primitiveResolverGetNameInfoServiceResult", "SocketPlugin", [space.w_nil, w_service])
+    assert w_service.unwrap_string(None) == "80"
+
 
 def test_socket_create():
     assert isinstance(prim("primitiveSocketCreate3Semaphores", "SocketPlugin",
@@ -87,9 +208,7 @@ def test_socket_status():
 def test_socket_connect():
     handle = prim("primitiveSocketCreate3Semaphores", "SocketPlugin",
                   [space.w_nil, 2, 0, 8000, 8000, 13, 14, 15])
-    prim("primitiveResolverStartNameLookup", "SocketPlugin",
-         [space.w_nil, space.wrap_string("google.com")])
-    w_host = prim("primitiveResolverNameLookupResult", "SocketPlugin")
+    w_host = lookup("google.com")
     assert prim("primitiveSocketConnectToPort", "SocketPlugin",
                 [space.w_nil, handle, w_host, space.wrap_int(80)])
     assert prim("primitiveSocketConnectionStatus", "SocketPlugin",
@@ -98,9 +217,7 @@ def test_socket_connect():
 def test_socket_ready():
     handle = prim("primitiveSocketCreate3Semaphores", "SocketPlugin",
                   [space.w_nil, 2, 0, 8000, 8000, 13, 14, 15])
-    prim("primitiveResolverStartNameLookup", "SocketPlugin",
-         [space.w_nil, space.wrap_string("google.com")])
-    w_host = prim("primitiveResolverNameLookupResult", "SocketPlugin")
+    w_host = lookup("google.com")
     assert prim("primitiveSocketConnectToPort", "SocketPlugin",
                 [space.w_nil, handle, w_host, space.wrap_int(80)])
     assert prim("primitiveSocketConnectionStatus", "SocketPlugin",
@@ -119,9 +236,7 @@ Accept: */*
 def test_socket_send_and_read_into():
     handle = prim("primitiveSocketCreate3Semaphores", "SocketPlugin",
                   [space.w_nil, 2, 0, 8000, 8000, 13, 14, 15])
-    prim("primitiveResolverStartNameLookup", "SocketPlugin",
-         [space.w_nil, space.wrap_string("google.com")])
-    w_host = prim("primitiveResolverNameLookupResult", "SocketPlugin")
+    w_host = lookup("google.com")
     assert prim("primitiveSocketConnectToPort", "SocketPlugin",
                 [space.w_nil, handle, w_host, space.wrap_int(80)])
     assert prim("primitiveSocketConnectionStatus", "SocketPlugin",
@@ -142,3 +257,328 @@ def test_socket_destroy():
                   [space.w_nil, 2, 0, 8000, 8000, 13, 14, 15])
     assert prim("primitiveSocketDestroy", "SocketPlugin",
                 [space.w_nil, handle]).value == -1
+
+def test_socket_close_drops_its_watches():
+    import os
+    from rsqueakvm.util import iopoll
+    from .util import InterpreterForTest
+    interp = InterpreterForTest(space)
+    handle = prim("primitiveSocketCreate3Semaphores", "SocketPlugin",
+                  [space.w_nil, 2, 0, 8000, 8000, 1, 2, 3], interp=interp)
+    handle.watch_readable(interp)
+    handle.watch_writable(interp)
+    assert interp.io_poller.has_watches()
+    handle.close()
+    assert not interp.io_poller.has_watches()
+    # an fd closed while it is watched is ready once, then dropped
+    r, w = os.pipe()
+    interp.io_poller.watch(r, iopoll.READ, 7)
+    os.close(r)
+    os.close(w)
+    assert interp.io_poller.poll(1000)
+    assert interp.io_poller.take_ready() == [7]
+    assert not interp.io_poller.has_watches()
+
+def test_socket_readiness_signals_semaphores():
+    import socket as pysocket
+    from rsqueakvm.wrapper import SemaphoreWrapper
+    from .util import InterpreterForTest
+    server = pysocket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    interp = InterpreterForTest(space)
+    w_read_sema = W_PointersObject(space, space.w_Semaphore, 3)
+    w_write_sema = W_PointersObject(space, space.w_Semaphore, 3)
+    SemaphoreWrapper(space, w_read_sema).store_excess_signals(0)
+    space.set_w_external_objects_array(space.wrap_list([space.w_nil, w_read_sema, w_write_sema]))
+    try:
+        handle = prim("primitiveSocketCreate3Semaphores", "SocketPlugin",
+                      [space.w_nil, 2, 0, 8000, 8000, 1, 2, 3], interp=interp)
+        prim("primitiveSocketConnectToPort", "SocketPlugin",
+             [space.w_nil, handle, space.wrap_string("127.0.0.1"),
+              space.wrap_int(server.getsockname()[1])], interp=interp)
+        conn, _ = server.accept()
+        assert prim("primitiveSocketSendDone", "SocketPlugin",
+                    [space.w_nil, handle], interp=interp) is space.w_true
+        assert prim("primitiveSocketReceiveDataAvailable", "SocketPlugin",
+                    [space.w_nil, handle], interp=interp) is space.w_false
+        assert interp.io_poller.has_watches()
+        assert not interp.io_poller.poll()
+
+        conn.send("hello")
+        assert interp.io_poller.poll(1000)
+        s_frame = new_frame("<not called>")[0].as_context_get_shadow(space)
+        interp.signal_external_semaphores(s_frame, interp.io_poller.take_ready())
+        assert SemaphoreWrapper(space, w_read_sema).excess_signals() == 1
+        assert not interp.io_poller.has_watches()
+        assert prim("primitiveSocketReceiveDataAvailable", "SocketPlugin",
+                    [space.w_nil, handle], interp=interp) is space.w_true
+
+        prim("primitiveSocketCloseConnection", "SocketPlugin",
+             [space.w_nil, handle], interp=interp)
+        conn.close()
+    finally:
+        space.set_w_external_objects_array(space.w_nil)
+        server.close()
+
+def test_socket_listen_and_accept():
+    import socket as pysocket
+    from .util import InterpreterForTest
+    interp = InterpreterForTest(space)
+    server = prim("primitiveSocketCreate3Semaphores", "SocketPlugin",
+                  [space.w_nil, 2, 0, 8000, 8000, 1, 2, 3], interp=interp)
+    prim("primitiveSocketListenOnPortBacklogInterface", "SocketPlugin",
+         [space.w_nil, server, 0, 8, space.wrap_string("127.0.0.1")], interp=interp)
+    assert prim("primitiveSocketLocalAddress", "SocketPlugin",
+                [space.w_nil, server]).unwrap_string(None) == "127.0.0.1"
+    port = prim("primitiveSocketLocalPort", "SocketPlugin", [space.w_nil, server]).value
+    assert port > 0
+    assert prim("primitiveSocketConnectionStatus", "SocketPlugin",
+                [space.w_nil, server], interp=interp).value == socket.WaitingForConnection
+    assert interp.io_poller.readers == {server.fileno(): 1}
+    client = pysocket.create_connection(("127.0.0.1", port))
+    try:
+        assert interp.io_poller.poll(1000)
+        assert interp.io_poller.take_ready() == [1]
+        assert prim("primitiveSocketConnectionStatus", "SocketPlugin",
+                    [space.w_nil, server], interp=interp).value == socket.Connected
+        conn = prim("primitiveSocketAccept3Semaphores", "SocketPlugin",
+                    [space.w_nil, server, 8000, 8000, 4, 5, 6], interp=interp)
+        assert isinstance(conn, socket.W_SocketHandle)
+        assert conn.readSema == 5
+        assert prim("primitiveSocketConnectionStatus", "SocketPlugin",
+                    [space.w_nil, conn], interp=interp).value == socket.Connected
+        assert prim("primitiveSocketRemotePort", "SocketPlugin",
+                    [space.w_nil, conn]).value == client.getsockname()[1]
+        # accepting never blocks
+        with py.test.raises(PrimitiveFailedError):
+            _prim(space, "primitiveSocketAccept3Semaphores", "SocketPlugin",
+                  [space.w_nil, server, 8000, 8000, 4, 5, 6], interp=interp)[2]()
+        client.sendall("ping")
+        time.sleep(0.1)
+        w_str = space.wrap_string("    ")
+        assert prim("primitiveSocketReceiveDataBufCount", "SocketPlugin",
+                    [space.w_nil, conn, w_str, 1, 4]).value == 4
+        assert prim("primitiveSocketSendDataBufCount", "SocketPlugin",
+                    [space.w_nil, conn, w_str, 1, 4]).value == 4
+        assert client.recv(4) == "ping"
+        prim("primitiveSocketCloseConnection", "SocketPlugin", [space.w_nil, conn], interp=interp)
+    finally:
+        client.close()
+        prim("primitiveSocketCloseConnection", "SocketPlugin", [space.w_nil, server], interp=interp)
+
+def test_socket_listen_without_backlog_accepts_in_place():
+    import socket as pysocket
+    from .util import InterpreterForTest
+    interp = InterpreterForTest(space)
+    server = prim("primitiveSocketCreate3Semaphores", "SocketPlugin",
+                  [space.w_nil, 2, 0, 8000, 8000, 1, 2, 3], interp=interp)
+    prim("primitiveSocketListenWithOrWithoutBacklog", "SocketPlugin",
+         [space.w_nil, server, 0], interp=interp)
+    port = prim("primitiveSocketLocalPort", "SocketPlugin", [space.w_nil, server]).value
+    client = pysocket.create_connection(("127.0.0.1", port))
+    try:
+        time.sleep(0.1)
+        assert prim("primitiveSocketConnectionStatus", "SocketPlugin",
+                    [space.w_nil, server], interp=interp).value == socket.Connected
+        assert prim("primitiveSocketRemotePort", "SocketPlugin",
+                    [space.w_nil, server]).value == client.getsockname()[1]
+        assert not interp.io_poller.has_watches()
+    finally:
+        client.close()
+        prim("primitiveSocketCloseConnection", "SocketPlugin", [space.w_nil, server], interp=interp)
+
+def test_socket_options():
+    handle = prim("primitiveSocketCreate3Semaphores", "SocketPlugin",
+                  [space.w_nil, 2, 0, 8000, 8000, 0, 0, 0])
+    w_res = prim("primitiveSocketSetOptions", "SocketPlugin",
+                 [space.w_nil, handle, space.wrap_string("TCP_NODELAY"), space.wrap_string("1")])
+    assert [space.unwrap_int(w) for w in space.unwrap_array(w_res)][0] == 0
+    assert space.unwrap_int(space.unwrap_array(w_res)[1]) != 0
+    w_res = prim("primitiveSocketGetOptions", "SocketPlugin",
+                 [space.w_nil, handle, space.wrap_string("SO_REUSEADDR")])
+    assert space.unwrap_int(space.unwrap_array(w_res)[1]) == 0
+    prim("primitiveSocketSetOptions", "SocketPlugin",
+         [space.w_nil, handle, space.wrap_string("SO_REUSEADDR"), space.wrap_string("true")])
+    w_res = prim("primitiveSocketGetOptions", "SocketPlugin",
+                 [space.w_nil, handle, space.wrap_string("SO_REUSEADDR")])
+    assert space.unwrap_int(space.unwrap_array(w_res)[1]) != 0
+    with py.test.raises(PrimitiveFailedError):
+        _prim(space, "primitiveSocketGetOptions", "SocketPlugin",
+              [space.w_nil, handle, space.wrap_string("NO_SUCH_OPTION")])[2]()
+
+def test_socket_udp():
+    w_a = prim("primitiveSocketCreate3Semaphores", "SocketPlugin",
+               [space.w_nil, 2, socket.UDPSocketType, 8000, 8000, 0, 0, 0])
+    w_b = prim("primitiveSocketCreate3Semaphores", "SocketPlugin",
+               [space.w_nil, 2, socket.UDPSocketType, 8000, 8000, 0, 0, 0])
+    prim("primitiveSocketBindToPort", "SocketPlugin",
+         [space.w_nil, w_a, space.wrap_string("127.0.0.1"), 0])
+    prim("primitiveSocketListenWithOrWithoutBacklog", "SocketPlugin", [space.w_nil, w_b, 0])
+    assert prim("primitiveSocketConnectionStatus", "SocketPlugin",
+                [space.w_nil, w_b]).value == socket.Connected
+    port_b = prim("primitiveSocketLocalPort", "SocketPlugin", [space.w_nil, w_b]).value
+    w_buf = space.wrap_string("xxhelloxx")
+    assert prim("primitiveSocketSendUDPDataBufCount", "SocketPlugin",
+                [space.w_nil, w_a, space.wrap_string("127.0.0.1"), port_b, w_buf, 3, 5]).value == 5
+    time.sleep(0.1)
+    w_target = space.wrap_string("........")
+    w_res = prim("primitiveSocketReceiveUDPDataBufCount", "SocketPlugin",
+                 [space.w_nil, w_b, w_target, 2, 7])
+    count, w_host, w_port, w_more = space.unwrap_array(w_res)
+    assert count.value == 5
+    assert w_target.unwrap_string(None) == ".hello.."
+    assert w_host.unwrap_string(None) == "127.0.0.1"
+    assert w_port.value == prim("primitiveSocketLocalPort", "SocketPlugin", [space.w_nil, w_a]).value
+    assert w_more is space.w_false
+    w_res = prim("primitiveSocketReceiveUDPDataBufCount", "SocketPlugin",
+                 [space.w_nil, w_b, w_target, 1, 8])
+    assert space.unwrap_array(w_res)[0].value == 0
+
+def test_socket_address_bind_and_port():
+    w_a = prim("primitiveSocketCreate3Semaphores", "SocketPlugin",
+               [space.w_nil, 2, 0, 8000, 8000, 0, 0, 0])
+    prim("primitiveSocketListenOnPortBacklogInterface", "SocketPlugin",
+         [space.w_nil, w_a, 0, 4, space.wrap_string("127.0.0.1")])
+    size = prim("primitiveSocketLocalAddressSize", "SocketPlugin", [space.w_nil, w_a]).value
+    w_addr = W_BytesObject(space, space.w_ByteArray, size)
+    prim("primitiveSocketLocalAddressResult", "SocketPlugin", [space.w_nil, w_a, w_addr])
+    port = prim("primitiveSocketLocalPort", "SocketPlugin", [space.w_nil, w_a]).value
+    assert prim("primitiveSocketAddressGetPort", "SocketPlugin", [w_addr]).value == port
+    prim("primitiveSocketAddressSetPort", "SocketPlugin", [w_addr, 0])
+    assert prim("primitiveSocketAddressGetPort", "SocketPlugin", [w_addr]).value == 0
+    w_b = prim("primitiveSocketCreate3Semaphores", "SocketPlugin",
+               [space.w_nil, 2, 0, 8000, 8000, 0, 0, 0])
+    prim("primitiveSocketBindTo", "SocketPlugin", [space.w_nil, w_b, w_addr])
+    prim("primitiveSocketListenWithBacklog", "SocketPlugin", [space.w_nil, w_b, 4])
+    assert prim("primitiveSocketLocalAddress", "SocketPlugin",
+                [space.w_nil, w_b]).unwrap_string(None) == "127.0.0.1"
+    prim("primitiveSocketAddressSetPort", "SocketPlugin",
+         [w_addr, prim("primitiveSocketLocalPort", "SocketPlugin", [space.w_nil, w_b]).value])
+    w_c = prim("primitiveSocketCreate3Semaphores", "SocketPlugin",
+               [space.w_nil, 2, 0, 8000, 8000, 0, 0, 0])
+    prim("primitiveSocketConnectTo", "SocketPlugin", [space.w_nil, w_c, w_addr])
+    assert prim("primitiveSocketConnectionStatus", "SocketPlugin",
+                [space.w_nil, w_c]).value == socket.Connected
+    for w_socket in [w_a, w_b, w_c]:
+        prim("primitiveSocketCloseConnection", "SocketPlugin", [space.w_nil, w_socket])
+
+def test_socket_send_and_receive_words_and_buffers():
+    import socket as pysocket
+    from rsqueakvm.model.variable import W_WordsObject
+    server = pysocket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    handle = prim("primitiveSocketCreate3Semaphores", "SocketPlugin",
+                  [space.w_nil, 2, 0, 8000, 8000, 0, 0, 0])
+    prim("primitiveSocketConnectToPort", "SocketPlugin",
+         [space.w_nil, handle, space.wrap_string("127.0.0.1"),
+          space.wrap_int(server.getsockname()[1])])
+    conn, _ = server.accept()
+    try:
+        w_words = W_WordsObject(space, space.w_Bitmap, 3)
+        w_words.setwords([0x64636261, 0x68676665, 0x6c6b6a69])
+        assert prim("primitiveSocketSendDataBufCount", "SocketPlugin",
+                    [space.w_nil, handle, w_words, 2, 2]).value == 2
+        assert conn.recv(8) == "efghijkl"
+        # nothing there yet
+        assert prim("primitiveSocketReceiveDataBufCount", "SocketPlugin",
+                    [space.w_nil, handle, w_words, 1, 3]).value == 0
+        conn.sendall("ABCDEF")
+        time.sleep(0.1)
+        assert prim("primitiveSocketReceiveDataBufCount", "SocketPlugin",
+                    [space.w_nil, handle, w_words, 2, 2]).value == 1
+        assert w_words.words_as_string(0, 3) == "abcdABCDEFkl"
+
+        w_bytes = space.wrap_string("xyz")
+        assert prim("primitiveSocketSendDataBuffers", "SocketPlugin",
+                    [space.w_nil, handle, space.wrap_list([w_bytes, w_words, w_bytes])]).value == 18
+        assert conn.recv(18) == "xyzabcdABCDEFklxyz"
+        conn.sendall("0123456789")
+        time.sleep(0.1)
+        w_first = space.wrap_string("...")
+        w_second = W_WordsObject(space, space.w_Bitmap, 2)
+        w_third = space.wrap_string("..")
+        assert prim("primitiveSocketReceiveDataBuffers", "SocketPlugin",
+                    [space.w_nil, handle, space.wrap_list([w_first, w_second, w_third])]).value == 10
+        assert w_first.unwrap_string(None) == "012"
+        assert w_second.words_as_string(0, 2) == "3456789\x00"
+        assert w_third.unwrap_string(None) == ".."
+
+        conn.close()
+        time.sleep(0.1)
+        assert prim("primitiveSocketReceiveDataBufCount", "SocketPlugin",
+                    [space.w_nil, handle, w_first, 1, 3]).value == 0
+        assert prim("primitiveSocketConnectionStatus", "SocketPlugin",
+                    [space.w_nil, handle]).value == socket.OtherEndClosed
+        prim("primitiveSocketCloseConnection", "SocketPlugin", [space.w_nil, handle])
+    finally:
+        conn.close()
+        server.close()
+
+def test_socket_receive_data_buffers_waits_for_data():
+    import socket as pysocket
+    from .util import InterpreterForTest
+    server = pysocket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    interp = InterpreterForTest(space)
+    handle = prim("primitiveSocketCreate3Semaphores", "SocketPlugin",
+                  [space.w_nil, 2, 0, 8000, 8000, 1, 2, 3], interp=interp)
+    prim("primitiveSocketConnectToPort", "SocketPlugin",
+         [space.w_nil, handle, space.wrap_string("127.0.0.1"),
+          space.wrap_int(server.getsockname()[1])], interp=interp)
+    conn, _ = server.accept()
+    try:
+        assert prim("primitiveSocketSendDone", "SocketPlugin",
+                    [space.w_nil, handle], interp=interp) is space.w_true
+        assert not interp.io_poller.has_watches()
+        w_buffer = space.wrap_string("...")
+        assert prim("primitiveSocketReceiveDataBuffers", "SocketPlugin",
+                    [space.w_nil, handle, space.wrap_list([w_buffer])], interp=interp).value == 0
+        assert interp.io_poller.has_watches()
+        conn.send("abc")
+        assert interp.io_poller.poll(1000)
+        assert interp.io_poller.take_ready() == [2]
+        prim("primitiveSocketCloseConnection", "SocketPlugin", [space.w_nil, handle], interp=interp)
+    finally:
+        conn.close()
+        server.close()
+
+def test_socket_message_ends_idling(monkeypatch):
+    import socket as pysocket
+    import threading
+    from rsqueakvm.display import NullDisplay
+    from .util import InterpreterForTest
+    monkeypatch.setattr(space, "display", lambda: NullDisplay())
+    server = pysocket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    interp = InterpreterForTest(space)
+    handle = prim("primitiveSocketCreate3Semaphores", "SocketPlugin",
+                  [space.w_nil, 2, 0, 8000, 8000, 1, 2, 3], interp=interp)
+    prim("primitiveSocketConnectToPort", "SocketPlugin",
+         [space.w_nil, handle, space.wrap_string("127.0.0.1"),
+          space.wrap_int(server.getsockname()[1])], interp=interp)
+    conn, _ = server.accept()
+    try:
+        assert prim("primitiveSocketReceiveDataAvailable", "SocketPlugin",
+                    [space.w_nil, handle], interp=interp) is space.w_false
+        sent = []
+        def send():
+            time.sleep(0.1)
+            sent.append(time.time())
+            conn.send("hello")
+        thread = threading.Thread(target=send)
+        thread.start()
+        interp.idle(5 * 1000 * 1000)
+        woken = time.time()
+        thread.join()
+        assert interp.io_poller.take_ready() == [2]
+        # from the message arriving to the semaphore being ready to signal
+        latency = woken - sent[0]
+        assert latency < 0.05
+        prim("primitiveSocketCloseConnection", "SocketPlugin", [space.w_nil, handle], interp=interp)
+    finally:
+        conn.close()
+        server.close()
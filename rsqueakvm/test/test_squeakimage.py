@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
+import os
 import pytest
 import py
+import stat
+import sys
 import StringIO
 from struct import pack
 
@@ -10,6 +13,8 @@ from rsqueakvm.model.compiled_methods import W_CompiledMethod
 from rsqueakvm.model.numeric import W_SmallInteger
 from rsqueakvm.model.pointers import W_PointersObject
 from rsqueakvm.model.variable import W_BytesObject, W_WordsObject
+from rsqueakvm.storage_classes import ClassShadow
+from rsqueakvm.util import system
 from rsqueakvm.util.stream import chrs2int, chrs2long, swapped_chrs2long
 
 from .util import create_space
@@ -135,6 +140,51 @@ def test_stream_next_qword_is_unsigned():
     assert max_uint64 == 2**64 - 1
     assert max_uint64 > 0
 
+def mapped_imagestream(tmpdir, string):
+    path = tmpdir.join("mapped.image")
+    path.write(string, mode="wb")
+    return squeakimage.Stream(filename=str(path), use_mmap=True)
+
+def test_mapped_stream(tmpdir):
+    s = mapped_imagestream(tmpdir, SIMPLE_VERSION_HEADER * 2 + '\x01\x02\x03\x04\x05\x06\x07\x08' + '\xFF' * 4)
+    assert s.is_mapped()
+    assert s.length() == 20
+    assert s.peek() == 6502
+    assert s.next() == 6502
+    s.big_endian = False
+    assert s.next() == 0x66190000
+    s.big_endian = True
+    assert s.next_qword() == 0x0102030405060708
+    assert s.next() == -1
+    py.test.raises(IndexError, lambda: s.next())
+    s.close()
+    assert not s.is_mapped()
+
+def test_mapped_stream_matches_in_memory_stream(tmpdir):
+    data = ''.join([chr((i * 37) & 0xff) for i in range(64)])
+    mapped = mapped_imagestream(tmpdir, data)
+    in_memory = imagestream_mock(data)
+    for big_endian in [True, False]:
+        mapped.reset()
+        in_memory.reset()
+        mapped.big_endian = in_memory.big_endian = big_endian
+        mapped.skipbytes(2)
+        in_memory.skipbytes(2)
+        assert mapped.next_short() == in_memory.next_short()
+        assert mapped.next_bytes(4) == in_memory.next_bytes(4)
+        assert mapped.next_qword() == in_memory.next_qword()
+        while in_memory.pos < len(data):
+            assert mapped.next() == in_memory.next()
+        assert mapped.count == in_memory.count
+        if system.IS_64BIT:
+            mapped.reset()
+            in_memory.reset()
+            mapped.big_endian = in_memory.big_endian = big_endian
+            mapped.be_64bit()
+            in_memory.be_64bit()
+            while in_memory.pos < len(data):
+                assert mapped.next() == in_memory.next()
+
 def test_simple_joinbits():
     assert 0x01010101 == joinbits(([1] * 4), [8,8,8,8])
     assert 0xFfFfFfFf == joinbits([255] * 4, [8,8,8,8])
@@ -301,6 +351,23 @@ def test_read_long_spur_header():
     assert expectedChunk == actualChunk
     assert pos == 8
 
+def test_spur_chunk_body_is_read_lazily():
+    objbytes = ints2str(joinbits([48, 0, 3], [22, 2, 8]),
+            joinbits([10, 0, 2, 0], [22, 2, 5, 3])) + ints2str(5, 7, 9, 0)
+    r = imagereader_mock(SPUR_VERSION_HEADER + objbytes)
+    stream = r.stream
+    r.read_version()
+    r.readerStrategy.oldbaseaddress = 0
+    stream.reset_count()
+    chunk, pos = r.readerStrategy.read_object()
+    assert stream.pos == len(SPUR_VERSION_HEADER + objbytes)  # alignment slot skipped
+    assert chunk.data is None
+    assert chunk.len_data() == 3
+    assert chunk.data_at(1) == 7
+    assert chunk.get_data() == [5, 7, 9]
+    chunk.release_data()
+    assert chunk.len_data() == 0
+
 def test_object_format_spur(monkeypatch):
     g_class_mock = squeakimage.GenericObject()
     from rpython.rlib import objectmodel
@@ -398,6 +465,7 @@ def reader_mock_v3(monkeypatch, space):
     from rpython.rlib import objectmodel
     class FakeVersion:
         is_big_endian = True
+        is_64bit = False
     reader_mock = NonSpurReader(imageReader=None, version=FakeVersion(),
             stream=None, space=space)
     reader_mock.special_g_objects = [GenericObject()]
@@ -413,6 +481,7 @@ def reader_mock_spur(monkeypatch, space):
     from rpython.rlib import objectmodel
     class FakeVersion:
         is_big_endian = True
+        is_64bit = False
     reader_mock = SpurReader(imageReader=None, version=FakeVersion(), stream=None,
             space=space)
     fake_g_class = GenericObject()
@@ -741,6 +810,28 @@ def test_simple_spur_image_little_endian():
     assert stream.pos == len(image_le)
     assert r.space.is_spur.is_set() is True
 
+def test_simple_spur_image_mapped(tmpdir):
+    image = simple_spur_image(pack_be, spur_hdr_big_endian, SPUR_VERSION_HEADER)
+    r = imagereader_mock(image)
+    stream = r.stream = mapped_imagestream(tmpdir, image)
+    r.read_all()  # does not raise
+    assert stream.pos == len(image)
+    assert not stream.is_mapped()  # released after fillin_w_objects
+
+def test_image_loading_log(capsys):
+    image = simple_spur_image(pack_be, spur_hdr_big_endian, SPUR_VERSION_HEADER)
+    r = imagereader_mock(image)
+    r.logging_enabled = True
+    r.read_all()
+    for chunk in r.chunklist:
+        assert chunk.g_object.filled_in
+    lines = capsys.readouterr()[0].splitlines()
+    phases = [line.split(":")[0] for line in lines if line.endswith(" ms")]
+    assert phases[:-1] == ["read body", "decode headers and pointers",
+                           "instantiate objects", "fill in objects",
+                           "fill in weak objects", "finalize"]
+    assert phases[-1].startswith("image loaded in ")
+
 def test_simple_spur_image_with_segments():
     spur_hdr = spur_hdr_big_endian
     word_size = 4
@@ -847,3 +938,219 @@ def test_simple_spur_image_with_segments():
     # we do not support unicode yet
     #assert r.space.unwrap_char(theArray.fetch(r.space, 5)) == u'ü'
     assert theArray.fetch(r.space, 6).gethash() == 4040
+
+def cached_image_reader(space, cache_path):
+    from .util import image_stream
+    return squeakimage.ImageReader(space, image_stream("mini.image"),
+                                   cache_path=cache_path)
+
+def test_image_cache(tmpdir):
+    cache_path = tmpdir.join("mini.image.cache")
+    r = cached_image_reader(create_space(), cache_path.strpath)
+    image = r.create_image()
+    assert not isinstance(r.readerStrategy, squeakimage.CachedReader)
+    assert cache_path.check()
+    assert not tmpdir.join("mini.image.cache.tmp").check()
+
+    cached_space = create_space()
+    cached_r = cached_image_reader(cached_space, cache_path.strpath)
+    cached_image = cached_r.create_image()
+    assert isinstance(cached_r.readerStrategy, squeakimage.CachedReader)
+    assert cached_r.version is r.version
+    assert cached_image.lastWindowSize == image.lastWindowSize
+    assert len(cached_r.chunklist) == len(r.chunklist)
+    for chunk, cached_chunk in zip(r.chunklist, cached_r.chunklist):
+        w_object = chunk.g_object.w_object
+        w_cached = cached_chunk.g_object.w_object
+        assert w_cached.__class__ is w_object.__class__
+        assert w_cached.size() == w_object.size()
+        if (isinstance(w_object, W_PointersObject) and
+                not w_cached.strategy.is_shadow()):
+            assert (w_cached.strategy.__class__ is
+                    w_object.strategy.__class__)
+    assert cached_space.unwrap_string(cached_image.w_asSymbol) == "asSymbol"
+    assert (cached_space.w_special_objects.size() ==
+            r.space.w_special_objects.size())
+    w_class = cached_space.w_special_objects.fetch(cached_space, 4) # Array
+    assert isinstance(w_class.strategy, ClassShadow)
+    assert w_class.strategy._s_methoddict is not None
+
+def test_simple_spur_image_cache(tmpdir):
+    cache_path = tmpdir.join("spur.image.cache").strpath
+    image = simple_spur_image(pack_le, spur_hdr_little_endian, SPUR_VERSION_HEADER_LE)
+    r = imagereader_mock(image)
+    r.cache_path = cache_path
+    r.read_all()
+    cached_r = imagereader_mock(image)
+    cached_r.cache_path = cache_path
+    cached_r.read_all()
+    assert isinstance(cached_r.readerStrategy, squeakimage.CachedReader)
+    assert cached_r.space.is_spur.is_set() is True
+    assert ([chunk.g_object.w_object.__class__ for chunk in cached_r.chunklist] ==
+            [chunk.g_object.w_object.__class__ for chunk in r.chunklist])
+
+def test_image_cache_of_other_image_is_rewritten(tmpdir):
+    cache_path = tmpdir.join("spur.image.cache")
+    cache_path.write(pack("<9i", squeakimage.CACHE_MAGIC,
+                          squeakimage.CACHE_VERSION, 1, 2, 6521, 0, 0, 0, 0),
+                     mode="wb")
+    image = simple_spur_image(pack_le, spur_hdr_little_endian, SPUR_VERSION_HEADER_LE)
+    r = imagereader_mock(image)
+    r.cache_path = cache_path.strpath
+    r.read_all()
+    assert not isinstance(r.readerStrategy, squeakimage.CachedReader)
+    assert cache_path.size() > 9 * 4
+    cached_r = imagereader_mock(image)
+    cached_r.cache_path = cache_path.strpath
+    cached_r.read_all()
+    assert isinstance(cached_r.readerStrategy, squeakimage.CachedReader)
+
+def damage_cache(cache_path, word_index, value):
+    data = cache_path.read(mode="rb")
+    cache_path.write(data[:word_index * 4] + pack("<i", value) +
+                     data[word_index * 4 + 4:], mode="wb")
+
+@pytest.mark.parametrize("damage", [
+    lambda path: damage_cache(path, 8, 100000), # special objects index
+    lambda path: damage_cache(path, 10, 100000), # object count
+    lambda path: damage_cache(path, 10, -1),
+    lambda path: damage_cache(path, 11, 100000), # kind of the first object
+    lambda path: path.write(path.read(mode="rb")[:-8], mode="wb"),
+    lambda path: path.write(path.read(mode="rb")[:60], mode="wb"),
+])
+def test_damaged_image_cache_is_rewritten(tmpdir, damage):
+    cache_path = tmpdir.join("spur.image.cache")
+    image = simple_spur_image(pack_le, spur_hdr_little_endian, SPUR_VERSION_HEADER_LE)
+    r = imagereader_mock(image)
+    r.cache_path = cache_path.strpath
+    r.read_all()
+    intact = cache_path.read(mode="rb")
+    damage(cache_path)
+    damaged_r = imagereader_mock(image)
+    damaged_r.cache_path = cache_path.strpath
+    damaged_r.read_all()
+    assert not isinstance(damaged_r.readerStrategy, squeakimage.CachedReader)
+    assert ([chunk.g_object.w_object.__class__ for chunk in damaged_r.chunklist] ==
+            [chunk.g_object.w_object.__class__ for chunk in r.chunklist])
+    assert cache_path.read(mode="rb") == intact
+
+def test_stream_identity_follows_file(tmpdir):
+    path = tmpdir.join("some.image")
+    path.write("\x00" * 16, mode="wb")
+    os.utime(path.strpath, (1000, 1000))
+    identity = squeakimage.Stream(filename=path.strpath).identity()
+    assert identity == squeakimage.Stream(filename=path.strpath).identity()
+    os.utime(path.strpath, (1000, 2000))
+    assert identity != squeakimage.Stream(filename=path.strpath).identity()
+    assert (imagestream_mock("\x00" * 16).identity() !=
+            imagestream_mock("\x00" * 15 + "\x01").identity())
+
+def test_snapshot_buffer(tmpdir, monkeypatch):
+    monkeypatch.setattr(squeakimage.SnapshotBuffer, "BLOCK_SIZE", 8)
+    buf = squeakimage.SnapshotBuffer()
+    buf.seek(4, 0)
+    buf.write("abcdefghijklmnopq")
+    assert buf.tell() == 21
+    buf.seek(0, 0)
+    buf.write("0123")
+    buf.seek(10, 0)
+    buf.write("XY")
+    assert len(buf.blocks) == 3
+    filename = tmpdir.join("snapshot.image")
+    buf.write_file(filename.strpath)
+    assert filename.read(mode="rb") == "0123abcdefXYijklmnopq"
+    assert not tmpdir.join("snapshot.image.tmp").check()
+
+def test_snapshot_buffer_replaces_symlink_target(tmpdir, monkeypatch):
+    monkeypatch.setattr(squeakimage.SnapshotBuffer, "BLOCK_SIZE", 8)
+    buf = squeakimage.SnapshotBuffer()
+    buf.write("new image")
+    target = tmpdir.mkdir("images").join("real.image")
+    target.write("old image", mode="wb")
+    target.chmod(0600)
+    link = tmpdir.join("link.image")
+    link.mksymlinkto("images/real.image")
+    buf.write_file(link.strpath)
+    assert link.islink()
+    assert target.read(mode="rb") == "new image"
+    assert stat.S_IMODE(target.stat().mode) == 0600
+    assert tmpdir.join("images").listdir() == [target]
+
+def test_snapshot_buffer_removes_tmp_file_on_failure(tmpdir):
+    buf = squeakimage.SnapshotBuffer()
+    buf.write("image")
+    # renaming a file over a directory fails
+    target = tmpdir.mkdir("snapshot.image")
+    with pytest.raises(OSError):
+        buf.write_file(target.strpath)
+    assert tmpdir.listdir() == [target]
+
+def test_wait_for_snapshot_writer(capfd):
+    space = create_space()
+    assert squeakimage.wait_for_snapshot_writer(space)
+    for exitcode, written in [(0, True), (1, False)]:
+        pid = os.fork()
+        if pid == 0:
+            os._exit(exitcode)
+        space.snapshot_writer_pid = pid
+        assert squeakimage.wait_for_snapshot_writer(space) is written
+        assert space.snapshot_writer_pid == 0
+    assert "writing in the background failed" in capfd.readouterr()[1]
+    # not our child
+    space.snapshot_writer_pid = os.getppid()
+    assert not squeakimage.wait_for_snapshot_writer(space)
+    assert space.snapshot_writer_pid == 0
+
+def test_small_float64():
+    from rsqueakvm.model.numeric import (is_small_float64, small_float64_oop,
+                                         small_float64_value)
+    assert small_float64_oop(0.0) == 0x4
+    assert small_float64_oop(1.0) == 0x7f00000000000004
+    for value in [0.0, -0.0, 1.0, -1.5, 3.14159, 2.0 ** 127, 2.0 ** -126]:
+        assert is_small_float64(value)
+        assert small_float64_value(small_float64_oop(value)) == value
+    for value in [1e300, 1e-300, 2.0 ** -127, float("inf")]:
+        assert not is_small_float64(value)
+
+@pytest.mark.skipif("not system.IS_64BIT")
+def test_spur64_round_trip(tmpdir, monkeypatch):
+    from rsqueakvm import wrapper
+    from rsqueakvm.constants import SO_EXTERNAL_OBJECTS_ARRAY
+    from rsqueakvm.model.numeric import W_Float
+    from .util import open_reader, InterpreterForTest
+    # not via read_image, the shared cached mini.image must stay untouched
+    space = create_space()
+    image = open_reader(space, "mini.image").create_image()
+    interp = InterpreterForTest(space, image)
+    w_values = space.wrap_list([space.wrap_int(2 ** 40), space.wrap_int(-3),
+                                W_Float(1.5), W_Float(1e300),
+                                space.wrap_char("a"),
+                                space.wrap_int(-2 ** 62 - 5),
+                                space.wrap_int(-sys.maxint - 1)])
+    space.w_special_objects.store(space, SO_EXTERNAL_OBJECTS_ARRAY, w_values)
+    w_process = wrapper.scheduler(space).active_process()
+    s_frame = wrapper.ProcessWrapper(space, w_process).suspended_context().as_context_get_shadow(space)
+    filename = tmpdir.join("mini64.image").strpath
+    # without --background-snapshot the image is written straight to disk
+    monkeypatch.setattr(squeakimage, "SnapshotBuffer", None)
+    writer = squeakimage.SpurImageWriter(interp, filename, is_64bit=True)
+    writer.trace_image(s_frame)
+
+    space64 = create_space()
+    r = squeakimage.ImageReader(space64, squeakimage.Stream(filename=filename))
+    image64 = r.create_image()
+    assert r.version.magic == 68021 and r.version.is_64bit
+    assert space64.is_spur.is_set()
+    assert space64.unwrap_string(image64.w_asSymbol) == "asSymbol"
+    w_values = space64.w_special_objects.fetch(space64, SO_EXTERNAL_OBJECTS_ARRAY)
+    values_w = [w_values.fetch(space64, i) for i in range(7)]
+    assert isinstance(values_w[0], W_SmallInteger)
+    assert values_w[0].value == 2 ** 40
+    assert values_w[1].value == -3
+    assert isinstance(values_w[2], W_Float) and values_w[2].value == 1.5
+    assert isinstance(values_w[3], W_Float) and values_w[3].value == 1e300
+    assert isinstance(values_w[4], W_Character) and values_w[4].value == ord("a")
+    # too large for a tagged SmallInteger, written as LargeNegativeIntegers
+    for w_value, value in zip(values_w[5:], [-2 ** 62 - 5, -sys.maxint - 1]):
+        assert w_value.getclass(space64).is_same_object(space64.w_LargeNegativeInteger)
+        assert space64.unwrap_rbigint(w_value).tolong() == value
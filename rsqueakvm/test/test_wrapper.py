@@ -243,6 +243,48 @@ class TestScheduler(object):
         assert highest.wrapped is old_process.wrapped
         py.test.raises(FatalError, wrapper.scheduler(space).wake_highest_priority_process)
 
+    def test_ready_queues_follow_the_process_lists(self):
+        ready_queues = space.ready_queues
+        scheduler = wrapper.scheduler(space)
+        process, old_process = self.make_processes(4, 2, space.w_false)
+        old_process.put_to_sleep()
+        assert scheduler.wake_highest_priority_process().wrapped is process.wrapped
+        assert ready_queues.highest() == 1
+        process.put_to_sleep()
+        assert ready_queues.highest() == 3
+        # a list emptied by the image clears its bit
+        process_list = scheduler.get_process_list(4)
+        process_list.store_first_link(space.w_nil)
+        process_list.store_last_link(space.w_nil)
+        assert ready_queues.highest() == 1
+        assert scheduler.wake_highest_priority_process().wrapped is old_process.wrapped
+        assert ready_queues.highest() == -1
+        # a new lists array is scanned once
+        priority_list = new_prioritylist()
+        process_list = wrapper.LinkedListWrapper(space, priority_list.read(3))
+        process_list.store_first_link(process.wrapped)
+        process_list.store_last_link(process.wrapped)
+        scheduler.write(0, priority_list.wrapped)
+        assert scheduler.wake_highest_priority_process().wrapped is process.wrapped
+        assert ready_queues.highest() == -1
+        # a list filled by the image sets its bit, even above a lower one
+        old_process.put_to_sleep()
+        process_list = scheduler.get_process_list(3)
+        process_list.store_first_link(process.wrapped)
+        process_list.store_last_link(process.wrapped)
+        assert ready_queues.highest() == 2
+        assert scheduler.wake_highest_priority_process().wrapped is process.wrapped
+        assert scheduler.wake_highest_priority_process().wrapped is old_process.wrapped
+        py.test.raises(FatalError, scheduler.wake_highest_priority_process)
+        # another list stored into the lists array by the image
+        w_list = new_processlist().wrapped
+        wrapper.LinkedListWrapper(space, w_list).store_first_link(process.wrapped)
+        wrapper.LinkedListWrapper(space, w_list).store_last_link(process.wrapped)
+        old_process.put_to_sleep()
+        priority_list.write(4, w_list)
+        assert scheduler.wake_highest_priority_process().wrapped is process.wrapped
+        assert scheduler.wake_highest_priority_process().wrapped is old_process.wrapped
+
     def test_semaphore_wait(self):
         semaphore = new_semaphore()
         suspendedcontext = new_frame()
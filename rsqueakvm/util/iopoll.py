@@ -0,0 +1,139 @@
+from rpython.rlib import rpoll
+
+
+READ = 1
+WRITE = 2
+
+if hasattr(rpoll, 'poll'):
+    # an fd that was closed behind our back (POLLNVAL) counts as ready, so
+    # its one-shot watch is dropped instead of waking every poll
+    POLL_READ = rpoll.POLLIN | rpoll.POLLHUP | rpoll.POLLERR | rpoll.POLLNVAL
+    POLL_WRITE = rpoll.POLLOUT | rpoll.POLLHUP | rpoll.POLLERR | rpoll.POLLNVAL
+
+    def wait_for_fds(readers, writers, timeout_ms):
+        "Answer the lists of the readable and the writable fds."
+        fddict = {}
+        for fd in readers:
+            fddict[fd] = rpoll.POLLIN
+        for fd in writers:
+            fddict[fd] = fddict.get(fd, 0) | rpoll.POLLOUT
+        readable = []
+        writable = []
+        try:
+            events = rpoll.poll(fddict, timeout_ms)
+        except rpoll.PollError:
+            return readable, writable  # interrupted, ask again next time
+        for fd, revents in events:
+            if revents & POLL_READ:
+                readable.append(fd)
+            if revents & POLL_WRITE:
+                writable.append(fd)
+        return readable, writable
+else:
+    def wait_for_fds(readers, writers, timeout_ms):
+        "Answer the lists of the readable and the writable fds."
+        try:
+            readable, writable, _ = rpoll.select(readers.keys(), writers.keys(), [],
+                                                 timeout_ms / 1000.0)
+        except rpoll.SelectError:
+            return [], []
+        return readable, writable
+
+
+def is_ready(fd, direction):
+    "Answer whether fd can be read from or written to without blocking."
+    if direction == READ:
+        readable, _ = wait_for_fds({fd: 0}, {}, 0)
+        return len(readable) > 0
+    else:
+        _, writable = wait_for_fds({}, {fd: 0}, 0)
+        return len(writable) > 0
+
+
+class Flusher(object):
+    """Something that queued output for an fd because the fd did not take
+    all of it without blocking."""
+    _attrs_ = []
+
+    def flush(self):
+        "Write out what the fd takes now and answer whether nothing is left."
+        raise NotImplementedError
+
+
+class IOPoller(object):
+    """Watches fds for readiness and remembers which external semaphore to
+    signal for them. Watches are one-shot: a primitive that answers "not
+    yet" (no data, send not done, no connection) arms one, the first poll
+    that sees the fd ready drops it and queues the semaphore index. So only
+    the fds the image is currently waiting for are polled at all. Queued
+    output of a Flusher is written out whenever its fd becomes writable,
+    until none is left."""
+    _attrs_ = ["readers", "writers", "flushers", "ready"]
+
+    def __init__(self):
+        self.readers = {}
+        self.writers = {}
+        self.flushers = {}
+        self.ready = []
+
+    def watch(self, fd, direction, semaphore_index):
+        if semaphore_index <= 0:
+            return
+        if direction == READ:
+            self.readers[fd] = semaphore_index
+        else:
+            self.writers[fd] = semaphore_index
+
+    def flush_when_writable(self, fd, flusher):
+        self.flushers[fd] = flusher
+
+    def unwatch(self, fd):
+        if fd in self.readers:
+            del self.readers[fd]
+        if fd in self.writers:
+            del self.writers[fd]
+        if fd in self.flushers:
+            del self.flushers[fd]
+
+    def has_watches(self):
+        return (len(self.readers) > 0 or len(self.writers) > 0 or
+                len(self.flushers) > 0)
+
+    def poll(self, timeout_ms=0, wakeup_fd=-1):
+        """Wait up to timeout_ms for a watched fd to become ready and queue
+        the semaphore indices of the ready ones. A readable wakeup_fd ends
+        the wait as well. Answer whether any fd was ready."""
+        if wakeup_fd < 0 and not self.has_watches():
+            return False
+        readers = self.readers
+        if wakeup_fd >= 0:
+            readers = readers.copy()
+            readers[wakeup_fd] = 0
+        writers = self.writers
+        if len(self.flushers) > 0:
+            writers = writers.copy()
+            for fd in self.flushers:
+                writers[fd] = 0
+        readable, writable = wait_for_fds(readers, writers, timeout_ms)
+        for fd in readable:
+            if fd in self.readers:
+                self.ready.append(self.readers[fd])
+                del self.readers[fd]
+        for fd in writable:
+            if fd in self.writers:
+                self.ready.append(self.writers[fd])
+                del self.writers[fd]
+            if fd in self.flushers:
+                try:
+                    done = self.flushers[fd].flush()
+                except OSError:
+                    done = True  # the fd is gone, so is what was queued
+                if done:
+                    del self.flushers[fd]
+        return len(readable) > 0 or len(writable) > 0
+
+    def take_ready(self):
+        "Answer and forget the queued semaphore indices."
+        ready = self.ready
+        self.ready = []
+        return ready
@@ -0,0 +1,473 @@
+import os
+import time
+
+from rsqueakvm.util import iopoll
+from rsqueakvm.util.system import IS_POSIX
+
+from rpython.rlib import rsocket, _rsocket_rffi
+from rpython.rtyper.lltypesystem import rffi
+
+
+NAME_LOOKUP = 0      # host name -> numeric host
+ADDRESS_LOOKUP = 1   # numeric host -> host name
+ADDRINFO_LOOKUP = 2  # host, service, flags, family, type, protocol -> infos
+NAMEINFO_LOOKUP = 3  # sockaddr, flags -> host and service name
+
+DEFAULT_TTL = 60.0
+MAX_CACHE_ENTRIES = 256
+READ_SIZE = 65536
+
+
+class LookupResult(object):
+    """What a lookup answered, kept in the cache until it expires. error is
+    0 or the errno/EAI code of the failed lookup."""
+    _attrs_ = ["error", "strings", "infos", "expires"]
+    _immutable_fields_ = ["error", "strings[*]", "infos[*]"]
+
+    def __init__(self, error, strings, infos=None):
+        self.error = error
+        self.strings = strings
+        self.infos = infos or []
+        self.expires = 0.0
+
+
+class AddressInfo(object):
+    "One answer of getaddrinfo, the address is kept as the raw sockaddr."
+    _attrs_ = _immutable_fields_ = ["family", "socktype", "protocol", "sockaddr"]
+
+    def __init__(self, family, socktype, protocol, sockaddr):
+        self.family = family
+        self.socktype = socktype
+        self.protocol = protocol
+        self.sockaddr = sockaddr
+
+
+def error_code(e):
+    if isinstance(e, rsocket.SocketErrorWithErrno):
+        return e.errno
+    return -1
+
+
+def address_to_bytes(address):
+    """Answer the raw sockaddr of address. This is what the image sees as a
+    SocketAddress, it only ever hands it back to us."""
+    addr = address.lock()
+    try:
+        return rffi.charpsize2str(rffi.cast(rffi.CCHARP, addr), address.addrlen)
+    finally:
+        address.unlock()
+
+
+def address_from_bytes(data):
+    "Answer the IP address of the raw sockaddr data, or None."
+    if (len(data) != rsocket.INETAddress.maxlen and
+            len(data) != rsocket.INET6Address.maxlen):
+        return None
+    with rffi.scoped_nonmovingbuffer(data) as buf:
+        address = rsocket.make_address(rffi.cast(_rsocket_rffi.sockaddr_ptr, buf),
+                                       len(data))
+    if not isinstance(address, rsocket.IPAddress):
+        return None
+    return address
+
+
+# Requests are lists of strings, the first one is the kind of lookup.
+
+def name_request(name):
+    return [str(NAME_LOOKUP), name]
+
+def address_request(host):
+    return [str(ADDRESS_LOOKUP), host]
+
+def addrinfo_request(host, service, flags, family, socktype, protocol):
+    return [str(ADDRINFO_LOOKUP), host, service, str(flags), str(family),
+            str(socktype), str(protocol)]
+
+def nameinfo_request(sockaddr, flags):
+    return [str(NAMEINFO_LOOKUP), sockaddr, str(flags)]
+
+
+def lookup(request):
+    "Do the lookup of request, this may block for as long as the DNS takes."
+    try:
+        kind = int(request[0])
+        if kind == NAME_LOOKUP:
+            return LookupResult(0, [rsocket.INETAddress(request[1], 0).get_host()])
+        elif kind == ADDRESS_LOOKUP:
+            return LookupResult(0, [rsocket.gethostbyaddr(request[1])[0]])
+        elif kind == ADDRINFO_LOOKUP:
+            host = request[1]
+            service = request[2]
+            infos = [AddressInfo(fam, typ, proto, address_to_bytes(address))
+                     for (fam, typ, proto, _, address)
+                     in rsocket.getaddrinfo(host or None, service or None,
+                                            int(request[4]), int(request[5]),
+                                            int(request[6]), int(request[3]))]
+            return LookupResult(0, [], infos)
+        elif kind == NAMEINFO_LOOKUP:
+            address = address_from_bytes(request[1])
+            if address is not None:
+                host, service = rsocket.getnameinfo(address, int(request[2]))
+                return LookupResult(0, [host, service])
+    except rsocket.SocketError as e:
+        return LookupResult(error_code(e), [])
+    except ValueError:
+        pass
+    return LookupResult(-1, [])
+
+
+def encode_fields(fields):
+    return "".join(["%d:%s" % (len(field), field) for field in fields])
+
+
+def decode_fields(data):
+    "Answer the strings encoded by encode_fields, raise ValueError if broken."
+    fields = []
+    pos = 0
+    while pos < len(data):
+        colon = data.find(":", pos)
+        if colon < 0:
+            raise ValueError
+        length = int(data[pos:colon])
+        start = colon + 1
+        end = start + length
+        if length < 0 or end > len(data):
+            raise ValueError
+        assert start >= 0 and end >= 0
+        fields.append(data[start:end])
+        pos = end
+    return fields
+
+
+def encode_result(result):
+    fields = [str(result.error), str(len(result.strings))] + result.strings
+    for info in result.infos:
+        fields += [str(info.family), str(info.socktype), str(info.protocol),
+                   info.sockaddr]
+    return encode_fields(fields)
+
+
+def decode_result(data):
+    try:
+        fields = decode_fields(data)
+        error = int(fields[0])
+        count = int(fields[1])
+        if (count < 0 or 2 + count > len(fields) or
+                (len(fields) - 2 - count) % 4 != 0):
+            raise ValueError
+        strings = fields[2:2 + count]
+        infos = []
+        for i in range(2 + count, len(fields), 4):
+            infos.append(AddressInfo(int(fields[i]), int(fields[i + 1]),
+                                     int(fields[i + 2]), fields[i + 3]))
+    except (ValueError, IndexError):
+        return LookupResult(-1, [])
+    return LookupResult(error, strings, infos)
+
+
+class FrameReader(object):
+    """Collects the bytes read from a pipe and cuts them into the
+    "<length>:<payload>" frames that requests and answers are sent as."""
+    _attrs_ = ["data"]
+
+    def __init__(self):
+        self.data = ""
+
+    def feed(self, chunk):
+        self.data += chunk
+
+    def next_frame(self):
+        "Answer the next whole frame, or None if it has not arrived yet."
+        colon = self.data.find(":")
+        if colon < 0:
+            return None
+        try:
+            length = int(self.data[:colon])
+        except ValueError:
+            length = -1
+        end = colon + 1 + length
+        if length < 0:
+            self.data = ""
+            return ""  # a broken frame, it decodes as an error
+        if len(self.data) < end:
+            return None
+        assert end >= 0
+        payload = self.data[colon + 1:end]
+        self.data = self.data[end:]
+        return payload
+
+
+def frame(payload):
+    return "%d:%s" % (len(payload), payload)
+
+
+def write_all(fd, data):
+    while data:
+        written = os.write(fd, data)
+        data = data[written:]
+
+
+def serve(rfd, wfd):
+    """The loop of the helper process: answer the requests from rfd on wfd,
+    one after the other, until the VM closes its end."""
+    reader = FrameReader()
+    while True:
+        request = reader.next_frame()
+        if request is None:
+            chunk = os.read(rfd, READ_SIZE)
+            if not chunk:
+                return
+            reader.feed(chunk)
+            continue
+        try:
+            fields = decode_fields(request)
+        except ValueError:
+            fields = []
+        if len(fields) == 0:
+            result = LookupResult(-1, [])
+        else:
+            result = lookup(fields)
+        write_all(wfd, frame(encode_result(result)))
+
+
+class Resolver(object):
+    """Runs the lookups of the SocketPlugin without blocking the VM. The VM
+    forks once into a helper process that stays around and answers the
+    requests it gets over a pipe. One lookup is pending at a time: the io
+    poller watches the answer pipe and signals the resolver semaphore when
+    the answer arrives. An aborted lookup still runs to its end in the
+    helper, its answer is skipped. Answers are cached for ttl seconds.
+    Without fork (Windows) lookups run inline."""
+    _attrs_ = ["cache", "ttl", "semaphore_index", "result", "addrinfo",
+               "addrinfo_index", "nameinfo", "pending_kind", "pending_key",
+               "skip", "helper_pid", "owner_pid", "request_fd", "answer_fd",
+               "answers"]
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.cache = {}
+        self.ttl = ttl
+        self.semaphore_index = 0
+        self.result = None
+        self.addrinfo = None
+        self.addrinfo_index = 0
+        self.nameinfo = None
+        self.pending_kind = -1
+        self.pending_key = ""
+        self.skip = 0
+        self.helper_pid = 0
+        self.owner_pid = 0
+        self.request_fd = -1
+        self.answer_fd = -1
+        self.answers = FrameReader()
+
+    def is_busy(self):
+        return self.pending_key != ""
+
+    def start(self, interp, request, inline=False):
+        """Start the lookup of request. Answers from the cache, inline
+        lookups and failures to reach the helper are ready at once,
+        otherwise the resolver is busy until poll() collects the answer."""
+        self.abort(interp)
+        kind = int(request[0])
+        key = encode_fields(request)
+        self.forget(kind)
+        result = self.cached(key)
+        if result is not None:
+            self.answer(kind, result)
+            return
+        if inline or not IS_POSIX:
+            self.answer(kind, self.store(key, lookup(request)))
+            return
+        try:
+            self.start_helper(interp)
+            write_all(self.request_fd, frame(encode_fields(request)))
+        except OSError:
+            self.stop_helper(interp)
+            self.answer(kind, LookupResult(-1, []))
+            return
+        self.pending_kind = kind
+        self.pending_key = key
+        self.watch(interp)
+
+    def forget(self, kind):
+        "Drop the answer of the last lookup of kind."
+        self.result = None
+        if kind == ADDRINFO_LOOKUP:
+            self.addrinfo = None
+            self.addrinfo_index = 0
+        elif kind == NAMEINFO_LOOKUP:
+            self.nameinfo = None
+
+    def answer(self, kind, result):
+        self.result = result
+        if result.error != 0:
+            return
+        if kind == ADDRINFO_LOOKUP:
+            self.addrinfo = result
+            self.addrinfo_index = 0
+        elif kind == NAMEINFO_LOOKUP and len(result.strings) == 2:
+            self.nameinfo = result
+
+    def watch(self, interp):
+        interp.io_poller.watch(self.answer_fd, iopoll.READ, self.semaphore_index)
+
+    def poll(self, interp):
+        "Collect the answer if the helper has sent it, answer whether it has."
+        if not self.is_busy():
+            return True
+        self.check_owner(interp)
+        while self.is_busy() and iopoll.is_ready(self.answer_fd, iopoll.READ):
+            try:
+                chunk = os.read(self.answer_fd, READ_SIZE)
+            except OSError:
+                chunk = ""
+            if not chunk:
+                # the helper is gone, the next lookup starts a new one
+                self.stop_helper(interp)
+                break
+            self.answers.feed(chunk)
+            self.collect_answers()
+        if self.is_busy():
+            self.watch(interp)
+            return False
+        interp.io_poller.unwatch(self.answer_fd)
+        return True
+
+    def collect_answers(self):
+        while self.is_busy():
+            payload = self.answers.next_frame()
+            if payload is None:
+                return
+            if self.skip > 0:
+                self.skip -= 1
+                continue
+            kind = self.pending_kind
+            key = self.pending_key
+            self.pending_kind = -1
+            self.pending_key = ""
+            self.answer(kind, self.store(key, decode_result(payload)))
+
+    def wait(self, interp, kind):
+        """Block until the pending lookup of kind is answered, for images
+        that ask for the answer without waiting for the resolver."""
+        while self.is_busy() and self.pending_kind == kind:
+            if self.poll(interp):
+                return
+            iopoll.wait_for_fds({self.answer_fd: 0}, {}, 1000)
+
+    def abort(self, interp):
+        if not self.is_busy():
+            return
+        interp.io_poller.unwatch(self.answer_fd)
+        self.skip += 1
+        self.pending_kind = -1
+        self.pending_key = ""
+        self.result = None
+
+    def start_helper(self, interp):
+        self.check_owner(interp)
+        if self.helper_pid != 0:
+            return
+        to_helper_r, to_helper_w = os.pipe()
+        to_vm_r, to_vm_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            exitcode = 0
+            try:
+                os.close(to_helper_w)
+                os.close(to_vm_r)
+                serve(to_helper_r, to_vm_w)
+            except OSError:
+                exitcode = 1
+            os._exit(exitcode)
+        os.close(to_helper_r)
+        os.close(to_vm_w)
+        self.helper_pid = pid
+        self.owner_pid = os.getpid()
+        self.request_fd = to_helper_w
+        self.answer_fd = to_vm_r
+        self.answers = FrameReader()
+        self.skip = 0
+
+    def check_owner(self, interp):
+        """A forked worker inherits the pipes to the helper of its parent,
+        it must not read the answers meant for the parent."""
+        if self.helper_pid != 0 and self.owner_pid != os.getpid():
+            interp.io_poller.unwatch(self.answer_fd)
+            os.close(self.request_fd)
+            os.close(self.answer_fd)
+            self.forget_helper()
+
+    def stop_helper(self, interp):
+        "End the helper, a pending lookup fails."
+        if self.helper_pid != 0:
+            interp.io_poller.unwatch(self.answer_fd)
+            os.close(self.request_fd)
+            os.close(self.answer_fd)
+            try:
+                os.kill(self.helper_pid, 9)  # SIGKILL
+                os.waitpid(self.helper_pid, 0)
+            except OSError:
+                pass
+            self.forget_helper()
+
+    def forget_helper(self):
+        if self.is_busy():
+            self.pending_kind = -1
+            self.pending_key = ""
+            self.result = LookupResult(-1, [])
+        self.helper_pid = 0
+        self.owner_pid = 0
+        self.request_fd = -1
+        self.answer_fd = -1
+        self.answers = FrameReader()
+        self.skip = 0
+
+    def cached(self, key):
+        result = self.cache.get(key, None)
+        if result is not None and result.expires < time.time():
+            del self.cache[key]
+            return None
+        return result
+
+    def store(self, key, result):
+        "Cache successful answers, answer result."
+        if result.error != 0:
+            return result
+        now = time.time()
+        if len(self.cache) >= MAX_CACHE_ENTRIES:
+            for k in self.cache.keys():
+                if self.cache[k].expires < now:
+                    del self.cache[k]
+        if len(self.cache) >= MAX_CACHE_ENTRIES:
+            self.cache.clear()
+        result.expires = now + self.ttl
+        self.cache[key] = result
+        return result
+
+    def name_result(self):
+        "Answer the host or name the last name or address lookup answered."
+        result = self.result
+        if result is None or result.error != 0 or len(result.strings) != 1:
+            return None
+        return result.strings[0]
+
+    def current_addrinfo(self, interp):
+        self.wait(interp, ADDRINFO_LOOKUP)
+        if self.addrinfo is None or self.addrinfo_index >= len(self.addrinfo.infos):
+            return None
+        return self.addrinfo.infos[self.addrinfo_index]
+
+    def next_addrinfo(self, interp):
+        "Move on to the next address info, answer whether there is one."
+        if self.current_addrinfo(interp) is None:
+            return False
+        self.addrinfo_index += 1
+        return self.current_addrinfo(interp) is not None
+
+    def nameinfo_string(self, interp, index):
+        "Answer the host (0) or the service (1) of the last getnameinfo."
+        self.wait(interp, NAMEINFO_LOOKUP)
+        if self.nameinfo is None:
+            return None
+        return self.nameinfo.strings[index]
@@ -0,0 +1,162 @@
+from rpython.translator.tool.cbuild import ExternalCompilationInfo
+from rpython.rtyper.lltypesystem import rffi
+from rpython.rlib.rarithmetic import intmask
+
+
+# the highest external semaphore index that can be signalled
+MAX_SEMAPHORE_INDEX = 4096
+
+eci = ExternalCompilationInfo(
+    post_include_bits=["""
+#ifndef __signal_queue_h
+#define __signal_queue_h
+
+#ifdef _WIN32
+#include <windows.h>
+#define DLLEXPORT __declspec(dllexport)
+#else
+#define DLLEXPORT __attribute__((__visibility__("default")))
+#endif
+
+#ifdef __cplusplus
+extern "C" {
+#endif
+        DLLEXPORT int RSqueakSignalSemaphoreWithIndex(long index);
+        DLLEXPORT long RSqueakHasPendingSignals(void);
+        DLLEXPORT long RSqueakTakePendingSignals(void);
+        DLLEXPORT long RSqueakHighestSignalledIndex(void);
+        DLLEXPORT long RSqueakTakeSemaphoreSignals(long index);
+        DLLEXPORT int RSqueakWakeupFd(void);
+#ifdef __cplusplus
+}
+#endif
+
+#endif"""],
+    separate_module_sources=["""
+#define RSQ_MAX_SEMAPHORES %(max)d
+
+/* Signal requests are counted per index by whoever signals, responses by
+   the VM only. The difference is the number of signals still to deliver. */
+static volatile long rsq_requests[RSQ_MAX_SEMAPHORES];
+static long rsq_responses[RSQ_MAX_SEMAPHORES];
+static volatile long rsq_pending = 0;
+static volatile long rsq_highest = 0;
+
+/* A pipe that gets a byte when signals become pending, so that the VM can
+   wait for them in poll() together with the fds it watches. */
+static int rsq_wakeup_fds[2] = {-1, -1};
+
+#ifdef _WIN32
+#define RSQ_INCREMENT(p) InterlockedIncrement(p)
+#define RSQ_EXCHANGE(p, v) InterlockedExchange(p, v)
+#define RSQ_CAS(p, old, new) (InterlockedCompareExchange(p, new, old) == (old))
+#else
+#define RSQ_INCREMENT(p) __sync_add_and_fetch(p, 1)
+#define RSQ_EXCHANGE(p, v) __sync_lock_test_and_set(p, v)
+#define RSQ_CAS(p, old, new) __sync_bool_compare_and_swap(p, old, new)
+#include <fcntl.h>
+#include <unistd.h>
+#endif
+
+int RSqueakSignalSemaphoreWithIndex(long index) {
+        long highest;
+        if (index <= 0 || index > RSQ_MAX_SEMAPHORES) {
+            return 0;
+        }
+        RSQ_INCREMENT(&rsq_requests[index - 1]);
+        while ((highest = rsq_highest) < index && !RSQ_CAS(&rsq_highest, highest, index));
+        if (RSQ_EXCHANGE(&rsq_pending, 1) == 0) {
+#ifndef _WIN32
+            if (rsq_wakeup_fds[1] >= 0) {
+                char byte = 0;
+                if (write(rsq_wakeup_fds[1], &byte, 1) < 0) {
+                    /* the pipe is full, so the VM will wake up anyway */
+                }
+            }
+#endif
+        }
+        return 1;
+}
+
+long RSqueakHasPendingSignals(void) {
+        return rsq_pending;
+}
+
+long RSqueakTakePendingSignals(void) {
+#ifndef _WIN32
+        char bytes[64];
+        if (rsq_wakeup_fds[0] >= 0) {
+            while (read(rsq_wakeup_fds[0], bytes, sizeof(bytes)) > 0);
+        }
+#endif
+        return RSQ_EXCHANGE(&rsq_pending, 0);
+}
+
+long RSqueakHighestSignalledIndex(void) {
+        return rsq_highest;
+}
+
+long RSqueakTakeSemaphoreSignals(long index) {
+        long requests = rsq_requests[index - 1];
+        long count = requests - rsq_responses[index - 1];
+        rsq_responses[index - 1] = requests;
+        return count;
+}
+
+int RSqueakWakeupFd(void) {
+#ifdef _WIN32
+        return -1;
+#else
+        if (rsq_wakeup_fds[0] < 0) {
+            int fds[2];
+            if (pipe(fds) != 0) {
+                return -1;
+            }
+            fcntl(fds[0], F_SETFL, fcntl(fds[0], F_GETFL) | O_NONBLOCK);
+            fcntl(fds[1], F_SETFL, fcntl(fds[1], F_GETFL) | O_NONBLOCK);
+            rsq_wakeup_fds[0] = fds[0];
+            rsq_wakeup_fds[1] = fds[1];
+        }
+        return rsq_wakeup_fds[0];
+#endif
+}""" % {"max": MAX_SEMAPHORE_INDEX}]
+)
+
+__ll_signal = rffi.llexternal('RSqueakSignalSemaphoreWithIndex', [rffi.LONG], rffi.INT,
+                              compilation_info=eci, releasegil=False)
+__ll_has_pending = rffi.llexternal('RSqueakHasPendingSignals', [], rffi.LONG,
+                                   compilation_info=eci, releasegil=False)
+__ll_take_pending = rffi.llexternal('RSqueakTakePendingSignals', [], rffi.LONG,
+                                    compilation_info=eci, releasegil=False)
+__ll_highest = rffi.llexternal('RSqueakHighestSignalledIndex', [], rffi.LONG,
+                               compilation_info=eci, releasegil=False)
+__ll_take_signals = rffi.llexternal('RSqueakTakeSemaphoreSignals', [rffi.LONG], rffi.LONG,
+                                    compilation_info=eci, releasegil=False)
+__ll_wakeup_fd = rffi.llexternal('RSqueakWakeupFd', [], rffi.INT,
+                                 compilation_info=eci, releasegil=False)
+
+def signal_semaphore_with_index(index):
+    """Queue a signal for the external semaphore at the 1-based index, like
+    signalSemaphoreWithIndex() in the Squeak VMs. Safe to call from any
+    thread, it neither allocates nor takes a lock. The interpreter delivers
+    the signal at its next interrupt check. Answer whether index is valid."""
+    return intmask(__ll_signal(index)) != 0
+
+def has_pending_signals():
+    return intmask(__ll_has_pending()) != 0
+
+def wakeup_fd():
+    """Answer an fd that becomes readable when signals are queued, to wait
+    for them with poll(), or -1 if there is none (Windows)."""
+    return intmask(__ll_wakeup_fd())
+
+def take_signals():
+    """Answer the indices of the semaphores signalled since the last call,
+    an index once for each signal, and forget about them."""
+    indices = []
+    if intmask(__ll_take_pending()) == 0:
+        return indices
+    for index in range(1, intmask(__ll_highest()) + 1):
+        for _ in range(intmask(__ll_take_signals(index))):
+            indices.append(index)
+    return indices
@@ -1,4 +1,9 @@
-from rpython.rlib import streamio, objectmodel
+import os
+import sys
+
+from rpython.rlib import streamio, objectmodel, rmmap
+from rpython.rlib.rarithmetic import intmask, r_uint, r_ulonglong, byteswap
+from rpython.rtyper.lltypesystem import lltype, rffi
 from rpython.rlib.rstruct.runpack import runpack as rlib_runpack
 from rsqueakvm.util import system
 
@@ -26,13 +31,41 @@ def swapped_chrs2long(b):
     assert len(b) == 8
     return runpack('<q', b)
 
+NATIVE_BIG_ENDIAN = sys.byteorder == "big"
+
 class Stream(object):
     """ Simple input stream.
-    Data is completely read into memory.
-    Constructor can raise OSError. """
+    Data is completely read into memory, unless use_mmap is given together
+    with a filename. In that case the file is mapped read-only. Either way,
+    words are decoded straight from the buffer without creating substrings,
+    and can be read at arbitrary positions with word_at. Constructor can
+    raise OSError. """
+    _immutable_fields_ = ["mtime", "inode"]
 
-    def __init__(self, filename=None, inputfile=None, data=None):
+    def __init__(self, filename=None, inputfile=None, data=None, use_mmap=False):
+        self.mmap = None
+        self.raw = lltype.nullptr(rffi.CCHARP.TO)
+        self.data = None
+        self.mtime = 0.0
+        self.inode = 0
         if filename:
+            st = os.stat(filename)
+            self.mtime = st.st_mtime
+            self.inode = intmask(st.st_ino)
+        if filename and use_mmap:
+            fd = os.open(filename, os.O_RDONLY, 0)
+            try:
+                try:
+                    self.mmap = rmmap.mmap(fd, 0, access=rmmap.ACCESS_READ)
+                except rmmap.RMMapError:
+                    pass # e.g. empty files cannot be mapped, read them instead
+            finally:
+                os.close(fd)
+        if self.mmap is not None:
+            # validated once here, words are then read straight from memory
+            self.mmap.check_valid()
+            self.raw = self.mmap.data
+        elif filename:
             f = streamio.open_file_as_stream(filename, mode="rb", buffering=0)
             try:
                 self.data = f.readall()
@@ -50,20 +83,102 @@ class Stream(object):
 
         self.reset()
 
-    def bytes2dword_with_correct_endianness(self, bytes):
+    def is_mapped(self):
+        return self.mmap is not None
+
+    def byte_at(self, pos):
+        if self.raw:
+            assert 0 <= pos < self.length()
+            return ord(self.raw[pos])
+        return ord(self.data[pos])
+
+    def mapped_word(self, pos, size):
+        """Load the aligned word of size bytes at pos from the mapping with a
+        single memory access"""
+        assert 0 <= pos and pos + size <= self.length()
+        ptr = rffi.ptradd(self.raw, pos)
+        if size == 4:
+            word32 = rffi.cast(rffi.UINTP, ptr)[0]
+            if self.big_endian != NATIVE_BIG_ENDIAN:
+                word32 = byteswap(word32)
+            return r_uint(word32)
+        word64 = rffi.cast(rffi.ULONGLONGP, ptr)[0]
+        if self.big_endian != NATIVE_BIG_ENDIAN:
+            word64 = byteswap(word64)
+        return r_uint(word64)
+
+    def decode_word(self, pos, size):
+        """Decode an unsigned word of size bytes at pos, without slicing"""
+        if self.raw and pos % size == 0:
+            return self.mapped_word(pos, size)
+        value = r_uint(0)
         if self.big_endian:
-            return runpack(">I", bytes)
+            for i in range(size):
+                value = (value << 8) | r_uint(self.byte_at(pos + i))
         else:
-            return runpack("<I", bytes)
+            for i in range(size - 1, -1, -1):
+                value = (value << 8) | r_uint(self.byte_at(pos + i))
+        return value
 
-    def bytes2qword_with_correct_endianness(self, bytes):
+    def decode_qword(self, pos):
+        if self.raw and pos % 8 == 0:
+            assert 0 <= pos and pos + 8 <= self.length()
+            qword = rffi.cast(rffi.ULONGLONGP, rffi.ptradd(self.raw, pos))[0]
+            if self.big_endian != NATIVE_BIG_ENDIAN:
+                qword = byteswap(qword)
+            return r_ulonglong(qword)
+        value = r_ulonglong(0)
         if self.big_endian:
-            return runpack(">Q", bytes)
+            for i in range(8):
+                value = (value << 8) | r_ulonglong(self.byte_at(pos + i))
         else:
-            return runpack("<Q", bytes)
+            for i in range(7, -1, -1):
+                value = (value << 8) | r_ulonglong(self.byte_at(pos + i))
+        return value
+
+    def word_at(self, pos):
+        """Answer the word at byte position pos, decoded like peek() would,
+        without moving the stream"""
+        if self.use_long_read:
+            assert system.IS_64BIT, "do not support reading 64 bit slots in 32 bit build"
+            return intmask(self.decode_word(pos, 8))
+        else:
+            return intmask(rffi.cast(rffi.INT, self.decode_word(pos, 4)))
+
+    def bytes_at(self, pos, n):
+        if self.mmap is not None:
+            return self.mmap.getslice(pos, n)
+        end = pos + n
+        assert pos >= 0 and end >= pos
+        return self.data[pos:end]
+
+    def checksum(self):
+        """Answer a 32-bit FNV-1a hash of the 32-bit words of the whole
+        stream, independent of the current position"""
+        h = r_uint(0x811c9dc5)
+        length = self.length()
+        end = length - length % 4
+        for pos in range(0, end, 4):
+            h = ((h ^ self.decode_word(pos, 4)) * r_uint(0x01000193)) & r_uint(0xffffffff)
+        for pos in range(end, length):
+            h = ((h ^ r_uint(self.byte_at(pos))) * r_uint(0x01000193)) & r_uint(0xffffffff)
+        return intmask(rffi.cast(rffi.INT, h))
+
+    def identity(self):
+        """Answer three 32-bit words that change whenever the contents may
+        have: the modification time (seconds and microseconds) and the inode
+        of a file, without reading it. Data that did not come from a named
+        file is already in memory, it is identified by 0, 0 and its
+        checksum."""
+        if self.mtime == 0.0 and self.inode == 0:
+            return [0, 0, self.checksum()]
+        seconds = int(self.mtime)
+        micros = int((self.mtime - seconds) * 1000000)
+        return [intmask(rffi.cast(rffi.INT, seconds)), micros,
+                intmask(rffi.cast(rffi.INT, self.inode))]
 
     def peek_bytes(self, n):
-        return self.data[self.pos:self.pos+n]
+        return self.bytes_at(self.pos, min(n, self.length() - self.pos))
 
     def next_bytes(self, n):
         bytes = self.peek_bytes(n)
@@ -72,20 +187,9 @@ class Stream(object):
         return bytes
 
     def peek(self):
-        if self.pos >= len(self.data):
+        if self.pos >= self.length():
             raise IndexError
-        data_peek = self.data[self.pos:self.pos + self.word_size]
-        if self.use_long_read:
-            assert system.IS_64BIT, "do not support reading 64 bit slots in 32 bit build"
-            if self.big_endian:
-                return chrs2long(data_peek)
-            else:
-                return swapped_chrs2long(data_peek)
-        else:
-            if self.big_endian:
-                return chrs2int(data_peek)
-            else:
-                return swapped_chrs2int(data_peek)
+        return self.word_at(self.pos)
 
     def next(self):
         integer = self.peek()
@@ -99,9 +203,17 @@ class Stream(object):
         self.count += 2
         return short
 
+    def next_word32(self):
+        """Answer the next signed 32-bit word, also in 64-bit mode"""
+        word = intmask(rffi.cast(rffi.INT, self.decode_word(self.pos, 4)))
+        self.pos += 4
+        self.count += 4
+        return word
+
     def next_qword(self):
-        bytes = self.next_bytes(8)
-        qword = self.bytes2qword_with_correct_endianness(bytes)
+        qword = self.decode_qword(self.pos)
+        self.pos += 8
+        self.count += 8
         return qword
 
     def reset(self):
@@ -115,21 +227,27 @@ class Stream(object):
 
     def skipbytes(self, jump):
         assert jump > 0
-        assert (self.pos + jump) <= len(self.data)
+        assert (self.pos + jump) <= self.length()
         self.pos += jump
         self.count += jump
 
     def skipwords(self, jump):
         self.skipbytes(jump * self.word_size)
-        assert (self.pos + jump) <= len(self.data)
+        assert (self.pos + jump) <= self.length()
         self.pos += jump
         self.count += jump
 
     def length(self):
+        if self.mmap is not None:
+            return self.mmap.len()
         return len(self.data)
 
     def close(self):
         self.data = None
+        self.raw = lltype.nullptr(rffi.CCHARP.TO)
+        if self.mmap is not None:
+            self.mmap.close()
+            self.mmap = None
 
     def be_64bit(self):
         self.word_size = 8
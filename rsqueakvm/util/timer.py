@@ -0,0 +1,172 @@
+from rpython.translator.tool.cbuild import ExternalCompilationInfo
+from rpython.rtyper.lltypesystem import lltype, rffi
+from rpython.rlib.rarithmetic import r_longlong
+
+from rsqueakvm import constants
+
+
+eci = ExternalCompilationInfo(
+    post_include_bits=["""
+#ifndef __timer_h
+#define __timer_h
+
+#ifdef _WIN32
+#include <windows.h>
+#define DLLEXPORT __declspec(dllexport)
+#else
+#define DLLEXPORT __attribute__((__visibility__("default")))
+#endif
+
+#ifdef __cplusplus
+extern "C" {
+#endif
+        DLLEXPORT long *RSqueakInterruptPendingFlag(void);
+        DLLEXPORT int RSqueakSetTimerDeadline(long long unix_us);
+#ifdef __cplusplus
+}
+#endif
+
+#endif"""],
+    separate_module_sources=["""
+/* A helper thread sleeps until the deadline of the timer semaphore and then
+   raises the interrupt pending flag, which the interpreter reads on every
+   quick interrupt check. */
+static volatile long rsq_interrupt_pending = 0;
+static volatile long long rsq_deadline = 0; /* Unix epoch microseconds */
+static int rsq_timer_started = 0;
+
+long *RSqueakInterruptPendingFlag(void) {
+        return (long *)&rsq_interrupt_pending;
+}
+
+#ifdef _WIN32
+static HANDLE rsq_timer_event = NULL;
+
+static long long rsq_now(void) {
+        FILETIME ft;
+        ULARGE_INTEGER t;
+        GetSystemTimeAsFileTime(&ft);
+        t.LowPart = ft.dwLowDateTime;
+        t.HighPart = ft.dwHighDateTime;
+        /* 100ns intervals since 1601 to microseconds since 1970 */
+        return (long long)(t.QuadPart / 10) - 11644473600000000LL;
+}
+
+static DWORD WINAPI rsq_timer_loop(LPVOID arg) {
+        while (1) {
+            long long deadline = rsq_deadline;
+            long long remaining;
+            if (deadline == 0) {
+                WaitForSingleObject(rsq_timer_event, INFINITE);
+                continue;
+            }
+            remaining = deadline - rsq_now();
+            if (remaining <= 0) {
+                if (InterlockedCompareExchange64(&rsq_deadline, 0, deadline) == deadline) {
+                    InterlockedExchange(&rsq_interrupt_pending, 1);
+                }
+                continue;
+            }
+            WaitForSingleObject(rsq_timer_event, (DWORD)((remaining + 999) / 1000));
+        }
+        return 0;
+}
+
+int RSqueakSetTimerDeadline(long long unix_us) {
+        if (!rsq_timer_started) {
+            rsq_timer_event = CreateEvent(NULL, FALSE, FALSE, NULL);
+            if (rsq_timer_event == NULL ||
+                    CreateThread(NULL, 0, rsq_timer_loop, NULL, 0, NULL) == NULL) {
+                return 0;
+            }
+            rsq_timer_started = 1;
+        }
+        InterlockedExchange64(&rsq_deadline, unix_us);
+        InterlockedExchange(&rsq_interrupt_pending, 0);
+        SetEvent(rsq_timer_event);
+        return 1;
+}
+#else
+#include <pthread.h>
+#include <sys/time.h>
+
+static pthread_mutex_t rsq_timer_lock = PTHREAD_MUTEX_INITIALIZER;
+static pthread_cond_t rsq_timer_cond = PTHREAD_COND_INITIALIZER;
+
+static void *rsq_timer_loop(void *arg) {
+        pthread_mutex_lock(&rsq_timer_lock);
+        while (1) {
+            long long deadline = rsq_deadline;
+            struct timeval now;
+            struct timespec until;
+            if (deadline == 0) {
+                pthread_cond_wait(&rsq_timer_cond, &rsq_timer_lock);
+                continue;
+            }
+            gettimeofday(&now, NULL);
+            if (now.tv_sec * 1000000LL + now.tv_usec >= deadline) {
+                rsq_deadline = 0;
+                __sync_lock_test_and_set(&rsq_interrupt_pending, 1);
+                continue;
+            }
+            until.tv_sec = deadline / 1000000;
+            until.tv_nsec = (deadline % 1000000) * 1000;
+            pthread_cond_timedwait(&rsq_timer_cond, &rsq_timer_lock, &until);
+        }
+        return NULL;
+}
+
+/* A forked child has no timer thread, and the lock may have been held by
+   the thread of the parent. Start over, the next deadline starts a thread. */
+static void rsq_timer_after_fork(void) {
+        pthread_mutex_init(&rsq_timer_lock, NULL);
+        pthread_cond_init(&rsq_timer_cond, NULL);
+        rsq_timer_started = 0;
+}
+
+int RSqueakSetTimerDeadline(long long unix_us) {
+        static int rsq_atfork_registered = 0;
+        int ok = 1;
+        if (!rsq_atfork_registered) {
+            pthread_atfork(NULL, NULL, rsq_timer_after_fork);
+            rsq_atfork_registered = 1;
+        }
+        pthread_mutex_lock(&rsq_timer_lock);
+        if (!rsq_timer_started) {
+            pthread_t thread;
+            if (pthread_create(&thread, NULL, rsq_timer_loop, NULL) == 0) {
+                pthread_detach(thread);
+                rsq_timer_started = 1;
+            } else {
+                ok = 0;
+            }
+        }
+        rsq_deadline = unix_us;
+        rsq_interrupt_pending = 0;
+        pthread_cond_signal(&rsq_timer_cond);
+        pthread_mutex_unlock(&rsq_timer_lock);
+        return ok;
+}
+#endif"""]
+)
+
+__ll_interrupt_pending_flag = rffi.llexternal('RSqueakInterruptPendingFlag', [], rffi.LONGP,
+                                              compilation_info=eci, releasegil=False)
+__ll_set_deadline = rffi.llexternal('RSqueakSetTimerDeadline', [rffi.LONGLONG], rffi.INT,
+                                    compilation_info=eci, releasegil=False)
+
+def interrupt_pending_flag():
+    """Answer a pointer to the flag the timer thread raises when the
+    deadline has passed. Whoever handles it resets it to 0."""
+    return __ll_interrupt_pending_flag()
+
+def set_deadline(squeak_us):
+    """Raise the interrupt pending flag at squeak_us, UTC microseconds since
+    the Smalltalk epoch, or never if it is 0. A flag raised for the previous
+    deadline is lowered, so a raised flag always means the current one has
+    passed. Answer whether the timer thread is running."""
+    if squeak_us == 0:
+        unix_us = r_longlong(0)
+    else:
+        unix_us = r_longlong(squeak_us - constants.SQUEAK_EPOCH_DELTA_MICROSECONDS)
+    return rffi.cast(lltype.Signed, __ll_set_deadline(unix_us)) != 0
@@ -1,9 +1,11 @@
 from rpython.rlib import jit
+from rpython.rlib.rarithmetic import LONG_BIT, r_uint
 
 from rsqueakvm import constants
 from rsqueakvm.error import FatalError, WrapperException, PrimitiveFailedError
 from rsqueakvm.model.display import W_DisplayBitmap, from_words_object
 from rsqueakvm.model.pointers import W_PointersObject
+from rsqueakvm.storage import ProcessListShadow, ProcessListsShadow
 
 
 class Wrapper(object):
@@ -219,12 +221,94 @@ class SchedulerWrapper(Wrapper):
         return ProcessWrapper(self.space, unwrapped_wake_highest_priority_process(self.space, w_lists))
 
 def unwrapped_wake_highest_priority_process(space, w_lists):
-    for i in range(w_lists.size() - 1, -1, -1):
-        process_list = LinkedListWrapper(space, w_lists.fetch(space, i))
+    ready_queues = space.ready_queues
+    ready_queues.sync(space, w_lists)
+    while True:
+        index0 = ready_queues.highest()
+        if index0 < 0:
+            break
+        process_list = LinkedListWrapper(space, w_lists.fetch(space, index0))
         if not process_list.is_empty_list():
             return process_list.remove_first_link_of_list()
+        ready_queues.clear(index0)
     raise FatalError("Scheduler could not find a runnable process")
 
+def highest_bit(word):
+    "Answer the index of the highest bit set in the non-zero r_uint word."
+    index = 0
+    shift = LONG_BIT / 2
+    while shift > 0:
+        if word >> shift:
+            word >>= shift
+            index += shift
+        shift /= 2
+    return index
+
+class ReadyQueues(object):
+    """VM-side shadow of the process lists of the ProcessorScheduler: a
+    bitmap with a bit for each priority whose list is non-empty, so waking
+    the highest priority process does not have to look at every (mostly
+    empty) list from the top down.
+
+    sync puts a ProcessListShadow on each list, which updates the bit of its
+    priority whenever its first link is stored, by the VM or by image code
+    (e.g. Process>>terminate). The lists array gets a ProcessListsShadow,
+    which invalidates the bitmap when another list is stored into it. When
+    the scheduler gets a new lists array (image start, highestPriority:)
+    the bitmap is rebuilt as well."""
+    _attrs_ = ["w_lists", "bits"]
+
+    def __init__(self):
+        self.w_lists = None
+        self.bits = []
+
+    def sync(self, space, w_lists):
+        if self.w_lists is w_lists:
+            return
+        if isinstance(w_lists, W_PointersObject):
+            w_lists.as_special_get_shadow(space, ProcessListsShadow)
+        self.w_lists = w_lists
+        size = w_lists.size()
+        self.bits = [r_uint(0)] * ((size + LONG_BIT - 1) / LONG_BIT)
+        for index0 in range(size):
+            w_list = w_lists.fetch(space, index0)
+            if isinstance(w_list, W_PointersObject):
+                w_list.as_special_get_shadow(space, ProcessListShadow).index0 = index0
+            if not LinkedListWrapper(space, w_list).is_empty_list():
+                self.set(index0)
+
+    def invalidate(self, w_lists):
+        "Another list was stored into w_lists."
+        if self.w_lists is w_lists:
+            self.w_lists = None
+
+    def set(self, index0):
+        self.bits[index0 / LONG_BIT] |= r_uint(1) << (index0 % LONG_BIT)
+
+    def clear(self, index0):
+        self.bits[index0 / LONG_BIT] &= ~(r_uint(1) << (index0 % LONG_BIT))
+
+    def highest(self):
+        "Answer the highest 0-based priority whose bit is set, or -1."
+        for i in range(len(self.bits) - 1, -1, -1):
+            word = self.bits[i]
+            if word:
+                return i * LONG_BIT + highest_bit(word)
+        return -1
+
+    def note_first_link(self, space, index0, w_list, w_first):
+        """w_first was stored as the first link of w_list, which was the
+        list for the 0-based priority index0 when it was synced."""
+        w_lists = self.w_lists
+        if w_lists is None or not 0 <= index0 < w_lists.size():
+            return
+        if not w_lists.fetch(space, index0).is_same_object(w_list):
+            return
+        if w_first.is_nil(space):
+            self.clear(index0)
+        else:
+            self.set(index0)
+
 def scheduler(space):
     return SchedulerWrapper(space, space.w_Processor)
 
@@ -0,0 +1,35 @@
+#!/bin/bash
+
+# Times the instance enumeration primitives (allInstances, someInstance /
+# nextInstance, allObjects) over heaps of a growing number of objects.
+
+if [ "$#" -ne 2 ]; then
+  echo "Please provide a RSqueak binary and an image!"
+  exit
+fi
+
+RSQUEAK=$1
+IMAGE=$2
+ARGS="--silent"
+
+MAX=4000000
+OBJECTS=1000000
+
+SETUP="|keep| keep := (1 to: ${OBJECTS}) collect: [:i | Association key: i value: nil]."
+
+while [ ${OBJECTS} -le ${MAX} ]; do
+  echo "#### ${OBJECTS} extra objects"
+  "${RSQUEAK}" ${ARGS} -r "${SETUP} ^ [Association allInstances size] timeToRun" "${IMAGE}"
+  echo "for Association allInstances"
+  echo "======================================================================="
+  "${RSQUEAK}" ${ARGS} -r "${SETUP} ^ [|n o| n := 0. o := Association someInstance. [o == nil] whileFalse: [n := n + 1. o := o nextInstance]] timeToRun" "${IMAGE}"
+  echo "for Association someInstance / nextInstance"
+  echo "======================================================================="
+  "${RSQUEAK}" ${ARGS} -r "${SETUP} ^ [|n| n := 0. Association allInstancesDo: [:each | n := n + 1]] timeToRun" "${IMAGE}"
+  echo "for Association allInstancesDo:"
+  echo "======================================================================="
+  "${RSQUEAK}" ${ARGS} -r "${SETUP} ^ [|n o| n := 0. o := self someObject. [o == 0] whileFalse: [n := n + 1. o := o nextObject]] timeToRun" "${IMAGE}"
+  echo "for someObject / nextObject"
+  echo "======================================================================="
+  OBJECTS=$(( OBJECTS * 2 ))
+done
@@ -0,0 +1,34 @@
+#!/bin/bash
+
+# Delay lateness: how much later than asked for `(Delay forMilliseconds: d)
+# wait` returns, for 1, 10 and 100 ms delays. Prints the 50th, 90th and
+# 99th percentile and the maximum in microseconds, once with the VM idle
+# and once with a busy process at background priority.
+
+if [ "$#" -ne 2 ]; then
+  echo "Please provide a RSqueak binary and an image!"
+  exit
+fi
+
+RSQUEAK=$1
+IMAGE=$2
+ARGS="--silent"
+
+WAITS=${WAITS:-200}
+
+function lateness() {
+  # $1 the delay in milliseconds, $2 true to keep the VM busy meanwhile
+  echo "|n busy late pct| n := ${WAITS} * 10 // ($1 max: 10). $2 ifTrue: [busy := [[true] whileTrue: [100 factorial]] forkAt: Processor userBackgroundPriority]. late := (1 to: n) collect: [:i | |t0| t0 := Time utcMicrosecondClock. (Delay forMilliseconds: $1) wait. Time utcMicrosecondClock - t0 - ($1 * 1000)]. busy ifNotNil: [busy terminate]. late := late asArray sort. pct := [:p | late at: (n * p // 100 max: 1)]. ^ 'p50 ', (pct value: 50) printString, ' p90 ', (pct value: 90) printString, ' p99 ', (pct value: 99) printString, ' max ', late last printString, ' us late (', n printString, ' waits)'"
+}
+
+for load in false true; do
+  for ms in 1 10 100; do
+    "${RSQUEAK}" ${ARGS} -r "$(lateness ${ms} ${load})" "${IMAGE}"
+    if [ "${load}" = "true" ]; then
+      echo "for ${ms} ms delays with a busy background process"
+    else
+      echo "for ${ms} ms delays"
+    fi
+    echo "======================================================================="
+  done
+done
@@ -0,0 +1,36 @@
+#!/bin/bash
+
+# Writes a 1 GB file line by line through a FileStream and reads it back
+# line by line, once with the default file handle buffer and once
+# unbuffered (primitiveFileSetBufferSize with 0).
+
+if [ "$#" -ne 2 ]; then
+  echo "Please provide a RSqueak binary and an image!"
+  exit
+fi
+
+RSQUEAK=$1
+IMAGE=$2
+ARGS="--silent"
+
+FILE=$(mktemp /tmp/bench_fileio.XXXXXX)
+# 2^24 lines of 63 characters and a line feed
+LINES=16777216
+
+LINE="|line| line := (String new: 63 withAll: \$x), (String with: Character lf)."
+COMPILE="StandardFileStream compile: 'primSetBufferSize: id to: size <primitive: ''primitiveFileSetBufferSize'' module: ''FilePlugin''> ^ self primitiveFailed' classified: 'benchmark'. StandardFileStream compile: 'bufferSize: size self primSetBufferSize: fileID to: size' classified: 'benchmark'."
+
+bench() {
+  BUFFER="f bufferSize: $1."
+  "${RSQUEAK}" ${ARGS} -r "${LINE} ${COMPILE} ^ [|f| f := StandardFileStream forceNewFileNamed: '${FILE}'. ${BUFFER} ${LINES} timesRepeat: [f nextPutAll: line]. f close] timeToRun" "${IMAGE}"
+  echo "for writing 1 GB line by line with a buffer of $1 bytes"
+  echo "======================================================================="
+  "${RSQUEAK}" ${ARGS} -r "${COMPILE} ^ [|f n| n := 0. f := StandardFileStream readOnlyFileNamed: '${FILE}'. ${BUFFER} [f atEnd] whileFalse: [f nextLine. n := n + 1]. f close] timeToRun" "${IMAGE}"
+  echo "for reading 1 GB line by line with a buffer of $1 bytes"
+  echo "======================================================================="
+}
+
+bench 65536
+bench 0
+
+rm -f "${FILE}"
@@ -0,0 +1,30 @@
+#!/bin/bash
+
+# Reports the peak resident set size of a VM holding many byte objects
+# (Strings, ByteArrays, Symbols and LargeIntegers), to compare the memory
+# footprint of the byte object storage between builds.
+
+if [ "$#" -ne 2 ]; then
+  echo "Please provide a RSqueak binary and an image!"
+  exit
+fi
+
+RSQUEAK=$1
+IMAGE=$2
+ARGS="--silent"
+
+MAX=4000000
+OBJECTS=1000000
+
+while [ ${OBJECTS} -le ${MAX} ]; do
+  /usr/bin/time -f "%M KB peak RSS" "${RSQUEAK}" ${ARGS} -r "|keep| keep := (1 to: ${OBJECTS}) collect: [:i | i printString, 'abcdefghijklmnopqrstuvwxyz']. ^ keep size" "${IMAGE}"
+  echo "for ${OBJECTS} Strings of 27+ bytes"
+  echo "======================================================================="
+  /usr/bin/time -f "%M KB peak RSS" "${RSQUEAK}" ${ARGS} -r "|keep| keep := (1 to: ${OBJECTS}) collect: [:i | ByteArray new: 64]. ^ keep size" "${IMAGE}"
+  echo "for ${OBJECTS} ByteArrays of 64 bytes"
+  echo "======================================================================="
+  /usr/bin/time -f "%M KB peak RSS" "${RSQUEAK}" ${ARGS} -r "|keep| keep := (1 to: ${OBJECTS}) collect: [:i | (2 raisedTo: 100) + i]. ^ keep size" "${IMAGE}"
+  echo "for ${OBJECTS} LargePositiveIntegers"
+  echo "======================================================================="
+  OBJECTS=$(( OBJECTS * 2 ))
+done
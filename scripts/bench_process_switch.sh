@@ -0,0 +1,38 @@
+#!/bin/bash
+
+# Process switch microbenchmarks for the scheduler: semaphore ping-pong
+# between two processes, a bounded producer/consumer, a ring of processes
+# passing a token and short-lived forked processes. Each prints the number
+# of process switches per second.
+
+if [ "$#" -ne 2 ]; then
+  echo "Please provide a RSqueak binary and an image!"
+  exit
+fi
+
+RSQUEAK=$1
+IMAGE=$2
+ARGS="--silent"
+
+SWITCHES=${SWITCHES:-1000000}
+RING=${RING:-1000}
+SLOTS=${SLOTS:-16}
+
+function rate() {
+  # $1 the number of switches, $2 the block that does them
+  echo "|n ms| n := $1. ms := $2 timeToRun. ^ (n * 1000 // (ms max: 1)) printString, ' switches/sec (', ms printString, ' ms)'"
+}
+
+echo "#### ${SWITCHES} switches"
+"${RSQUEAK}" ${ARGS} -r "$(rate ${SWITCHES} "[|ping pong| ping := Semaphore new. pong := Semaphore new. [n // 2 timesRepeat: [ping wait. pong signal]] fork. n // 2 timesRepeat: [ping signal. pong wait]]")" "${IMAGE}"
+echo "for semaphore ping-pong"
+echo "======================================================================="
+"${RSQUEAK}" ${ARGS} -r "$(rate ${SWITCHES} "[|slots items done| slots := Semaphore new. items := Semaphore new. done := Semaphore new. ${SLOTS} timesRepeat: [slots signal]. [n // 2 timesRepeat: [items wait. slots signal]. done signal] fork. n // 2 timesRepeat: [slots wait. items signal]. done wait]")" "${IMAGE}"
+echo "for producer/consumer with ${SLOTS} slots"
+echo "======================================================================="
+"${RSQUEAK}" ${ARGS} -r "$(rate ${SWITCHES} "[|semas done| semas := (1 to: ${RING}) collect: [:i | Semaphore new]. done := Semaphore new. 1 to: ${RING} do: [:i | [(n // ${RING}) timesRepeat: [(semas at: i) wait. (semas at: i \\\\ ${RING} + 1) signal]. i = ${RING} ifTrue: [done signal]] fork]. semas first signal. done wait]")" "${IMAGE}"
+echo "for a ring of ${RING} processes"
+echo "======================================================================="
+"${RSQUEAK}" ${ARGS} -r "$(rate ${SWITCHES} "[|sema| sema := Semaphore new. n // 2 timesRepeat: [[sema signal] fork. sema wait]]")" "${IMAGE}"
+echo "for forked processes"
+echo "======================================================================="
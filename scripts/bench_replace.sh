@@ -0,0 +1,33 @@
+#!/bin/bash
+
+# Times string building and collection copying, which spend most of their
+# time in replaceFrom:to:with:startingAt: (primitive 105).
+
+if [ "$#" -ne 2 ]; then
+  echo "Please provide a RSqueak binary and an image!"
+  exit
+fi
+
+RSQUEAK=$1
+IMAGE=$2
+ARGS="--silent"
+
+MAX=1000000
+COUNT=100000
+
+while [ ${COUNT} -le ${MAX} ]; do
+  echo "#### ${COUNT} iterations"
+  "${RSQUEAK}" ${ARGS} -r "^ [|s| s := WriteStream on: String new. 1 to: ${COUNT} do: [:i | s nextPutAll: 'abcdefghijklmnopqrstuvwxyz']. s contents size] timeToRun" "${IMAGE}"
+  echo "for WriteStream>>nextPutAll: on a String"
+  echo "======================================================================="
+  "${RSQUEAK}" ${ARGS} -r "^ [|s| s := ''. 1 to: ${COUNT} // 100 do: [:i | s := s, 'abcdefghijklmnopqrstuvwxyz']. s size] timeToRun" "${IMAGE}"
+  echo "for String>>, in a loop"
+  echo "======================================================================="
+  "${RSQUEAK}" ${ARGS} -r "^ [|a| a := (1 to: 1000) asArray. 1 to: ${COUNT} // 10 do: [:i | a copy]] timeToRun" "${IMAGE}"
+  echo "for Array>>copy of SmallIntegers"
+  echo "======================================================================="
+  "${RSQUEAK}" ${ARGS} -r "^ [|b| b := Bitmap new: 1000. 1 to: ${COUNT} // 10 do: [:i | b copy]] timeToRun" "${IMAGE}"
+  echo "for Bitmap>>copy"
+  echo "======================================================================="
+  COUNT=$(( COUNT * 10 ))
+done
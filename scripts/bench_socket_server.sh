@@ -0,0 +1,80 @@
+#!/bin/bash
+
+# Load test for the server side of the SocketPlugin: runs an echo server in
+# the image (one process per accepted connection) and hammers it from
+# loopback clients, reporting requests/sec and round trip latencies.
+
+if [ "$#" -ne 2 ]; then
+  echo "Please provide a RSqueak binary and an image!"
+  exit
+fi
+
+RSQUEAK=$1
+IMAGE=$2
+ARGS="--silent"
+PYTHON=${PYTHON:-python3}
+
+PORT=${PORT:-8765}
+CLIENTS=${CLIENTS:-16}
+REQUESTS=${REQUESTS:-2000}
+SIZE=${SIZE:-64}
+
+SERVER="|server| server := Socket newTCP. server setOption: 'TCP_NODELAY' value: true. server listenOn: ${PORT} backlogSize: 128. [true] whileTrue: [(server waitForAcceptFor: 60) ifNotNil: [:conn | [[conn isConnected] whileTrue: [(conn receiveDataTimeout: 60) ifNotEmpty: [:data | conn sendData: data]]. conn closeAndDestroy] fork]]"
+
+"${RSQUEAK}" ${ARGS} -r "${SERVER}" "${IMAGE}" &
+SERVER_PID=$!
+trap "kill ${SERVER_PID} 2>/dev/null" EXIT
+
+"${PYTHON}" - "${PORT}" "${CLIENTS}" "${REQUESTS}" "${SIZE}" <<'EOF'
+import socket, sys, threading, time
+
+port, clients, requests, size = [int(arg) for arg in sys.argv[1:]]
+timer = getattr(time, "perf_counter", time.time)
+message = b"x" * size
+
+def connect():
+    deadline = time.time() + 60
+    while True:
+        try:
+            sock = socket.create_connection(("127.0.0.1", port))
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            return sock
+        except socket.error:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.1)
+
+def client(latencies):
+    sock = connect()
+    for _ in range(requests):
+        start = timer()
+        sock.sendall(message)
+        received = 0
+        while received < size:
+            chunk = sock.recv(size - received)
+            if not chunk:
+                raise RuntimeError("server closed the connection")
+            received += len(chunk)
+        latencies.append(timer() - start)
+    sock.close()
+
+connect().close()  # wait for the image to come up
+results = [[] for _ in range(clients)]
+threads = [threading.Thread(target=client, args=(r,)) for r in results]
+start = timer()
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+elapsed = timer() - start
+
+latencies = sorted(l for r in results for l in r)
+if not latencies:
+    sys.exit("no requests completed")
+def percentile(p):
+    return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+print("%d clients, %d requests of %d bytes" % (clients, len(latencies), size))
+print("%.0f requests/sec" % (len(latencies) / elapsed))
+print("latency p50 %.3f ms, p99 %.3f ms, max %.3f ms" % (
+    percentile(0.5), percentile(0.99), latencies[-1] * 1000))
+EOF